@@ -0,0 +1,216 @@
+# api/admission.py
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed instead of queued.
+
+    Attributes:
+        status_code: 429 when the wait queue is full, 503 when the expected
+                     (or actual) queue wait exceeds the configured maximum
+        retry_after: Suggested client back-off in whole seconds
+        mode: Admission pool that rejected the request
+    """
+
+    def __init__(self, status_code: int, retry_after: int, mode: str, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.mode = mode
+        self.reason = reason
+
+
+class AdmissionSlot:
+    """
+    A concurrency slot held by one request.
+
+    The slot is normally bound to the worker future running the strategy, so
+    it is returned only when that work actually finishes - a request that
+    already answered 504 keeps its slot until the thread stops.
+    """
+
+    def __init__(self, pool: "_ModePool", wait_seconds: float):
+        self._pool = pool
+        self._acquired_at = time.monotonic()
+        self._bound = False
+        self._released = False
+        self.wait_seconds = wait_seconds
+
+    def bind(self, future: asyncio.Future) -> None:
+        """Release the slot when the given future completes."""
+        self._bound = True
+        future.add_done_callback(lambda _: self.release())
+
+    def release(self) -> None:
+        """Return the slot to its pool (idempotent)."""
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(time.monotonic() - self._acquired_at)
+
+    def release_if_unbound(self) -> None:
+        """Release unless ownership was handed to a worker future."""
+        if not self._bound:
+            self.release()
+
+
+class _ModePool:
+    """FIFO concurrency pool for one execution mode. Event-loop use only."""
+
+    # Smoothing factor for the service-time moving average
+    EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        mode: str,
+        limit: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        initial_service_seconds: float,
+    ):
+        self.mode = mode
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_seconds = initial_service_seconds
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_wait = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self) -> float:
+        """Expected queue wait for a new arrival, from the service-time average."""
+        if self.in_flight < self.limit and not self._waiters:
+            return 0.0
+        batches_ahead = self.queued // self.limit + 1
+        return batches_ahead * self._service_seconds
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        if status_code == 429:
+            self.rejected_queue_full += 1
+        else:
+            self.rejected_wait += 1
+        logger.warning(
+            f"Admission rejected | mode={self.mode} status={status_code} reason={reason} "
+            f"in_flight={self.in_flight}/{self.limit} queued={self.queued}/{self.max_queue}"
+        )
+        return AdmissionRejected(status_code, self._retry_after(), self.mode, reason)
+
+    def _record_admit(self, wait_seconds: float) -> AdmissionSlot:
+        self.admitted += 1
+        self._wait_total += wait_seconds
+        self._wait_max = max(self._wait_max, wait_seconds)
+        return AdmissionSlot(self, wait_seconds)
+
+    async def acquire(self) -> AdmissionSlot:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return self._record_admit(0.0)
+
+        if self.queued >= self.max_queue:
+            raise self._reject(429, "queue_full")
+
+        if self.estimated_wait() > self.max_wait_seconds:
+            raise self._reject(503, "estimated_wait_exceeded")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Slot was handed over just as the wait expired - give it back
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise self._reject(503, "wait_timeout") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+        return self._record_admit(time.monotonic() - started)
+
+    def release(self, service_seconds: float | None) -> None:
+        if service_seconds is not None:
+            self._service_seconds += self.EWMA_ALPHA * (service_seconds - self._service_seconds)
+        # Hand the slot straight to the next waiter so in_flight never dips
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_wait": self.rejected_wait,
+            "avg_wait_ms": int(self._wait_total / self.admitted * 1000) if self.admitted else 0,
+            "max_wait_ms": int(self._wait_max * 1000),
+            "est_service_ms": int(self._service_seconds * 1000),
+        }
+
+
+class AdmissionController:
+    """
+    Per-mode admission control for the improve endpoint.
+
+    Each mode has its own concurrency limit and bounded FIFO wait queue.
+    Requests are shed fast instead of piling up behind the 120s strategy
+    timeout: 429 when the queue is full, 503 when the expected wait is
+    already longer than max_wait_seconds or the wait actually times out.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int],
+        max_queue: int,
+        max_wait_seconds: float,
+        initial_service_seconds: float = 5.0,
+    ):
+        self._pools = {
+            mode: _ModePool(mode, limit, max_queue, max_wait_seconds, initial_service_seconds)
+            for mode, limit in limits.items()
+        }
+
+    async def acquire(self, mode: str) -> AdmissionSlot:
+        """
+        Wait for a slot in the mode's pool.
+
+        Raises:
+            AdmissionRejected: If the request should be shed
+            KeyError: If the mode has no configured pool
+        """
+        return await self._pools[mode].acquire()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Queue depth, occupancy and wait-time metrics per mode."""
+        return {mode: pool.snapshot() for mode, pool in self._pools.items()}
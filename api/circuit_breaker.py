@@ -1,66 +1,181 @@
 # api/circuit_breaker.py
-import asyncio
 import logging
+import time
+from collections import deque
+from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
 
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+
 logger = logging.getLogger(__name__)
 
+StateListener = Callable[[BreakerState, BreakerState], None]
+
 
 class CircuitBreaker:
     """
-    Thread-safe circuit breaker for async operations.
+    Low-overhead circuit breaker for async operations.
+
+    Prevents cascading failures by disabling operations after consecutive
+    failures, or once the failure rate over the last ``window_size`` calls
+    reaches ``failure_rate_threshold``. After the cooldown a single probe is
+    let through (HALF_OPEN): its success closes the breaker, its failure
+    re-opens it.
 
-    Prevents cascading failures by disabling operations after
-    consecutive failures. Automatically re-enables after cooldown period.
+    The breaker is used from one event loop and none of its methods await,
+    so each call runs to completion without interleaving and needs no lock.
+    While CLOSED, should_attempt() is a single attribute check and never
+    reads the clock; timing uses the monotonic clock, so wall-clock jumps
+    cannot open or close the breaker.
     """
 
-    def __init__(self, max_failures: int = 5, timeout_seconds: int = 300):
+    def __init__(
+        self,
+        max_failures: int = 5,
+        timeout_seconds: float = 300,
+        window_size: int = 0,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int | None = None,
+        on_state_change: StateListener | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_failures: Consecutive failures that open the breaker
+            timeout_seconds: How long the breaker stays open before probing
+            window_size: Calls in the sliding failure-rate window (0 disables it)
+            failure_rate_threshold: Window failure rate that opens the breaker
+            min_calls: Calls needed before the rate is trusted (default: window_size)
+            on_state_change: Called with (old, new) on every transition
+            clock: Monotonic time source (seconds)
+        """
         self._max_failures = max_failures
         self._timeout_seconds = timeout_seconds
+        self._failure_rate_threshold = failure_rate_threshold
+        self._min_calls = window_size if min_calls is None else min_calls
+        self._clock = clock
+        self._state = BreakerState.CLOSED
         self._failure_count = 0
+        self._open_until = 0.0
+        # Wall-clock reopen time, informational only (logs, /health)
         self._disabled_until: datetime | None = None
-        self._lock = asyncio.Lock()
+        self._probe_started: float | None = None
+        self._window: deque[bool] | None = deque(maxlen=window_size) if window_size > 0 else None
+        self._window_failures = 0
+        self._listeners: list[StateListener] = [on_state_change] if on_state_change else []
 
-    async def should_attempt(self) -> bool:
-        """Check if operation should be attempted."""
-        async with self._lock:
-            # Check if disabled
-            if self._disabled_until:
-                if datetime.now(UTC) < self._disabled_until:
-                    logger.warning(
-                        f"Circuit breaker open until {self._disabled_until.isoformat()}"
-                    )
-                    return False
-                # Reset after timeout
-                logger.info("Circuit breaker timeout elapsed, resetting")
-                self._failure_count = 0
-                self._disabled_until = None
+    @property
+    def state(self) -> BreakerState:
+        """Current state; an OPEN breaker whose cooldown elapsed reads HALF_OPEN."""
+        if self._state == BreakerState.OPEN and self._clock() >= self._open_until:
+            return BreakerState.HALF_OPEN
+        return self._state
+
+    @property
+    def failure_count(self) -> int:
+        """Failures since the breaker last closed (consecutive while CLOSED)."""
+        return self._failure_count
 
+    @property
+    def failure_rate(self) -> float:
+        """Failure rate over the sliding window (0.0 without one)."""
+        if not self._window:
+            return 0.0
+        return self._window_failures / len(self._window)
+
+    def add_listener(self, listener: StateListener) -> None:
+        """Register a callback for state transitions; it must not raise."""
+        self._listeners.append(listener)
+
+    async def should_attempt(self) -> bool:
+        """Check if operation should be attempted; in HALF_OPEN this claims the probe."""
+        if self._state is BreakerState.CLOSED:
             return True
 
+        now = self._clock()
+        if self._state is BreakerState.OPEN:
+            if now < self._open_until:
+                return False
+            self._transition(BreakerState.HALF_OPEN)
+
+        # A probe whose outcome was never recorded (e.g. the write was
+        # dropped) must not wedge the breaker: it expires after a cooldown
+        if self._probe_started is not None and now - self._probe_started < self._timeout_seconds:
+            return False
+        self._probe_started = now
+        return True
+
+    async def release(self):
+        """Give back a claimed half-open probe whose operation was not attempted."""
+        self._probe_started = None
+
     async def record_success(self):
         """Record successful operation."""
-        async with self._lock:
-            if self._failure_count > 0:
-                logger.info(f"Circuit breaker reset (was at {self._failure_count} failures)")
+        if self._window is not None:
+            self._observe(False)
+        if self._state is BreakerState.CLOSED:
             self._failure_count = 0
-            self._disabled_until = None
+            return
+        if self._state is BreakerState.HALF_OPEN:
+            logger.info(f"Circuit breaker probe succeeded (was at {self._failure_count} failures)")
+            self._close()
 
     async def record_failure(self):
         """Record failed operation and trip if needed."""
-        async with self._lock:
-            self._failure_count += 1
+        if self._window is not None:
+            self._observe(True)
+        self._failure_count += 1
 
+        if self._state is BreakerState.HALF_OPEN:
+            self._trip("half-open probe failed")
+        elif self._state is BreakerState.CLOSED:
             if self._failure_count >= self._max_failures:
-                self._disabled_until = datetime.now(UTC) + timedelta(
-                    seconds=self._timeout_seconds
-                )
-                logger.error(
-                    f"Circuit breaker tripped after {self._failure_count} failures, "
-                    f"disabled until {self._disabled_until.isoformat()}"
-                )
+                self._trip(f"{self._failure_count} consecutive failures")
+            elif self._rate_exceeded():
+                self._trip(f"failure rate {self.failure_rate:.0%} over {len(self._window)} calls")
             else:
                 logger.warning(
                     f"Circuit breaker failure count: "
                     f"{self._failure_count}/{self._max_failures}"
                 )
+
+    def _observe(self, failed: bool) -> None:
+        window = self._window
+        if len(window) == window.maxlen and window[0]:
+            self._window_failures -= 1
+        window.append(failed)
+        if failed:
+            self._window_failures += 1
+
+    def _rate_exceeded(self) -> bool:
+        return (
+            self._window is not None
+            and len(self._window) >= max(self._min_calls, 1)
+            and self.failure_rate >= self._failure_rate_threshold
+        )
+
+    def _trip(self, cause: str) -> None:
+        self._open_until = self._clock() + self._timeout_seconds
+        self._disabled_until = datetime.now(UTC) + timedelta(seconds=self._timeout_seconds)
+        self._probe_started = None
+        logger.error(
+            f"Circuit breaker tripped after {cause}, "
+            f"disabled until {self._disabled_until.isoformat()}"
+        )
+        self._transition(BreakerState.OPEN)
+
+    def _close(self) -> None:
+        self._failure_count = 0
+        self._disabled_until = None
+        self._probe_started = None
+        if self._window is not None:
+            self._window.clear()
+            self._window_failures = 0
+        self._transition(BreakerState.CLOSED)
+
+    def _transition(self, new: BreakerState) -> None:
+        old, self._state = self._state, new
+        if old is new:
+            return
+        for listener in self._listeners:
+            listener(old, new)
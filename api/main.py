@@ -5,6 +5,7 @@ This server exposes the PromptImprover module via REST API for integration
 with the Raycast TypeScript frontend.
 """
 
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -13,11 +14,25 @@ from enum import Enum
 import dspy
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from api.exception_utils import create_exception_handlers
 from api.metrics_api import router as metrics_router
 from api.middleware import RequestIDMiddleware
+from api.prompt_improver_api import (
+    get_admission_controller,
+    get_history_writer,
+    get_metrics_worker,
+    get_model_arms,
+    get_shadow_runner,
+)
 from api.prompt_improver_api import router as prompt_improver_router
+from api.telemetry_api import router as telemetry_router
+from api.warmup import run_warmup, warmup_state
+from hemdov.domain.services.cancellation import cancellation_stats
+from hemdov.domain.services.stage_timing import bind_metrics_port
+from hemdov.infrastructure.adapters.fake_llm import FakeLLM
+from hemdov.infrastructure.adapters.http_pool import HttpPool
 from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
     create_anthropic_adapter,
     create_deepseek_adapter,
@@ -25,13 +40,28 @@ from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
     create_ollama_adapter,
     create_openai_adapter,
 )
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+from hemdov.infrastructure.adapters.provider_router import ProviderRouter
+from hemdov.infrastructure.adapters.rate_limiter import RateLimiter
+from hemdov.infrastructure.adapters.retry_policy import RetryPolicy
 from hemdov.infrastructure.config import settings
+from hemdov.infrastructure.metrics import telemetry
 from hemdov.infrastructure.persistence.metrics_repository import SQLiteMetricsRepository
 from hemdov.interfaces import container
 
 # Global LM instance for DSPy
 lm = None
 
+# Keep-alive HTTP pool the adapters share (see get_http_pool)
+http_pool = None
+
+# On-disk LLM response cache the adapters share (see get_llm_cache)
+llm_cache = None
+
+# Client-side rate limiters by (provider, model), shared by every adapter of
+# that model (see get_rate_limiter)
+rate_limiters: dict[tuple[str, str], RateLimiter] = {}
+
 # Temperature defaults per provider (for consistency)
 DEFAULT_TEMPERATURE = {
     "ollama": 0.1,    # Local models need some variability
@@ -44,71 +74,278 @@ DEFAULT_TEMPERATURE = {
 logger = logging.getLogger(__name__)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Manage application lifecycle - initialize DSPy LM."""
-    global lm
+def get_http_pool() -> HttpPool | None:
+    """The connection pool shared by all provider adapters (None when disabled)."""
+    global http_pool
+    if settings.LLM_HTTP_POOL_ENABLED and http_pool is None:
+        http_pool = HttpPool(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS,
+            http2=settings.LLM_HTTP2,
+        )
+    return http_pool
+
+
+def get_retry_policy() -> RetryPolicy | None:
+    """Retry policy for transient LLM failures (None when disabled)."""
+    if not settings.LLM_RETRY_ENABLED:
+        return None
+    return RetryPolicy(
+        max_attempts=settings.LLM_RETRY_MAX_ATTEMPTS,
+        base_delay_seconds=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay_seconds=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+        min_attempt_seconds=settings.LLM_RETRY_MIN_ATTEMPT_SECONDS,
+    )
+
+
+def parse_rate_limits(spec: str) -> dict[tuple[str, str], tuple[int | None, int | None]]:
+    """Parse LLM_RATE_LIMITS ("provider:model=rpm/tpm,...") into {(provider, model): (rpm, tpm)}."""
+    limits = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        target, sep, values = entry.rpartition("=")
+        provider, colon, model = target.partition(":")
+        rpm, slash, tpm = values.partition("/")
+        if not (sep and colon and slash and provider.strip() and model.strip()):
+            raise ValueError(
+                f"Invalid LLM_RATE_LIMITS entry: {entry!r} (expected provider:model=rpm/tpm)"
+            )
+        try:
+            parsed = (int(rpm) if rpm.strip() else None, int(tpm) if tpm.strip() else None)
+        except ValueError:
+            raise ValueError(
+                f"Invalid LLM_RATE_LIMITS entry: {entry!r} (limits must be integers)"
+            ) from None
+        limits[(provider.strip().lower(), model.strip())] = parsed
+    return limits
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter | None:
+    """The rate limiter of a provider model (None when LLM_RATE_LIMITS has no entry for it)."""
+    key = (provider.lower(), model)
+    if key not in rate_limiters:
+        limits = parse_rate_limits(settings.LLM_RATE_LIMITS).get(key)
+        if limits is None:
+            return None
+        rate_limiters[key] = RateLimiter(requests_per_minute=limits[0], tokens_per_minute=limits[1])
+    return rate_limiters[key]
+
+
+def get_llm_cache() -> LLMResponseCache | None:
+    """The LLM response cache shared by all provider adapters (None when disabled)."""
+    global llm_cache
+    if settings.LLM_CACHE_ENABLED and llm_cache is None:
+        llm_cache = LLMResponseCache(
+            settings.LLM_CACHE_PATH,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+            mode=settings.LLM_CACHE_MODE,
+        )
+    return llm_cache
+
+
+def create_fake_llm(model: str) -> FakeLLM:
+    """The offline provider, replaying LLM_FAKE_RECORDINGS_PATH when set."""
+    recordings = None
+    if settings.LLM_FAKE_RECORDINGS_PATH:
+        recordings = LLMResponseCache(
+            settings.LLM_FAKE_RECORDINGS_PATH, ttl_seconds=None, mode="replay"
+        )
+    return FakeLLM(
+        model=f"fake/{model}",
+        recordings=recordings,
+        latency_ms=settings.LLM_FAKE_LATENCY_MS,
+        latency_sigma=settings.LLM_FAKE_LATENCY_SIGMA,
+        chunk_tokens=settings.LLM_FAKE_CHUNK_TOKENS,
+        chunk_ms=settings.LLM_FAKE_CHUNK_MS,
+        error_rate=settings.LLM_FAKE_ERROR_RATE,
+        rate_limit_rate=settings.LLM_FAKE_RATE_LIMIT_RATE,
+        seed=settings.LLM_FAKE_SEED,
+    )
+
 
-    # Initialize DSPy with appropriate LM
-    provider = settings.LLM_PROVIDER.lower()
+def create_provider_adapter(provider: str, model: str, base_url: str | None = None):
+    """Build the LiteLLM adapter for one provider with its default temperature."""
+    provider = provider.lower()
+    if provider == "fake":
+        return create_fake_llm(model)
     temp = DEFAULT_TEMPERATURE.get(provider, 0.0)
+    shared = {
+        "max_parallel_samples": settings.LLM_SAMPLE_CONCURRENCY,
+        "http_pool": get_http_pool(),
+        "cache": get_llm_cache(),
+        "retry_policy": get_retry_policy(),
+        "rate_limiter": get_rate_limiter(provider, model),
+        "cache_breakpoints": settings.LLM_PROMPT_CACHE_BREAKPOINTS,
+        "metrics": telemetry,
+    }
 
     if provider == "ollama":
-        lm = create_ollama_adapter(
-            model=settings.LLM_MODEL,
-            base_url=settings.LLM_BASE_URL,
+        return create_ollama_adapter(
+            model=model,
+            base_url=base_url or "http://localhost:11434",
+            **shared,
             temperature=temp,  # Uses 0.1 from DEFAULT_TEMPERATURE
         )
     elif provider == "gemini":
-        lm = create_gemini_adapter(
-            model=settings.LLM_MODEL,
+        return create_gemini_adapter(
+            model=model,
             api_key=settings.GEMINI_API_KEY or settings.LLM_API_KEY,
+            **shared,
             temperature=temp,  # Uses 0.0 from DEFAULT_TEMPERATURE
         )
     elif provider == "deepseek":
-        lm = create_deepseek_adapter(
-            model=settings.LLM_MODEL,
+        return create_deepseek_adapter(
+            model=model,
             api_key=settings.DEEPSEEK_API_KEY or settings.LLM_API_KEY,
+            **shared,
             temperature=temp,  # Uses 0.0 from DEFAULT_TEMPERATURE
         )
     elif provider == "openai":
-        lm = create_openai_adapter(
-            model=settings.LLM_MODEL,
+        return create_openai_adapter(
+            model=model,
             api_key=settings.OPENAI_API_KEY or settings.LLM_API_KEY,
+            **shared,
             temperature=temp,  # Uses 0.0 from DEFAULT_TEMPERATURE
         )
     elif provider == "anthropic":
-        lm = create_anthropic_adapter(
-            model=settings.LLM_MODEL,
+        return create_anthropic_adapter(
+            model=model,
             api_key=(
                 settings.ANTHROPIC_API_KEY
                 or settings.HEMDOV_ANTHROPIC_API_KEY
                 or settings.LLM_API_KEY
             ),
-            base_url=settings.LLM_BASE_URL,
+            base_url=base_url,
+            **shared,
             temperature=temp,  # Uses 0.0 from DEFAULT_TEMPERATURE
         )
-    else:
-        raise ValueError(f"Unsupported LLM provider: {settings.LLM_PROVIDER}")
+    raise ValueError(f"Unsupported LLM provider: {provider}")
+
+
+def parse_fallback_providers(spec: str) -> list[tuple[str, str]]:
+    """Parse LLM_FALLBACK_PROVIDERS ("provider:model,...") into (provider, model) pairs."""
+    entries = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        # Split once: Ollama model names contain ':' themselves
+        provider, sep, model = entry.partition(":")
+        if not sep or not provider.strip() or not model.strip():
+            raise ValueError(
+                f"Invalid LLM_FALLBACK_PROVIDERS entry: {entry!r} (expected provider:model)"
+            )
+        entries.append((provider.strip().lower(), model.strip()))
+    return entries
+
+
+def create_lm():
+    """The primary provider adapter, in a ProviderRouter for failover, hedging or breakers."""
+    primary = create_provider_adapter(
+        settings.LLM_PROVIDER, settings.LLM_MODEL, base_url=settings.LLM_BASE_URL
+    )
+    fallbacks = parse_fallback_providers(settings.LLM_FALLBACK_PROVIDERS)
+    if not (fallbacks or settings.LLM_HEDGE_ENABLED or settings.LLM_BREAKER_ENABLED):
+        return primary
+
+    return ProviderRouter(
+        [primary] + [create_provider_adapter(provider, model) for provider, model in fallbacks],
+        window=settings.LLM_ROUTER_WINDOW,
+        max_error_rate=settings.LLM_ROUTER_MAX_ERROR_RATE,
+        cooldown_seconds=settings.LLM_ROUTER_COOLDOWN_SECONDS,
+        attempt_timeout_seconds=settings.LLM_ROUTER_ATTEMPT_TIMEOUT_SECONDS,
+        hedge_enabled=settings.LLM_HEDGE_ENABLED,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        hedge_min_delay_seconds=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+        hedge_budget=settings.LLM_HEDGE_BUDGET,
+        breaker_failure_threshold=(
+            settings.LLM_BREAKER_FAILURE_THRESHOLD if settings.LLM_BREAKER_ENABLED else None
+        ),
+        breaker_reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+        breaker_slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        metrics=telemetry,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage application lifecycle - initialize DSPy LM."""
+    global lm
+
+    # Initialize DSPy with appropriate LM (several providers with failover
+    # when LLM_FALLBACK_PROVIDERS is set)
+    lm = create_lm()
 
     # Configure DSPy
     dspy.settings.configure(lm=lm)
 
+    # Fails fast on a malformed LLM_MODEL_ARMS; arm LMs are built on first use
+    model_arms = get_model_arms(settings)
+    if model_arms.arms:
+        logger.info(f"Model arms (traffic share): {model_arms.snapshot()}")
+
     # Register metrics repository for metrics endpoints
     try:
         metrics_db_path = "data/metrics.db"  # Separate from prompt_history.db
         metrics_repo = SQLiteMetricsRepository(metrics_db_path)
         await metrics_repo.initialize()  # Must call async initialize before use
         container.register(SQLiteMetricsRepository, metrics_repo)
+        container._cleanup_hooks.append(metrics_repo.close)
         logger.info("SQLiteMetricsRepository registered in container")
     except (ConnectionError, OSError, RuntimeError) as e:
         logger.warning(f"Failed to initialize metrics repository: {type(e).__name__}: {e}")
 
     logger.info(f"DSPy configured with {settings.LLM_PROVIDER}/{settings.LLM_MODEL}")
+    if isinstance(lm, ProviderRouter):
+        logger.info(f"Provider failover order: {[provider.model for provider in lm.providers]}")
+        router = lm
+
+        async def close_router():
+            router.close()
+
+        container._cleanup_hooks.append(close_router)
+
+    if http_pool is not None:
+
+        async def close_http_pool():
+            global http_pool
+            if http_pool is not None:
+                http_pool.close()
+                http_pool = None
+
+        container._cleanup_hooks.append(close_http_pool)
+
+    if llm_cache is not None:
+        logger.info(f"LLM response cache: {settings.LLM_CACHE_PATH} ({settings.LLM_CACHE_MODE})")
+
+        async def close_llm_cache():
+            global llm_cache
+            if llm_cache is not None:
+                llm_cache.close()
+                llm_cache = None
+
+        container._cleanup_hooks.append(close_llm_cache)
+
+    # Warm up in the background: /health answers immediately, /ready once warm
+    if settings.WARMUP_ENABLED:
+        warmup_task = asyncio.ensure_future(run_warmup(settings, lm=lm))
+
+        async def cancel_warmup():
+            warmup_task.cancel()
+
+        container._cleanup_hooks.append(cancel_warmup)
+    else:
+        warmup_state.mark_ready()
 
     yield
 
     logger.info("Shutting down DSPy backend...")
+    warmup_state.reset()
     await container.shutdown()
 
 
@@ -140,6 +377,10 @@ app.add_middleware(RequestIDMiddleware)
 # Include routers
 app.include_router(prompt_improver_router)
 app.include_router(metrics_router)
+app.include_router(telemetry_router)
+
+# Feed pipeline stage timings (llm, knn, queue, ...) into the /metrics histograms
+bind_metrics_port(telemetry)
 
 # Register global exception handlers
 exception_handlers = create_exception_handlers()
@@ -186,14 +427,53 @@ async def health_check(
             "degradation_flags": {"knn_disabled": True}
         }
 
+    # Share of prompt tokens each provider served from its prompt cache
+    cache_ratios = telemetry.prompt_cache_ratios()
     return {
         "status": "healthy",
         "provider": settings.LLM_PROVIDER,
         "model": settings.LLM_MODEL,
         "dspy_configured": lm is not None,
+        "cancellations": cancellation_stats.snapshot(),
+        "admission": get_admission_controller(settings).snapshot(),
+        "metrics_worker": get_metrics_worker(settings).stats(),
+        "history_writer": get_history_writer(settings).stats(),
+        "model_arms": get_model_arms(settings).snapshot(),
+        **({"http_pool": http_pool.stats()} if http_pool is not None else {}),
+        **({"llm_cache": llm_cache.stats()} if llm_cache is not None else {}),
+        **({"prompt_cache": cache_ratios} if cache_ratios else {}),
+        **(
+            {
+                "rate_limits": {
+                    f"{p}:{m}": limiter.stats() for (p, m), limiter in rate_limiters.items()
+                }
+            }
+            if rate_limiters
+            else {}
+        ),
+        **({"shadow": get_shadow_runner(settings).stats()} if settings.SHADOW_ENABLED else {}),
+        **(
+            {"providers": lm.stats(), "hedging": lm.hedge_stats()}
+            if isinstance(lm, ProviderRouter)
+            else {}
+        ),
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe, separate from /health (liveness).
+
+    Returns 200 only once startup warm-up has completed, and 503 while the
+    instance is cold, still warming, failed to warm, or shutting down.
+    """
+    body = warmup_state.snapshot()
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -202,10 +482,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "improve_prompt": "/api/v1/improve-prompt",
             "metrics_summary": "/api/v1/metrics/summary",
             "metrics_trends": "/api/v1/metrics/trends",
             "metrics_compare": "/api/v1/metrics/compare",
+            "prometheus": "/metrics",
             "docs": "/docs",
         },
     }
@@ -0,0 +1,130 @@
+# api/model_arms.py
+"""
+Per-request model selection for in-process A/B routing.
+
+The lifespan configures one process-wide LM with dspy.settings.configure, so
+comparing models used to mean running separate deployments. ModelArms lets
+one instance serve several provider/model "arms":
+
+- LLM_MODEL_ARMS ("provider:model=weight,...") splits traffic by weight;
+  whatever the weights leave goes to the primary LLM_PROVIDER/LLM_MODEL.
+  The split is sticky: the same idea and context always land on the same arm.
+- A request may pick a configured arm explicitly (provider/model fields).
+
+The chosen arm's LM is applied with dspy.context, which is scoped to the
+current contextvars context. The strategy worker thread inherits it, so
+concurrent requests can run on different models without touching the
+global LM. The primary arm keeps using the global LM (and its router).
+"""
+
+import hashlib
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class ModelArmError(ValueError):
+    """A requested provider/model is not one of the configured arms."""
+
+
+@dataclass(frozen=True)
+class ModelArm:
+    """One provider/model and its share of traffic."""
+
+    provider: str
+    model: str
+    weight: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+def parse_model_arms(spec: str) -> list[ModelArm]:
+    """Parse LLM_MODEL_ARMS ("provider:model=weight,...") into arms."""
+    arms = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        target, sep, weight = entry.rpartition("=")
+        # Split once: Ollama model names contain ':' themselves
+        provider, colon, model = target.partition(":")
+        try:
+            share = float(weight)
+        except ValueError:
+            share = -1.0
+        if not sep or not colon or not provider.strip() or not model.strip() or not 0 <= share <= 1:
+            raise ValueError(
+                f"Invalid LLM_MODEL_ARMS entry: {entry!r} (expected provider:model=weight, 0-1)"
+            )
+        arms.append(ModelArm(provider.strip().lower(), model.strip(), share))
+    if sum(arm.weight for arm in arms) > 1 + 1e-9:
+        raise ValueError("LLM_MODEL_ARMS weights must sum to at most 1")
+    return arms
+
+
+class ModelArms:
+    """Weighted, sticky choice between the primary model and experiment arms."""
+
+    def __init__(
+        self,
+        primary: ModelArm,
+        arms: list[ModelArm],
+        lm_factory: Callable[[str, str], Any],
+    ):
+        """
+        Args:
+            primary: The globally configured provider/model (remaining traffic)
+            arms: Experiment arms with their traffic weights
+            lm_factory: Builds the LM of an arm from (provider, model)
+        """
+        self.primary = primary
+        self.arms = [arm for arm in arms if arm.name != primary.name]
+        self._lm_factory = lm_factory
+        self._lms: dict[str, Any] = {}
+
+    def choose(self, key: str) -> ModelArm:
+        """Arm for a request key; the same key always gets the same arm."""
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        point = int.from_bytes(digest[:8], "big") / 2**64
+        for arm in self.arms:
+            if point < arm.weight:
+                return arm
+            point -= arm.weight
+        return self.primary
+
+    def resolve(self, provider: str | None, model: str | None) -> ModelArm:
+        """
+        The configured arm matching an explicit override.
+
+        Raises:
+            ModelArmError: If no configured arm matches
+        """
+        provider = provider.strip().lower() if provider else None
+        for arm in [self.primary, *self.arms]:
+            provider_matches = provider is None or arm.provider == provider
+            if provider_matches and (model is None or arm.model == model):
+                return arm
+        configured = ", ".join(arm.name for arm in [self.primary, *self.arms])
+        raise ModelArmError(
+            f"Model {provider or '*'}:{model or '*'} is not configured (available: {configured})"
+        )
+
+    def lm(self, arm: ModelArm):
+        """LM to scope the request to, or None for the primary (global) LM."""
+        if arm.name == self.primary.name:
+            return None
+        if arm.name not in self._lms:
+            self._lms[arm.name] = self._lm_factory(arm.provider, arm.model)
+            logger.info(f"Model arm {arm.name} initialized")
+        return self._lms[arm.name]
+
+    def snapshot(self) -> dict[str, float]:
+        """Traffic share per arm name."""
+        shares = {arm.name: arm.weight for arm in self.arms}
+        shares[self.primary.name] = max(0.0, 1.0 - sum(shares.values()))
+        return shares
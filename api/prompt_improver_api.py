@@ -8,17 +8,27 @@ Supports both zero-shot and few-shot modes.
 import asyncio
 import hashlib
 import logging
+import math
 import time
 import uuid
+from contextlib import nullcontext
+from dataclasses import replace
 from enum import Enum
+from pathlib import Path
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Request
+import aiosqlite
+import dspy
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, Field, field_validator
 
+from api.admission import AdmissionController, AdmissionRejected, AdmissionSlot
 from api.circuit_breaker import CircuitBreaker
+from api.model_arms import ModelArm, ModelArmError, ModelArms, parse_model_arms
 from api.quality_gates import GateReport, evaluate_output, get_template_summary
-from eval.src.dspy_prompt_improver import PromptImprover
+from api.shadow import ShadowRequest, ShadowRunner
+from eval.src.dspy_prompt_improver import PromptImprover, PromptImproverZeroShot
+from eval.src.strategies.base import PromptImproverStrategy
 from eval.src.strategy_selector import StrategySelector
 from hemdov.domain.entities.prompt_history import PromptHistory
 from hemdov.domain.metrics.evaluators import (
@@ -26,7 +36,26 @@ from hemdov.domain.metrics.evaluators import (
     PromptMetricsCalculator,
 )
 from hemdov.domain.repositories.prompt_repository import PromptRepository
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.domain.services.context_compressor import CompressedContext, compress_context
+from hemdov.domain.services.request_features import RequestFeatures, features_scope
+from hemdov.domain.services.stage_timing import StageTimings, timed_stage, timing_scope
+from hemdov.domain.services.token_usage import TokenUsage, usage_scope
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+from hemdov.infrastructure.adapters.provider_router import (
+    ProviderCircuitOpenError,
+    ProviderUnavailableError,
+)
 from hemdov.infrastructure.config import Settings
+from hemdov.infrastructure.metrics import telemetry
+from hemdov.infrastructure.metrics.metrics_worker import MetricsJob, MetricsWorker
+from hemdov.infrastructure.persistence.history_writer import HistoryWriter
+from hemdov.infrastructure.persistence.metrics_repository import SQLiteMetricsRepository
 from hemdov.infrastructure.persistence.sqlite_prompt_repository import SQLitePromptRepository
 from hemdov.interfaces import container
 
@@ -39,6 +68,7 @@ class DegradationFlag(str, Enum):
     KNN_DISABLED = "knn_disabled"
     COMPLEX_STRATEGY_DISABLED = "complex_strategy_disabled"
     PERSISTENCE_FAILED = "persistence_failed"
+    LLM_FALLBACK = "llm_fallback"
 
 
 # Custom exceptions for better error handling
@@ -125,17 +155,26 @@ def normalize_framework_for_history(framework_raw: str) -> tuple[str, bool]:
 router = APIRouter(prefix="/api/v1", tags=["prompts"])
 
 # Circuit breaker instance
-_circuit_breaker = CircuitBreaker(max_failures=5, timeout_seconds=300)
+_circuit_breaker = CircuitBreaker(
+    max_failures=5,
+    timeout_seconds=300,
+    window_size=50,
+    failure_rate_threshold=0.5,
+    min_calls=20,
+    on_state_change=lambda old, new: telemetry.record_breaker_transition(
+        "history_persistence", new.value
+    ),
+)
 
 
-def _classify_intent(idea: str, context: str) -> str:
+def _classify_intent(features: RequestFeatures) -> str:
     """
     Classify intent based on keyword matching.
 
     Simple heuristic for test compatibility.
     Returns uppercase intent string (DEBUG, REFACTOR, GENERATE, EXPLAIN).
     """
-    combined = f"{idea} {context}".lower()
+    combined = features.text
 
     # Priority order for keyword matching
     if any(kw in combined for kw in ["bug", "fix", "debug", "error", "issue", "fail"]):
@@ -161,6 +200,84 @@ def _generate_stable_prompt_id(idea: str, context: str, mode: str) -> str:
 # Metrics calculator
 _metrics_calculator = PromptMetricsCalculator()
 
+# Metrics worker (lazy loading); moves metrics computation off the event loop
+_metrics_worker: MetricsWorker | None = None
+
+
+def _get_metrics_repository() -> SQLiteMetricsRepository | None:
+    """Open metrics repository registered by the app lifespan, if any."""
+    try:
+        repo = container.get(SQLiteMetricsRepository)
+    except ValueError:
+        return None
+    return repo if repo.is_initialized else None
+
+
+def get_metrics_worker(settings: Settings) -> MetricsWorker:
+    """Get or initialize the background metrics worker."""
+    global _metrics_worker
+
+    if _metrics_worker is None:
+        worker = MetricsWorker(
+            # Resolve the module-level calculator per job (tests patch it)
+            calculate=lambda **inputs: _metrics_calculator.calculate_from_history(**inputs),
+            repository_getter=(
+                _get_metrics_repository if settings.SQLITE_ENABLED else lambda: None
+            ),
+            max_queue=settings.METRICS_QUEUE_SIZE,
+            metrics=telemetry,
+        )
+
+        # Drain pending jobs on shutdown
+        async def cleanup():
+            await asyncio.to_thread(worker.stop)
+
+        container._cleanup_hooks.append(cleanup)
+        _metrics_worker = worker
+
+    return _metrics_worker
+
+
+async def _calculate_metrics_inline(
+    settings: Settings, metrics_inputs: dict[str, Any], metrics_warnings: list[str]
+) -> None:
+    """
+    Synchronous metrics mode: compute and persist before responding.
+
+    Calculation errors propagate to the caller; persistence errors are
+    reported through metrics_warnings.
+    """
+    metrics_start = time.time()
+    with timed_stage("metrics"):
+        metrics = _metrics_calculator.calculate_from_history(**metrics_inputs)
+    metrics_duration_ms = int((time.time() - metrics_start) * 1000)
+
+    # Warn if too slow
+    if metrics_duration_ms > 10:
+        logger.warning(f"Metrics calculation took {metrics_duration_ms}ms (target: <10ms)")
+
+    # Log metrics for monitoring
+    logger.info(
+        f"Metrics ({metrics_duration_ms}ms): "
+        f"overall={metrics.overall_score:.2f} ({metrics.grade}), "
+        f"quality={metrics.quality.composite_score:.2f}, "
+        f"perf={metrics.performance.performance_score:.2f}"
+    )
+
+    # Store metrics if SQLite is enabled
+    metrics_repo = _get_metrics_repository() if settings.SQLITE_ENABLED else None
+    if metrics_repo is None:
+        return
+    try:
+        await metrics_repo.save(metrics)
+    except (aiosqlite.Error, ConnectionError, OSError) as e:
+        metrics_warnings.append(f"Metrics persistence failed: {type(e).__name__}")
+        logger.error(f"Failed to save metrics: {type(e).__name__}: {e}")
+    except (AttributeError, KeyError) as e:
+        metrics_warnings.append(f"Metrics data issue: {type(e).__name__}")
+        logger.warning(f"Metrics data structure issue: {type(e).__name__}: {e}")
+
+
 # Repository getter with circuit breaker
 async def get_repository(settings: Settings) -> PromptRepository | None:
     """Get repository instance with circuit breaker protection."""
@@ -178,15 +295,47 @@ async def get_repository(settings: Settings) -> PromptRepository | None:
         repo = SQLitePromptRepository(settings)
         container.register(PromptRepository, repo)
 
-        # Register cleanup hook
+        # Register cleanup hook. Hooks run in reverse order; inserting at the
+        # front closes the connection after the history writer has drained.
         async def cleanup():
             await repo.close()
 
-        container._cleanup_hooks.append(cleanup)
+        container._cleanup_hooks.insert(0, cleanup)
 
         return repo
 
 
+# History writer (lazy loading); batches prompt history writes
+_history_writer: HistoryWriter | None = None
+
+
+def get_history_writer(settings: Settings) -> HistoryWriter:
+    """Get or initialize the batched prompt history writer."""
+    global _history_writer
+
+    if _history_writer is None:
+        writer = HistoryWriter(
+            # Resolved per batch so tests can patch get_repository/_circuit_breaker
+            repository_getter=lambda: get_repository(settings),
+            max_queue=settings.HISTORY_QUEUE_SIZE,
+            batch_size=settings.HISTORY_BATCH_SIZE,
+            flush_interval_seconds=settings.HISTORY_FLUSH_INTERVAL_SECONDS,
+            overflow_policy=settings.HISTORY_OVERFLOW_POLICY,
+            block_timeout_seconds=settings.HISTORY_BLOCK_TIMEOUT_SECONDS,
+            spill_path=settings.HISTORY_SPILL_PATH,
+            metrics=telemetry,
+            on_success=lambda: _circuit_breaker.record_success(),
+            on_failure=lambda: _circuit_breaker.record_failure(),
+            on_release=lambda: _circuit_breaker.release(),
+        )
+
+        # Drain buffered records on shutdown
+        container._cleanup_hooks.append(writer.close)
+        _history_writer = writer
+
+    return _history_writer
+
+
 
 class ImprovePromptRequest(BaseModel):
     idea: str = Field(..., min_length=5, description="User's raw idea (min 5 characters)")
@@ -195,6 +344,10 @@ class ImprovePromptRequest(BaseModel):
         default="legacy",
         description="Execution mode: 'legacy' (DSPy) or 'nlac' (NLaC pipeline)"
     )
+    provider: str | None = Field(
+        default=None, description="Run on this configured model arm's provider"
+    )
+    model: str | None = Field(default=None, description="Run on this configured model arm")
 
     @field_validator("mode")
     @classmethod
@@ -292,12 +445,35 @@ def get_fewshot_improver(settings: Settings):
     return _fewshot_improver
 
 
+# Single-call improver used when the strategy's LLM path is failing
+_zero_shot_improver: PromptImproverZeroShot | None = None
+
+
+def get_zero_shot_improver(settings: Settings) -> PromptImproverZeroShot:
+    """Get or initialize the zero-shot fallback module (one Predict call)."""
+    global _zero_shot_improver
+
+    if _zero_shot_improver is None:
+        _zero_shot_improver = PromptImproverZeroShot()
+
+    return _zero_shot_improver
+
+
 # Initialize strategy selector (lazy loading)
 # Dict mapping mode ("legacy"/"nlac") to StrategySelector instance
 _strategy_selector: dict[str, StrategySelector] = {}
 _strategy_selector_lock = asyncio.Lock()
 
 
+def _opro_options(settings: Settings) -> dict[str, int | None]:
+    """OPRO beam mode and LLM call cap for NLaC selectors."""
+    return {
+        "opro_beam_width": settings.NLAC_OPRO_BEAM_WIDTH,
+        "opro_candidates_per_round": settings.NLAC_OPRO_CANDIDATES_PER_ROUND,
+        "opro_max_llm_calls": settings.NLAC_OPRO_MAX_LLM_CALLS,
+    }
+
+
 async def get_strategy_selector(settings: Settings, use_nlac: bool = False) -> StrategySelector:
     """
     Get or initialize StrategySelector with all three strategies.
@@ -314,12 +490,15 @@ async def get_strategy_selector(settings: Settings, use_nlac: bool = False) -> S
     # Use lock to prevent race condition during lazy initialization
     async with _strategy_selector_lock:
         if selector_key not in _strategy_selector:
-            # Create selector with appropriate mode
-            selector = StrategySelector(
+            # Create selector with appropriate mode. Construction fits the KNN
+            # vocabulary / loads few-shot data, so keep it off the event loop.
+            selector = await asyncio.to_thread(
+                StrategySelector,
                 trainset_path=settings.DSPY_FEWSHOT_TRAINSET_PATH,
                 compiled_path=settings.DSPY_FEWSHOT_COMPILED_PATH,
                 fewshot_k=settings.DSPY_FEWSHOT_K,
-                use_nlac=use_nlac
+                use_nlac=use_nlac,
+                opro_options=_opro_options(settings),
             )
             _strategy_selector[selector_key] = selector
             mode_name = "NLaC" if use_nlac else "legacy DSPy"
@@ -328,8 +507,304 @@ async def get_strategy_selector(settings: Settings, use_nlac: bool = False) -> S
     return _strategy_selector[selector_key]
 
 
+# Admission controller (lazy loading, sized from settings)
+_admission_controller: AdmissionController | None = None
+
+
+def get_admission_controller(settings: Settings) -> AdmissionController:
+    """Get or initialize the per-mode admission controller."""
+    global _admission_controller
+
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            limits={
+                "legacy": settings.ADMISSION_LEGACY_CONCURRENCY,
+                "nlac": settings.ADMISSION_NLAC_CONCURRENCY,
+            },
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            max_wait_seconds=settings.ADMISSION_MAX_WAIT_SECONDS,
+        )
+
+    return _admission_controller
+
+
+# Shadow traffic (lazy loading); candidate runs off the response path
+_shadow_runner: ShadowRunner | None = None
+_shadow_selector: StrategySelector | None = None
+_shadow_selector_lock = asyncio.Lock()
+
+
+async def _get_shadow_selector(settings: Settings) -> StrategySelector:
+    """
+    Candidate StrategySelector for shadow runs.
+
+    Without a candidate few-shot pool this is the regular selector of
+    SHADOW_CANDIDATE_MODE; with one, a separate selector built on that pool.
+    """
+    use_nlac = settings.SHADOW_CANDIDATE_MODE == "nlac"
+    pool = settings.SHADOW_FEWSHOT_POOL_PATH
+    if not pool:
+        return await get_strategy_selector(settings, use_nlac=use_nlac)
+
+    global _shadow_selector
+    async with _shadow_selector_lock:
+        if _shadow_selector is None:
+            _shadow_selector = await asyncio.to_thread(
+                StrategySelector,
+                trainset_path=None if use_nlac else pool,
+                compiled_path=None,  # Never overwrite the primary's compilation
+                fewshot_k=settings.DSPY_FEWSHOT_K,
+                use_nlac=use_nlac,
+                catalog_path=pool if use_nlac else None,
+                opro_options=_opro_options(settings),
+            )
+            logger.info(f"Shadow StrategySelector initialized with pool {pool}")
+    return _shadow_selector
+
+
+def get_shadow_runner(settings: Settings) -> ShadowRunner:
+    """Get or initialize the shadow traffic runner."""
+    global _shadow_runner
+
+    if _shadow_runner is None:
+        pool = settings.SHADOW_FEWSHOT_POOL_PATH
+        runner = ShadowRunner(
+            selector_getter=lambda: _get_shadow_selector(settings),
+            results_path=settings.SHADOW_RESULTS_PATH,
+            sample_rate=settings.SHADOW_SAMPLE_RATE,
+            max_concurrency=settings.SHADOW_MAX_CONCURRENCY,
+            timeout_seconds=settings.SHADOW_TIMEOUT_SECONDS,
+            gate_template=settings.SHADOW_GATE_TEMPLATE,
+            candidate_name=settings.SHADOW_CANDIDATE_MODE + (f"+{Path(pool).name}" if pool else ""),
+            metrics=telemetry,
+        )
+
+        # Stop in-flight candidate runs on shutdown
+        container._cleanup_hooks.append(runner.close)
+        _shadow_runner = runner
+
+    return _shadow_runner
+
+
+def _mirror_to_shadow(
+    settings: Settings,
+    request: "ImprovePromptRequest",
+    context: str,
+    response: "ImprovePromptResponse",
+    latency_ms: int,
+    request_id: str,
+) -> None:
+    """Replay a sampled, served request through the candidate configuration."""
+    if request.mode == settings.SHADOW_CANDIDATE_MODE and not settings.SHADOW_FEWSHOT_POOL_PATH:
+        return  # Candidate would be identical to what just served the request
+    runner = get_shadow_runner(settings)
+    if not runner.should_sample():
+        return
+    runner.submit(ShadowRequest(
+        request_id=request_id,
+        prompt_id=response.prompt_id,
+        mode=request.mode,
+        idea=request.idea,
+        context=context,  # Same (compressed) context the primary got
+        strategy=response.strategy,
+        latency_ms=latency_ms,
+        improved_prompt=response.improved_prompt,
+        framework=response.framework,
+        guardrails=response.guardrails,
+    ))
+
+
+# Model arms (lazy loading); in-process A/B routing between models
+_model_arms: ModelArms | None = None
+
+
+def _create_arm_lm(provider: str, model: str):
+    # api.main builds the provider adapters and imports this module
+    from api.main import create_provider_adapter
+
+    return create_provider_adapter(provider, model)
+
+
+def get_model_arms(settings: Settings) -> ModelArms:
+    """Get or initialize the model arms from LLM_MODEL_ARMS."""
+    global _model_arms
+
+    if _model_arms is None:
+        _model_arms = ModelArms(
+            primary=ModelArm(settings.LLM_PROVIDER.lower(), settings.LLM_MODEL),
+            arms=parse_model_arms(settings.LLM_MODEL_ARMS),
+            lm_factory=_create_arm_lm,
+        )
+
+    return _model_arms
+
+
+def _select_model_arm(settings: Settings, request: "ImprovePromptRequest") -> ModelArm:
+    """
+    The request's explicit provider/model, else its sticky traffic-split arm.
+
+    Raises:
+        HTTPException: 400 if the requested model is not a configured arm
+    """
+    arms = get_model_arms(settings)
+    if request.provider or request.model:
+        if not settings.LLM_MODEL_OVERRIDE_ENABLED:
+            raise HTTPException(status_code=400, detail="Model override is disabled")
+        try:
+            return arms.resolve(request.provider, request.model)
+        except ModelArmError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from None
+    return arms.choose(f"{request.idea}|{request.context}")
+
+
+# How often the strategy runner checks whether the client has gone away
+_DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def _wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client has disconnected."""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(_DISCONNECT_POLL_SECONDS)
+
+
+def _discard_abandoned_result(future: asyncio.Future) -> None:
+    """Retrieve the outcome of abandoned strategy work so it is not logged as unhandled."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.debug(f"Abandoned strategy work ended with {type(future.exception()).__name__}")
+
+
+async def _run_strategy_cancellable(
+    strategy,
+    request: ImprovePromptRequest,
+    http_request: Request,
+    token: CancellationToken,
+    slot: AdmissionSlot | None = None,
+    context: str | None = None,
+):
+    """
+    Run strategy.improve in a worker thread and propagate cancellation to it.
+
+    The admission slot, if any, is bound to the worker so it is released only
+    once the thread has actually finished. context, if given, replaces
+    request.context (the compressed context).
+
+    The thread itself cannot be interrupted, so cancellation is cooperative:
+    the token is cancelled and the pipeline stops at its next checkpoint
+    (OPRO/Reflexion iteration, LLM call) instead of running to completion.
+
+    Raises:
+        OperationCancelledError: If the client disconnected before completion
+        asyncio.CancelledError: If the enclosing wait_for timed out
+    """
+    # The task copies the current context and to_thread carries it on, so the
+    # worker thread sees the token bound by cancellation_scope.
+    work = asyncio.create_task(
+        asyncio.to_thread(
+            strategy.improve,
+            original_idea=request.idea,
+            context=request.context if context is None else context,
+        )
+    )
+    if slot is not None:
+        slot.bind(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(http_request))
+    try:
+        done, _ = await asyncio.wait(
+            {work, watcher}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if work in done:
+            return work.result()
+        token.cancel(CancelReason.CLIENT_DISCONNECTED)
+        raise OperationCancelledError(CancelReason.CLIENT_DISCONNECTED, "improve")
+    except asyncio.CancelledError:
+        token.cancel(CancelReason.TIMEOUT)
+        raise
+    finally:
+        watcher.cancel()
+        if not work.done():
+            # Cancelling the task would not stop the thread (and would free
+            # the admission slot early); the token stops it, we only drop the result.
+            work.add_done_callback(_discard_abandoned_result)
+
+
+def _provider_failure(error: BaseException | None) -> ProviderUnavailableError | None:
+    """The ProviderUnavailableError behind a (wrapped) strategy failure, if any."""
+    seen: set[int] = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, ProviderUnavailableError):
+            return error
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return None
+
+
+async def _find_cached_improvement(settings: Settings, idea: str, context: str):
+    """Latest stored improvement of the same idea and context, if persistence is up."""
+    repo = await get_repository(settings)
+    if repo is None:
+        return None
+    try:
+        return await repo.find_latest(idea, context)
+    except (aiosqlite.Error, OSError, ValueError) as e:
+        logger.warning(f"Cached improvement lookup failed: {type(e).__name__}: {e}")
+        return None
+    finally:
+        # A read is not a probe of the write path; leave that to the flush
+        await _circuit_breaker.release()
+
+
+async def _llm_fallback(
+    settings: Settings,
+    request: "ImprovePromptRequest",
+    failure: ProviderUnavailableError,
+    context: str,
+):
+    """
+    Answer through a cheaper path when the LLM providers are failing.
+
+    A stored improvement of the same idea and context is returned when one
+    exists. Otherwise, unless every provider circuit is open, one zero-shot
+    call (no chain-of-thought, few-shot or OPRO) is made on what is left of
+    the request budget, with the same (compressed) context the strategy got.
+
+    Returns:
+        (result, backend) with backend "cache" or "zero-shot"
+
+    Raises:
+        HTTPException: 503 with Retry-After when neither path produced a result
+    """
+    cached = await _find_cached_improvement(settings, request.idea, request.context)
+    if cached is not None:
+        logger.warning(f"event=llm_fallback backend=cache cause={failure}")
+        return cached, "cache"
+
+    if not isinstance(failure, ProviderCircuitOpenError):
+        try:
+            with timed_stage("fallback"):
+                result = await asyncio.to_thread(
+                    get_zero_shot_improver(settings),
+                    original_idea=request.idea,
+                    context=context,
+                )
+            logger.warning(f"event=llm_fallback backend=zero-shot cause={failure}")
+            return result, "zero-shot"
+        except RuntimeError as e:
+            failure = _provider_failure(e)
+            if failure is None:
+                raise
+
+    retry_after = getattr(failure, "retry_after", 0.0) or settings.LLM_BREAKER_RESET_SECONDS
+    raise HTTPException(
+        status_code=503,
+        detail="LLM providers are unavailable. Please retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
 @router.post("/improve-prompt", response_model=ImprovePromptResponse)
-async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
+async def improve_prompt(
+    request: ImprovePromptRequest, http_request: Request, response: Response
+):
     """
     Improve a raw idea into a high-quality structured prompt.
 
@@ -359,17 +834,125 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
     # - mode required validation (422 error)
     settings = container.get(Settings)
 
+    # Per-stage latency breakdown, reported via Server-Timing
+    timings = StageTimings()
+    request_start = time.perf_counter()
+
+    try:
+        with timing_scope(timings):
+            # Shed load before doing any work: bounded queue per mode
+            slot: AdmissionSlot | None = None
+            if settings.ADMISSION_ENABLED:
+                try:
+                    with timed_stage("queue"):
+                        slot = await get_admission_controller(settings).acquire(request.mode)
+                except AdmissionRejected as e:
+                    raise HTTPException(
+                        status_code=e.status_code,
+                        detail=f"Server busy ({e.reason}). Please retry later.",
+                        headers={"Retry-After": str(e.retry_after)},
+                    ) from None
+
+            try:
+                result = await _improve_prompt_admitted(request, http_request, settings, slot)
+            finally:
+                if slot is not None:
+                    slot.release_if_unbound()
+    except HTTPException as e:
+        telemetry.record_request(mode=request.mode, status=e.status_code)
+        raise
+
+    total_seconds = time.perf_counter() - request_start
+    telemetry.record_request(
+        mode=request.mode,
+        status=200,
+        duration_seconds=total_seconds,
+        strategy=result.strategy,
+        # Provider of the model arm that served the request
+        provider=result.strategy_meta.get("model_arm", settings.LLM_PROVIDER).partition(":")[0],
+        degradation_flags=result.degradation_flags,
+    )
+
+    timings.record("total", total_seconds * 1000)
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = timings.server_timing_header()
+    if settings.TIMINGS_IN_RESPONSE:
+        result.strategy_meta["timings"] = timings.as_dict()
+    return result
+
+
+def _usage_inputs(usage: TokenUsage) -> dict[str, Any]:
+    """
+    Token counts of the request's LLM calls for calculate_from_history.
+
+    Empty when no call was made (e.g. a fallback answer), which leaves the
+    metrics to estimate tokens from the idea and the improved prompt.
+    """
+    if usage.calls == 0:
+        return {}
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "cached_tokens": usage.cached_tokens,
+        "tokens_estimated": usage.estimated,
+    }
+
+
+def _compress_context(
+    settings: Settings, request: ImprovePromptRequest, strategy
+) -> CompressedContext | None:
+    """
+    Fit the request context into the token budget left after few-shot examples.
+
+    Returns None when compression is disabled or there is no context.
+    """
+    if not settings.CONTEXT_COMPRESSION_ENABLED or not request.context:
+        return None
+    examples = strategy.few_shot_examples if isinstance(strategy, PromptImproverStrategy) else 0
+    budget = max(
+        settings.CONTEXT_MIN_TOKENS,
+        settings.CONTEXT_TOKEN_BUDGET - examples * settings.CONTEXT_EXAMPLE_TOKENS,
+    )
+    return compress_context(request.idea, request.context, budget)
+
+
+async def _improve_prompt_admitted(
+    request: ImprovePromptRequest,
+    http_request: Request,
+    settings: Settings,
+    slot: AdmissionSlot | None,
+) -> ImprovePromptResponse:
+    """Body of improve_prompt, run while holding an admission slot."""
     # Use StrategySelector for intelligent strategy routing
     # NLaC mode is enabled when request.mode == "nlac"
     use_nlac = request.mode == "nlac"
-    selector = await get_strategy_selector(settings, use_nlac=use_nlac)
-    strategy = selector.select(request.idea, request.context)
-    complexity = selector.get_complexity(request.idea, request.context)
+    with timed_stage("selector"):
+        # First call per mode also builds the strategies
+        selector = await get_strategy_selector(settings, use_nlac=use_nlac)
+    with timed_stage("features"):
+        # Computed once; selector, NLaC builder and response labels reuse it
+        features = RequestFeatures.from_request(request.idea, request.context)
+    with timed_stage("select"):
+        strategy = selector.select(request.idea, request.context, features=features)
+    complexity = selector.get_complexity(request.idea, request.context, features=features)
+    arm = _select_model_arm(settings, request)
+    arm_lm = get_model_arms(settings).lm(arm)
+    with timed_stage("context"):
+        # Routing saw the full context; the LLM only gets what fits the budget
+        compressed = _compress_context(settings, request, strategy)
+    context = request.context
+    if compressed is not None and compressed.compressed:
+        context = compressed.text
+        features = replace(features, context=context)
+        logger.info(
+            f"Context compressed: {compressed.original_tokens} -> {compressed.tokens} tokens"
+        )
 
     # Log strategy selection for observability
     logger.info(
         f"Mode: {request.mode} | Strategy: {strategy.name} | "
-        f"Complexity: {complexity.value} | Idea: {len(request.idea)} chars"
+        f"Complexity: {complexity.value} | Model: {arm.name} | "
+        f"Idea: {len(request.idea)} chars"
     )
 
     # Start timer for latency
@@ -380,82 +963,74 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
     # See: dashboard/src/core/config/defaults.ts:58-80 for three-layer sync invariant
     STRATEGY_TIMEOUT_SECONDS = 120
 
+    # Shares the deadline with wait_for so the pipeline stops once we give up on it
+    token = CancellationToken(timeout_seconds=STRATEGY_TIMEOUT_SECONDS)
+    # Provider-reported tokens of every LLM call made for this request
+    usage = TokenUsage()
+
     try:
         # Run synchronous strategy.improve in thread with timeout
-        result = await asyncio.wait_for(
-            asyncio.to_thread(
-                strategy.improve,
-                original_idea=request.idea,
-                context=request.context
-            ),
-            timeout=STRATEGY_TIMEOUT_SECONDS
-        )
+        fallback: str | None = None
+        # dspy.context is contextvar-scoped: only this request sees the arm's LM
+        lm_scope = dspy.context(lm=arm_lm) if arm_lm is not None else nullcontext()
+        with cancellation_scope(token), features_scope(features), usage_scope(usage), \
+                lm_scope, timed_stage("improve"):
+            try:
+                result = await asyncio.wait_for(
+                    _run_strategy_cancellable(
+                        strategy, request, http_request, token, slot, context=context
+                    ),
+                    timeout=STRATEGY_TIMEOUT_SECONDS
+                )
+            except RuntimeError as e:
+                # Providers down or circuits open: cached or zero-shot answer
+                failure = None if isinstance(e, OperationCancelledError) else _provider_failure(e)
+                if failure is None or not settings.LLM_FALLBACK_ENABLED:
+                    raise
+                result, fallback = await _llm_fallback(settings, request, failure, context)
+        backend = fallback or strategy.name
 
         # Calculate latency
         latency_ms = int((time.time() - start_time) * 1000)
+        telemetry.record_llm_tokens(arm.provider, usage)
 
         # Track metrics warnings for response metadata
         metrics_warnings = []
 
         # Calculate comprehensive metrics
         try:
-            # Extract model and provider from settings
-            model = settings.LLM_MODEL
-            provider = settings.LLM_PROVIDER
-
-            # Convert guardrails to list if it's a string
-            guardrails_list = _normalize_guardrails(result.guardrails)
-
-            # Extract confidence
-            confidence_value = _extract_confidence(result)
-
-            # Calculate metrics using calculate_from_history with timing
-            metrics_start = time.time()
-            metrics = _metrics_calculator.calculate_from_history(
-                original_idea=request.idea,
-                context=request.context,
-                improved_prompt=result.improved_prompt,
-                role=result.role,
-                directive=result.directive,
-                framework=result.framework,
-                guardrails=guardrails_list,
-                backend=strategy.name,  # Use strategy name instead of backend
-                model=model,
-                provider=provider,
-                latency_ms=latency_ms,
-                confidence=confidence_value,
-                impact_data=ImpactData(),  # TODO: Track user interactions
-            )
-            metrics_duration_ms = int((time.time() - metrics_start) * 1000)
-
-            # Warn if too slow
-            if metrics_duration_ms > 10:
-                logger.warning(f"Metrics calculation took {metrics_duration_ms}ms (target: <10ms)")
-
-            # Log metrics for monitoring
-            logger.info(
-                f"Metrics ({metrics_duration_ms}ms): "
-                f"overall={metrics.overall_score:.2f} ({metrics.grade}), "
-                f"quality={metrics.quality.composite_score:.2f}, "
-                f"perf={metrics.performance.performance_score:.2f}"
-            )
+            # Model and provider of the arm that served the request
+            model = arm.model
+            provider = arm.provider
+
+            metrics_inputs = {
+                "original_idea": request.idea,
+                "context": request.context,
+                "improved_prompt": result.improved_prompt,
+                "role": result.role,
+                "directive": result.directive,
+                "framework": result.framework,
+                # Convert guardrails to list if it's a string
+                "guardrails": _normalize_guardrails(result.guardrails),
+                "backend": backend,  # Strategy name, or the fallback that answered
+                "model": model,
+                "provider": provider,
+                "latency_ms": latency_ms,
+                "confidence": _extract_confidence(result),
+                "impact_data": ImpactData(),  # TODO: Track user interactions
+                **_usage_inputs(usage),
+            }
 
-            # Store metrics if SQLite is enabled
-            if settings.SQLITE_ENABLED:
-                try:
-                    metrics_repo = await get_repository(settings)
-                    if metrics_repo and hasattr(metrics_repo, 'save'):
-                        # Note: We need a metrics repository, not prompt repo
-                        # For now, just log that we would save it
-                        logger.debug(
-                            "Metrics calculated (persistence to be implemented)"
-                        )
-                except (ConnectionError, OSError) as e:
-                    metrics_warnings.append(f"Metrics persistence failed: {type(e).__name__}")
-                    logger.error(f"Failed to save metrics: {type(e).__name__}: {e}")
-                except (AttributeError, KeyError) as e:
-                    metrics_warnings.append(f"Metrics data issue: {type(e).__name__}")
-                    logger.warning(f"Metrics data structure issue: {type(e).__name__}: {e}")
+            if settings.METRICS_SYNC_MODE:
+                await _calculate_metrics_inline(settings, metrics_inputs, metrics_warnings)
+            else:
+                # Regex-heavy evaluation runs on the metrics worker thread
+                with timed_stage("metrics"):
+                    queued = get_metrics_worker(settings).submit(
+                        MetricsJob(calculation=metrics_inputs, loop=asyncio.get_running_loop())
+                    )
+                if not queued:
+                    metrics_warnings.append("Metrics calculation skipped: queue full")
         except (ValueError, TypeError, AttributeError) as e:
             # Expected errors from metrics calculation (invalid data types, missing attributes)
             metrics_warnings.append(f"Metrics calculation skipped: {type(e).__name__}")
@@ -481,7 +1056,7 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
 
         # Build response
         # Classify intent for response (used by tests)
-        intent = _classify_intent(request.idea, request.context)
+        intent = _classify_intent(features)
 
         prompt_id = _generate_stable_prompt_id(
             request.idea, request.context, request.mode
@@ -490,34 +1065,23 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
             getattr(http_request.state, "request_id", None)
             or prompt_id
         )
-        persistence_failed = False
 
-        history_task_coro = _save_history_async(
-            settings=settings,
-            original_idea=request.idea,
-            context=request.context,
-            result=result,
-            backend=strategy.name,  # Use strategy name instead of backend
-            latency_ms=latency_ms,
-            mode=request.mode,
-            request_id=request_id,
-        )
-        try:
-            # Fire-and-forget persistence, never block request completion.
-            asyncio.create_task(history_task_coro)
-        except RuntimeError as e:
-            # If scheduling fails, close coroutine to avoid unawaited warnings.
-            history_task_coro.close()
-            persistence_failed = True
-            logger.warning(
-                "event=persistence_failed reason=schedule_failed error_type=%s "
-                "request_id=%s backend=%s mode=%s latency_ms=%s",
-                type(e).__name__,
-                request_id,
-                strategy.name,
-                request.mode,
-                latency_ms,
-            )
+        persistence_failed = False
+        if settings.SQLITE_ENABLED and fallback != "cache":
+            # Buffered for the batched writer; only the block policy can wait here
+            with timed_stage("persistence"):
+                persistence_failed = not await _enqueue_history(
+                    settings=settings,
+                    original_idea=request.idea,
+                    context=request.context,
+                    result=result,
+                    backend=backend,
+                    latency_ms=latency_ms,
+                    mode=request.mode,
+                    request_id=request_id,
+                    model=arm.model,
+                    provider=arm.provider,
+                )
 
         response = ImprovePromptResponse(
             improved_prompt=result.improved_prompt,
@@ -527,7 +1091,7 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
             guardrails=_normalize_guardrails(result.guardrails),
             reasoning=getattr(result, "reasoning", None),
             confidence=_extract_confidence(result),
-            backend=strategy.name,  # Use strategy name instead of backend
+            backend=backend,  # Strategy name, or the fallback that answered
             prompt_id=prompt_id,
             strategy=strategy.name,
             intent=intent,
@@ -535,6 +1099,18 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
                 "complexity": complexity.value,
                 "mode": request.mode,
                 "strategy": strategy.name,
+                "model_arm": arm.name,
+                **({"fallback": fallback} if fallback else {}),
+                **(
+                    {"context_compression": compressed.as_meta()}
+                    if compressed is not None and compressed.compressed
+                    else {}
+                ),
+                **(
+                    {"token_usage": usage.as_dict()}
+                    if settings.TIMINGS_IN_RESPONSE and usage.calls
+                    else {}
+                ),
             },
             metrics_warning=metrics_warnings[0] if metrics_warnings else None,
             degradation_flags={
@@ -548,12 +1124,35 @@ async def improve_prompt(request: ImprovePromptRequest, http_request: Request):
                     )
                 ),
                 DegradationFlag.PERSISTENCE_FAILED.value: persistence_failed,
+                DegradationFlag.LLM_FALLBACK.value: fallback is not None,
             },
         )
 
+        if settings.SHADOW_ENABLED and fallback is None:
+            _mirror_to_shadow(settings, request, context, response, latency_ms, request_id)
+
         return response
 
+    except OperationCancelledError as e:
+        if e.reason == CancelReason.CLIENT_DISCONNECTED:
+            logger.info(
+                f"Strategy {strategy.name} abandoned: client disconnected | "
+                f"stage: {e.stage}"
+            )
+            raise HTTPException(
+                status_code=499,  # Client Closed Request
+                detail="Client disconnected before the prompt was improved."
+            ) from None
+        logger.critical(
+            f"Strategy {strategy.name} cancelled at deadline ({STRATEGY_TIMEOUT_SECONDS}s) | "
+            f"stage: {e.stage} | idea_length: {len(request.idea)}"
+        )
+        raise HTTPException(
+            status_code=504,  # Gateway Timeout
+            detail="Prompt improvement took too long. Please try with a shorter prompt."
+        ) from None
     except asyncio.TimeoutError:
+        token.cancel(CancelReason.TIMEOUT)
         logger.critical(
             f"Strategy {strategy.name} timed out after {STRATEGY_TIMEOUT_SECONDS}s | "
             f"idea_length: {len(request.idea)}"
@@ -746,97 +1345,87 @@ async def evaluate_quality(request: EvaluateQualityRequest):
     # Let all other exceptions propagate (KeyboardInterrupt, SystemExit, etc.)
 
 
-async def _save_history_async(
+def _build_history_entry(
     settings: Settings,
     original_idea: str,
     context: str,
     result,
     backend: str,
     latency_ms: int,
-    mode: str = "legacy",
-    request_id: str | None = None,
-):
+    model: str | None = None,
+    provider: str | None = None,
+) -> PromptHistory:
     """
-    Save prompt improvement history to SQLite with circuit breaker protection.
+    Build the PromptHistory record for an improved prompt.
 
-    Non-blocking async function that logs errors without failing the request.
+    Raises:
+        ValueError: If the result violates PromptHistory invariants
     """
-    repo = None
-    success = False
+    # Convert guardrails to list if it's a string
+    guardrails_list = _normalize_guardrails(result.guardrails)
 
-    try:
-        if not settings.SQLITE_ENABLED:
-            logger.debug("Persistence disabled by configuration")
-            return
-
-        # Get repository with circuit breaker
-        repo = await get_repository(settings)
-        if repo is None:
-            logger.warning(
-                "event=persistence_failed reason=circuit_breaker_open "
-                "request_id=%s backend=%s mode=%s latency_ms=%s",
-                request_id or "unknown",
-                backend,
-                mode,
-                latency_ms,
-            )
-            return
+    # Extract confidence score
+    confidence_value = _extract_confidence(result)
 
-        # Extract model and provider from settings
-        model = settings.LLM_MODEL
-        provider = settings.LLM_PROVIDER
+    framework_for_history, used_framework_fallback = normalize_framework_for_history(
+        result.framework
+    )
+    if used_framework_fallback:
+        logger.warning(
+            "event=framework_normalization_fallback framework_raw=%r framework_normalized=%s",
+            result.framework,
+            framework_for_history,
+        )
+    return PromptHistory(
+        original_idea=original_idea,
+        context=context,
+        improved_prompt=result.improved_prompt,
+        role=result.role,
+        directive=result.directive,
+        framework=framework_for_history,
+        guardrails=guardrails_list,
+        backend=backend,
+        model=model or settings.LLM_MODEL,
+        provider=provider or settings.LLM_PROVIDER,
+        reasoning=getattr(result, "reasoning", None),
+        confidence=confidence_value,
+        latency_ms=latency_ms
+    )
 
-        # Convert guardrails to list if it's a string
-        guardrails_list = _normalize_guardrails(result.guardrails)
 
-        # Extract confidence score
-        confidence_value = _extract_confidence(result)
+async def _enqueue_history(
+    settings: Settings,
+    original_idea: str,
+    context: str,
+    result,
+    backend: str,
+    latency_ms: int,
+    mode: str = "legacy",
+    request_id: str | None = None,
+    model: str | None = None,
+    provider: str | None = None,
+) -> bool:
+    """
+    Hand the history record to the batched writer.
 
-        # Create PromptHistory entity
-        framework_for_history, used_framework_fallback = normalize_framework_for_history(result.framework)
-        if used_framework_fallback:
-            logger.warning(
-                "event=framework_normalization_fallback framework_raw=%r framework_normalized=%s",
-                result.framework,
-                framework_for_history,
-            )
-        history = PromptHistory(
-            original_idea=original_idea,
-            context=context,
-            improved_prompt=result.improved_prompt,
-            role=result.role,
-            directive=result.directive,
-            framework=framework_for_history,
-            guardrails=guardrails_list,
-            backend=backend,
-            model=model,
-            provider=provider,
-            reasoning=getattr(result, "reasoning", None),
-            confidence=confidence_value,
-            latency_ms=latency_ms
-        )
+    Returns:
+        False if the record could not be built or was rejected by the writer
+    """
+    if not settings.SQLITE_ENABLED:
+        return True
 
-        # Save to database
-        await repo.save(history)
-        success = True
-        logger.info(f"Saved prompt history to database (latency: {latency_ms}ms)")
+    # Breaker open: skip as the per-request save did, rather than buffering
+    # records the flusher would discard. Only reads the state: the half-open
+    # probe is claimed by the flush that actually writes.
+    if _circuit_breaker.state is BreakerState.OPEN:
+        return True
 
-    except (ConnectionError, OSError, TimeoutError) as e:
-        # Record failure on circuit breaker
-        await _circuit_breaker.record_failure()
-        logger.error(
-            "event=persistence_failed error_type=%s request_id=%s backend=%s mode=%s "
-            "latency_ms=%s error=%s",
-            type(e).__name__,
-            request_id or "unknown",
-            backend,
-            mode,
-            latency_ms,
-            str(e),
+    try:
+        history = _build_history_entry(
+            settings, original_idea, context, result, backend, latency_ms,
+            model=model, provider=provider,
         )
     except (ValueError, KeyError, TypeError) as e:
-        # Record failure on circuit breaker
-        await _circuit_breaker.record_failure()
         logger.warning(
             "event=persistence_failed error_type=%s request_id=%s backend=%s mode=%s "
             "latency_ms=%s error=%s",
@@ -847,9 +1436,6 @@ async def _save_history_async(
             latency_ms,
             str(e),
         )
-    # Let unexpected errors propagate - don't silently swallow them
+        return False
 
-    finally:
-        # Record success OUTSIDE try-except to prevent paradox
-        if success:
-            await _circuit_breaker.record_success()
+    return await get_history_writer(settings).submit(history, request_id=request_id, mode=mode)
@@ -0,0 +1,250 @@
+# api/shadow.py
+"""
+Shadow traffic: mirror sampled requests through a candidate strategy.
+
+Before switching NLAC_ENABLED or changing the few-shot pool we want to see
+the candidate on real traffic without exposing users to it. When
+SHADOW_ENABLED is set, a SHADOW_SAMPLE_RATE fraction of successful
+improve-prompt requests is replayed through the candidate selector after the
+response has been built:
+
+- Shadow runs are fire-and-forget tasks, off the response path. They run in
+  an empty contextvars context, so they inherit neither the request's
+  cancellation token, stage timings nor its model arm.
+- At most SHADOW_MAX_CONCURRENCY runs are in flight; requests sampled while
+  the cap is reached are skipped, never queued.
+- Each run has its own deadline (SHADOW_TIMEOUT_SECONDS).
+- Latency, quality score and quality-gate summary of the primary and the
+  candidate are appended side by side to a JSONL file for offline
+  comparison.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from api.quality_gates import evaluate_output
+from hemdov.domain.metrics.evaluators import QualityEvaluator
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    cancellation_scope,
+)
+from hemdov.domain.services.stage_timing import StageTimings, timing_scope
+
+logger = logging.getLogger(__name__)
+
+# Errors a candidate run may end with (OperationCancelledError is a
+# RuntimeError); they are recorded, never raised
+SHADOW_ERRORS = (
+    asyncio.TimeoutError,
+    RuntimeError,
+    ValueError,
+    TypeError,
+    AttributeError,
+    KeyError,
+    ConnectionError,
+    OSError,
+)
+
+
+@dataclass(frozen=True)
+class ShadowRequest:
+    """A served request and what the primary path answered."""
+
+    request_id: str
+    prompt_id: str
+    mode: str
+    idea: str
+    context: str
+    strategy: str
+    latency_ms: int
+    improved_prompt: str
+    framework: str
+    guardrails: list[str]
+
+
+def evaluate_prompt(
+    idea: str, improved_prompt: str, framework: str, guardrails: list[str], gate_template: str
+) -> dict[str, Any]:
+    """Quality score and gate summary of one improved prompt."""
+    quality = QualityEvaluator.evaluate(idea, improved_prompt, framework, guardrails)
+    gates = evaluate_output(improved_prompt, gate_template).to_dict()["summary"]
+    return {
+        "quality_score": round(quality.composite_score, 4),
+        "quality_grade": quality.grade,
+        "gates": gates,
+    }
+
+
+class ShadowRunner:
+    """Sampled, concurrency-capped candidate runs with side-by-side results."""
+
+    def __init__(
+        self,
+        selector_getter: Callable[[], Awaitable[Any]],
+        results_path: str | Path,
+        sample_rate: float = 0.05,
+        max_concurrency: int = 1,
+        timeout_seconds: float = 120.0,
+        gate_template: str = "example_md",
+        candidate_name: str = "candidate",
+        metrics=None,
+        random_fn: Callable[[], float] = random.random,
+    ):
+        """
+        Args:
+            selector_getter: Returns the candidate StrategySelector
+            results_path: JSONL file the paired results are appended to
+            sample_rate: Fraction of requests mirrored (0-1)
+            max_concurrency: Shadow runs allowed in flight at once
+            timeout_seconds: Deadline of one candidate run
+            gate_template: Quality-gate template both outputs are checked against
+            candidate_name: Label of the candidate configuration in results
+            metrics: Optional InProcessMetrics receiving shadow outcome counts
+            random_fn: Source of [0, 1) samples (for tests)
+        """
+        self._selector_getter = selector_getter
+        self._results_path = Path(results_path)
+        self._sample_rate = sample_rate
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout_seconds
+        self._gate_template = gate_template
+        self.candidate_name = candidate_name
+        self._metrics = metrics
+        self._random = random_fn
+        self._in_flight: dict[asyncio.Task, CancellationToken] = {}
+        self._stats = {"sampled": 0, "skipped": 0, "completed": 0, "failed": 0}
+
+    def should_sample(self) -> bool:
+        return self._sample_rate > 0 and self._random() < self._sample_rate
+
+    def submit(self, request: ShadowRequest) -> bool:
+        """
+        Start a shadow run for a served request, unless the cap is reached.
+
+        Returns:
+            True if a run was started
+        """
+        if len(self._in_flight) >= self._max_concurrency:
+            self._count("skipped")
+            return False
+        self._count("sampled")
+        token = CancellationToken(timeout_seconds=self._timeout)
+        # Fresh context: nothing request-scoped leaks into the shadow run
+        task = contextvars.Context().run(asyncio.ensure_future, self._run(request, token))
+        self._in_flight[task] = token
+        task.add_done_callback(lambda t: self._in_flight.pop(t, None))
+        return True
+
+    async def _run(self, request: ShadowRequest, token: CancellationToken) -> None:
+        timings = StageTimings()
+        candidate: dict[str, Any]
+        start = time.perf_counter()
+        try:
+            with cancellation_scope(token), timing_scope(timings):
+                selector = await self._selector_getter()
+                strategy = selector.select(request.idea, request.context)
+                result = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        strategy.improve, original_idea=request.idea, context=request.context
+                    ),
+                    timeout=self._timeout,
+                )
+            guardrails = result.guardrails
+            if isinstance(guardrails, str):
+                guardrails = [g.strip() for g in guardrails.split("\n") if g.strip()]
+            latency_ms = int((time.perf_counter() - start) * 1000)
+            # Regex-heavy scoring stays off the event loop
+            scores = await asyncio.to_thread(
+                evaluate_prompt,
+                request.idea,
+                result.improved_prompt,
+                result.framework,
+                list(guardrails or []),
+                self._gate_template,
+            )
+            candidate = {
+                "ok": True,
+                "strategy": strategy.name,
+                "latency_ms": latency_ms,
+                "improved_prompt": result.improved_prompt,
+                **scores,
+            }
+            self._count("completed")
+        except SHADOW_ERRORS as e:
+            if isinstance(e, asyncio.TimeoutError):
+                token.cancel(CancelReason.TIMEOUT)
+            candidate = {
+                "ok": False,
+                "latency_ms": int((time.perf_counter() - start) * 1000),
+                "error": type(e).__name__,
+            }
+            self._count("failed")
+            logger.info(f"Shadow run {request.request_id} failed: {type(e).__name__}: {e}")
+        candidate["timings"] = timings.as_dict()
+
+        primary = {
+            "ok": True,
+            "strategy": request.strategy,
+            "latency_ms": request.latency_ms,
+            "improved_prompt": request.improved_prompt,
+            **await asyncio.to_thread(
+                evaluate_prompt,
+                request.idea,
+                request.improved_prompt,
+                request.framework,
+                request.guardrails,
+                self._gate_template,
+            ),
+        }
+        record = {
+            "recorded_at": datetime.now(UTC).isoformat(),
+            "request_id": request.request_id,
+            "prompt_id": request.prompt_id,
+            "mode": request.mode,
+            "candidate_name": self.candidate_name,
+            "idea": request.idea,
+            "primary": primary,
+            "candidate": candidate,
+        }
+        try:
+            await asyncio.to_thread(self._append, record)
+        except OSError as e:
+            logger.warning(f"Shadow result not stored: {type(e).__name__}: {e}")
+
+    def _append(self, record: dict[str, Any]) -> None:
+        self._results_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._results_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _count(self, outcome: str) -> None:
+        self._stats[outcome] += 1
+        if self._metrics is not None:
+            self._metrics.record_shadow_run(outcome)
+
+    def stats(self) -> dict[str, int | float | str]:
+        return {
+            **self._stats,
+            "in_flight": len(self._in_flight),
+            "sample_rate": self._sample_rate,
+            "candidate": self.candidate_name,
+        }
+
+    async def close(self) -> None:
+        """Stop in-flight runs at their next checkpoint and wait for them."""
+        for token in self._in_flight.values():
+            token.cancel(CancelReason.SHUTDOWN)
+        tasks = list(self._in_flight)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
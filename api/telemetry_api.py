@@ -0,0 +1,73 @@
+# api/telemetry_api.py
+"""
+Operational telemetry endpoint.
+
+GET /metrics serves the in-process counters and histograms in Prometheus
+text format. Unlike /api/v1/metrics (prompt-quality analytics from SQLite),
+nothing here touches storage: scraping only renders in-memory state.
+"""
+
+import dspy
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.prompt_improver_api import (
+    _circuit_breaker,
+    get_admission_controller,
+    get_history_writer,
+)
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+from hemdov.infrastructure.adapters.provider_router import ProviderRouter
+from hemdov.infrastructure.config import settings
+from hemdov.infrastructure.metrics import telemetry
+
+router = APIRouter(tags=["telemetry"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _provider_breakers():
+    lm = dspy.settings.lm
+    return lm.breakers() if isinstance(lm, ProviderRouter) else []
+
+
+def _breaker_open() -> dict[tuple[str, ...], float]:
+    is_open = _circuit_breaker.state == BreakerState.OPEN
+    values = {("history_persistence",): 1.0 if is_open else 0.0}
+    for breaker in _provider_breakers():
+        values[(f"llm:{breaker.name}",)] = 1.0 if breaker.state == BreakerState.OPEN else 0.0
+    return values
+
+
+def _breaker_failures() -> dict[tuple[str, ...], float]:
+    values = {("history_persistence",): float(_circuit_breaker.failure_count)}
+    for breaker in _provider_breakers():
+        values[(f"llm:{breaker.name}",)] = float(breaker.snapshot()["consecutive_failures"])
+    return values
+
+
+def _admission_field(field: str):
+    def read() -> dict[tuple[str, ...], float]:
+        pools = get_admission_controller(settings).snapshot()
+        return {(mode,): float(pool[field]) for mode, pool in pools.items()}
+    return read
+
+
+def _history_field(field: str):
+    def read() -> dict[tuple[str, ...], float]:
+        return {(): float(get_history_writer(settings).stats()[field])}
+    return read
+
+
+telemetry.circuit_breaker_open.set_function(_breaker_open)
+telemetry.circuit_breaker_failures.set_function(_breaker_failures)
+telemetry.admission_in_flight.set_function(_admission_field("in_flight"))
+telemetry.admission_queued.set_function(_admission_field("queued"))
+telemetry.history_queued.set_function(_history_field("queued"))
+telemetry.history_lag.set_function(_history_field("lag_seconds"))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(telemetry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,190 @@
+# api/warmup.py
+"""
+Startup warm-up and readiness state.
+
+The first request after boot used to pay for lazy StrategySelector
+construction: KNNProvider vocabulary fitting (NLaC), ComplexStrategy few-shot
+compilation (legacy) and the first provider handshake. When WARMUP_ENABLED is
+set, the lifespan runs run_warmup() in the background: it builds the
+selectors for WARMUP_MODES, routes a synthetic request through each of them
+and, with WARMUP_DRY_RUN, sends one tiny completion to the provider.
+
+/health keeps answering while this happens (liveness); /ready only returns
+200 once the pipeline is warm (readiness).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+import litellm
+
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.domain.services.request_features import RequestFeatures
+from hemdov.infrastructure.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Synthetic request routed through each selector; long enough for the legacy
+# selector to pick ComplexStrategy, which is the costliest to build.
+WARMUP_IDEA = (
+    "Design a framework for evaluating API integration quality across the "
+    "pipeline, including metrics, architecture decisions and failure modes."
+)
+WARMUP_CONTEXT = "Warm-up request. Architecture team, infrastructure domain."
+
+
+class WarmupStatus(str, Enum):
+    COLD = "cold"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+@dataclass
+class WarmupStep:
+    """Outcome of one warm-up step."""
+
+    name: str
+    ok: bool
+    duration_ms: float
+    error: str | None = None
+
+
+class WarmupState:
+    """Readiness of this instance; READY is the only state served as ready."""
+
+    def __init__(self):
+        self.status = WarmupStatus.COLD
+        self.steps: list[WarmupStep] = []
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == WarmupStatus.READY
+
+    def begin(self) -> None:
+        self.status = WarmupStatus.WARMING
+        self.steps = []
+        self._started_at = time.monotonic()
+        self._finished_at = None
+
+    def finish(self, status: WarmupStatus) -> None:
+        self.status = status
+        self._finished_at = time.monotonic()
+
+    def mark_ready(self) -> None:
+        """Ready without warming (warm-up disabled)."""
+        self.finish(WarmupStatus.READY)
+
+    def reset(self) -> None:
+        """Back to COLD, e.g. on shutdown so traffic drains before exit."""
+        self.status = WarmupStatus.COLD
+
+    def snapshot(self) -> dict:
+        duration_ms = None
+        if self._started_at is not None and self._finished_at is not None:
+            duration_ms = round((self._finished_at - self._started_at) * 1000, 1)
+        return {
+            "status": self.status.value,
+            "duration_ms": duration_ms,
+            "steps": [
+                {
+                    "name": step.name,
+                    "ok": step.ok,
+                    "duration_ms": round(step.duration_ms, 1),
+                    **({"error": step.error} if step.error else {}),
+                }
+                for step in self.steps
+            ],
+        }
+
+
+# Process-wide readiness served by /ready
+warmup_state = WarmupState()
+
+
+def _parse_modes(modes: str) -> list[str]:
+    parsed = [mode.strip() for mode in modes.split(",") if mode.strip()]
+    unknown = [mode for mode in parsed if mode not in ("legacy", "nlac")]
+    if unknown:
+        raise ValueError(f"Unknown WARMUP_MODES entries: {unknown}")
+    return parsed
+
+
+async def _provider_handshake(lm, timeout_seconds: float) -> None:
+    """One minimal completion: opens the provider connection and loads the model."""
+    token = CancellationToken(timeout_seconds=timeout_seconds)
+    with cancellation_scope(token):
+        await asyncio.wait_for(
+            asyncio.to_thread(lm, prompt="ping", max_tokens=1),
+            timeout=timeout_seconds,
+        )
+
+
+async def run_warmup(settings: Settings, lm=None, state: WarmupState = warmup_state) -> WarmupState:
+    """
+    Warm the improve-prompt pipeline and record the outcome in state.
+
+    Selector construction failures leave the instance FAILED (not ready). A
+    failed provider handshake only does so when WARMUP_REQUIRE_PROVIDER is
+    set; otherwise it is recorded and the instance still becomes ready.
+    """
+    # Imported here: prompt_improver_api is heavy and main imports both modules
+    from api.prompt_improver_api import get_strategy_selector
+
+    state.begin()
+    failed = False
+
+    async def step(name: str, work) -> bool:
+        start = time.perf_counter()
+        try:
+            await work()
+        except (
+            OSError, ValueError, TypeError, KeyError, RuntimeError, TimeoutError,
+            OperationCancelledError, litellm.exceptions.OpenAIError,
+        ) as e:
+            state.steps.append(WarmupStep(
+                name, False, (time.perf_counter() - start) * 1000, f"{type(e).__name__}: {e}"
+            ))
+            logger.warning(f"Warm-up step {name} failed: {type(e).__name__}: {e}")
+            return False
+        state.steps.append(WarmupStep(name, True, (time.perf_counter() - start) * 1000))
+        logger.info(f"Warm-up step {name} done in {state.steps[-1].duration_ms:.0f}ms")
+        return True
+
+    try:
+        modes = _parse_modes(settings.WARMUP_MODES)
+    except ValueError as e:
+        logger.error(str(e))
+        state.finish(WarmupStatus.FAILED)
+        return state
+
+    for mode in modes:
+        async def build(mode=mode):
+            selector = await get_strategy_selector(settings, use_nlac=mode == "nlac")
+            # Route a synthetic request: compiles the analyzers' patterns and
+            # touches the strategy the selector would pick
+            features = RequestFeatures.from_request(WARMUP_IDEA, WARMUP_CONTEXT)
+            selector.select(WARMUP_IDEA, WARMUP_CONTEXT, features=features)
+
+        if not await step(f"selector:{mode}", build):
+            failed = True
+
+    if settings.WARMUP_DRY_RUN and lm is not None:
+        handshake_ok = await step(
+            "provider", lambda: _provider_handshake(lm, settings.WARMUP_TIMEOUT_SECONDS)
+        )
+        if not handshake_ok and settings.WARMUP_REQUIRE_PROVIDER:
+            failed = True
+
+    state.finish(WarmupStatus.FAILED if failed else WarmupStatus.READY)
+    logger.info(f"Warm-up finished: {state.status.value}")
+    return state
@@ -13,6 +13,9 @@ class PromptImproverStrategy(ABC):
     # Truncation threshold ratio (70% of max_length)
     TRUNCATION_THRESHOLD_RATIO = 0.7
 
+    # Upper bound on few-shot examples sent next to the context (token budgeting)
+    few_shot_examples: int = 0
+
     @abstractmethod
     def improve(self, original_idea: str, context: str) -> dspy.Prediction:
         """
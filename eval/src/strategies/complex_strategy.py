@@ -4,6 +4,8 @@ from pathlib import Path
 
 import dspy
 
+from hemdov.domain.services.cancellation import OperationCancelledError
+
 from .base import PromptImproverStrategy
 
 logger = logging.getLogger(__name__)
@@ -37,6 +39,7 @@ class ComplexStrategy(PromptImproverStrategy):
         self._trainset_path = trainset_path
         self._compiled_path = compiled_path
         self._k = k
+        self.few_shot_examples = k
 
         # Import few-shot module lazily
         from eval.src.dspy_prompt_improver_fewshot import (
@@ -84,6 +87,8 @@ class ComplexStrategy(PromptImproverStrategy):
 
         try:
             result = self.improver(original_idea=original_idea, context=context)
+        except OperationCancelledError:
+            raise
         except Exception as e:
             logger.error(f"DSPy KNNFewShot error in ComplexStrategy: {e}")
             raise RuntimeError(f"DSPy PromptImprover failed: {e}") from e
@@ -4,6 +4,7 @@ import logging
 import dspy
 
 from hemdov.domain.dspy_modules.prompt_improver import PromptImproverSignature
+from hemdov.domain.services.cancellation import OperationCancelledError
 
 from .base import PromptImproverStrategy
 
@@ -43,6 +44,8 @@ class ModerateStrategy(PromptImproverStrategy):
 
         try:
             result = self.improver(original_idea=original_idea, context=context)
+        except OperationCancelledError:
+            raise
         except Exception as e:
             logger.error(f"DSPy ChainOfThought error in ModerateStrategy: {e}")
             raise RuntimeError(f"DSPy PromptImprover failed: {e}") from e
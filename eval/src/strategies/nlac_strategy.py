@@ -21,11 +21,14 @@ from datetime import UTC, datetime
 import dspy
 
 from hemdov.domain.dto.nlac_models import NLaCRequest, PromptObject
+from hemdov.domain.services.cancellation import OperationCancelledError, raise_if_cancelled
 from hemdov.domain.services.knn_provider import KNNProvider
 from hemdov.domain.services.llm_protocol import LLMClient
 from hemdov.domain.services.nlac_builder import NLaCBuilder
 from hemdov.domain.services.oprop_optimizer import OPROOptimizer
 from hemdov.domain.services.reflexion_service import ReflexionService
+from hemdov.domain.services.request_features import get_current_features
+from hemdov.domain.services.stage_timing import timed_stage
 
 from .base import PromptImproverStrategy
 
@@ -49,6 +52,9 @@ class NLaCStrategy(PromptImproverStrategy):
         enable_optimization: bool = True,
         enable_validation: bool = False,
         knn_provider: KNNProvider | None = None,
+        opro_beam_width: int = 1,
+        opro_candidates_per_round: int = 1,
+        opro_max_llm_calls: int | None = None,
     ):
         """
         Initialize NLaC strategy with all services.
@@ -59,14 +65,25 @@ class NLaCStrategy(PromptImproverStrategy):
             enable_optimization: Whether to run OPRO optimization
             enable_validation: Whether to run IFEval validation (reserved, not yet implemented)
             knn_provider: Optional KNNProvider for few-shot examples
+            opro_beam_width: OPRO candidates kept per round (beam mode if > 1)
+            opro_candidates_per_round: OPRO variations scored concurrently per round
+            opro_max_llm_calls: Cap on OPRO variation LLM calls per request
         """
         self.builder = NLaCBuilder(knn_provider=knn_provider)
-        self.optimizer = OPROOptimizer(llm_client=llm_client, knn_provider=knn_provider)
+        self.optimizer = OPROOptimizer(
+            llm_client=llm_client,
+            knn_provider=knn_provider,
+            beam_width=opro_beam_width,
+            candidates_per_round=opro_candidates_per_round,
+            max_llm_calls=opro_max_llm_calls,
+        )
         self.reflexion = ReflexionService(llm_client=llm_client) if llm_client else None
         self._enable_optimization = enable_optimization
         self._enable_validation = enable_validation
         self._llm_client = llm_client
         self._knn_provider = knn_provider
+        # NLaCBuilder fetches up to 5 KNN examples (complex inputs)
+        self.few_shot_examples = 5 if knn_provider else 0
 
     def improve(self, original_idea: str, context: str) -> dspy.Prediction:
         """
@@ -98,7 +115,11 @@ class NLaCStrategy(PromptImproverStrategy):
         # Build PromptObject (with KNN examples if available)
         logger.info(f"Building NLaC prompt for: {original_idea[:50]}...")
         try:
-            prompt_obj = self.builder.build(request)
+            with timed_stage("nlac_build"):
+                # Reuse the intent/complexity computed at the API boundary
+                prompt_obj = self.builder.build(
+                    request, features=get_current_features(original_idea, context)
+                )
         except (ValueError, FileNotFoundError, json.JSONDecodeError) as e:
             logger.exception(
                 f"Failed to build PromptObject for request: {original_idea[:50]}. "
@@ -117,6 +138,9 @@ class NLaCStrategy(PromptImproverStrategy):
                 "Please try again or contact support if the issue persists."
             ) from e
 
+        # Builder work is local; skip the optimizers if the request is already gone
+        raise_if_cancelled("nlac_optimize")
+
         # Extract intent for routing
         intent = prompt_obj.strategy_meta.get("intent", "").lower()
 
@@ -144,6 +168,8 @@ class NLaCStrategy(PromptImproverStrategy):
                 opt_response = self.optimizer.run_loop(prompt_obj)
                 prompt_obj.template = opt_response.final_instruction
                 prompt_obj.updated_at = datetime.now(UTC).isoformat()
+            except OperationCancelledError:
+                raise
             except Exception as e:
                 logger.exception(
                     f"OPRO optimization failed, using initial template. Error: {type(e).__name__}"
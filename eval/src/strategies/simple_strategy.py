@@ -4,6 +4,7 @@ import logging
 import dspy
 
 from hemdov.domain.dspy_modules.prompt_improver import PromptImproverSignature
+from hemdov.domain.services.cancellation import OperationCancelledError
 
 from .base import PromptImproverStrategy
 
@@ -43,6 +44,8 @@ class SimpleStrategy(PromptImproverStrategy):
 
         try:
             result = self.improver(original_idea=original_idea, context=context)
+        except OperationCancelledError:
+            raise
         except Exception as e:
             logger.error(f"DSPy Predict error in SimpleStrategy: {e}")
             raise RuntimeError(f"DSPy PromptImprover failed: {e}") from e
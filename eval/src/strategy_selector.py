@@ -5,6 +5,7 @@ from pathlib import Path
 
 from hemdov.domain.services.knn_provider import KNNProvider
 from hemdov.domain.services.llm_protocol import LLMClient
+from hemdov.domain.services.request_features import RequestFeatures
 
 from .complexity_analyzer import ComplexityAnalyzer, ComplexityLevel
 from .strategies.base import PromptImproverStrategy
@@ -42,6 +43,8 @@ class StrategySelector:
         fewshot_k: int = 3,
         use_nlac: bool = False,
         llm_client: LLMClient | None = None,
+        catalog_path: str | None = None,
+        opro_options: dict[str, int | None] | None = None,
     ):
         """
         Initialize strategy selector.
@@ -52,6 +55,8 @@ class StrategySelector:
             fewshot_k: Number of neighbors for KNNFewShot
             use_nlac: Whether to use NLaC strategy (default: False for backward compatibility)
             llm_client: Optional LLM client for NLaC advanced features
+            catalog_path: KNN few-shot pool for NLaC (default: unified-fewshot-pool-v2)
+            opro_options: NLaCStrategy opro_* keyword arguments (beam mode, LLM call cap)
 
         Raises:
             RuntimeError: If ComplexStrategy initialization fails
@@ -68,7 +73,7 @@ class StrategySelector:
         # Initialize NLaC strategy if enabled
         if use_nlac:
             # Initialize KNNProvider with ComponentCatalog
-            catalog_path = Path("datasets/exports/unified-fewshot-pool-v2.json")
+            catalog_path = Path(catalog_path or "datasets/exports/unified-fewshot-pool-v2.json")
             knn_provider = None
             if catalog_path.exists():
                 try:
@@ -91,7 +96,8 @@ class StrategySelector:
 
             self.nlac_strategy = NLaCStrategy(
                 llm_client=llm_client,
-                knn_provider=knn_provider
+                knn_provider=knn_provider,
+                **(opro_options or {}),
             )
             logger = __import__("logging").getLogger(__name__)
             logger.info("NLaC strategy enabled - using unified NLaC pipeline")
@@ -128,7 +134,8 @@ class StrategySelector:
     def select(
         self,
         original_idea: str,
-        context: str
+        context: str,
+        features: RequestFeatures | None = None,
     ) -> PromptImproverStrategy:
         """
         Select appropriate strategy based on mode and complexity.
@@ -139,6 +146,7 @@ class StrategySelector:
         Args:
             original_idea: User's original prompt idea
             context: Additional context (optional)
+            features: Precomputed request features; avoids re-analyzing complexity
 
         Returns:
             Selected strategy instance
@@ -158,7 +166,7 @@ class StrategySelector:
             return self.nlac_strategy
 
         # Legacy mode: route based on complexity
-        complexity = self.analyzer.analyze(original_idea, context)
+        complexity = self.get_complexity(original_idea, context, features)
 
         if complexity == ComplexityLevel.SIMPLE:
             return self.simple_strategy
@@ -174,17 +182,27 @@ class StrategySelector:
                 logger.warning("ComplexStrategy unavailable, using ModerateStrategy fallback")
                 return self.moderate_strategy
 
-    def get_complexity(self, original_idea: str, context: str) -> ComplexityLevel:
+    def get_complexity(
+        self,
+        original_idea: str,
+        context: str,
+        features: RequestFeatures | None = None,
+    ) -> ComplexityLevel:
         """
         Get complexity level for logging/metrics.
 
         Args:
             original_idea: User's original prompt idea
             context: Additional context (optional)
+            features: Precomputed request features; reused when they describe
+                this input instead of running the analyzer again
 
         Returns:
             ComplexityLevel (SIMPLE, MODERATE, or COMPLEX)
         """
+        if features is not None and features.describes(original_idea, context):
+            # Features carry the domain enum; map onto this module's enum
+            return ComplexityLevel(features.complexity.value)
         return self.analyzer.analyze(original_idea, context)
 
     def get_degradation_flags(self) -> dict:
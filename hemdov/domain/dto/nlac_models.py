@@ -5,10 +5,11 @@ Pydantic models for the NLaC feature - treating prompts as structured
 executable objects rather than plain strings.
 """
 
+from collections.abc import Callable
 from enum import Enum
 from typing import Any, Literal, NotRequired, TypedDict
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, computed_field, field_validator
 
 # ============================================================================
 # Enums
@@ -234,13 +235,31 @@ class PromptObject(BaseModel):
 
 
 class OPROIteration(BaseModel):
-    """Single OPRO optimization iteration result."""
+    """
+    Single OPRO optimization iteration result.
+
+    meta_prompt_used may be given as a callable; it is then rendered on
+    first access (and serialization), so iterations whose meta-prompt is
+    never read do not pay for it.
+    """
     iteration_number: int = Field(..., ge=1, description="Iteration number (1-indexed)")
-    meta_prompt_used: str = Field(..., description="Meta-prompt template used")
     generated_instruction: str = Field(..., description="Generated instruction")
     score: float = Field(..., ge=0.0, le=1.0, description="Quality score (0-1)")
     feedback: str | None = Field(None, description="Feedback for next iteration")
 
+    _meta_prompt: str | Callable[[], str] = PrivateAttr()
+
+    def __init__(self, *, meta_prompt_used: str | Callable[[], str], **data: Any):
+        super().__init__(**data)
+        self._meta_prompt = meta_prompt_used
+
+    @computed_field(description="Meta-prompt template used")
+    @property
+    def meta_prompt_used(self) -> str:
+        if callable(self._meta_prompt):
+            self._meta_prompt = self._meta_prompt()
+        return self._meta_prompt
+
 
 class OptimizeResponse(BaseModel):
     """
@@ -102,7 +102,7 @@ class PerformanceMetrics:
     # Latency in milliseconds
     latency_ms: int
 
-    # Estimated token count (input + output)
+    # Token count (input + output); provider-reported unless tokens_estimated
     total_tokens: int
 
     # Estimated cost in USD
@@ -117,6 +117,15 @@ class PerformanceMetrics:
     # Backend type (zero-shot | few-shot)
     backend: str
 
+    # Split of total_tokens; cached_tokens is the part of input_tokens read
+    # from the provider's prompt cache
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+    # True when the counts are len // 4 estimates (provider sent no usage)
+    tokens_estimated: bool = True
+
     # Performance score (higher is better, max 1.0)
     performance_score: float = field(init=False)
 
@@ -385,6 +394,10 @@ class PromptMetrics:
                 "grade": self.performance.grade,
                 "latency_ms": self.performance.latency_ms,
                 "total_tokens": self.performance.total_tokens,
+                "input_tokens": self.performance.input_tokens,
+                "output_tokens": self.performance.output_tokens,
+                "cached_tokens": self.performance.cached_tokens,
+                "tokens_estimated": self.performance.tokens_estimated,
                 "cost_usd": self.performance.cost_usd,
                 "provider": self.performance.provider,
                 "model": self.performance.model,
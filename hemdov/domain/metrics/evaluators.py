@@ -33,19 +33,23 @@ logger = logging.getLogger(__name__)
 # COST CALCULATION
 # ============================================================================
 
+# Prices per 1K tokens. "cached_input" prices prompt tokens read from the
+# provider's prompt cache; models without it bill cached tokens at the input rate.
 PRICING_TABLE = {
     "anthropic": {
-        "claude-haiku-4-5-20251001": {"input": 0.00008, "output": 0.00024},  # per 1K tokens
-        "claude-sonnet-4-5-20250929": {"input": 0.003, "output": 0.015},
-        "claude-opus-4-20250514": {"input": 0.015, "output": 0.075},
+        "claude-haiku-4-5-20251001": {
+            "input": 0.00008, "output": 0.00024, "cached_input": 0.000008,
+        },
+        "claude-sonnet-4-5-20250929": {"input": 0.003, "output": 0.015, "cached_input": 0.0003},
+        "claude-opus-4-20250514": {"input": 0.015, "output": 0.075, "cached_input": 0.0015},
     },
     "deepseek": {
-        "deepseek-chat": {"input": 0.00014, "output": 0.00028},
-        "deepseek-reasoner": {"input": 0.00055, "output": 0.00219},
+        "deepseek-chat": {"input": 0.00014, "output": 0.00028, "cached_input": 0.000014},
+        "deepseek-reasoner": {"input": 0.00055, "output": 0.00219, "cached_input": 0.00014},
     },
     "openai": {
-        "gpt-4o-mini": {"input": 0.00015, "output": 0.00060},
-        "gpt-4o": {"input": 0.0025, "output": 0.01},
+        "gpt-4o-mini": {"input": 0.00015, "output": 0.00060, "cached_input": 0.000075},
+        "gpt-4o": {"input": 0.0025, "output": 0.01, "cached_input": 0.00125},
     },
     "gemini": {
         "gemini-2.0-flash-exp": {"input": 0.00001, "output": 0.00001},  # Approx
@@ -62,6 +66,7 @@ def calculate_cost(
     model: str,
     input_tokens: int,
     output_tokens: int,
+    cached_tokens: int = 0,
 ) -> float:
     """
     Calculate cost in USD for a given API call.
@@ -69,8 +74,9 @@ def calculate_cost(
     Args:
         provider: LLM provider (anthropic, deepseek, openai, etc.)
         model: Model name
-        input_tokens: Number of input tokens
+        input_tokens: Number of input tokens, including cached ones
         output_tokens: Number of output tokens
+        cached_tokens: Input tokens read from the provider's prompt cache
 
     Returns:
         Cost in USD
@@ -90,7 +96,9 @@ def calculate_cost(
         # Use default or free
         rates = pricing.get("default", {"input": 0.0, "output": 0.0})
 
-    input_cost = (input_tokens / 1000) * rates["input"]
+    cached_tokens = min(cached_tokens, input_tokens)
+    input_cost = ((input_tokens - cached_tokens) / 1000) * rates["input"]
+    input_cost += (cached_tokens / 1000) * rates.get("cached_input", rates["input"])
     output_cost = (output_tokens / 1000) * rates["output"]
 
     return input_cost + output_cost
@@ -342,6 +350,11 @@ class PromptImprovementResult:
     backend: str | None = None
     provider: str | None = None
     model: str | None = None
+    # Provider-reported usage summed over the request's LLM calls (None: estimate)
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    cached_tokens: int = 0
+    tokens_estimated: bool = False  # Some calls reported no usage and were estimated
 
 
 class PerformanceEvaluator:
@@ -360,10 +373,17 @@ class PerformanceEvaluator:
         backend: str,
         original_idea: str,
         improved_prompt: str,
+        input_tokens: int | None = None,
+        output_tokens: int | None = None,
+        cached_tokens: int = 0,
+        tokens_estimated: bool = False,
     ) -> PerformanceMetrics:
         """
         Calculate performance metrics.
 
+        Token counts reported by the provider are used when given; otherwise
+        they are estimated from the idea and the improved prompt.
+
         Args:
             latency_ms: Request latency in milliseconds
             provider: LLM provider
@@ -371,17 +391,23 @@ class PerformanceEvaluator:
             backend: Backend type (zero-shot | few-shot)
             original_idea: Original input text
             improved_prompt: Improved output text
+            input_tokens: Provider-reported prompt tokens (None: estimate)
+            output_tokens: Provider-reported completion tokens (None: estimate)
+            cached_tokens: Prompt tokens read from the provider's prompt cache
+            tokens_estimated: The given counts include estimates
 
         Returns:
             PerformanceMetrics instance
         """
-        # Estimate tokens
-        input_tokens = estimate_tokens(original_idea)
-        output_tokens = estimate_tokens(improved_prompt)
+        estimated = input_tokens is None or output_tokens is None
+        if estimated:
+            input_tokens = estimate_tokens(original_idea)
+            output_tokens = estimate_tokens(improved_prompt)
+            cached_tokens = 0
         total_tokens = input_tokens + output_tokens
 
         # Calculate cost
-        cost_usd = calculate_cost(provider, model, input_tokens, output_tokens)
+        cost_usd = calculate_cost(provider, model, input_tokens, output_tokens, cached_tokens)
 
         return PerformanceMetrics(
             latency_ms=latency_ms,
@@ -390,6 +416,10 @@ class PerformanceEvaluator:
             provider=provider,
             model=model,
             backend=backend,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=cached_tokens,
+            tokens_estimated=estimated or tokens_estimated,
         )
 
 
@@ -503,6 +533,10 @@ class PromptMetricsCalculator:
             backend=result.backend or "zero-shot",  # Use backend from result, default to zero-shot
             original_idea=original_idea,
             improved_prompt=result.improved_prompt,
+            input_tokens=result.input_tokens,
+            output_tokens=result.output_tokens,
+            cached_tokens=result.cached_tokens,
+            tokens_estimated=result.tokens_estimated,
         )
 
         # Calculate impact metrics (default to zeros if not provided)
@@ -540,6 +574,10 @@ class PromptMetricsCalculator:
         latency_ms: int | None = None,
         confidence: float | None = None,
         impact_data: ImpactData | None = None,
+        input_tokens: int | None = None,
+        output_tokens: int | None = None,
+        cached_tokens: int = 0,
+        tokens_estimated: bool = False,
     ) -> PromptMetrics:
         """
         Calculate metrics from PromptHistory entity fields.
@@ -560,6 +598,10 @@ class PromptMetricsCalculator:
             latency_ms: Request latency
             confidence: Confidence score
             impact_data: Optional user interaction data
+            input_tokens: Provider-reported prompt tokens of the request's LLM calls
+            output_tokens: Provider-reported completion tokens of those calls
+            cached_tokens: Prompt tokens read from the provider's prompt cache
+            tokens_estimated: Some of those calls reported no usage
 
         Returns:
             Complete PromptMetrics instance
@@ -575,6 +617,10 @@ class PromptMetricsCalculator:
             confidence=confidence,
             latency_ms=latency_ms,
             backend=backend,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=cached_tokens,
+            tokens_estimated=tokens_estimated,
         )
 
         # Override model/provider in result for performance evaluation
@@ -22,6 +22,20 @@ class PromptRepository(ABC):
         """
         pass
 
+    async def save_many(self, histories: list[PromptHistory]) -> int:
+        """
+        Save several prompt history records.
+
+        Implementations should override this to write all records in one
+        transaction; the default saves them one by one.
+
+        Returns:
+            int: Number of records saved
+        """
+        for history in histories:
+            await self.save(history)
+        return len(histories)
+
     @abstractmethod
     async def find_by_id(self, history_id: int) -> PromptHistory | None:
         """Find a prompt history by ID."""
@@ -43,6 +57,18 @@ class PromptRepository(ABC):
         """Search prompts by text content."""
         pass
 
+    async def find_latest(self, original_idea: str, context: str) -> PromptHistory | None:
+        """
+        Most recent improvement of exactly this idea and context.
+
+        Implementations should override this with an indexed lookup; the
+        default filters search() results.
+        """
+        for history in await self.search(original_idea):
+            if history.original_idea == original_idea and history.context == context:
+                return history
+        return None
+
     @abstractmethod
     async def delete_old_records(self, days: int) -> int:
         """
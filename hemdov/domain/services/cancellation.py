@@ -0,0 +1,226 @@
+"""
+Cancellation - Cooperative cancellation for long-running pipeline work.
+
+A CancellationToken travels with a single improve-prompt request from the
+API boundary down to OPRO/Reflexion loops and the LLM adapter. Worker code
+cannot be interrupted from the outside (it runs in a thread), so it checks
+the token between units of work and stops as soon as it is cancelled.
+
+The token is propagated through a ContextVar: asyncio.to_thread copies the
+current context into the worker thread, so no strategy signature has to
+change for the token to reach the adapter.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class CancelReason(str, Enum):
+    """Why a request's work was cancelled."""
+    TIMEOUT = "timeout"
+    CLIENT_DISCONNECTED = "client_disconnected"
+    SHUTDOWN = "shutdown"
+    SUPERSEDED = "superseded"  # A concurrent attempt (e.g. a hedged LLM call) won
+
+
+class OperationCancelledError(RuntimeError):
+    """Raised by a cancellation checkpoint once the token is cancelled."""
+
+    def __init__(self, reason: CancelReason, stage: str = "unknown"):
+        super().__init__(f"Operation cancelled ({reason.value}) at stage '{stage}'")
+        self.reason = reason
+        self.stage = stage
+
+
+class CancellationStats:
+    """Thread-safe counters for cancelled requests and abandoned work units."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: dict[str, int] = {}
+        self._aborted_stages: dict[str, int] = {}
+
+    def record_request(self, reason: CancelReason) -> None:
+        """Count a request whose work was cancelled."""
+        with self._lock:
+            self._requests[reason.value] = self._requests.get(reason.value, 0) + 1
+
+    def record_aborted(self, stage: str) -> None:
+        """Count a unit of work (iteration, LLM call) skipped because of cancellation."""
+        with self._lock:
+            self._aborted_stages[stage] = self._aborted_stages.get(stage, 0) + 1
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        """Return a copy of the counters."""
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "aborted_work": dict(self._aborted_stages),
+            }
+
+    def reset(self) -> None:
+        """Clear all counters (used by tests)."""
+        with self._lock:
+            self._requests.clear()
+            self._aborted_stages.clear()
+
+
+# Process-wide counters, reported by the API health endpoint
+cancellation_stats = CancellationStats()
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation token with an optional deadline.
+
+    The deadline is expressed on the monotonic clock. A token whose deadline
+    has passed behaves as if it was cancelled with CancelReason.TIMEOUT.
+
+    A child token (see child()) is cancelled with its parent and inherits its
+    deadline, but can also be cancelled on its own, e.g. to abandon one of
+    several concurrent attempts without cancelling the request.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float | None = None,
+        parent: "CancellationToken | None" = None,
+    ):
+        """
+        Create a token.
+
+        Args:
+            timeout_seconds: Optional budget in seconds from now. None means no deadline.
+            parent: Optional token whose cancellation and deadline also apply
+        """
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._reason: CancelReason | None = None
+        self._parent = parent
+        self._deadline = (
+            time.monotonic() + timeout_seconds if timeout_seconds is not None else None
+        )
+        if parent is not None and parent.deadline is not None:
+            self._deadline = (
+                parent.deadline if self._deadline is None else min(self._deadline, parent.deadline)
+            )
+
+    def child(self, timeout_seconds: float | None = None) -> "CancellationToken":
+        """Create a token cancelled together with this one."""
+        return CancellationToken(timeout_seconds=timeout_seconds, parent=self)
+
+    def cancel(self, reason: CancelReason) -> bool:
+        """
+        Cancel the token.
+
+        Returns:
+            True if this call cancelled the token, False if it was already cancelled
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._reason = reason
+            self._event.set()
+        if self._parent is None:
+            # Child tokens abandon attempts, not requests
+            cancellation_stats.record_request(reason)
+            logger.info(f"Cancellation requested | reason={reason.value}")
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token was cancelled or its deadline has passed."""
+        if self._event.is_set():
+            return True
+        if self._parent is not None and self._parent.cancelled:
+            self.cancel(self._parent.reason or CancelReason.TIMEOUT)
+            return True
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self.cancel(CancelReason.TIMEOUT)
+            return True
+        return False
+
+    @property
+    def reason(self) -> CancelReason | None:
+        """Reason of cancellation, or None while still active."""
+        return self._reason
+
+    @property
+    def deadline(self) -> float | None:
+        """Deadline on the time.monotonic() clock, or None."""
+        return self._deadline
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline (never negative), or None if unbounded."""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep up to `seconds`, waking early when the token is cancelled.
+
+        Returns:
+            True if the token was cancelled (or its deadline passed)
+        """
+        end = time.monotonic() + seconds
+        while not self.cancelled:
+            left = end - time.monotonic()
+            if left <= 0:
+                return False
+            # Short slices: a parent's cancellation only shows on polling
+            self._event.wait(min(left, 0.05))
+        return True
+
+    def raise_if_cancelled(self, stage: str = "unknown") -> None:
+        """
+        Cancellation checkpoint.
+
+        Args:
+            stage: Name of the work unit about to start (for stats and logs)
+
+        Raises:
+            OperationCancelledError: If the token is cancelled
+        """
+        if self.cancelled:
+            cancellation_stats.record_aborted(stage)
+            raise OperationCancelledError(self._reason or CancelReason.TIMEOUT, stage)
+
+
+_current_token: ContextVar[CancellationToken | None] = ContextVar(
+    "hemdov_cancellation_token", default=None
+)
+
+
+def get_current_token() -> CancellationToken | None:
+    """Return the token bound to the current context, if any."""
+    return _current_token.get()
+
+
+def raise_if_cancelled(stage: str = "unknown") -> None:
+    """Checkpoint against the current context's token (no-op when unbound)."""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled(stage)
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken) -> Iterator[CancellationToken]:
+    """
+    Bind a token to the current context for the duration of the block.
+
+    Work started inside the block (including asyncio.to_thread calls, which
+    copy the context) observes the token through get_current_token().
+    """
+    reset_token = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset_token)
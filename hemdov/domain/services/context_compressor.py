@@ -0,0 +1,209 @@
+"""
+Context Compressor - Fit request context into a token budget before the LLM call.
+
+ImprovePromptRequest.context (up to 5000 characters) used to reach every LLM
+call verbatim, next to the few-shot examples, and in NLaC into every OPRO
+iteration. Input tokens dominate cost and latency for long contexts, so the
+API reduces the context once, locally and deterministically, when it would
+not fit the budget left after the examples:
+
+1. Split into segments (sentences; fenced code blocks stay whole)
+2. Drop repeated segments (case, whitespace and punctuation insensitive)
+3. Drop boilerplate: lines that are only a greeting, sign-off or separator
+4. If still over budget, keep the segments sharing the most words with the
+   idea, emitted in their original order. When nothing fits whole, the most
+   relevant sentence is truncated; code blocks are kept whole or dropped,
+   never cut.
+
+Token counts use the same ~4 characters/token estimate as the metrics.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from hemdov.domain.metrics.evaluators import estimate_tokens
+
+_FENCE_PATTERN = re.compile(r"```.*?(?:```|\Z)", re.DOTALL)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(r"\w{3,}")
+_NORMALIZE_PATTERN = re.compile(r"[\W_]+")
+# Matched against whole lines only: "Hello world." or "Hey there" inside
+# content must survive, so a greeting takes an addressee only from a short
+# list or when written letter-style with a trailing comma ("Hi Maria,")
+_BOILERPLATE_PATTERN = re.compile(
+    r"^\W*(?:"
+    r"(?:hi|hello|hey|hola|buenas)(?:,? (?:team|all|everyone|folks|equipo|a todos|todos))?|"
+    r"(?:hi|hello|hey|hola|dear) \w+,|"
+    r"thanks?(?: you)?(?: (?:so|very) much)?(?: in advance)?|muchas gracias|gracias|"
+    r"best(?: regards)?|kind regards|regards|cheers|saludos|un saludo|"
+    r"hope (?:this|that) helps|let me know if you (?:have|need) (?:any|more) \w+|"
+    r"as an ai(?: language model)?\b.*"
+    r")\W*$",
+    re.IGNORECASE,
+)
+_STOPWORDS = frozenset({
+    "the", "and", "for", "with", "that", "this", "from", "are", "was", "were", "you",
+    "your", "have", "has", "not", "but", "can", "will", "should", "would", "could",
+    "into", "about", "there", "their", "them", "they", "what", "when", "which", "who",
+    "how", "que", "para", "con", "una", "los", "las", "del", "por", "como", "esta",
+    "este", "son", "pero", "más", "mas", "sin", "sobre",
+})
+
+
+@dataclass(frozen=True)
+class CompressedContext:
+    """
+    Result of fitting one context into a token budget.
+
+    Attributes:
+        text: Context to send to the LLM (the original when it already fit)
+        original_tokens: Estimated tokens of the original context
+        tokens: Estimated tokens of text
+        duplicates: Segments dropped as repeats
+        boilerplate: Segments dropped as boilerplate
+        low_relevance: Segments dropped for lexical distance to the idea
+    """
+
+    text: str
+    original_tokens: int
+    tokens: int
+    duplicates: int = 0
+    boilerplate: int = 0
+    low_relevance: int = 0
+
+    @property
+    def compressed(self) -> bool:
+        return self.tokens < self.original_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def as_meta(self) -> dict[str, int]:
+        """Summary for strategy_meta."""
+        return {
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "saved_tokens": self.saved_tokens,
+            "dropped_duplicates": self.duplicates,
+            "dropped_boilerplate": self.boilerplate,
+            "dropped_low_relevance": self.low_relevance,
+        }
+
+
+@dataclass(frozen=True)
+class _Segment:
+    line: int
+    text: str
+    code: bool = False
+
+
+def _segments(context: str) -> list[_Segment]:
+    """Sentences tagged with their line; each fenced code block is one segment."""
+    segments: list[_Segment] = []
+    line = 0
+    position = 0
+    for block in [*_FENCE_PATTERN.finditer(context), None]:
+        prose = context[position:block.start() if block else len(context)]
+        for raw_line in prose.split("\n"):
+            for sentence in _SENTENCE_SPLIT.split(raw_line.strip()):
+                if sentence:
+                    segments.append(_Segment(line, sentence))
+            line += 1
+        if block is not None:
+            # The block ends the current line and starts its own
+            segments.append(_Segment(line, block.group().strip(), code=True))
+            position = block.end()
+    return segments
+
+
+def _words(text: str) -> set[str]:
+    return {w for w in _WORD_PATTERN.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def _join(segments: list[_Segment]) -> str:
+    lines: list[str] = []
+    current: int | None = None
+    for segment in segments:
+        if segment.line == current:
+            lines[-1] += " " + segment.text
+        else:
+            lines.append(segment.text)
+            current = segment.line
+    return "\n".join(lines)
+
+
+def compress_context(idea: str, context: str, budget_tokens: int) -> CompressedContext:
+    """
+    Reduce context to at most budget_tokens (estimated), keeping what matters.
+
+    Contexts already within budget are returned unchanged. The result is
+    deterministic for a given (idea, context, budget).
+
+    Args:
+        idea: The request idea; segments sharing its words are kept first
+        context: Context to reduce
+        budget_tokens: Token budget for the context
+
+    Returns:
+        CompressedContext with the reduced text and what was dropped
+    """
+    original_tokens = estimate_tokens(context)
+    if original_tokens <= budget_tokens:
+        return CompressedContext(context, original_tokens, original_tokens)
+
+    segments = _segments(context)
+    per_line = Counter(segment.line for segment in segments)
+    kept: list[_Segment] = []
+    seen: set[str] = set()
+    duplicates = boilerplate = 0
+    for segment in segments:
+        key = _NORMALIZE_PATTERN.sub(" ", segment.text.lower()).strip()
+        whole_line = per_line[segment.line] == 1 and not segment.code
+        if not key or (whole_line and _BOILERPLATE_PATTERN.match(segment.text)):
+            boilerplate += 1
+        elif key in seen:
+            duplicates += 1
+        else:
+            seen.add(key)
+            kept.append(segment)
+
+    text = _join(kept)
+    low_relevance = 0
+    if estimate_tokens(text) > budget_tokens:
+        idea_words = _words(idea)
+
+        def relevance(item: tuple[int, _Segment]) -> tuple[float, int]:
+            index, segment = item
+            words = _words(segment.text)
+            overlap = len(words & idea_words) / math.sqrt(len(words)) if words else 0.0
+            # Ties keep the earlier segment, which usually states the setting
+            return (-overlap, index)
+
+        budget_chars = budget_tokens * 4
+        used = 0
+        chosen: set[int] = set()
+        for index, segment in sorted(enumerate(kept), key=relevance):
+            cost = len(segment.text) + 1
+            if used + cost <= budget_chars:
+                chosen.add(index)
+                used += cost
+        selected = [segment for index, segment in enumerate(kept) if index in chosen]
+        prose = [(index, segment) for index, segment in enumerate(kept) if not segment.code]
+        if not selected and prose:
+            # Nothing fits whole: keep the head of the most relevant sentence
+            best = min(prose, key=relevance)[1]
+            selected = [_Segment(best.line, best.text[:budget_chars].rstrip())]
+        low_relevance = len(kept) - len(selected)
+        text = _join(selected)
+
+    return CompressedContext(
+        text=text,
+        original_tokens=original_tokens,
+        tokens=estimate_tokens(text),
+        duplicates=duplicates,
+        boilerplate=boilerplate,
+        low_relevance=low_relevance,
+    )
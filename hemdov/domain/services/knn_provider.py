@@ -37,6 +37,7 @@ if TYPE_CHECKING:
 # Import enums for type-safe validation
 from hemdov.domain.dto.nlac_models import IntentType
 from hemdov.domain.services.complexity_analyzer import ComplexityLevel
+from hemdov.domain.services.stage_timing import get_metrics_port, timed_stage
 
 logger = logging.getLogger(__name__)
 
@@ -125,6 +126,17 @@ class FewShotExample:
     metadata: dict[str, object] = field(default_factory=dict)
 
 
+def stable_example_order(examples: list[FewShotExample]) -> list[FewShotExample]:
+    """
+    Examples in a request-independent order.
+
+    find_examples returns them by similarity to the query, so the same
+    examples would otherwise be laid out differently from one request to
+    the next and break the shared prompt prefix.
+    """
+    return sorted(examples, key=lambda ex: (ex.input_idea, ex.input_context, ex.improved_prompt))
+
+
 @dataclass(frozen=True)
 class FindExamplesResult:
     """Result from find_examples with metadata for debugging.
@@ -492,6 +504,10 @@ class KNNProvider:
 
         # Build query and compute similarities
         query_text = self._build_query_text(intent, complexity, user_input)
+        metrics = get_metrics_port()
+        if metrics is not None:
+            # Retrieval uses the character n-gram vectorizer, never DSPy embeddings
+            metrics.record_knn_hit(used_embeddings=False, query=query_text)
         candidate_vectors = self._get_candidate_vectors(candidates)
         query_vector = self._vectorizer([query_text])[0]
         similarities = self._compute_cosine_similarities(candidate_vectors, query_vector)
@@ -543,15 +559,16 @@ class KNNProvider:
             KNNProviderError: If vectorizer is not initialized
             TypeError: If user_input is not str or None
         """
-        result = self._find_examples_impl(
-            intent=intent,
-            complexity=complexity,
-            k=k,
-            has_expected_output=has_expected_output,
-            user_input=user_input,
-            min_similarity=min_similarity,
-            return_metadata=False,
-        )
+        with timed_stage("knn"):
+            result = self._find_examples_impl(
+                intent=intent,
+                complexity=complexity,
+                k=k,
+                has_expected_output=has_expected_output,
+                user_input=user_input,
+                min_similarity=min_similarity,
+                return_metadata=False,
+            )
         # Type narrowing: we know result is List when return_metadata=False
         assert isinstance(result, list)
         return result
@@ -592,15 +609,16 @@ class KNNProvider:
             >>> if result.empty:
             ...     print(f"No examples met threshold. Highest similarity: {result.highest_similarity}")
         """
-        result = self._find_examples_impl(
-            intent=intent,
-            complexity=complexity,
-            k=k,
-            has_expected_output=has_expected_output,
-            user_input=user_input,
-            min_similarity=min_similarity,
-            return_metadata=True,
-        )
+        with timed_stage("knn"):
+            result = self._find_examples_impl(
+                intent=intent,
+                complexity=complexity,
+                k=k,
+                has_expected_output=has_expected_output,
+                user_input=user_input,
+                min_similarity=min_similarity,
+                return_metadata=True,
+            )
         # Type narrowing: we know result is FindExamplesResult when return_metadata=True
         assert isinstance(result, FindExamplesResult)
         return result
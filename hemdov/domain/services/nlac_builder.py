@@ -7,6 +7,10 @@ The "Compiler" for NLaC - builds structured prompts using:
 - Context Injection for SQL schemas
 - Strategy selection based on complexity + intent
 - KNN few-shot examples from ComponentCatalog
+
+Templates put the static parts (role, requirements, examples in a stable
+order) before anything request-specific, so provider prompt caches can
+reuse the prefix.
 """
 
 import logging
@@ -24,7 +28,9 @@ from hemdov.domain.services.knn_provider import (
     KNNProvider,
     KNNProviderError,
     handle_knn_failure,
+    stable_example_order,
 )
+from hemdov.domain.services.request_features import RequestFeatures
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +56,9 @@ class NLaCBuilder:
         self.intent_classifier = IntentClassifier()
         self.knn_provider = knn_provider
 
-    def build(self, request: NLaCRequest) -> PromptObject:
+    def build(
+        self, request: NLaCRequest, features: RequestFeatures | None = None
+    ) -> PromptObject:
         """
         Construct a structured PromptObject from NLaCRequest.
 
@@ -65,12 +73,23 @@ class NLaCBuilder:
 
         Args:
             request: NLaCRequest with idea, context, inputs
+            features: Precomputed request features; intent and complexity are
+                reused when they describe this request (structured inputs
+                still go through the classifier)
 
         Returns:
             PromptObject with structured template and metadata
         """
+        if features is not None and (
+            request.inputs is not None or not features.describes(request.idea, request.context)
+        ):
+            features = None
+
         # Step 1: Classify intent
-        intent_str = self.intent_classifier.classify(request)
+        if features is not None:
+            intent_str = features.intent
+        else:
+            intent_str = self.intent_classifier.classify(request)
         intent_type = self.intent_classifier.get_intent_type(intent_str)
 
         logger.debug(
@@ -79,10 +98,13 @@ class NLaCBuilder:
         )
 
         # Step 2: Analyze complexity
-        complexity = self.complexity_analyzer.analyze(
-            request.idea,
-            request.context
-        )
+        if features is not None:
+            complexity = features.complexity
+        else:
+            complexity = self.complexity_analyzer.analyze(
+                request.idea,
+                request.context
+            )
 
         # Step 3: Select strategy
         strategy = self._select_strategy(complexity, intent_str)
@@ -221,15 +243,44 @@ class NLaCBuilder:
                 return "Software Engineer"
 
     def _build_simple_template(self, request: NLaCRequest, role: str, fewshot_examples: list[FewShotExample] | None = None) -> str:
-        """Build simple template without RaR, optionally with few-shot examples."""
+        """
+        Build simple template without RaR, optionally with few-shot examples.
+
+        Layout is static first: role, then the examples, then the request, so
+        requests sharing role and examples share the prompt prefix.
+        """
         template_parts = [
             f"# Role\nYou are a {role}.",
-            "",
-            "# Task",
         ]
 
+        # Few-shot examples before the request keep the prefix request-independent
+        if fewshot_examples:
+            template_parts.extend([
+                "",
+                "# Examples",
+                "Here are some similar examples to guide you:",
+                "",
+            ])
+            for i, ex in enumerate(stable_example_order(fewshot_examples), 1):
+                template_parts.extend([
+                    f"## Example {i}",
+                    f"**Input:** {ex.input_idea}",
+                ])
+                if ex.input_context:
+                    template_parts.append(f"**Context:** {ex.input_context}")
+                template_parts.extend([
+                    f"**Output:** {ex.improved_prompt}",
+                    "",
+                ])
+            # Trailing blank line of the last example separates the task
+            template_parts.pop()
+
         # Add the core idea
-        template_parts.append(request.idea)
+        template_parts.extend([
+            "",
+            "# Task",
+            request.idea,
+        ])
 
         # Add context if provided
         if request.context and request.context.strip():
@@ -263,26 +314,6 @@ class NLaCBuilder:
                     f"# Target Language: {request.inputs.target_language}",
                 ])
 
-        # Add few-shot examples if available
-        if fewshot_examples:
-            template_parts.extend([
-                "",
-                "# Examples",
-                "Here are some similar examples to guide you:",
-                "",
-            ])
-            for i, ex in enumerate(fewshot_examples, 1):
-                template_parts.extend([
-                    f"## Example {i}",
-                    f"**Input:** {ex.input_idea}",
-                ])
-                if ex.input_context:
-                    template_parts.append(f"**Context:** {ex.input_context}")
-                template_parts.extend([
-                    f"**Output:** {ex.improved_prompt}",
-                    "",
-                ])
-
         return "\n".join(template_parts)
 
     def _build_rar_template(self, request: NLaCRequest, role: str, fewshot_examples: list[FewShotExample] | None = None) -> str:
@@ -294,21 +325,52 @@ class NLaCBuilder:
         2. Expand implicit requirements
         3. Structure the problem space
 
-        Few-shot examples are added after RaR for guidance.
+        The static parts (role, requirements, reference examples) come first
+        and the request-specific parts (rephrased request, context, inputs)
+        last, so the prefix is shared across requests.
         """
         template_parts = [
             "# Role",
             f"You are a {role}.",
             "",
-            "# Understanding the Request",
-            "First, let me rephrase the request to ensure clarity:",
-            "",
+            "## Requirements",
+            "- Provide a clear, well-structured response",
+            "- Include code examples where applicable",
+            "- Explain your reasoning",
         ]
 
+        # Add few-shot examples if available
+        if fewshot_examples:
+            template_parts.extend([
+                "",
+                "## Reference Examples",
+                "These examples may help guide your approach:",
+                "",
+            ])
+            # Limit to the 3 most similar for RAR, then order them stably
+            for i, ex in enumerate(stable_example_order(fewshot_examples[:3]), 1):
+                template_parts.extend([
+                    f"### Example {i}",
+                    f"**Request:** {ex.input_idea}",
+                ])
+                if ex.input_context:
+                    template_parts.append(f"**Context:** {ex.input_context}")
+                template_parts.extend([
+                    f"**Response:** {ex.improved_prompt}",
+                    "",
+                ])
+            template_parts.pop()
+
         # Rephrase section (RaR)
         rephrase = self._rephrase_request(request)
-        template_parts.append(f"**Original Request:** {request.idea}")
-        template_parts.append(f"**Rephrased Understanding:** {rephrase}")
+        template_parts.extend([
+            "",
+            "# Understanding the Request",
+            "First, let me rephrase the request to ensure clarity:",
+            "",
+            f"**Original Request:** {request.idea}",
+            f"**Rephrased Understanding:** {rephrase}",
+        ])
 
         # Add the structured response section
         template_parts.extend([
@@ -346,35 +408,6 @@ class NLaCBuilder:
             if request.inputs.target_framework:
                 template_parts.append(f"\n**Framework:** {request.inputs.target_framework}")
 
-        # Add few-shot examples if available
-        if fewshot_examples:
-            template_parts.extend([
-                "",
-                "## Reference Examples",
-                "These examples may help guide your approach:",
-                "",
-            ])
-            for i, ex in enumerate(fewshot_examples[:3], 1):  # Limit to 3 for RAR
-                template_parts.extend([
-                    f"### Example {i}",
-                    f"**Request:** {ex.input_idea}",
-                ])
-                if ex.input_context:
-                    template_parts.append(f"**Context:** {ex.input_context}")
-                template_parts.extend([
-                    f"**Response:** {ex.improved_prompt}",
-                    "",
-                ])
-
-        # Add requirements
-        template_parts.extend([
-            "",
-            "## Requirements",
-            "- Provide a clear, well-structured response",
-            "- Include code examples where applicable",
-            "- Explain your reasoning",
-        ])
-
         return "\n".join(template_parts)
 
     def _rephrase_request(self, request: NLaCRequest) -> str:
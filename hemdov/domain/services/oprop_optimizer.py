@@ -9,11 +9,18 @@ Key features:
 - Early stopping at quality threshold (1.0)
 - Trajectory tracking for each iteration
 - Returns best candidate from history
-- KNN few-shot examples in meta-prompts for better guidance
+- KNN few-shot examples in meta-prompts for better guidance, fetched once per
+  run; trajectory meta-prompts are rendered only when read
+- Optional beam mode: several candidates per round, generated and scored
+  concurrently from the top-b candidates so far, under an LLM call budget
 """
 
+import contextvars
 import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
+from functools import partial
 from typing import Any
 
 from hemdov.domain.dto.nlac_models import (
@@ -21,16 +28,29 @@ from hemdov.domain.dto.nlac_models import (
     OptimizeResponse,
     PromptObject,
 )
+from hemdov.domain.services.cancellation import raise_if_cancelled
 from hemdov.domain.services.knn_provider import (
+    FewShotExample,
     KNNProvider,
     KNNProviderError,
     handle_knn_failure,
+    stable_example_order,
 )
 from hemdov.domain.services.llm_protocol import LLMClient
+from hemdov.domain.services.stage_timing import timed_stage
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class _Run:
+    """State of one run_loop call; the optimizer is shared by concurrent requests."""
+
+    llm_calls: int = 0  # Variations generated through llm_client
+    examples: list[FewShotExample] | None = None  # KNN examples, fetched for the first entry
+    knn_failures: list[dict[str, Any]] = field(default_factory=list)
+
+
 class OPROOptimizer:
     """
     Optimization by PROmpting (OPRO).
@@ -45,7 +65,14 @@ class OPROOptimizer:
     MAX_ITERATIONS = 3  # Fixed iterations (latency control per user decision: 5-10 LLM calls)
     QUALITY_THRESHOLD = 1.0  # Early stopping if 100% pass
 
-    def __init__(self, llm_client: LLMClient | None = None, knn_provider: KNNProvider | None = None):
+    def __init__(
+        self,
+        llm_client: LLMClient | None = None,
+        knn_provider: KNNProvider | None = None,
+        beam_width: int = 1,
+        candidates_per_round: int = 1,
+        max_llm_calls: int | None = None,
+    ):
         """
         Initialize optimizer.
 
@@ -53,10 +80,23 @@ class OPROOptimizer:
             llm_client: Optional LLM client for generating variations.
                       If None, uses mock evaluation for testing.
             knn_provider: Optional KNNProvider for few-shot examples in meta-prompts.
+            beam_width: Best candidates kept as parents for the next round (beam mode if > 1)
+            candidates_per_round: Variations generated concurrently per round (beam mode if > 1)
+            max_llm_calls: Cap on variations generated through llm_client per run (None: no cap)
+
+        Raises:
+            ValueError: If beam_width, candidates_per_round or max_llm_calls is not positive
         """
+        for name, value in (("beam_width", beam_width),
+                            ("candidates_per_round", candidates_per_round),
+                            ("max_llm_calls", max_llm_calls)):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be at least 1, got {value}")
         self.llm_client = llm_client
         self.knn_provider = knn_provider
-        self._knn_failures: list[dict[str, Any]] = []  # Track failures across iterations
+        self.beam_width = beam_width
+        self.candidates_per_round = candidates_per_round
+        self.max_llm_calls = max_llm_calls
 
     def run_loop(self, prompt_obj: PromptObject) -> OptimizeResponse:
         """
@@ -77,14 +117,18 @@ class OPROOptimizer:
 
         Raises:
             ValueError: If prompt_obj is None
+            OperationCancelledError: If the request was cancelled between iterations
         """
         if prompt_obj is None:
             raise ValueError("prompt_obj cannot be None")
 
+        run = _Run()
+        if self.beam_width > 1 or self.candidates_per_round > 1:
+            return self._run_beam(prompt_obj, run)
+
         trajectory: list[OPROIteration] = []
         best_score = 0.0
         best_prompt = prompt_obj
-        self._knn_failures = []  # Reset for each optimization run
 
         logger.info(
             f"Starting OPRO optimization | "
@@ -93,84 +137,221 @@ class OPROOptimizer:
         )
 
         for i in range(1, self.MAX_ITERATIONS + 1):
-            # Generate candidate variation
-            if i == 1:
-                # First iteration uses original prompt
-                candidate = prompt_obj
-            else:
-                # Subsequent iterations generate variations
-                candidate = self._generate_variation(prompt_obj, trajectory)
-
-            # Evaluate candidate
-            score, feedback = self._evaluate(candidate)
+            # Stop between iterations once the request is timed out or abandoned
+            raise_if_cancelled("opro_iteration")
+
+            with timed_stage("opro_iter"):
+                # Generate candidate variation
+                if i == 1:
+                    # First iteration uses original prompt
+                    candidate = prompt_obj
+                elif not self._reserve_llm_calls(run, 1):
+                    logger.info(f"LLM call budget spent after {i - 1} iterations")
+                    break
+                else:
+                    # Subsequent iterations generate variations
+                    candidate = self._generate_variation(prompt_obj, trajectory)
 
-            logger.debug(
-                f"Iteration {i}/{self.MAX_ITERATIONS} | "
-                f"score={score:.2f} | "
-                f"feedback={feedback}"
-            )
+                # Evaluate candidate
+                score, feedback = self._evaluate(candidate)
 
-            # Track best candidate
-            if score > best_score:
-                best_score = score
-                best_prompt = candidate
-
-            # Early stopping (quality threshold)
-            if score >= self.QUALITY_THRESHOLD:
-                logger.info(f"Early stopping at iteration {i} | score={score:.2f}")
-
-                # Build KNN failure metadata for response
-                knn_failure = None
-                if self._knn_failures:
-                    knn_failure = {
-                        "failed": True,
-                        "failure_count": len(self._knn_failures),
-                        "errors": self._knn_failures,
-                        "last_error": self._knn_failures[-1] if self._knn_failures else None
-                    }
-
-                return self._build_response(
-                    prompt_obj_id=prompt_obj.id,
-                    final_instruction=best_prompt.template,
-                    final_score=score,
-                    iteration_count=i,
-                    early_stopped=True,
-                    trajectory=trajectory,
-                    knn_failure=knn_failure,
+                logger.debug(
+                    f"Iteration {i}/{self.MAX_ITERATIONS} | "
+                    f"score={score:.2f} | "
+                    f"feedback={feedback}"
                 )
 
-            # Store trajectory entry
-            trajectory.append(OPROIteration(
-                iteration_number=i,
-                meta_prompt_used=self._build_meta_prompt(candidate, trajectory),
-                generated_instruction=candidate.template,
-                score=score,
-                feedback=feedback,
-            ))
+                # Track best candidate
+                if score > best_score:
+                    best_score = score
+                    best_prompt = candidate
+
+                # Early stopping (quality threshold)
+                if score >= self.QUALITY_THRESHOLD:
+                    logger.info(f"Early stopping at iteration {i} | score={score:.2f}")
+
+                    return self._build_response(
+                        prompt_obj_id=prompt_obj.id,
+                        final_instruction=best_prompt.template,
+                        final_score=score,
+                        iteration_count=i,
+                        early_stopped=True,
+                        trajectory=trajectory,
+                        knn_failure=self._knn_failure_meta(run),
+                    )
+
+                # Store trajectory entry
+                trajectory.append(
+                    self._trajectory_entry(run, i, candidate, trajectory, score, feedback)
+                )
 
         # Return best from history
-        logger.info(f"Completed {self.MAX_ITERATIONS} iterations | best_score={best_score:.2f}")
-
-        # Build KNN failure metadata for response
-        knn_failure = None
-        if self._knn_failures:
-            knn_failure = {
-                "failed": True,
-                "failure_count": len(self._knn_failures),
-                "errors": self._knn_failures,
-                "last_error": self._knn_failures[-1] if self._knn_failures else None
-            }
+        logger.info(f"Completed {len(trajectory)} iterations | best_score={best_score:.2f}")
 
         return self._build_response(
             prompt_obj_id=prompt_obj.id,
             final_instruction=best_prompt.template,
             final_score=best_score,
-            iteration_count=self.MAX_ITERATIONS,
+            iteration_count=len(trajectory),
             early_stopped=False,
             trajectory=trajectory,
-            knn_failure=knn_failure,
+            knn_failure=self._knn_failure_meta(run),
+        )
+
+    def _run_beam(self, prompt_obj: PromptObject, run: _Run) -> OptimizeResponse:
+        """
+        Beam-style OPRO: several variations per round, generated and scored concurrently.
+
+        Round 1 scores the original. Each later round derives up to
+        candidates_per_round variations from the beam (the beam_width best
+        candidates so far, round-robin over parents) on worker threads and
+        scores them as they finish. The first candidate to reach
+        QUALITY_THRESHOLD ends the run; variations not yet finished are
+        abandoned. Entries of one round share its iteration_number, and
+        duplicate templates are not scored twice.
+        """
+        logger.info(
+            f"Starting OPRO beam optimization | "
+            f"intent={prompt_obj.intent_type} | "
+            f"rounds={self.MAX_ITERATIONS} | "
+            f"beam_width={self.beam_width} | "
+            f"candidates_per_round={self.candidates_per_round}"
+        )
+
+        trajectory: list[OPROIteration] = []
+        beam: list[tuple[OPROIteration, PromptObject]] = []  # Best first
+        seen = {prompt_obj.template}
+        rounds = 0
+
+        for round_number in range(1, self.MAX_ITERATIONS + 1):
+            raise_if_cancelled("opro_iteration")
+
+            with timed_stage("opro_round"):
+                if round_number == 1:
+                    jobs = [(prompt_obj, None)]
+                else:
+                    parents = [beam[i % len(beam)] for i in range(self.candidates_per_round)]
+                    granted = self._reserve_llm_calls(run, len(parents))
+                    jobs = [
+                        (candidate, self._beam_history(beam, entry))
+                        for entry, candidate in parents[:granted]
+                    ]
+                    if not jobs:
+                        logger.info(f"LLM call budget spent after {rounds} rounds")
+                        break
+
+                rounds = round_number
+                qualified = None
+                for candidate, score, feedback in self._score_concurrently(jobs):
+                    if candidate.template in seen and round_number > 1:
+                        continue
+                    seen.add(candidate.template)
+                    entry = self._trajectory_entry(
+                        run, round_number, candidate, trajectory, score, feedback
+                    )
+                    trajectory.append(entry)
+                    beam.append((entry, candidate))
+                    if score >= self.QUALITY_THRESHOLD:
+                        qualified = (entry, candidate)
+                        break
+
+                beam.sort(key=lambda item: item[0].score, reverse=True)  # Stable: earlier wins ties
+                del beam[self.beam_width:]
+
+                if qualified is not None:
+                    logger.info(
+                        f"Early stopping at round {round_number} | score={qualified[0].score:.2f}"
+                    )
+                    return self._build_response(
+                        prompt_obj_id=prompt_obj.id,
+                        final_instruction=qualified[1].template,
+                        final_score=qualified[0].score,
+                        iteration_count=round_number,
+                        early_stopped=True,
+                        trajectory=trajectory,
+                        knn_failure=self._knn_failure_meta(run),
+                    )
+
+        best_entry, best_prompt = beam[0]
+        logger.info(
+            f"Completed {rounds} rounds | candidates={len(trajectory)} | "
+            f"llm_calls={run.llm_calls} | best_score={best_entry.score:.2f}"
+        )
+
+        return self._build_response(
+            prompt_obj_id=prompt_obj.id,
+            final_instruction=best_prompt.template,
+            final_score=best_entry.score,
+            iteration_count=rounds,
+            early_stopped=False,
+            trajectory=trajectory,
+            knn_failure=self._knn_failure_meta(run),
         )
 
+    def _score_concurrently(self, jobs: list[tuple[PromptObject, list[OPROIteration] | None]]):
+        """
+        Generate (history given) and evaluate each job on its own thread.
+
+        Yields (candidate, score, feedback) in completion order. When the
+        caller stops early, jobs not yet started are cancelled and running
+        ones finish in the background with their results discarded.
+        """
+        def run(parent: PromptObject, history: list[OPROIteration] | None):
+            candidate = parent if history is None else self._generate_variation(parent, history)
+            score, feedback = self._evaluate(candidate)
+            return candidate, score, feedback
+
+        if len(jobs) == 1:
+            yield run(*jobs[0])
+            return
+
+        executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="opro-beam")
+        try:
+            # copy_context: cancellation, stage timings and token usage reach the workers
+            pending: set[Future] = {
+                executor.submit(contextvars.copy_context().run, run, parent, history)
+                for parent, history in jobs
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _beam_history(
+        self, beam: list[tuple[OPROIteration, PromptObject]], parent: OPROIteration
+    ) -> list[OPROIteration]:
+        """Top-b trajectory for one parent: ascending score, the parent's own entry last."""
+        others = sorted((entry for entry, _ in beam if entry is not parent), key=lambda e: e.score)
+        return [*others, parent]
+
+    def _reserve_llm_calls(self, run: _Run, wanted: int) -> int:
+        """
+        Take up to `wanted` variation generations from the LLM call budget.
+
+        Heuristic refinements (no llm_client) cost no LLM calls and are not capped.
+
+        Returns:
+            Generations granted (0 once the budget is spent)
+        """
+        if self.llm_client is None or self.max_llm_calls is None:
+            return wanted
+        granted = max(0, min(wanted, self.max_llm_calls - run.llm_calls))
+        run.llm_calls += granted
+        return granted
+
+    def _knn_failure_meta(self, run: _Run) -> dict[str, Any] | None:
+        """KNN failure metadata for the response (None if KNN never failed in the run)."""
+        if not run.knn_failures:
+            return None
+        return {
+            "failed": True,
+            "failure_count": len(run.knn_failures),
+            "errors": run.knn_failures,
+            "last_error": run.knn_failures[-1],
+        }
+
     def _generate_variation(self, original: PromptObject, trajectory: list[OPROIteration]) -> PromptObject:
         """
         Generate candidate variation using meta-prompt + trajectory.
@@ -235,12 +416,23 @@ class OPROOptimizer:
         # For now, delegate to simple refinement
         return self._simple_refinement(prompt_obj, trajectory)
 
-    def _build_meta_prompt(self, candidate: PromptObject, trajectory: list[OPROIteration]) -> str:
+    def _build_meta_prompt(
+        self,
+        candidate: PromptObject,
+        trajectory: list[OPROIteration],
+        fewshot_examples: list[FewShotExample] | None = None,
+    ) -> str:
         """
         Build meta-prompt for next iteration.
 
         Enhanced with KNN few-shot examples to guide the LLM toward
-        better prompt variations.
+        better prompt variations. The examples lead, in a stable order, and
+        the candidate-specific part follows, so iterations share a prefix.
+
+        Args:
+            candidate: Candidate the meta-prompt asks to improve
+            trajectory: Iterations before this one
+            fewshot_examples: Examples already fetched for this run (None: fetch now)
         """
         # Build base meta-prompt
         if not trajectory:
@@ -252,59 +444,100 @@ class OPROOptimizer:
             ])
             base_prompt = f"Previous attempts:\n{history}\n\nGenerate improved version."
 
-        # Add few-shot examples if KNNProvider available
-        if self.knn_provider:
-            # Fetch examples based on intent
-            intent_str = candidate.strategy_meta.get("intent", "generate")
-            complexity_str = candidate.strategy_meta.get("complexity", "moderate")
-
-            try:
-                fewshot_examples = self.knn_provider.find_examples(
-                    intent=intent_str,
-                    complexity=complexity_str,
-                    k=2,  # Use 2 examples for meta-prompt (keep it concise)
-                    user_input=candidate.template  # Use template for semantic matching
-                )
-            except (KNNProviderError, ConnectionError, TimeoutError) as e:
-                # Track transient failure with metadata
-                self._knn_failures.append({
-                    "error_type": type(e).__name__,
-                    "error_message": str(e)[:200],
-                    "timestamp": datetime.now(UTC).isoformat(),
-                    "intent": intent_str,
-                    "complexity": complexity_str,
-                    "is_transient": True
-                })
-                handle_knn_failure(logger, "OPROOptimizer._build_meta_prompt", e)
-                fewshot_examples = []
-            except (RuntimeError, KeyError, TypeError, ValueError) as e:
-                # Track code bug before propagating
-                self._knn_failures.append({
-                    "error_type": type(e).__name__,
-                    "error_message": str(e)[:200],
-                    "timestamp": datetime.now(UTC).isoformat(),
-                    "intent": intent_str,
-                    "complexity": complexity_str,
-                    "is_bug": True
-                })
-                logger.exception(
-                    f"Unexpected KNN error (code bug) in OPROOptimizer: {type(e).__name__}"
-                )
-                raise
+        if fewshot_examples is None:
+            # Outside a run: failures are not reported in any response
+            fewshot_examples = self._fetch_examples(candidate, _Run())
 
-            if fewshot_examples:
-                examples_section = "\n\n## Reference Examples\nThese examples show good prompt patterns:\n\n"
-                for i, ex in enumerate(fewshot_examples, 1):
-                    examples_section += f"### Example {i}\n"
-                    examples_section += f"**Input:** {ex.input_idea}\n"
-                    if ex.input_context:
-                        examples_section += f"**Context:** {ex.input_context}\n"
-                    examples_section += f"**Improved:** {ex.improved_prompt}\n\n"
+        if fewshot_examples:
+            examples_section = (
+                "## Reference Examples\nThese examples show good prompt patterns:\n\n"
+            )
+            for i, ex in enumerate(stable_example_order(fewshot_examples), 1):
+                examples_section += f"### Example {i}\n"
+                examples_section += f"**Input:** {ex.input_idea}\n"
+                if ex.input_context:
+                    examples_section += f"**Context:** {ex.input_context}\n"
+                examples_section += f"**Improved:** {ex.improved_prompt}\n\n"
 
-                return base_prompt + examples_section
+            return examples_section + base_prompt
 
         return base_prompt
 
+    def _fetch_examples(self, candidate: PromptObject, run: _Run) -> list[FewShotExample]:
+        """
+        KNN few-shot examples for meta-prompts (empty without a KNNProvider).
+
+        Transient KNN failures are tracked in the run and degrade to no
+        examples; code bugs are tracked and propagate.
+        """
+        if not self.knn_provider:
+            return []
+
+        # Fetch examples based on intent
+        intent_str = candidate.strategy_meta.get("intent", "generate")
+        complexity_str = candidate.strategy_meta.get("complexity", "moderate")
+
+        try:
+            return self.knn_provider.find_examples(
+                intent=intent_str,
+                complexity=complexity_str,
+                k=2,  # Use 2 examples for meta-prompt (keep it concise)
+                user_input=candidate.template  # Use template for semantic matching
+            )
+        except (KNNProviderError, ConnectionError, TimeoutError) as e:
+            # Track transient failure with metadata
+            run.knn_failures.append({
+                "error_type": type(e).__name__,
+                "error_message": str(e)[:200],
+                "timestamp": datetime.now(UTC).isoformat(),
+                "intent": intent_str,
+                "complexity": complexity_str,
+                "is_transient": True
+            })
+            handle_knn_failure(logger, "OPROOptimizer._build_meta_prompt", e)
+            return []
+        except (RuntimeError, KeyError, TypeError, ValueError) as e:
+            # Track code bug before propagating
+            run.knn_failures.append({
+                "error_type": type(e).__name__,
+                "error_message": str(e)[:200],
+                "timestamp": datetime.now(UTC).isoformat(),
+                "intent": intent_str,
+                "complexity": complexity_str,
+                "is_bug": True
+            })
+            logger.exception(
+                f"Unexpected KNN error (code bug) in OPROOptimizer: {type(e).__name__}"
+            )
+            raise
+
+    def _trajectory_entry(
+        self,
+        run: _Run,
+        iteration_number: int,
+        candidate: PromptObject,
+        trajectory: list[OPROIteration],
+        score: float,
+        feedback: str,
+    ) -> OPROIteration:
+        """
+        Trajectory entry whose meta-prompt is rendered only when read.
+
+        The run's KNN examples are fetched once, for its first entry, and
+        every meta-prompt of the run is rendered from them.
+        """
+        if run.examples is None:
+            run.examples = self._fetch_examples(candidate, run)
+        return OPROIteration(
+            iteration_number=iteration_number,
+            meta_prompt_used=partial(
+                self._build_meta_prompt, candidate, list(trajectory), run.examples
+            ),
+            generated_instruction=candidate.template,
+            score=score,
+            feedback=feedback,
+        )
+
     def _evaluate(self, prompt_obj: PromptObject) -> tuple[float, str]:
         """
         Evaluate prompt against constraints (IFEval-style validation).
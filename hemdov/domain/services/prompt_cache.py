@@ -14,6 +14,7 @@ from typing import TypedDict
 import aiosqlite
 
 from hemdov.domain.dto.nlac_models import NLaCRequest, PromptObject
+from hemdov.domain.ports.metrics_port import MetricsPort
 
 
 class CacheStats(TypedDict):
@@ -35,15 +36,17 @@ class PromptCache:
     - Automatic last_accessed timestamp updates
     """
 
-    def __init__(self, repository=None):
+    def __init__(self, repository=None, metrics: MetricsPort | None = None):
         """
         Initialize cache with optional repository.
 
         Args:
             repository: Optional PromptRepository for persistent cache.
                        If None, cache is in-memory only (for testing).
+            metrics: Optional MetricsPort notified of every hit and miss.
         """
         self.repository = repository
+        self.metrics = metrics
         self._memory_cache: dict[str, dict] = {}  # In-memory fallback
 
     def generate_key(self, request: NLaCRequest) -> str:
@@ -84,6 +87,7 @@ class PromptCache:
                     # Update access stats
                     await self.repository.update_cache_access(cache_key)
                     logger.debug(f"Cache hit: {cache_key[:8]}...")
+                    self._record(True, cache_key)
                     return cached
             except (aiosqlite.Error, ConnectionError, TimeoutError, json.JSONDecodeError) as e:
                 logger.warning(f"Cache lookup failed: {type(e).__name__}: {e}, falling back to memory")
@@ -94,11 +98,18 @@ class PromptCache:
             entry["hit_count"] += 1
             entry["last_accessed"] = datetime.now(UTC).isoformat()
             logger.debug(f"Memory cache hit: {cache_key[:8]}...")
+            self._record(True, cache_key)
             return entry["prompt_obj"]
 
         logger.debug(f"Cache miss: {cache_key[:8]}...")
+        self._record(False, cache_key)
         return None
 
+    def _record(self, hit: bool, cache_key: str) -> None:
+        """Report a lookup outcome to the metrics port, if configured."""
+        if self.metrics is not None:
+            self.metrics.record_cache_hit(hit, cache_key)
+
     async def put(self, request: NLaCRequest, prompt_obj: PromptObject) -> None:
         """
         Store prompt in cache.
@@ -11,7 +11,9 @@ import logging
 from collections.abc import Callable
 from dataclasses import dataclass, field
 
+from hemdov.domain.services.cancellation import OperationCancelledError, raise_if_cancelled
 from hemdov.domain.services.llm_protocol import LLMClient
+from hemdov.domain.services.stage_timing import timed_stage
 
 logger = logging.getLogger(__name__)
 
@@ -77,6 +79,7 @@ class ReflexionService:
         Raises:
             ValueError: If prompt or error_type is None or empty
             TypeError: If prompt or error_type is not a string
+            OperationCancelledError: If the request was cancelled between iterations
         """
         # Input validation
         if prompt is None or error_type is None:
@@ -99,66 +102,71 @@ class ReflexionService:
         )
 
         for iteration in range(1, max_iterations + 1):
+            raise_if_cancelled("reflexion_iteration")
             logger.info(f"Reflexion iteration {iteration}/{max_iterations}")
 
-            # Generate code
-            try:
-                if self.llm_client:
-                    code = self.llm_client.generate(current_prompt)
-                else:
-                    # Fallback for testing
-                    code = f"# Generated code for iteration {iteration}"
-            except (ConnectionError, TimeoutError, RuntimeError, ValueError, TypeError) as e:
-                # LLM generation failed - abort with error
-                logger.exception(
-                    f"LLM generation failed at iteration {iteration}/{max_iterations}. "
-                    f"Error: {type(e).__name__}"
-                )
-                return ReflexionResult(
-                    code="",
-                    iteration_count=iteration,
-                    success=False,
-                    error_history=error_history + [str(e)],
-                    final_error=f"LLM generation failed: {e}"
-                )
-
-            # Try to execute if executor provided
-            if self.executor:
+            with timed_stage("reflexion_iter"):
+                # Generate code
                 try:
-                    result = self.executor(code)
-                    # Success!
-                    logger.info(f"Reflexion converged in {iteration} iterations")
+                    if self.llm_client:
+                        code = self.llm_client.generate(current_prompt)
+                    else:
+                        # Fallback for testing
+                        code = f"# Generated code for iteration {iteration}"
+                except OperationCancelledError:
+                    # Cancellation is not an LLM failure - stop the whole loop
+                    raise
+                except (ConnectionError, TimeoutError, RuntimeError, ValueError, TypeError) as e:
+                    # LLM generation failed - abort with error
+                    logger.exception(
+                        f"LLM generation failed at iteration {iteration}/{max_iterations}. "
+                        f"Error: {type(e).__name__}"
+                    )
+                    return ReflexionResult(
+                        code="",
+                        iteration_count=iteration,
+                        success=False,
+                        error_history=error_history + [str(e)],
+                        final_error=f"LLM generation failed: {e}"
+                    )
+
+                # Try to execute if executor provided
+                if self.executor:
+                    try:
+                        self.executor(code)
+                        # Success!
+                        logger.info(f"Reflexion converged in {iteration} iterations")
+                        return ReflexionResult(
+                            code=code,
+                            iteration_count=iteration,
+                            success=True,
+                            error_history=error_history
+                        )
+                    except (RuntimeError, TimeoutError, ValueError, TypeError, KeyError) as e:
+                        # Execution failed - add error to context
+                        error_msg = str(e)
+                        error_history.append(error_msg)
+                        logger.exception(
+                            f"Executor failed at iteration {iteration}/{max_iterations}. "
+                            f"Error: {type(e).__name__}"
+                        )
+
+                        # Build prompt with error feedback for next iteration
+                        if iteration < max_iterations:
+                            current_prompt = self._build_feedback_prompt(
+                                current_prompt,
+                                code,
+                                error_msg
+                            )
+                else:
+                    # No executor - assume success after first iteration
+                    logger.info("Reflexion generated code (no execution validation)")
                     return ReflexionResult(
                         code=code,
                         iteration_count=iteration,
                         success=True,
                         error_history=error_history
                     )
-                except (RuntimeError, TimeoutError, ValueError, TypeError, KeyError) as e:
-                    # Execution failed - add error to context
-                    error_msg = str(e)
-                    error_history.append(error_msg)
-                    logger.exception(
-                        f"Executor failed at iteration {iteration}/{max_iterations}. "
-                        f"Error: {type(e).__name__}"
-                    )
-
-                    # Build prompt with error feedback for next iteration
-                    if iteration < max_iterations:
-                        current_prompt = self._build_feedback_prompt(
-                            current_prompt,
-                            code,
-                            error_msg
-                        )
-            else:
-                # No executor - assume success after first iteration
-                logger.info("Reflexion generated code (no execution validation)")
-                return ReflexionResult(
-                    code=code,
-                    iteration_count=iteration,
-                    success=True,
-                    error_history=error_history
-                )
 
         # Max iterations reached
         logger.warning(f"Reflexion did not converge after {max_iterations} iterations")
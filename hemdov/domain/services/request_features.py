@@ -0,0 +1,96 @@
+"""
+Request Features - Lexical signals of a prompt request, computed once.
+
+Routing used to re-derive the same signals several times per request:
+StrategySelector.select and get_complexity each ran ComplexityAnalyzer, the
+API ran its own intent keyword scan, and NLaCBuilder classified intent and
+complexity again. RequestFeatures bundles them so the API computes them once
+and passes the bundle down.
+
+Only signals something reads are kept. Intent is only needed by the NLaC
+builder, so it is classified on first access rather than for every request.
+
+The API binds the bundle with features_scope(); like the cancellation token
+it is carried by a ContextVar, so NLaCStrategy (running in the strategy
+worker thread) picks it up without changing the strategy interface.
+"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cached_property
+
+from hemdov.domain.dto.nlac_models import NLaCRequest
+from hemdov.domain.services.complexity_analyzer import ComplexityAnalyzer, ComplexityLevel
+from hemdov.domain.services.intent_classifier import IntentClassifier
+
+_complexity_analyzer = ComplexityAnalyzer()
+_intent_classifier = IntentClassifier()
+
+
+@dataclass(frozen=True)
+class RequestFeatures:
+    """
+    Immutable feature bundle for one (idea, context) pair.
+
+    Attributes:
+        idea: Original idea the features were computed from
+        context: Original context the features were computed from
+        text: Lowercased "idea context", shared by keyword scans
+        complexity: ComplexityAnalyzer result
+    """
+
+    idea: str
+    context: str
+    text: str
+    complexity: ComplexityLevel
+
+    @cached_property
+    def intent(self) -> str:
+        """IntentClassifier result (generate, debug, refactor, explain), computed once."""
+        return _intent_classifier.classify(NLaCRequest(idea=self.idea, context=self.context))
+
+    @classmethod
+    def from_request(cls, idea: str, context: str) -> "RequestFeatures":
+        """
+        Compute the eager features of a request (intent follows on first access).
+
+        Raises:
+            ValueError: If inputs are None
+            TypeError: If inputs are not strings
+        """
+        complexity = _complexity_analyzer.analyze(idea, context)
+        return cls(
+            idea=idea,
+            context=context,
+            text=f"{idea} {context}".lower(),
+            complexity=complexity,
+        )
+
+    def describes(self, idea: str, context: str) -> bool:
+        """Whether these features were computed for this idea and context."""
+        return self.idea == idea and self.context == context
+
+
+_current_features: ContextVar[RequestFeatures | None] = ContextVar(
+    "request_features", default=None
+)
+
+
+def get_current_features(idea: str, context: str) -> RequestFeatures | None:
+    """Features bound to the current context, if they describe this input."""
+    features = _current_features.get()
+    if features is not None and features.describes(idea, context):
+        return features
+    return None
+
+
+@contextmanager
+def features_scope(features: RequestFeatures) -> Iterator[RequestFeatures]:
+    """Bind features to the current context for the duration of the block."""
+    reset = _current_features.set(features)
+    try:
+        yield features
+    finally:
+        _current_features.reset(reset)
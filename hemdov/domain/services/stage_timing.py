@@ -0,0 +1,119 @@
+"""
+Stage Timing - Per-request latency breakdown of the improve pipeline.
+
+A StageTimings collector is bound to the current context at the API boundary
+and the pipeline wraps each unit of work in timed_stage(). Like the
+cancellation token, the collector is carried by a ContextVar and therefore
+reaches the strategy worker thread; recording is lock-protected because
+stages may be timed from the event loop and the worker at the same time.
+
+Each timed stage is also reported to the process-wide MetricsPort, when one
+is bound with bind_metrics_port(), so the same instrumentation feeds the
+latency histograms. With neither a scope nor a port, timed_stage() does
+nothing.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from hemdov.domain.ports.metrics_port import MetricsPort
+
+
+class StageTimings:
+    """Thread-safe accumulator of stage durations for one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # stage name -> [total milliseconds, call count], in first-seen order
+        self._stages: dict[str, list[float]] = {}
+
+    def record(self, stage: str, duration_ms: float) -> None:
+        """Add one timed occurrence of a stage."""
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0.0, 0])
+            entry[0] += duration_ms
+            entry[1] += 1
+
+    def as_dict(self) -> dict[str, dict[str, float | int]]:
+        """Return {stage: {"ms": total, "count": n}} with ms rounded to 0.1."""
+        with self._lock:
+            return {
+                stage: {"ms": round(total, 1), "count": count}
+                for stage, (total, count) in self._stages.items()
+            }
+
+    def server_timing_header(self) -> str:
+        """
+        Render the timings as a Server-Timing header value.
+
+        Repeated stages (LLM calls, OPRO iterations) are summed and the number
+        of occurrences goes into the description, e.g. llm;dur=812.4;desc="3x".
+        """
+        parts = []
+        for stage, entry in self.as_dict().items():
+            part = f"{stage};dur={entry['ms']}"
+            if entry["count"] > 1:
+                part += f';desc="{entry["count"]}x"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_current_timings: ContextVar[StageTimings | None] = ContextVar(
+    "hemdov_stage_timings", default=None
+)
+
+
+_metrics_port: MetricsPort | None = None
+
+
+def bind_metrics_port(port: MetricsPort | None) -> None:
+    """Report every timed stage to `port` via record_latency (None to unbind)."""
+    global _metrics_port
+    _metrics_port = port
+
+
+def get_metrics_port() -> MetricsPort | None:
+    """Return the process-wide port bound with bind_metrics_port(), if any."""
+    return _metrics_port
+
+
+def get_current_timings() -> StageTimings | None:
+    """Return the collector bound to the current context, if any."""
+    return _current_timings.get()
+
+
+@contextmanager
+def timing_scope(timings: StageTimings) -> Iterator[StageTimings]:
+    """Bind a collector to the current context for the duration of the block."""
+    reset_token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(reset_token)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as `stage` in the current request's collector.
+
+    The duration is recorded even if the block raises, so failed LLM calls
+    and cancelled iterations still show up in the breakdown.
+    """
+    timings = _current_timings.get()
+    port = _metrics_port
+    if timings is None and port is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        if timings is not None:
+            timings.record(stage, duration_ms)
+        if port is not None:
+            port.record_latency(stage, duration_ms)
@@ -0,0 +1,121 @@
+"""
+Token Usage - Per-request ledger of provider-reported token counts.
+
+A TokenUsage ledger is bound to the current context at the API boundary and
+every LLM call made while serving the request records what the provider
+billed: prompt, completion and cached prompt tokens. Like StageTimings, the
+ledger travels in a ContextVar and so reaches the strategy worker thread and
+the sampling executor; recording is lock-protected.
+
+Calls whose provider sent no usage are recorded from the len // 4 estimate
+and flagged, so metrics can tell measured counts from guessed ones. Without
+a bound ledger, record_usage() does nothing.
+"""
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class TokenUsage:
+    """Thread-safe token totals of the LLM calls made for one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._estimated_calls = 0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._cached_tokens = 0
+
+    def record(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        estimated: bool = False,
+    ) -> None:
+        """
+        Add one LLM call.
+
+        Args:
+            prompt_tokens: Input tokens, including the cached ones
+            completion_tokens: Output tokens
+            cached_tokens: Input tokens served from the provider's prompt cache
+            estimated: True when the counts are estimates, not provider usage
+        """
+        with self._lock:
+            self._calls += 1
+            self._estimated_calls += int(estimated)
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+            self._cached_tokens += cached_tokens
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self._prompt_tokens
+
+    @property
+    def completion_tokens(self) -> int:
+        return self._completion_tokens
+
+    @property
+    def cached_tokens(self) -> int:
+        return self._cached_tokens
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        return self._cached_tokens / self._prompt_tokens if self._prompt_tokens else 0.0
+
+    @property
+    def estimated(self) -> bool:
+        """True if any recorded call had no provider usage."""
+        return self._estimated_calls > 0
+
+    def as_dict(self) -> dict[str, int | float | bool]:
+        """Totals, the cached prompt token ratio and whether any count is estimated."""
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "cached_tokens": self._cached_tokens,
+                "cached_ratio": round(self.cached_ratio, 3),
+                "estimated": self._estimated_calls > 0,
+            }
+
+
+_current_usage: ContextVar[TokenUsage | None] = ContextVar("hemdov_token_usage", default=None)
+
+
+def get_current_usage() -> TokenUsage | None:
+    """Return the ledger bound to the current context, if any."""
+    return _current_usage.get()
+
+
+@contextmanager
+def usage_scope(usage: TokenUsage) -> Iterator[TokenUsage]:
+    """Bind a ledger to the current context for the duration of the block."""
+    reset_token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(reset_token)
+
+
+def record_usage(
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    estimated: bool = False,
+) -> None:
+    """Record one LLM call in the current request's ledger, if one is bound."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.record(prompt_tokens, completion_tokens, cached_tokens, estimated)
@@ -0,0 +1,220 @@
+"""
+FakeLLM - In-process LLM provider for offline load tests.
+
+With LLM_PROVIDER=fake the lifespan configures DSPy with a FakeLLM instead
+of a LiteLLM adapter, so the full /api/v1/improve-prompt stack can be
+benchmarked on a laptop with no network and no provider bill:
+
+- Responses are replayed from an LLMResponseCache file recorded against a
+  real provider (LLM_CACHE_ENABLED), looked up by the hash of the messages.
+  Prompts that were never recorded get a synthesized answer that follows
+  the DSPy ChatAdapter field layout, so every module still parses it.
+- Latency is time to first token (log-normal around a median) plus one
+  delay per streamed chunk of the answer, mimicking a streaming provider.
+- error_rate fails calls like a dropped connection, rate_limit_rate answers
+  429 (litellm RateLimitError); both are retryable for the ProviderRouter.
+- Calls honour the request cancellation token and time out like the real
+  adapter when the simulated latency exceeds the call's timeout.
+"""
+
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import dspy
+import litellm
+
+from hemdov.domain.metrics.evaluators import estimate_tokens
+from hemdov.domain.services.cancellation import get_current_token
+from hemdov.domain.services.stage_timing import timed_stage
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import Sample
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+# "1. `improved_prompt` (str): ..." lines of the ChatAdapter system message
+_OUTPUT_FIELDS = re.compile(
+    r"Your output fields are:\n(.*?)\n(?:All interactions|In adhering)", re.S
+)
+_FIELD_LINE = re.compile(r"^\d+\. `(\w+)` \(([^)]*)\)", re.M)
+_IDEA = re.compile(r"\[\[ ## (?:original_idea|idea|prompt) ## \]\]\n(.*?)(?:\n\n|\Z)", re.S)
+
+
+def synthesize_response(messages: list[dict[str, Any]]) -> str:
+    """
+    A well-formed answer for prompts that were never recorded.
+
+    Fills every output field the DSPy signature asks for with a plausible
+    value of its type, or returns plain text for non-DSPy callers.
+    """
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    idea_match = _IDEA.search(user)
+    idea = (idea_match.group(1) if idea_match else user).strip()[:200] or "the task"
+
+    section = _OUTPUT_FIELDS.search(system)
+    if section is None:
+        return f"Simulated response for: {idea}"
+
+    parts = []
+    for name, type_name in _FIELD_LINE.findall(section.group(1)):
+        parts.append(f"[[ ## {name} ## ]]\n{_field_value(name, type_name, idea)}")
+    parts.append("[[ ## completed ## ]]")
+    return "\n\n".join(parts)
+
+
+def _field_value(name: str, type_name: str, idea: str) -> str:
+    if name == "framework":
+        return "chain-of-thought"
+    if name == "confidence" or type_name == "float":
+        return "0.8"
+    if type_name == "int":
+        return "1"
+    if type_name == "bool":
+        return "true"
+    if name == "guardrails":
+        return "- Be concise\n- State assumptions\n- Ask for missing details"
+    if name == "role":
+        return "Senior domain expert"
+    if name == "directive":
+        return f"Accomplish: {idea}"
+    if type_name.startswith(("list", "dict")):
+        return '["simulated"]' if type_name.startswith("list") else "{}"
+    if name == "improved_prompt":
+        return (
+            "You are a senior domain expert.\n\n"
+            f"Directive: {idea}\n\n"
+            "Framework: chain-of-thought. Work step by step.\n\n"
+            "Guardrails:\n- Be concise\n- State assumptions\n- Ask for missing details"
+        )
+    return f"Simulated {name.replace('_', ' ')} for: {idea}"
+
+
+class FakeLLM(dspy.LM):
+    """dspy.LM answering from recordings with simulated latency and failures."""
+
+    def __init__(
+        self,
+        model: str = "fake/replay",
+        recordings: LLMResponseCache | None = None,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        chunk_tokens: int = 16,
+        chunk_ms: float = 15.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            model: Name reported to routers, metrics and history
+            recordings: Cache file whose responses are replayed by prompt hash
+            latency_ms: Median time to first token
+            latency_sigma: Log-normal spread of the time to first token (0: fixed)
+            chunk_tokens: Tokens per simulated streaming chunk
+            chunk_ms: Delay per chunk after the first token
+            error_rate: Fraction of calls failing like a dropped connection
+            rate_limit_rate: Fraction of calls answered with a 429
+            seed: Seed for reproducible latencies and failures
+            sleep: Sleep function (for tests)
+        """
+        super().__init__(model)
+        self.model = model
+        self.kwargs = {"temperature": 0.0, "max_tokens": 2000}
+        self.recordings = recordings
+        self._latency_ms = latency_ms
+        self._sigma = latency_sigma
+        self._chunk_tokens = max(1, chunk_tokens)
+        self._chunk_ms = chunk_ms
+        self._error_rate = error_rate
+        self._rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "replayed": 0, "synthesized": 0, "errors": 0, "rate_limited": 0}
+
+    def __call__(
+        self,
+        prompt: str | None = None,
+        messages: list[dict[str, Any]] | None = None,
+        **kwargs,
+    ) -> list[str]:
+        if messages is None:
+            if prompt is None:
+                raise ValueError("FakeLLM requires prompt or messages")
+            messages = [{"role": "user", "content": prompt}]
+        requested_n = max(1, int(kwargs.get("n", 1)))
+
+        token = get_current_token()
+        timeout = kwargs.get("timeout")
+        if token is not None:
+            token.raise_if_cancelled("llm_call")
+            remaining = token.remaining()
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(float(timeout), remaining)
+
+        with self._lock:
+            self._stats["calls"] += 1
+            roll = self._random.random()
+            first_token = self._first_token_seconds()
+
+        with timed_stage("llm"):
+            if roll < self._rate_limit_rate:
+                self._count("rate_limited")
+                raise litellm.exceptions.RateLimitError(
+                    message="Simulated rate limit", llm_provider="fake", model=self.model
+                )
+            if roll < self._rate_limit_rate + self._error_rate:
+                self._count("errors")
+                self._sleep(first_token)
+                raise RuntimeError("LiteLLM request failed: ConnectionError: simulated") from (
+                    ConnectionError("simulated connection reset")
+                )
+
+            outputs = self._answer(messages, requested_n)
+            tokens = max(estimate_tokens(str(output)) for output in outputs)
+            latency = first_token + math.ceil(tokens / self._chunk_tokens) * self._chunk_ms / 1000
+            if timeout is not None and latency > float(timeout):
+                self._sleep(float(timeout))
+                raise RuntimeError("LiteLLM request failed: Timeout: simulated") from TimeoutError(
+                    f"simulated latency {latency:.2f}s exceeds timeout {float(timeout):.2f}s"
+                )
+            self._sleep(latency)
+
+        if token is not None:
+            token.raise_if_cancelled("llm_result")
+        return outputs
+
+    def _first_token_seconds(self) -> float:
+        if self._sigma <= 0:
+            return self._latency_ms / 1000
+        mu = math.log(max(self._latency_ms, 1e-3))
+        return self._random.lognormvariate(mu, self._sigma) / 1000
+
+    def _answer(self, messages: list[dict[str, Any]], requested_n: int) -> list[str]:
+        recorded = None
+        if self.recordings is not None:
+            recorded = self.recordings.find_by_prompt(self.recordings.prompt_hash(messages))
+        if recorded:
+            self._count("replayed")
+            samples = [Sample(entry["text"], entry.get("usage", {})) for entry in recorded]
+        else:
+            self._count("synthesized")
+            samples = [Sample(synthesize_response(messages))]
+        # Cycle the recorded samples when more are requested than were recorded
+        return [samples[i % len(samples)] for i in range(requested_n)]
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self) -> dict[str, int]:
+        """Calls, and how they were answered or failed."""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,117 @@
+"""
+HttpPool - One keep-alive connection pool shared by the LLM adapters.
+
+Without an explicit client LiteLLM picks its HTTP client per call path, so
+under load remote providers paid TCP and TLS setup again and local Ollama
+saw connection churn. An HttpPool owns a single httpx.Client with bounded
+connections and keep-alive (optionally HTTP/2) that every
+PromptImproverLiteLLMAdapter given the pool sends its requests through:
+
+- OpenAI models get an OpenAI SDK client built on the pooled httpx.Client;
+- every other provider gets a LiteLLM HTTPHandler wrapping it.
+
+Requests, newly opened connections and HTTP versions are counted from the
+response extensions, so stats() shows how often connections are reused.
+"""
+
+import importlib.util
+import threading
+import weakref
+from typing import Any
+
+import httpx
+import openai
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+
+class HttpPool:
+    """Shared httpx connection pool with reuse statistics."""
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout_seconds: float = 600.0,
+        connect_timeout_seconds: float = 10.0,
+    ):
+        """
+        Args:
+            max_connections: Open connections allowed across all hosts
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept
+            http2: Negotiate HTTP/2 with servers that support it
+            timeout_seconds: Read/write timeout when a call sets none
+            connect_timeout_seconds: TCP/TLS connect timeout
+
+        Raises:
+            ValueError: If http2 is requested without the h2 package
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise ValueError("LLM_HTTP2 requires the h2 package (pip install 'httpx[http2]')")
+        self._limits = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+            "http2": http2,
+        }
+        self._lock = threading.Lock()
+        # Connections seen so far; a response on an unseen one opened it
+        self._streams: weakref.WeakSet = weakref.WeakSet()
+        self._requests = 0
+        self._opened = 0
+        self._versions: dict[str, int] = {}
+        self.client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            timeout=httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds),
+            follow_redirects=True,
+            event_hooks={"response": [self._on_response]},
+        )
+        self.handler = HTTPHandler(client=self.client)
+
+    def client_for(self, model: str, api_key: str | None, api_base: str | None) -> Any | None:
+        """
+        The `client` to pass to litellm.completion for a model.
+
+        Returns:
+            An OpenAI SDK client for openai/ models, else the LiteLLM handler;
+            None when an OpenAI client cannot be built without a key
+        """
+        if model.startswith("openai/"):
+            try:
+                return openai.OpenAI(api_key=api_key, base_url=api_base, http_client=self.client)
+            except openai.OpenAIError:
+                # No key configured here: LiteLLM resolves credentials itself
+                return None
+        return self.handler
+
+    def _on_response(self, response: httpx.Response) -> None:
+        stream = response.extensions.get("network_stream")
+        version = response.extensions.get("http_version", b"unknown").decode("ascii", "replace")
+        with self._lock:
+            self._requests += 1
+            self._versions[version] = self._versions.get(version, 0) + 1
+            if stream is not None and stream not in self._streams:
+                self._streams.add(stream)
+                self._opened += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Requests, connections opened and reused, HTTP versions and limits."""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "connections_opened": self._opened,
+                "reused": max(0, self._requests - self._opened),
+                "http_versions": dict(self._versions),
+                **self._limits,
+            }
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.client.close()
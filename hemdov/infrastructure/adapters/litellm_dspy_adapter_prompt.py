@@ -5,12 +5,140 @@ Parallel adapter to avoid impacting the HemDov production adapter.
 Compatible with DSPy v3 call signatures.
 """
 
+import contextvars
+import logging
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import dspy
 import litellm
 
+from hemdov.domain.metrics.evaluators import estimate_tokens
+from hemdov.domain.services.cancellation import OperationCancelledError, get_current_token
+from hemdov.domain.services.stage_timing import timed_stage
+from hemdov.domain.services.token_usage import record_usage
+from hemdov.infrastructure.adapters.http_pool import HttpPool
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+from hemdov.infrastructure.adapters.rate_limiter import RateLimiter
+from hemdov.infrastructure.adapters.retry_policy import (
+    FINAL_LITELLM_ERRORS,
+    TRANSIENT_LITELLM_ERRORS,
+    RetryPolicy,
+    is_transient,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Temperature added per extra sample when the provider has no native `n`,
+# so parallel samples do not all decode the same way
+SAMPLE_TEMPERATURE_STEP = 0.15
+MAX_SAMPLE_TEMPERATURE = 1.0
+
+
+class Sample(str):
+    """One completion; compares like its text and carries its token usage."""
+
+    usage: dict[str, Any]
+
+    def __new__(cls, text: str, usage: dict[str, Any] | None = None) -> "Sample":
+        sample = super().__new__(cls, text)
+        sample.usage = usage or {}
+        return sample
+
+
+def _usage_of(response) -> dict[str, Any]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    counts = {
+        key: getattr(usage, key, None)
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens")
+        if isinstance(getattr(usage, key, None), int)
+    }
+    cached = _cached_tokens_of(usage)
+    if cached:
+        counts["cached_tokens"] = cached
+    return counts
+
+
+def _cached_tokens_of(usage) -> int:
+    """Prompt tokens served from the provider's prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if isinstance(cached, int):
+        return cached
+    # Providers reporting cache reads outside the OpenAI layout
+    for key in ("cache_read_input_tokens", "prompt_cache_hit_tokens"):
+        value = getattr(usage, key, None)
+        if isinstance(value, int):
+            return value
+    return 0
+
+
+def with_cache_breakpoints(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Mark where the stable prefix of a DSPy chat prompt ends.
+
+    ChatAdapter messages are laid out system instructions, few-shot demo
+    turns, then the request. The system message and the last demo turn get
+    an ephemeral cache_control breakpoint, so a provider with explicit
+    prompt caching can reuse the instructions, and the demos when they
+    repeat. The request itself is never marked.
+    """
+    if len(messages) < 2:
+        return messages
+    marked = [len(messages) - 2]
+    if messages[0].get("role") == "system":
+        marked.append(0)
+    result = list(messages)
+    for index in set(marked):
+        content = result[index].get("content")
+        if isinstance(content, str) and content:
+            result[index] = {
+                **result[index],
+                "content": [
+                    {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+                ],
+            }
+    return result
+
+
+def _cap_timeout(params: dict[str, Any], token) -> dict[str, Any]:
+    """params with the call timeout capped at the request's remaining budget."""
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return params
+    configured = params.get("timeout")
+    timeout = remaining if configured is None else min(float(configured), remaining)
+    return {**params, "timeout": timeout}
+
+
+def _record_call_usage(
+    messages: list[dict[str, Any]], texts: list[str], usage: dict[str, Any]
+) -> None:
+    """Record one provider call in the request's TokenUsage ledger."""
+    if "prompt_tokens" in usage and "completion_tokens" in usage:
+        record_usage(
+            usage["prompt_tokens"], usage["completion_tokens"], usage.get("cached_tokens", 0)
+        )
+        return
+    # No usage from the provider: fall back to the len // 4 estimate
+    prompt_text = "".join(str(message.get("content", "")) for message in messages)
+    record_usage(
+        estimate_tokens(prompt_text),
+        sum(estimate_tokens(text or "") for text in texts),
+        estimated=True,
+    )
+
+
+# Providers that take explicit prompt-cache breakpoints; OpenAI and DeepSeek
+# cache matching prefixes automatically
+CACHE_BREAKPOINT_PREFIXES = ("anthropic/",)
+
 
 class PromptImproverLiteLLMAdapter(dspy.LM):
     """LiteLLM adapter compatible with DSPy v3 prompt/messages calls."""
@@ -22,6 +150,13 @@ class PromptImproverLiteLLMAdapter(dspy.LM):
         api_key: str | None = None,
         temperature: float = 0.3,
         max_tokens: int = 2000,
+        max_parallel_samples: int = 4,
+        http_pool: HttpPool | None = None,
+        cache: LLMResponseCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        cache_breakpoints: bool = True,
+        metrics=None,
         **kwargs,
     ) -> None:
         super().__init__(model, api_base=api_base, **kwargs)
@@ -29,6 +164,7 @@ class PromptImproverLiteLLMAdapter(dspy.LM):
         self.api_base = api_base
         self.api_key = api_key or os.getenv("LITELLM_API_KEY")
         self.litellm = litellm
+        self.max_parallel_samples = max(1, max_parallel_samples)
         self.kwargs = {
             "temperature": temperature,
             "max_tokens": max_tokens,
@@ -37,6 +173,15 @@ class PromptImproverLiteLLMAdapter(dspy.LM):
             self.kwargs["api_base"] = api_base
         if api_key:
             self.kwargs["api_key"] = api_key
+        self._supported_params: set[str] | None = None
+        self.http_pool = http_pool
+        self._pooled_client: Any | None = None
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.cache_breakpoints = cache_breakpoints and model.startswith(CACHE_BREAKPOINT_PREFIXES)
+        self.metrics = metrics
+        self._retry_random = random.Random()
 
     def __call__(
         self,
@@ -44,37 +189,257 @@ class PromptImproverLiteLLMAdapter(dspy.LM):
         messages: list[dict[str, Any]] | None = None,
         **kwargs,
     ) -> list[str]:
+        """
+        Complete `messages` and return one output per requested sample.
+
+        With n > 1 the provider's native `n` is used where it is supported;
+        otherwise (or for choices it did not return) the remaining samples
+        are separate concurrent calls, at most max_parallel_samples at a
+        time, each with a higher temperature and its own seed. Outputs are
+        Sample strings carrying their token usage.
+
+        With a cache, a call made before is answered from it; in replay mode
+        an uncached call raises LLMCacheMissError instead of reaching the
+        provider.
+        """
         if messages is None:
             if prompt is None:
                 raise ValueError("LiteLLM adapter requires prompt or messages")
             messages = [{"role": "user", "content": prompt}]
 
         params = {**self.kwargs, **kwargs}
-        requested_n = int(params.pop("n", 1))
+        requested_n = max(1, int(params.pop("n", 1)))
+
+        # Honour the request's cancellation token: never start a call for an
+        # abandoned request, and cap the HTTP timeout at the remaining budget.
+        token = get_current_token()
+        if token is not None:
+            token.raise_if_cancelled("llm_call")
+            params = _cap_timeout(params, token)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(self.model, messages, {**params, "n": requested_n})
+            cached = self.cache.get(cache_key)
+            if self.metrics is not None:
+                self.metrics.record_cache_hit(cached is not None, cache_key)
+            if cached is not None:
+                # Answered locally: a call with nothing billed
+                record_usage(0, 0)
+                return [
+                    Sample(entry["text"], {**entry["usage"], "cached": True}) for entry in cached
+                ]
+
+        if requested_n > 1 and self.supports_param("n"):
+            outputs = self._complete(messages, {**params, "n": requested_n})
+        else:
+            outputs = self._complete(messages, params)
 
-        try:
-            response = self.litellm.completion(
-                model=self.model,
-                messages=messages,
-                **params,
+        if token is not None:
+            # The client went away while the call was in flight - discard the result
+            token.raise_if_cancelled("llm_result")
+
+        if len(outputs) < requested_n:
+            outputs.extend(self._extra_samples(messages, params, len(outputs), requested_n))
+        # Only complete answers are cached; a dropped sample is retried next time
+        if cache_key is not None and len(outputs) == requested_n:
+            self.cache.put(
+                cache_key,
+                self.model,
+                [
+                    {"text": str(output), "usage": getattr(output, "usage", {})}
+                    for output in outputs
+                ],
+                prompt_hash=self.cache.prompt_hash(messages),
             )
-        except (ConnectionError, TimeoutError, ValueError, RuntimeError) as exc:
-            raise RuntimeError(f"LiteLLM request failed: {type(exc).__name__}: {exc}") from exc
+        return outputs
+
+    def supports_param(self, name: str) -> bool:
+        """True if LiteLLM knows the provider to honour an OpenAI-style parameter."""
+        if self._supported_params is None:
+            try:
+                supported = self.litellm.get_supported_openai_params(model=self.model)
+            except (ValueError, KeyError, litellm.exceptions.BadRequestError):
+                supported = None
+            self._supported_params = set(supported) if isinstance(supported, list) else set()
+        return name in self._supported_params
 
-        outputs: list[str] = []
+    def _complete(self, messages: list[dict[str, Any]], params: dict[str, Any]) -> list[str]:
+        """One LiteLLM call; every returned choice becomes a Sample."""
+        if self.http_pool is not None and "client" not in params:
+            if self._pooled_client is None:
+                self._pooled_client = self.http_pool.client_for(
+                    self.model, self.api_key, self.api_base
+                )
+            if self._pooled_client is not None:
+                params = {**params, "client": self._pooled_client}
+        response = self._send(messages, params)
+
+        texts: list[str] = []
         for choice in response.choices:
             if hasattr(choice, "message"):
-                outputs.append(choice.message.content)
+                texts.append(choice.message.content)
             else:
-                outputs.append(choice["text"])
+                texts.append(choice["text"])
+        if not texts:
+            texts = [""]
 
-        if not outputs:
-            outputs = [""]
+        usage = _usage_of(response)
+        _record_call_usage(messages, texts, usage)
+        if len(texts) == 1:
+            return [Sample(texts[0] or "", usage)]
+        # Native n bills the prompt once; per-choice completion tokens are estimated
+        samples = []
+        for index, text in enumerate(texts):
+            sample_usage = {
+                "prompt_tokens": usage.get("prompt_tokens", 0) if index == 0 else 0,
+                "completion_tokens": estimate_tokens(text or ""),
+                "estimated": True,
+            }
+            samples.append(Sample(text or "", sample_usage))
+        return samples
 
-        if requested_n > len(outputs):
-            outputs.extend([outputs[0]] * (requested_n - len(outputs)))
+    def _send(self, messages: list[dict[str, Any]], params: dict[str, Any]):
+        """
+        litellm.completion, retried on transient failures per the retry policy.
 
-        return outputs
+        Each retry waits a jittered backoff and caps its timeout at what is
+        left of the request deadline; no retry is made that could not finish
+        within it. With a rate limiter, every attempt first queues for
+        capacity and settles its token reservation to the reported usage,
+        or releases it when the attempt fails.
+        """
+        token = get_current_token()
+        sent_messages = with_cache_breakpoints(messages) if self.cache_breakpoints else messages
+        attempt = 0
+        while True:
+            attempt += 1
+            reserved = 0
+            if self.rate_limiter is not None:
+                with timed_stage("rate_limit"):
+                    estimate = self._estimate_call_tokens(messages, params)
+                    reserved = self.rate_limiter.acquire(estimate)
+                params = _cap_timeout(params, token)
+            try:
+                with timed_stage("llm"):
+                    response = self.litellm.completion(
+                        model=self.model,
+                        messages=sent_messages,
+                        **params,
+                    )
+                self._count_attempt("ok")
+                if self.rate_limiter is not None:
+                    usage = _usage_of(response)
+                    if "prompt_tokens" in usage and "completion_tokens" in usage:
+                        actual = usage["prompt_tokens"] + usage["completion_tokens"]
+                        self.rate_limiter.settle(reserved, actual)
+                return response
+            except OperationCancelledError:
+                raise
+            except (
+                *TRANSIENT_LITELLM_ERRORS, *FINAL_LITELLM_ERRORS,
+                ConnectionError, TimeoutError, ValueError, RuntimeError,
+            ) as exc:
+                error = exc
+            if reserved and not isinstance(error, (TimeoutError, litellm.exceptions.Timeout)):
+                # A failed call billed nothing; a timed-out one may still be processed
+                self.rate_limiter.settle(reserved, 0)
+            remaining = token.remaining() if token is not None else None
+            delay = None
+            if self.retry_policy is not None:
+                delay = self.retry_policy.delay(error, attempt, remaining, self._retry_random)
+            if delay is None:
+                if isinstance(error, (TimeoutError, litellm.exceptions.Timeout)):
+                    # The attempt ran into its timeout, capped at the request deadline
+                    outcome = "deadline"
+                elif not is_transient(error) or self.retry_policy is None:
+                    outcome = "error"
+                elif attempt >= self.retry_policy.max_attempts:
+                    outcome = "exhausted"
+                else:
+                    outcome = "deadline"
+                self._count_attempt(outcome)
+                if isinstance(error, (*TRANSIENT_LITELLM_ERRORS, *FINAL_LITELLM_ERRORS)):
+                    raise error
+                raise RuntimeError(
+                    f"LiteLLM request failed: {type(error).__name__}: {error}"
+                ) from error
+
+            self._count_attempt("retry")
+            logger.info(
+                "event=llm_retry model=%s attempt=%d error_type=%s delay_ms=%.0f",
+                self.model,
+                attempt,
+                type(error).__name__,
+                delay * 1000,
+            )
+            if token is not None:
+                if token.wait(delay):
+                    token.raise_if_cancelled("llm_retry")
+                params = _cap_timeout(params, token)
+            else:
+                time.sleep(delay)
+
+    def _estimate_call_tokens(self, messages: list[dict[str, Any]], params: dict[str, Any]) -> int:
+        """Tokens a call may bill: the prompt estimate plus its completion cap, per sample."""
+        prompt_text = "".join(str(message.get("content", "")) for message in messages)
+        completion = int(params.get("max_tokens") or 0) * max(1, int(params.get("n", 1)))
+        return estimate_tokens(prompt_text) + completion
+
+    def _count_attempt(self, outcome: str) -> None:
+        if self.metrics is not None:
+            self.metrics.record_llm_attempt(self.model, outcome)
+
+    def _extra_samples(
+        self,
+        messages: list[dict[str, Any]],
+        params: dict[str, Any],
+        start: int,
+        requested_n: int,
+    ) -> list[str]:
+        """
+        Samples start..requested_n-1 as concurrent single-choice calls.
+
+        A failed extra sample is dropped (the first one already succeeded);
+        cancellation still propagates.
+        """
+        base_temperature = float(params.get("temperature") or 0.0)
+        seeded = self.supports_param("seed")
+
+        def sample_params(index: int) -> dict[str, Any]:
+            varied = dict(params)
+            varied["temperature"] = min(
+                MAX_SAMPLE_TEMPERATURE, base_temperature + SAMPLE_TEMPERATURE_STEP * index
+            )
+            if seeded:
+                varied["seed"] = index
+            return varied
+
+        indices = range(start, requested_n)
+        workers = min(self.max_parallel_samples, len(indices))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-sample") as pool:
+            # copy_context: the cancellation token and stage timings reach each call
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run, self._complete, messages, sample_params(i)
+                )
+                for i in indices
+            ]
+            samples: list[str] = []
+            for future in futures:
+                try:
+                    samples.extend(future.result()[:1])
+                except OperationCancelledError:
+                    raise
+                except (
+                    *TRANSIENT_LITELLM_ERRORS, ConnectionError, TimeoutError, RuntimeError,
+                ) as e:
+                    # _send re-raises transient LiteLLM errors unwrapped
+                    logger.warning(f"Extra LLM sample dropped: {type(e).__name__}: {e}")
+        token = get_current_token()
+        if token is not None:
+            token.raise_if_cancelled("llm_result")
+        return samples
 
 
 def create_ollama_adapter(
@@ -0,0 +1,248 @@
+"""
+LLMResponseCache - Content-addressed on-disk cache of LLM completions.
+
+Evaluation scripts, A/B runs and quality-gate dataset runs send
+byte-identical prompts to the provider again on every run. With a cache
+given to PromptImproverLiteLLMAdapter, a call is keyed on the SHA-256 of
+its model, messages and sampling parameters (transport settings such as
+credentials, base URL, timeout and client are left out) and answered from
+a local SQLite file when the same call was made before.
+
+- Entries expire after ttl_seconds, except in replay mode, which serves a
+  recording whatever its age; the least recently used entries are evicted
+  beyond max_entries or max_bytes.
+- Replay mode opens the file read-only and never reaches the provider: a
+  call that is not cached raises LLMCacheMissError, so a deterministic
+  rerun either costs nothing or fails loudly.
+- Hits, misses, writes and evictions are counted in stats().
+
+Entries also carry the hash of their messages alone, so recordings made
+with one provider can be replayed by the fake provider (see fake_llm.py).
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("readwrite", "replay")
+
+# Parameters that change where or how a call is sent, not what it returns
+TRANSPORT_PARAMS = frozenset({
+    "api_key",
+    "api_base",
+    "base_url",
+    "timeout",
+    "client",
+    "metadata",
+    "num_retries",
+    "max_retries",
+})
+
+
+class LLMCacheMissError(LookupError):
+    """A call was not cached and the cache is in replay mode."""
+
+
+class LLMResponseCache:
+    """SQLite-backed LLM response cache with TTL, size caps and replay mode."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: float | None = 7 * 24 * 3600,
+        max_entries: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        mode: str = "readwrite",
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: SQLite file holding the cache
+            ttl_seconds: Age after which an entry is ignored (None: never;
+                not applied in replay mode)
+            max_entries: Entries kept before the least recently used go
+            max_bytes: Stored response bytes kept before the least recently used go
+            mode: "readwrite", or "replay" to serve only cached calls
+            clock: Wall-clock source (for tests)
+
+        Raises:
+            ValueError: If mode is unknown
+            sqlite3.OperationalError: If a replay cache file cannot be opened
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode!r} (expected one of {CACHE_MODES})")
+        self.path = Path(path)
+        self.mode = mode
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        if self.replay:
+            # Read-only: a replay run can never change the recorded responses
+            self._conn = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    prompt_hash TEXT,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+            if "prompt_hash" not in columns:
+                self._conn.execute("ALTER TABLE llm_cache ADD COLUMN prompt_hash TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache(last_accessed)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_prompt_hash ON llm_cache(prompt_hash)"
+            )
+            self._conn.commit()
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(model: str, messages: list[dict[str, Any]], params: dict[str, Any]) -> str:
+        """SHA-256 of the call's model, messages and sampling parameters."""
+        sampling = {k: v for k, v in params.items() if k not in TRANSPORT_PARAMS}
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": sampling},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def prompt_hash(messages: list[dict[str, Any]]) -> str:
+        """SHA-256 of the messages alone, whatever model and params answered them."""
+        payload = json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[dict[str, Any]] | None:
+        """
+        Cached outputs of a call, or None.
+
+        Raises:
+            LLMCacheMissError: On a miss in replay mode
+        """
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            # A replay serves the recording it was given, however old
+            fresh = row is not None and (
+                self._ttl is None or self.replay or now - row[1] <= self._ttl
+            )
+            self._stats["hits" if fresh else "misses"] += 1
+            if fresh and not self.replay:
+                self._conn.execute(
+                    "UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 "
+                    "WHERE key = ?",
+                    (now, key),
+                )
+                self._conn.commit()
+        if fresh:
+            return json.loads(row[0])
+        if self.replay:
+            raise LLMCacheMissError(f"LLM call {key[:12]} is not in the replay cache {self.path}")
+        return None
+
+    def find_by_prompt(self, prompt_hash: str) -> list[dict[str, Any]] | None:
+        """Most recently recorded outputs for these messages, ignoring TTL."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_cache WHERE prompt_hash = ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (prompt_hash,),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(
+        self,
+        key: str,
+        model: str,
+        outputs: list[dict[str, Any]],
+        prompt_hash: str | None = None,
+    ) -> None:
+        """Store a call's outputs, then evict expired and over-cap entries."""
+        if self.replay:
+            return
+        response = json.dumps(outputs, ensure_ascii=False)
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, prompt_hash, model, response, size, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, prompt_hash, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._stats["writes"] += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        evicted = 0
+        if self._ttl is not None:
+            evicted += self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self._ttl,)
+            ).rowcount
+        count, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        while count > self._max_entries or size > self._max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY last_accessed LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (oldest[0],))
+            count -= 1
+            size -= oldest[1]
+            evicted += 1
+        self._stats["evictions"] += evicted
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss/write/eviction counters, hit rate and current size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+                "mode": self.mode,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+"""
+ProviderBreaker - Circuit breaker around the LLM calls of one provider/model.
+
+api/circuit_breaker.py guards history persistence from the event loop. LLM
+calls run in worker threads, so this breaker is synchronous and lock
+protected. It is used by ProviderRouter, one per provider/model:
+
+- CLOSED: calls flow; consecutive failures are counted. Errors, timeouts
+  and (with slow_call_seconds) successful calls slower than the threshold
+  all count, so a provider that hangs trips the breaker as surely as one
+  that refuses connections.
+- OPEN: calls fail fast without touching the provider, for
+  reset_timeout_seconds.
+- HALF_OPEN: a single probe call is let through; its success closes the
+  breaker, its failure re-opens it for another reset period.
+"""
+
+import threading
+import time
+from enum import Enum
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class ProviderBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        slow_call_seconds: float | None = None,
+    ):
+        """
+        Args:
+            name: Provider/model the breaker guards (for logs and stats)
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout_seconds: How long the breaker stays open before probing
+            slow_call_seconds: Successful calls at least this slow count as
+                timeouts (None: only errors count)
+        """
+        self.name = name
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout_seconds
+        self._slow_call = slow_call_seconds
+        self._lock = threading.Lock()
+        self._state = BreakerState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+        self._last_failure_kind: str | None = None
+        self._trips = 0
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """Whether a call may start now; in HALF_OPEN this claims the probe."""
+        with self._lock:
+            state = self._current_state()
+            if state == BreakerState.CLOSED:
+                return True
+            if state == BreakerState.HALF_OPEN and not self._probe_in_flight:
+                self._state = BreakerState.HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency_seconds: float) -> None:
+        """A call returned; slow successes count as timeouts."""
+        if self._slow_call is not None and latency_seconds >= self._slow_call:
+            self.record_failure("slow")
+            return
+        with self._lock:
+            self._state = BreakerState.CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, kind: str = "error") -> None:
+        """A call failed (kind: error, timeout or slow)."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_failure_kind = kind
+            probe_failed = self._probe_in_flight
+            self._probe_in_flight = False
+            if probe_failed or self._consecutive_failures >= self._threshold:
+                if self._state != BreakerState.OPEN or probe_failed:
+                    self._trips += 1
+                self._state = BreakerState.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """A call ended without telling anything about the provider (cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may start (0 unless open)."""
+        with self._lock:
+            if self._current_state() != BreakerState.OPEN or self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state().value,
+                "consecutive_failures": self._consecutive_failures,
+                "last_failure_kind": self._last_failure_kind,
+                "trips": self._trips,
+            }
+
+    def _current_state(self) -> BreakerState:
+        if (
+            self._state == BreakerState.OPEN
+            and self._opened_at is not None
+            and time.monotonic() - self._opened_at >= self._reset_timeout
+        ):
+            return BreakerState.HALF_OPEN
+        return self._state
@@ -0,0 +1,488 @@
+"""
+ProviderRouter - Latency-aware failover across several LLM providers.
+
+The lifespan used to configure exactly one PromptImproverLiteLLMAdapter, so a
+slow or failing provider degraded every request until restart. When
+LLM_FALLBACK_PROVIDERS is set, DSPy is configured with a ProviderRouter
+instead. It wraps several adapters and, per call:
+
+- orders them by health: providers whose recent error rate is at or above
+  max_error_rate are cooling down and only tried last; the rest are ordered
+  by rolling latency (EWMA) weighted by error rate. A provider without a
+  latency sample ranks first so each one gets measured; ties keep the
+  configuration order, so the primary serves the first call;
+- tries them in that order, failing over to the next one on retryable
+  errors (connection failures, timeouts, rate limits, 5xx, auth/model errors
+  that are specific to one provider);
+- re-raises non-retryable errors (bad requests, cancellation) immediately,
+  since another provider would reject the same request.
+
+With hedging enabled, an attempt that has not returned after the
+hedge_percentile of the provider's recent latencies is duplicated to the
+next healthy provider (or the same one when it is alone). The first success
+wins; the loser's child cancellation token is cancelled so the adapter
+discards its late result. hedge_budget caps duplicates at a fraction of
+routed calls.
+
+Each provider can also sit behind a ProviderBreaker: an open breaker takes
+the provider out of routing without calling it, and when every breaker is
+open the router fails fast with ProviderCircuitOpenError instead of letting
+each request wait for timeouts.
+
+Providers are anything callable like a dspy.LM with a ``model`` attribute,
+which keeps the router testable with in-process fakes.
+"""
+
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import dspy
+import litellm
+
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+    get_current_token,
+)
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState, ProviderBreaker
+from hemdov.infrastructure.adapters.rate_limiter import RateLimitWaitError, rate_limit_wait_scope
+
+logger = logging.getLogger(__name__)
+
+# Errors another provider may not hit: transient failures, throttling, and
+# credentials or models that only exist on one provider
+RETRYABLE_LITELLM_ERRORS = (
+    litellm.exceptions.APIConnectionError,
+    litellm.exceptions.Timeout,
+    litellm.exceptions.RateLimitError,
+    litellm.exceptions.ServiceUnavailableError,
+    litellm.exceptions.InternalServerError,
+    litellm.exceptions.BadGatewayError,
+    litellm.exceptions.AuthenticationError,
+    litellm.exceptions.PermissionDeniedError,
+    litellm.exceptions.NotFoundError,
+)
+
+# Smoothing factor of the rolling latency average
+LATENCY_EWMA_ALPHA = 0.3
+
+# Calls needed before an error rate can put a provider in cool-down
+MIN_SAMPLES = 3
+
+# Latencies kept per provider for the hedge delay, and needed before hedging
+HEDGE_LATENCY_SAMPLES = 100
+HEDGE_MIN_SAMPLES = 10
+
+# Threads running hedged attempts
+HEDGE_MAX_WORKERS = 16
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Every provider failed with a retryable error."""
+
+
+class ProviderCircuitOpenError(ProviderUnavailableError):
+    """Every provider's breaker is open; nothing was called."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True if the error is specific to the provider that raised it."""
+    if isinstance(error, OperationCancelledError):
+        return False
+    if isinstance(error, RETRYABLE_LITELLM_ERRORS):
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # PromptImproverLiteLLMAdapter wraps transport errors in RuntimeError;
+    # a wrapped ValueError is a malformed request and would fail anywhere
+    if isinstance(error, RuntimeError):
+        return not isinstance(error.__cause__, ValueError)
+    return False
+
+
+def _is_timeout(error: BaseException) -> bool:
+    timeouts = (TimeoutError, litellm.exceptions.Timeout)
+    return isinstance(error, timeouts) or isinstance(error.__cause__, timeouts)
+
+
+class _ProviderStats:
+    """Rolling outcomes and latency of one provider; guarded by the router lock."""
+
+    def __init__(self, window: int):
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.latencies: deque[float] = deque(maxlen=HEDGE_LATENCY_SAMPLES)
+        self.latency_ewma: float | None = None
+        self.last_failure: float | None = None
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, ok: bool, latency: float) -> None:
+        self.calls += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += LATENCY_EWMA_ALPHA * (latency - self.latency_ewma)
+        else:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def cooling_down(self, max_error_rate: float, cooldown_seconds: float) -> bool:
+        return (
+            len(self.outcomes) >= MIN_SAMPLES
+            and self.error_rate() >= max_error_rate
+            and self.last_failure is not None
+            and time.monotonic() - self.last_failure < cooldown_seconds
+        )
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(percentile * len(ordered)) - 1)]
+
+    def score(self) -> float:
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma * (1 + self.error_rate())
+
+
+class ProviderRouter(dspy.LM):
+    """dspy.LM that routes each call to the healthiest of several providers."""
+
+    def __init__(
+        self,
+        providers: list[Any],
+        window: int = 20,
+        max_error_rate: float = 0.5,
+        cooldown_seconds: float = 30.0,
+        attempt_timeout_seconds: float | None = None,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay_seconds: float = 0.5,
+        hedge_budget: float = 0.1,
+        breaker_failure_threshold: int | None = None,
+        breaker_reset_seconds: float = 30.0,
+        breaker_slow_call_seconds: float | None = None,
+        metrics=None,
+    ) -> None:
+        """
+        Args:
+            providers: Adapters in preference order (primary first)
+            window: Calls remembered per provider for the error rate
+            max_error_rate: Error rate at which a provider cools down
+            cooldown_seconds: How long a failing provider is tried last
+            attempt_timeout_seconds: Per-attempt timeout passed to providers,
+                leaving budget to fail over (None: request budget only)
+            hedge_enabled: Duplicate slow attempts (see module docstring)
+            hedge_percentile: Latency percentile after which to hedge
+            hedge_min_delay_seconds: Never hedge earlier than this
+            hedge_budget: Maximum hedges as a fraction of routed calls
+            breaker_failure_threshold: Consecutive failures that open a
+                provider's breaker (None: no breakers)
+            breaker_reset_seconds: How long a breaker stays open before probing
+            breaker_slow_call_seconds: Successful calls this slow count as
+                timeouts for the breaker
+            metrics: Optional InProcessMetrics receiving per-provider outcomes
+
+        Raises:
+            ValueError: If no providers are given
+        """
+        if not providers:
+            raise ValueError("ProviderRouter requires at least one provider")
+        primary = providers[0]
+        super().__init__(primary.model)
+        self.model = primary.model
+        self.providers = list(providers)
+        # Generation defaults for introspection; credentials stay per provider
+        self.kwargs = {
+            key: value
+            for key, value in getattr(primary, "kwargs", {}).items()
+            if key in ("temperature", "max_tokens")
+        }
+        self._max_error_rate = max_error_rate
+        self._cooldown = cooldown_seconds
+        self._attempt_timeout = attempt_timeout_seconds
+        self._hedge_enabled = hedge_enabled
+        self._hedge_percentile = hedge_percentile
+        self._hedge_min_delay = hedge_min_delay_seconds
+        self._hedge_budget = hedge_budget
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._stats = {provider.model: _ProviderStats(window) for provider in self.providers}
+        self._breakers = {
+            provider.model: ProviderBreaker(
+                provider.model,
+                failure_threshold=breaker_failure_threshold,
+                reset_timeout_seconds=breaker_reset_seconds,
+                slow_call_seconds=breaker_slow_call_seconds,
+            )
+            for provider in self.providers
+        } if breaker_failure_threshold else {}
+        self._routed_calls = 0
+        self._hedge_counts = {"fired": 0, "won": 0, "lost": 0, "skipped_budget": 0}
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __call__(
+        self,
+        prompt: str | None = None,
+        messages: list[dict[str, Any]] | None = None,
+        **kwargs,
+    ) -> list[str]:
+        if self._attempt_timeout is not None and "timeout" not in kwargs:
+            kwargs["timeout"] = self._attempt_timeout
+        with self._lock:
+            self._routed_calls += 1
+
+        token = get_current_token()
+        errors: list[str] = []
+        ordered = self.ordered_providers()
+        for index, provider in enumerate(ordered):
+            if token is not None:
+                token.raise_if_cancelled("provider_failover")
+            breaker = self._breakers.get(provider.model)
+            if breaker is not None and not breaker.allow():
+                continue
+
+            try:
+                if self._hedge_enabled:
+                    alternate = self._hedge_target(ordered, index)
+                    return self._call_hedged(provider, alternate, token, prompt, messages, kwargs)
+                return self._attempt(provider, prompt, messages, kwargs)
+            except (*RETRYABLE_LITELLM_ERRORS, ConnectionError, TimeoutError, RuntimeError) as e:
+                if not is_retryable(e):
+                    raise
+                errors.append(f"{provider.model}: {type(e).__name__}: {e}")
+                logger.warning(
+                    "event=provider_failover provider=%s error_type=%s error=%s",
+                    provider.model,
+                    type(e).__name__,
+                    e,
+                )
+
+        if not errors and self._breakers:
+            raise ProviderCircuitOpenError(
+                "All LLM provider circuits are open", retry_after=self.retry_after()
+            )
+        raise ProviderUnavailableError("All LLM providers failed: " + "; ".join(errors))
+
+    def ordered_providers(self) -> list[Any]:
+        """Providers in the order the next call will try them."""
+        with self._lock:
+            ranked = [
+                (
+                    self._stats[provider.model].cooling_down(self._max_error_rate, self._cooldown),
+                    self._stats[provider.model].score(),
+                    index,
+                    provider,
+                )
+                for index, provider in enumerate(self.providers)
+            ]
+        ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked]
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Per-provider health, in routing order."""
+        with self._lock:
+            snapshot = {
+                model: {
+                    "provider": model,
+                    "calls": stats.calls,
+                    "failures": stats.failures,
+                    "error_rate": round(stats.error_rate(), 3),
+                    "latency_ms": (
+                        round(stats.latency_ewma * 1000, 1)
+                        if stats.latency_ewma is not None
+                        else None
+                    ),
+                    "cooling_down": stats.cooling_down(self._max_error_rate, self._cooldown),
+                }
+                for model, stats in self._stats.items()
+            }
+        for model, breaker in self._breakers.items():
+            snapshot[model]["breaker"] = breaker.snapshot()
+        return [snapshot[provider.model] for provider in self.ordered_providers()]
+
+    def breakers(self) -> list[ProviderBreaker]:
+        """Provider breakers in configuration order (empty when disabled)."""
+        return list(self._breakers.values())
+
+    def retry_after(self) -> float:
+        """Seconds until some provider accepts calls again (0 if one does now)."""
+        if not self._breakers:
+            return 0.0
+        return min(breaker.retry_after() for breaker in self._breakers.values())
+
+    def hedge_stats(self) -> dict[str, Any]:
+        """Hedge counters: fired, won (hedge finished first), lost, skipped_budget."""
+        with self._lock:
+            return {"enabled": self._hedge_enabled, **self._hedge_counts}
+
+    def close(self) -> None:
+        """Stop the hedging threads; in-flight attempts finish on their own."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # Attempts
+
+    def _attempt(self, provider, prompt, messages, kwargs) -> list[str]:
+        """One provider call; its outcome feeds the provider's stats and breaker."""
+        start = time.perf_counter()
+        # ok | error | timeout | reachable (rejected the request) | None (abandoned)
+        outcome: str | None = None
+        with rate_limit_wait_scope() as waits:
+            try:
+                outputs = provider(prompt=prompt, messages=messages, **kwargs)
+                outcome = "ok"
+                return outputs
+            except OperationCancelledError as e:
+                if e.reason == CancelReason.TIMEOUT and e.stage == "llm_result":
+                    # The provider held the call past the request deadline
+                    outcome = "timeout"
+                raise
+            except RateLimitWaitError:
+                # Refused locally before reaching the provider: abandoned
+                raise
+            except (*RETRYABLE_LITELLM_ERRORS, ConnectionError, TimeoutError, RuntimeError) as e:
+                outcome = (
+                    ("timeout" if _is_timeout(e) else "error") if is_retryable(e) else "reachable"
+                )
+                raise
+            finally:
+                # Time queued for local rate limit capacity is not provider latency
+                latency = max(0.0, time.perf_counter() - start - sum(waits))
+                self._settle(provider, outcome, latency)
+
+    def _settle(self, provider, outcome: str | None, latency: float) -> None:
+        breaker = self._breakers.get(provider.model)
+        if outcome in ("ok", "error", "timeout"):
+            self._record(provider, ok=outcome == "ok", latency=latency)
+        if breaker is None:
+            return
+        if outcome in ("ok", "reachable"):
+            breaker.record_success(latency)
+        elif outcome in ("error", "timeout"):
+            breaker.record_failure(outcome)
+        else:
+            breaker.release()
+
+    def _submit(self, provider, token: CancellationToken, prompt, messages, kwargs) -> Future:
+        def run():
+            with cancellation_scope(token):
+                return self._attempt(provider, prompt, messages, kwargs)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+            )
+        # copy_context: stage timings and request features reach the attempt
+        return self._executor.submit(contextvars.copy_context().run, run)
+
+    def _hedge_delay(self, provider) -> float | None:
+        with self._lock:
+            percentile = self._stats[provider.model].latency_percentile(self._hedge_percentile)
+        if percentile is None:
+            return None
+        return max(self._hedge_min_delay, percentile)
+
+    def _hedge_target(self, ordered: list[Any], index: int):
+        """Next provider not cooling down, else the same provider again."""
+        with self._lock:
+            for candidate in ordered[index + 1:]:
+                breaker = self._breakers.get(candidate.model)
+                if breaker is not None and breaker.state != BreakerState.CLOSED:
+                    continue
+                if not self._stats[candidate.model].cooling_down(
+                    self._max_error_rate, self._cooldown
+                ):
+                    return candidate
+        return ordered[index]
+
+    def _take_hedge_budget(self) -> bool:
+        with self._lock:
+            allowed = self._hedge_counts["fired"] + 1 <= self._hedge_budget * self._routed_calls
+            self._hedge_counts["fired" if allowed else "skipped_budget"] += 1
+        if self._metrics is not None:
+            self._metrics.record_hedge("fired" if allowed else "skipped_budget")
+        return allowed
+
+    def _count_hedge(self, outcome: str) -> None:
+        with self._lock:
+            self._hedge_counts[outcome] += 1
+        if self._metrics is not None:
+            self._metrics.record_hedge(outcome)
+
+    def _call_hedged(self, provider, alternate, token, prompt, messages, kwargs) -> list[str]:
+        delay = self._hedge_delay(provider)
+        if delay is None:
+            return self._attempt(provider, prompt, messages, kwargs)
+
+        root = token if token is not None else CancellationToken()
+        primary_token = root.child()
+        primary = self._submit(provider, primary_token, prompt, messages, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        # Hedges only go to a provider whose breaker is closed
+        alternate_breaker = self._breakers.get(alternate.model)
+        if (
+            alternate_breaker is not None
+            and alternate_breaker.state != BreakerState.CLOSED
+        ) or not self._take_hedge_budget():
+            return primary.result()
+
+        hedge_token = root.child()
+        hedge = self._submit(alternate, hedge_token, prompt, messages, kwargs)
+        logger.info(
+            "event=llm_hedge provider=%s alternate=%s delay_ms=%.0f",
+            provider.model,
+            alternate.model,
+            delay * 1000,
+        )
+
+        tokens = {primary: primary_token, hedge: hedge_token}
+        pending = {primary, hedge}
+        first_error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    for loser in pending:
+                        tokens[loser].cancel(CancelReason.SUPERSEDED)
+                    self._count_hedge("won" if future is hedge else "lost")
+                    return future.result()
+                if not is_retryable(error):
+                    for loser in pending:
+                        tokens[loser].cancel(CancelReason.SUPERSEDED)
+                    raise error
+                if future is primary or first_error is None:
+                    first_error = error
+        # Both failed: surface the primary's error to the failover loop
+        raise first_error
+
+    def _record(self, provider, ok: bool, latency: float) -> None:
+        with self._lock:
+            self._stats[provider.model].record(ok, latency)
+        if self._metrics is not None:
+            self._metrics.record_provider_call(provider.model, "ok" if ok else "error")
@@ -0,0 +1,196 @@
+"""
+RateLimiter - Client-side requests- and tokens-per-minute limits per provider.
+
+A traffic burst used to reach the provider all at once and come back as
+429s. A RateLimiter given to PromptImproverLiteLLMAdapter admits each call
+to a provider model through two token buckets, one for requests per minute
+and one for tokens per minute:
+
+- a call reserves one request and its estimated tokens (prompt estimate plus
+  max_tokens, the way providers count a call against TPM) before it is
+  sent; once the provider reports usage the reservation is settled to the
+  actual count, refunding or charging the difference;
+- callers queue in arrival order, so a large call at the head is not starved
+  by a stream of small ones behind it;
+- a caller only waits while its request deadline (the cancellation token)
+  can cover the wait; otherwise it fails at once with RateLimitWaitError, a
+  RuntimeError the ProviderRouter fails over on without counting it against
+  the provider;
+- waits are reported to the enclosing rate_limit_wait_scope(), so the router
+  can keep queueing out of the provider latency it measures.
+
+The limiter is a plain lock-and-condition object, so the strategy threads
+started by asyncio.to_thread and the sampling executor share it safely.
+"""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from hemdov.domain.services.cancellation import get_current_token
+
+# Longest single wait, so queued callers notice cancellation promptly
+_POLL_SECONDS = 0.05
+
+_current_waits: ContextVar[list[float] | None] = ContextVar("rate_limit_waits", default=None)
+
+
+@contextmanager
+def rate_limit_wait_scope() -> Iterator[list[float]]:
+    """Collect the seconds each call made inside the block spent queued."""
+    waits: list[float] = []
+    reset = _current_waits.set(waits)
+    try:
+        yield waits
+    finally:
+        _current_waits.reset(reset)
+
+
+class RateLimitWaitError(RuntimeError):
+    """The wait for rate limit capacity would outlast the request deadline."""
+
+
+class _Bucket:
+    """Token bucket holding up to a minute's allowance, refilled continuously."""
+
+    def __init__(self, per_minute: int, now: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._rate = per_minute / 60.0
+        self._updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        return max(0.0, (amount - self.level) / self._rate)
+
+
+class RateLimiter:
+    """FIFO requests-per-minute and tokens-per-minute limiter for one provider model."""
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            requests_per_minute: Calls allowed per minute (None: unlimited)
+            tokens_per_minute: Prompt plus completion tokens per minute (None: unlimited)
+            clock: Monotonic clock (for tests)
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        for name, limit in (("requests_per_minute", requests_per_minute),
+                            ("tokens_per_minute", tokens_per_minute)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} must be positive, got {limit}")
+        self._clock = clock
+        now = clock()
+        self._requests = _Bucket(requests_per_minute, now) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute, now) if tokens_per_minute else None
+        self._cond = threading.Condition()
+        self._queue: deque[object] = deque()
+        self._stats = {"admitted": 0, "waited": 0, "rejected": 0, "wait_seconds": 0.0}
+
+    def acquire(self, tokens: int) -> int:
+        """
+        Block until a call of about `tokens` tokens may be sent.
+
+        Args:
+            tokens: Estimated tokens of the call
+
+        Returns:
+            Tokens reserved, to be passed to settle()
+
+        Raises:
+            RateLimitWaitError: If the wait would exceed the request deadline
+            OperationCancelledError: If the request is cancelled while queued
+        """
+        if self._tokens is not None:
+            # A call larger than a minute's allowance would never fit
+            tokens = min(tokens, int(self._tokens.capacity))
+        cancel_token = get_current_token()
+        ticket = object()
+        start = self._clock()
+        blocked = False
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled("rate_limit")
+                    wait = _POLL_SECONDS
+                    if self._queue[0] is ticket:
+                        wait = self._wait_seconds(tokens)
+                        if wait == 0:
+                            self._take(tokens)
+                            break
+                        remaining = cancel_token.remaining() if cancel_token is not None else None
+                        if remaining is not None and wait > remaining:
+                            self._stats["rejected"] += 1
+                            raise RateLimitWaitError(
+                                f"Rate limit wait of {wait:.2f}s exceeds the remaining "
+                                f"{remaining:.2f}s of the request deadline"
+                            )
+                    blocked = True
+                    self._cond.wait(min(wait, _POLL_SECONDS))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            self._stats["admitted"] += 1
+            if blocked:
+                waited = self._clock() - start
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += waited
+                waits = _current_waits.get()
+                if waits is not None:
+                    waits.append(waited)
+        return tokens
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """Correct a reservation to the tokens the provider actually billed."""
+        if self._tokens is None or actual == reserved:
+            return
+        with self._cond:
+            self._tokens.refill(self._clock())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + reserved - actual)
+            self._cond.notify_all()
+
+    def _wait_seconds(self, tokens: int) -> float:
+        now = self._clock()
+        wait = 0.0
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_for(amount))
+        return wait
+
+    def _take(self, tokens: int) -> None:
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= tokens
+
+    def stats(self) -> dict[str, float | int]:
+        """Admitted, waited and rejected calls, total wait, queue and bucket levels."""
+        with self._cond:
+            now = self._clock()
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            return {
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3),
+                "queued": len(self._queue),
+                **({"requests_available": int(self._requests.level)} if self._requests else {}),
+                **({"tokens_available": int(self._tokens.level)} if self._tokens else {}),
+            }
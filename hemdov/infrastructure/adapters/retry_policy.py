@@ -0,0 +1,108 @@
+"""
+RetryPolicy - Jittered exponential backoff for transient LLM failures.
+
+The adapter used to turn a dropped connection, a 429 or a 5xx straight
+into an error, so the request failed (or, behind the router, failed over)
+on a hiccup that a second attempt would have absorbed. A RetryPolicy lets
+PromptImproverLiteLLMAdapter retry those failures:
+
+- only transient errors are retried: connection failures, rate limits and
+  5xx responses. Timeouts are not; they already spent their share of the
+  budget. Bad requests and auth errors would fail the same way again;
+- the delay before retry k is drawn uniformly from
+  [0, min(max_delay, base_delay * 2**k)] ("full jitter"), raised to the
+  provider's Retry-After when it sends one;
+- a retry is only made when the request's remaining deadline (the
+  cancellation token bound by improve_prompt) covers the delay plus
+  min_attempt_seconds, so retries never push a request past its budget.
+"""
+
+import random
+from dataclasses import dataclass
+
+import litellm
+
+from hemdov.domain.services.cancellation import OperationCancelledError
+
+# Failures another attempt at the same provider may not hit
+TRANSIENT_LITELLM_ERRORS = (
+    litellm.exceptions.APIConnectionError,
+    litellm.exceptions.RateLimitError,
+    litellm.exceptions.ServiceUnavailableError,
+    litellm.exceptions.InternalServerError,
+    litellm.exceptions.BadGatewayError,
+)
+
+# Provider failures a retry would not fix: timeouts, bad requests, credentials
+FINAL_LITELLM_ERRORS = (
+    litellm.exceptions.Timeout,
+    litellm.exceptions.APIError,
+    litellm.exceptions.BadRequestError,
+    litellm.exceptions.AuthenticationError,
+    litellm.exceptions.PermissionDeniedError,
+    litellm.exceptions.NotFoundError,
+)
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for connection failures, rate limits and 5xx responses."""
+    if isinstance(error, OperationCancelledError):
+        return False
+    if isinstance(error, (TimeoutError, litellm.exceptions.Timeout)):
+        return False
+    return isinstance(error, (*TRANSIENT_LITELLM_ERRORS, ConnectionError))
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """The Retry-After delay a provider sent with the error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    try:
+        value = headers.get("retry-after")
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        # HTTP-date form or a malformed header: fall back to backoff
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how long to wait before retrying a transient failure."""
+
+    max_attempts: int = 3
+    base_delay_seconds: float = 0.5
+    max_delay_seconds: float = 8.0
+    min_attempt_seconds: float = 1.0  # Budget an attempt needs to be worth starting
+
+    def backoff(self, retry: int, rng: random.Random | None = None) -> float:
+        """Full-jitter delay before retry number `retry` (0-based)."""
+        cap = min(self.max_delay_seconds, self.base_delay_seconds * 2**retry)
+        return (rng or random).uniform(0, cap)
+
+    def delay(
+        self,
+        error: BaseException,
+        attempt: int,
+        remaining: float | None,
+        rng: random.Random | None = None,
+    ) -> float | None:
+        """
+        Seconds to wait before the next attempt, or None to give up.
+
+        Args:
+            error: What the attempt failed with
+            attempt: Attempts made so far (1 after the first call)
+            remaining: Seconds left of the request deadline (None: unbounded)
+            rng: Random source for the jitter (for tests)
+        """
+        if attempt >= self.max_attempts or not is_transient(error):
+            return None
+        wait = self.backoff(attempt - 1, rng)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        if remaining is not None and remaining < wait + self.min_attempt_seconds:
+            return None
+        return wait
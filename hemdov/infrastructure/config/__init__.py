@@ -17,7 +17,7 @@ class Settings(BaseSettings):
     """Global settings for HemDov DSPy integration."""
 
     # LLM Provider Settings
-    LLM_PROVIDER: str = "ollama"  # ollama, gemini, deepseek, openai, anthropic
+    LLM_PROVIDER: str = "ollama"  # ollama, gemini, deepseek, openai, anthropic, fake
     LLM_MODEL: str = "hf.co/mradermacher/Novaeus-Promptist-7B-Instruct-i1-GGUF:Q5_K_M"
     LLM_BASE_URL: str | None = "http://localhost:11434"
     LLM_API_KEY: str | None = None
@@ -26,6 +26,81 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = None
     ANTHROPIC_API_KEY: str | None = None
     HEMDOV_ANTHROPIC_API_KEY: str | None = None
+    # Concurrent calls per n > 1 request on providers without native `n`
+    LLM_SAMPLE_CONCURRENCY: int = 4
+
+    # Keep-alive connection pool shared by all provider adapters
+    LLM_HTTP_POOL_ENABLED: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 20
+    LLM_HTTP_MAX_KEEPALIVE: int = 10  # Idle connections kept for reuse
+    LLM_HTTP_KEEPALIVE_SECONDS: float = 30.0
+    LLM_HTTP2: bool = False  # Needs the h2 package (httpx[http2])
+
+    # Retry of transient LLM failures (connection errors, 429, 5xx) with
+    # full-jitter backoff, only while the request deadline leaves room
+    LLM_RETRY_ENABLED: bool = True
+    LLM_RETRY_MAX_ATTEMPTS: int = 3  # Including the first call
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_RETRY_MIN_ATTEMPT_SECONDS: float = 1.0  # Budget a retry needs to be worth starting
+
+    # Client-side rate limits: comma-separated provider:model=rpm/tpm entries,
+    # e.g. "deepseek:deepseek-chat=60/100000"; either limit may be left empty
+    # ("openai:gpt-4o-mini=/200000"). Calls queue up to the request deadline.
+    LLM_RATE_LIMITS: str = ""
+
+    # Mark the stable prompt prefix (instructions, few-shot demos) with cache
+    # breakpoints on providers that take them (Anthropic)
+    LLM_PROMPT_CACHE_BREAKPOINTS: bool = True
+
+    # On-disk cache of LLM responses keyed on model, messages and sampling
+    # params. "replay" serves cached calls only and fails on a miss.
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "data/llm_cache.sqlite"
+    LLM_CACHE_MODE: str = "readwrite"  # readwrite, replay
+    LLM_CACHE_TTL_SECONDS: float | None = 604800.0  # 7 days; None keeps entries forever
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_MAX_MB: int = 256
+
+    # Offline provider for load tests (LLM_PROVIDER=fake): replays responses
+    # recorded in an LLM cache file, synthesizes the rest
+    LLM_FAKE_RECORDINGS_PATH: str | None = None
+    LLM_FAKE_LATENCY_MS: float = 800.0  # Median time to first token
+    LLM_FAKE_LATENCY_SIGMA: float = 0.5  # Log-normal spread; 0 for a fixed latency
+    LLM_FAKE_CHUNK_TOKENS: int = 16  # Tokens per simulated streaming chunk
+    LLM_FAKE_CHUNK_MS: float = 15.0
+    LLM_FAKE_ERROR_RATE: float = 0.0
+    LLM_FAKE_RATE_LIMIT_RATE: float = 0.0  # Fraction of calls answered with 429
+    LLM_FAKE_SEED: int | None = None
+
+    # Provider failover: comma-separated provider:model entries tried after
+    # the primary, e.g. "deepseek:deepseek-chat,openai:gpt-4o-mini"
+    LLM_FALLBACK_PROVIDERS: str = ""
+    LLM_ROUTER_WINDOW: int = 20  # Calls remembered per provider
+    LLM_ROUTER_MAX_ERROR_RATE: float = 0.5  # Error rate that sends a provider to cool-down
+    LLM_ROUTER_COOLDOWN_SECONDS: float = 30.0
+    LLM_ROUTER_ATTEMPT_TIMEOUT_SECONDS: float | None = None  # Leaves budget to fail over
+
+    # Hedging: duplicate LLM calls slower than the provider's recent percentile
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    LLM_HEDGE_BUDGET: float = 0.1  # Max hedges as a fraction of LLM calls
+
+    # Per-provider circuit breaker: fail fast instead of waiting out timeouts.
+    # Off by default: enabling it routes every call through the ProviderRouter,
+    # and requests fail with 503 + Retry-After while all circuits are open.
+    LLM_BREAKER_ENABLED: bool = False
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive errors, timeouts or slow calls
+    LLM_BREAKER_RESET_SECONDS: float = 30.0  # Open period before a half-open probe
+    LLM_BREAKER_SLOW_CALL_SECONDS: float | None = None  # Slower successes count as timeouts
+    LLM_FALLBACK_ENABLED: bool = True  # Cached or zero-shot answer when no provider is usable
+
+    # Model A/B arms: comma-separated provider:model=weight entries served in
+    # process, e.g. "openai:gpt-4o-mini=0.2"; the remaining traffic goes to
+    # LLM_PROVIDER/LLM_MODEL. Requests may also pick a configured arm.
+    LLM_MODEL_ARMS: str = ""
+    LLM_MODEL_OVERRIDE_ENABLED: bool = True  # Honour request provider/model fields
 
     # DSPy Settings
     DSPY_MAX_BOOTSTRAPPED_DEMOS: int = 5
@@ -63,6 +138,54 @@ class Settings(BaseSettings):
     MIN_CONFIDENCE_THRESHOLD: float = 0.7
     MAX_LATENCY_MS: int = 30000
 
+    # Admission Control (improve endpoint)
+    # NLaC runs OPRO/Reflexion loops per request, so it gets far fewer slots
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LEGACY_CONCURRENCY: int = 8
+    ADMISSION_NLAC_CONCURRENCY: int = 2
+    ADMISSION_MAX_QUEUE: int = 16
+    ADMISSION_MAX_WAIT_SECONDS: float = 15.0
+
+    # NLaC OPRO loop: beam mode generates and scores several candidates per round
+    # concurrently (both 1: sequential); LLM calls count variation generations
+    NLAC_OPRO_BEAM_WIDTH: int = 1  # Best candidates kept as parents for the next round
+    NLAC_OPRO_CANDIDATES_PER_ROUND: int = 1
+    NLAC_OPRO_MAX_LLM_CALLS: int | None = None  # Per request (None: no cap)
+
+    # Context compression: fit context plus few-shot examples into a token budget.
+    # Off by default: when on, the LLM no longer sees over-budget context verbatim
+    CONTEXT_COMPRESSION_ENABLED: bool = False
+    CONTEXT_TOKEN_BUDGET: int = 1000  # Context + few-shot examples (~4 chars/token)
+    CONTEXT_EXAMPLE_TOKENS: int = 150  # Estimated tokens per injected few-shot example
+    CONTEXT_MIN_TOKENS: int = 250  # Context keeps at least this, whatever the examples take
+
+    # Shadow traffic: mirror sampled requests through a candidate configuration,
+    # off the response path, and log both results side by side
+    SHADOW_ENABLED: bool = False
+    SHADOW_SAMPLE_RATE: float = 0.05
+    SHADOW_CANDIDATE_MODE: str = "nlac"  # Candidate selector mode: legacy | nlac
+    SHADOW_FEWSHOT_POOL_PATH: str | None = None  # Candidate few-shot pool (trainset or KNN catalog)
+    SHADOW_MAX_CONCURRENCY: int = 1
+    SHADOW_TIMEOUT_SECONDS: float = 120.0
+    SHADOW_GATE_TEMPLATE: str = "example_md"  # Quality-gate template both outputs are checked on
+    SHADOW_RESULTS_PATH: str = "data/shadow_runs.jsonl"
+
+    # Observability
+    SERVER_TIMING_ENABLED: bool = True  # Per-stage Server-Timing header on improve-prompt
+    # Also copy the breakdown into strategy_meta["timings"] (and token usage into "token_usage")
+    TIMINGS_IN_RESPONSE: bool = False
+
+    # Metrics pipeline: computed on a background worker unless sync mode is on
+    METRICS_SYNC_MODE: bool = False
+    METRICS_QUEUE_SIZE: int = 1000
+
+    # Startup warm-up: /ready stays 503 until selectors are built
+    WARMUP_ENABLED: bool = False
+    WARMUP_MODES: str = "legacy,nlac"  # Comma-separated selector modes to build
+    WARMUP_DRY_RUN: bool = True  # Send one tiny completion to the provider
+    WARMUP_REQUIRE_PROVIDER: bool = False  # Failed handshake keeps the instance not ready
+    WARMUP_TIMEOUT_SECONDS: float = 30.0
+
     # SQLite Persistence Settings
     SQLITE_ENABLED: bool = True
     SQLITE_DB_PATH: str = "data/prompt_history.db"
@@ -71,6 +194,14 @@ class Settings(BaseSettings):
     SQLITE_AUTO_CLEANUP: bool = True
     SQLITE_WAL_MODE: bool = True
 
+    # Prompt history writer: bounded buffer flushed in batches (one transaction each)
+    HISTORY_QUEUE_SIZE: int = 1000
+    HISTORY_BATCH_SIZE: int = 50
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 0.5
+    HISTORY_OVERFLOW_POLICY: str = "drop_oldest"  # drop_oldest | block | spill
+    HISTORY_BLOCK_TIMEOUT_SECONDS: float = 1.0
+    HISTORY_SPILL_PATH: str = "data/prompt_history_spill.jsonl"
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
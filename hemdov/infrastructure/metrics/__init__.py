@@ -0,0 +1,18 @@
+"""Operational telemetry (in-process counters, gauges and histograms)."""
+
+from hemdov.infrastructure.metrics.in_process import InProcessMetrics, telemetry
+from hemdov.infrastructure.metrics.instruments import (
+    Counter,
+    Gauge,
+    Histogram,
+    InstrumentRegistry,
+)
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "InProcessMetrics",
+    "InstrumentRegistry",
+    "telemetry",
+]
@@ -0,0 +1,244 @@
+"""
+InProcessMetrics - MetricsPort implementation backed by in-process instruments.
+
+Besides the MetricsPort contract used by domain services, it owns the
+operational metric families of the API (request latency, stage latency,
+degradation flags) and renders all of them for the /metrics endpoint.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+from hemdov.domain.services.token_usage import TokenUsage
+from hemdov.infrastructure.metrics.instruments import InstrumentRegistry
+
+_WINDOW_PATTERN = re.compile(r"^(\d+)([smhd])$")
+_WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Bounded event history for the windowed hit-rate queries
+_MAX_RATE_EVENTS = 10_000
+
+
+def _parse_window(time_window: str) -> float:
+    """Convert '30m', '24h', '7d' to seconds."""
+    match = _WINDOW_PATTERN.match(time_window.strip())
+    if not match:
+        raise ValueError(f"Invalid time window: {time_window!r} (expected e.g. '24h', '7d')")
+    return int(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+
+
+class _RateWindow:
+    """Recent boolean events on the monotonic clock, for windowed rates."""
+
+    def __init__(self):
+        self._events: deque[tuple[float, bool]] = deque(maxlen=_MAX_RATE_EVENTS)
+        self._lock = threading.Lock()
+
+    def add(self, value: bool) -> None:
+        with self._lock:
+            self._events.append((time.monotonic(), value))
+
+    def rate(self, time_window: str) -> float:
+        cutoff = time.monotonic() - _parse_window(time_window)
+        with self._lock:
+            recent = [value for ts, value in self._events if ts >= cutoff]
+        return sum(recent) / len(recent) if recent else 0.0
+
+
+class InProcessMetrics:
+    """
+    Low-overhead telemetry for the prompt improver service.
+
+    Implements MetricsPort. Latencies reported through record_latency() land
+    in the per-stage histogram, which is how pipeline timings (LLM calls,
+    KNN lookups, admission queue wait, OPRO iterations) are exported.
+    """
+
+    def __init__(self):
+        self.registry = InstrumentRegistry()
+        self.requests = self.registry.counter(
+            "prompt_improver_requests_total",
+            "Improve-prompt requests by mode and HTTP status.",
+            ("mode", "status"),
+        )
+        self.request_duration = self.registry.histogram(
+            "prompt_improver_request_duration_seconds",
+            "End-to-end latency of successful improve-prompt requests.",
+            ("strategy", "mode", "provider"),
+        )
+        self.stage_duration = self.registry.histogram(
+            "prompt_improver_stage_duration_seconds",
+            "Latency of individual pipeline stages (llm, knn, queue, opro_iter, ...).",
+            ("stage",),
+        )
+        self.cache_requests = self.registry.counter(
+            "prompt_improver_cache_requests_total",
+            "LLM response cache lookups by result.",
+            ("result",),
+        )
+        self.knn_queries = self.registry.counter(
+            "prompt_improver_knn_queries_total",
+            "KNN few-shot queries by retrieval method.",
+            ("method",),
+        )
+        self.ifeval_results = self.registry.counter(
+            "prompt_improver_ifeval_results_total",
+            "IFEval validation results.",
+            ("passed",),
+        )
+        self.degradations = self.registry.counter(
+            "prompt_improver_degradation_total",
+            "Responses served with a degradation flag set.",
+            ("flag",),
+        )
+        self.circuit_breaker_open = self.registry.gauge(
+            "prompt_improver_circuit_breaker_open",
+            "1 while a circuit breaker is open, else 0.",
+            ("breaker",),
+        )
+        self.circuit_breaker_failures = self.registry.gauge(
+            "prompt_improver_circuit_breaker_failures",
+            "Consecutive failures counted by a circuit breaker.",
+            ("breaker",),
+        )
+        self.circuit_breaker_transitions = self.registry.counter(
+            "prompt_improver_circuit_breaker_transitions_total",
+            "Circuit breaker state transitions by target state.",
+            ("breaker", "state"),
+        )
+        self.admission_in_flight = self.registry.gauge(
+            "prompt_improver_admission_in_flight",
+            "Requests currently holding an admission slot.",
+            ("mode",),
+        )
+        self.admission_queued = self.registry.gauge(
+            "prompt_improver_admission_queued",
+            "Requests waiting in the admission queue.",
+            ("mode",),
+        )
+        self.history_queued = self.registry.gauge(
+            "prompt_improver_history_queue_depth",
+            "Prompt history records buffered for the batched writer.",
+        )
+        self.history_lag = self.registry.gauge(
+            "prompt_improver_history_lag_seconds",
+            "Age of the oldest buffered prompt history record.",
+        )
+        self.provider_calls = self.registry.counter(
+            "prompt_improver_provider_calls_total",
+            "LLM calls routed to each provider by outcome.",
+            ("provider", "outcome"),
+        )
+        self.llm_attempts = self.registry.counter(
+            "prompt_improver_llm_attempts_total",
+            "LLM call attempts: ok, retry, and why retrying stopped (exhausted, deadline, error).",
+            ("provider", "outcome"),
+        )
+        self.llm_tokens = self.registry.counter(
+            "prompt_improver_llm_tokens_total",
+            "Tokens of served requests' LLM calls: prompt, completion, cached (part of prompt).",
+            ("provider", "kind"),
+        )
+        self.llm_hedges = self.registry.counter(
+            "prompt_improver_llm_hedges_total",
+            "Hedged LLM calls: fired, won (hedge first), lost, skipped_budget.",
+            ("outcome",),
+        )
+        self.shadow_runs = self.registry.counter(
+            "prompt_improver_shadow_runs_total",
+            "Shadow candidate runs: sampled, skipped (cap reached), completed, failed.",
+            ("outcome",),
+        )
+        self._cache_window = _RateWindow()
+        self._knn_window = _RateWindow()
+
+    # MetricsPort
+
+    def record_knn_hit(self, used_embeddings: bool, query: str) -> None:
+        self.knn_queries.inc(method="embeddings" if used_embeddings else "bigrams")
+        self._knn_window.add(used_embeddings)
+
+    def record_ifeval_result(self, score: float, passed: bool, prompt_id: str) -> None:
+        self.ifeval_results.inc(passed=str(passed).lower())
+
+    def record_latency(self, operation: str, duration_ms: float) -> None:
+        self.stage_duration.observe(duration_ms / 1000, stage=operation)
+
+    def record_cache_hit(self, hit: bool, key: str) -> None:
+        self.cache_requests.inc(result="hit" if hit else "miss")
+        self._cache_window.add(hit)
+
+    def get_knn_hit_rate(self, time_window: str = "24h") -> float:
+        return self._knn_window.rate(time_window)
+
+    def get_cache_hit_rate(self, time_window: str = "24h") -> float:
+        return self._cache_window.rate(time_window)
+
+    # API-level recording
+
+    def record_request(
+        self,
+        mode: str,
+        status: int,
+        duration_seconds: float | None = None,
+        strategy: str | None = None,
+        provider: str | None = None,
+        degradation_flags: dict[str, bool] | None = None,
+    ) -> None:
+        """Record one finished improve-prompt request."""
+        self.requests.inc(mode=mode, status=str(status))
+        if duration_seconds is not None and strategy is not None:
+            self.request_duration.observe(
+                duration_seconds, strategy=strategy, mode=mode, provider=provider or "unknown"
+            )
+        for flag, active in (degradation_flags or {}).items():
+            if active:
+                self.degradations.inc(flag=flag)
+
+    def record_provider_call(self, provider: str, outcome: str) -> None:
+        """Record one routed LLM call (outcome: ok or error)."""
+        self.provider_calls.inc(provider=provider, outcome=outcome)
+
+    def record_llm_attempt(self, provider: str, outcome: str) -> None:
+        """Record one attempt of an LLM call, or how its retries ended."""
+        self.llm_attempts.inc(provider=provider, outcome=outcome)
+
+    def record_llm_tokens(self, provider: str, usage: TokenUsage) -> None:
+        """Add a request's token usage to the per-provider token counters."""
+        totals = usage.as_dict()
+        for kind in ("prompt", "completion", "cached"):
+            if totals[f"{kind}_tokens"]:
+                self.llm_tokens.inc(totals[f"{kind}_tokens"], provider=provider, kind=kind)
+
+    def prompt_cache_ratios(self) -> dict[str, float]:
+        """Per provider, the share of prompt tokens served from its prompt cache."""
+        totals: dict[str, dict[str, float]] = {}
+        for (provider, kind), value in self.llm_tokens.series().items():
+            totals.setdefault(provider, {})[kind] = value
+        return {
+            provider: round(kinds.get("cached", 0.0) / kinds["prompt"], 3)
+            for provider, kinds in totals.items()
+            if kinds.get("prompt")
+        }
+
+    def record_hedge(self, outcome: str) -> None:
+        """Record a hedging decision or result."""
+        self.llm_hedges.inc(outcome=outcome)
+
+    def record_breaker_transition(self, breaker: str, state: str) -> None:
+        """Record a circuit breaker entering a new state."""
+        self.circuit_breaker_transitions.inc(breaker=breaker, state=state)
+
+    def record_shadow_run(self, outcome: str) -> None:
+        """Record a shadow traffic outcome."""
+        self.shadow_runs.inc(outcome=outcome)
+
+    def render(self) -> str:
+        """All metric families in Prometheus text format."""
+        return self.registry.render()
+
+
+# Process-wide instance served by /metrics
+telemetry = InProcessMetrics()
@@ -0,0 +1,175 @@
+"""
+MetricsWorker - Computes and persists prompt metrics off the request path.
+
+PromptMetricsCalculator is CPU-bound (regex-heavy quality evaluation), so
+running it on the event loop stalls every other request. The API submits a
+MetricsJob to a bounded queue instead; a single daemon thread computes the
+metrics and hands the result back to the submitting event loop to be saved
+by SQLiteMetricsRepository, whose aiosqlite connection belongs to that loop.
+
+When the queue is full the job is dropped and counted - the response is
+never delayed by metrics.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiosqlite
+
+from hemdov.domain.metrics.dimensions import PromptMetrics
+from hemdov.domain.ports.metrics_port import MetricsPort
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on waiting for the event loop to persist one result
+PERSIST_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass
+class MetricsJob:
+    """
+    Everything needed to compute metrics for one improved prompt.
+
+    Attributes:
+        calculation: Keyword arguments for calculate_from_history
+        loop: Event loop that owns the metrics repository connection
+    """
+
+    calculation: dict[str, Any]
+    loop: asyncio.AbstractEventLoop | None = None
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class MetricsWorker:
+    """Bounded queue of MetricsJob drained by one background thread."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        calculate: Callable[..., PromptMetrics],
+        repository_getter: Callable[[], Any | None],
+        max_queue: int = 1000,
+        metrics: MetricsPort | None = None,
+    ):
+        """
+        Args:
+            calculate: Called with a job's calculation kwargs, normally
+                PromptMetricsCalculator.calculate_from_history
+            repository_getter: Returns the metrics repository (or None to skip
+                persistence); called per job so late registration is picked up
+            max_queue: Maximum number of pending jobs before dropping
+            metrics: Optional MetricsPort receiving computation latency
+        """
+        self._calculate = calculate
+        self._repository_getter = repository_getter
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._metrics = metrics
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "dropped": 0, "computed": 0, "persisted": 0, "failed": 0}
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def start(self) -> None:
+        """Start the worker thread (idempotent)."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-worker", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, job: MetricsJob) -> bool:
+        """
+        Enqueue a job without blocking.
+
+        Returns:
+            False if the queue is full and the job was dropped
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Metrics queue full, dropping metrics job")
+            return False
+        self._count("submitted")
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Process already-queued jobs, then stop the thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Metrics worker did not stop within {timeout}s")
+
+    def join(self) -> None:
+        """Block until every submitted job has been processed."""
+        self._queue.join()
+
+    def stats(self) -> dict[str, int]:
+        """Counters plus the current queue depth."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["queued"] = self._queue.qsize()
+        return snapshot
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is self._STOP:
+                    return
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job: MetricsJob) -> None:
+        if self._metrics is not None:
+            # Queue lag: how far behind the request path the worker is running
+            self._metrics.record_latency(
+                "metrics_queue", (time.monotonic() - job.submitted_at) * 1000
+            )
+        start = time.perf_counter()
+        try:
+            metrics = self._calculate(**job.calculation)
+        except (
+            ValueError, TypeError, AttributeError, KeyError,
+            ConnectionError, OSError, RuntimeError, MemoryError,
+        ) as e:
+            self._count("failed")
+            logger.warning(f"Background metrics calculation failed: {type(e).__name__}: {e}")
+            return
+        self._count("computed")
+        if self._metrics is not None:
+            self._metrics.record_latency("metrics", (time.perf_counter() - start) * 1000)
+
+        repository = self._repository_getter()
+        if repository is None or job.loop is None or job.loop.is_closed():
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(repository.save(metrics), job.loop)
+            future.result(timeout=PERSIST_TIMEOUT_SECONDS)
+        except (
+            aiosqlite.Error, ConnectionError, OSError, RuntimeError,
+            # Not the builtin TimeoutError before Python 3.11
+            concurrent.futures.TimeoutError,
+        ) as e:
+            self._count("failed")
+            logger.warning(f"Background metrics persistence failed: {type(e).__name__}: {e}")
+            return
+        self._count("persisted")
@@ -0,0 +1,322 @@
+"""
+HistoryWriter - Bounded, batched background persistence of prompt history.
+
+Improve-prompt used to schedule one task per request to save its history
+record. Nothing bounded those tasks, each record paid for its own commit,
+and anything still pending at shutdown was lost. The API now submits
+records to a HistoryWriter instead:
+
+- Records wait in a bounded in-memory buffer.
+- A flusher task writes them in batches through PromptRepository.save_many
+  (one transaction per batch), every HISTORY_FLUSH_INTERVAL_SECONDS or as
+  soon as a batch fills up.
+- When the buffer is full, the overflow policy decides what happens:
+  drop_oldest, block (wait up to a timeout for space), or spill (append the
+  record to a JSONL file for later replay).
+- close(), registered as a Container cleanup hook, drains the buffer.
+
+The flusher lives on the event loop that submitted the records and is
+restarted on demand, so a writer survives a loop being replaced.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from enum import Enum
+from pathlib import Path
+
+import aiosqlite
+
+from hemdov.domain.entities.prompt_history import PromptHistory
+from hemdov.domain.ports.metrics_port import MetricsPort
+from hemdov.domain.repositories.prompt_repository import PromptRepository
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on draining the buffer at shutdown
+CLOSE_TIMEOUT_SECONDS = 10.0
+
+
+class OverflowPolicy(str, Enum):
+    """What submit() does when the buffer is full."""
+
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+    SPILL = "spill"
+
+
+@dataclass
+class _Pending:
+    entry: PromptHistory
+    request_id: str | None = None
+    mode: str | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class HistoryWriter:
+    """Buffers PromptHistory records and writes them in batches."""
+
+    def __init__(
+        self,
+        repository_getter: Callable[[], Awaitable[PromptRepository | None]],
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval_seconds: float = 0.5,
+        overflow_policy: OverflowPolicy | str = OverflowPolicy.DROP_OLDEST,
+        block_timeout_seconds: float = 1.0,
+        spill_path: str | Path | None = None,
+        metrics: MetricsPort | None = None,
+        on_success: Callable[[], Awaitable[None]] | None = None,
+        on_failure: Callable[[], Awaitable[None]] | None = None,
+        on_release: Callable[[], Awaitable[None]] | None = None,
+    ):
+        """
+        Args:
+            repository_getter: Returns the repository, or None when it is
+                unavailable (e.g. circuit breaker open); called per batch
+            max_queue: Maximum number of buffered records
+            batch_size: Maximum records written per transaction
+            flush_interval_seconds: Longest a record waits for a partial batch
+            overflow_policy: drop_oldest, block or spill
+            block_timeout_seconds: How long submit() waits for space (block)
+            spill_path: JSONL file for spilled records; also receives batches
+                that fail to write when the policy is spill
+            metrics: Optional MetricsPort receiving lag and flush latency
+            on_success: Awaited after each written batch (circuit breaker)
+            on_failure: Awaited after each failed batch (circuit breaker)
+            on_release: Awaited when a batch is not attempted because the
+                repository is unavailable, giving back a claimed probe
+
+        Raises:
+            ValueError: If the policy is unknown, or spill has no spill_path
+        """
+        self._repository_getter = repository_getter
+        self._max_queue = max_queue
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval_seconds
+        self._policy = OverflowPolicy(overflow_policy)
+        self._block_timeout = block_timeout_seconds
+        self._spill_path = Path(spill_path) if spill_path else None
+        self._metrics = metrics
+        self._on_success = on_success
+        self._on_failure = on_failure
+        self._on_release = on_release
+        if self._policy == OverflowPolicy.SPILL and self._spill_path is None:
+            raise ValueError("Overflow policy 'spill' requires a spill_path")
+
+        self._buffer: deque[_Pending] = deque()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._flusher: asyncio.Future | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._space: asyncio.Event | None = None
+        self._closing = False
+        self._stats = {
+            "submitted": 0, "written": 0, "batches": 0,
+            "dropped": 0, "spilled": 0, "failed": 0,
+        }
+
+    # Public API
+
+    async def submit(
+        self, entry: PromptHistory, request_id: str | None = None, mode: str | None = None
+    ) -> bool:
+        """
+        Buffer a record for the next batch.
+
+        Returns:
+            False if the record was not accepted (block policy timed out)
+        """
+        self._ensure_flusher()
+        pending = _Pending(entry, request_id, mode)
+
+        if len(self._buffer) >= self._max_queue:
+            if self._policy == OverflowPolicy.DROP_OLDEST:
+                dropped = self._buffer.popleft()
+                self._stats["dropped"] += 1
+                logger.warning(
+                    "event=persistence_failed reason=queue_full_drop_oldest request_id=%s",
+                    dropped.request_id or "unknown",
+                )
+            elif self._policy == OverflowPolicy.SPILL:
+                await self._spill([pending], reason="queue_full")
+                self._stats["submitted"] += 1
+                return True
+            elif not await self._wait_for_space():
+                self._stats["dropped"] += 1
+                logger.warning(
+                    "event=persistence_failed reason=queue_full_timeout request_id=%s",
+                    request_id or "unknown",
+                )
+                return False
+
+        self._buffer.append(pending)
+        self._stats["submitted"] += 1
+        if len(self._buffer) >= self._batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write everything buffered now; returns the number of records written."""
+        written = 0
+        while self._buffer:
+            written += await self._flush_batch()
+        return written
+
+    async def close(self) -> None:
+        """Drain the buffer and stop the flusher."""
+        self._closing = True
+        flusher = self._flusher
+        if (
+            flusher is not None
+            and not flusher.done()
+            and self._loop is asyncio.get_running_loop()
+        ):
+            # Let the flusher finish its current batch and drain the rest
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(flusher, CLOSE_TIMEOUT_SECONDS)
+            except TimeoutError:
+                logger.warning(
+                    f"History writer did not drain within {CLOSE_TIMEOUT_SECONDS}s, "
+                    f"{len(self._buffer)} records left"
+                )
+        else:
+            await self.flush()
+        self._flusher = None
+        self._closing = False
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters, queue depth and the age of the oldest buffered record."""
+        snapshot: dict[str, int | float] = dict(self._stats)
+        snapshot["queued"] = len(self._buffer)
+        snapshot["lag_seconds"] = self.lag_seconds()
+        return snapshot
+
+    def lag_seconds(self) -> float:
+        """How long the oldest buffered record has been waiting."""
+        if not self._buffer:
+            return 0.0
+        return round(time.monotonic() - self._buffer[0].enqueued_at, 3)
+
+    # Flusher
+
+    def _ensure_flusher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # New (or first) event loop: its events and task belong to it
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Event()
+            self._flusher = None
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            self._wakeup.clear()
+            while self._buffer:
+                await self._flush_batch()
+            if self._closing:
+                return
+
+    async def _wait_for_space(self) -> bool:
+        deadline = time.monotonic() + self._block_timeout
+        while len(self._buffer) >= self._max_queue:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except TimeoutError:
+                return False
+        return True
+
+    async def _flush_batch(self) -> int:
+        batch = [self._buffer.popleft() for _ in range(min(self._batch_size, len(self._buffer)))]
+        if self._space is not None:
+            self._space.set()
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            repository = await self._repository_getter()
+            if repository is None:
+                if self._on_release is not None:
+                    await self._on_release()
+                await self._handle_failure(batch, "repository_unavailable", record=False)
+                return 0
+            await repository.save_many([pending.entry for pending in batch])
+        except (
+            aiosqlite.Error, ConnectionError, OSError, TimeoutError,
+            ValueError, KeyError, TypeError,
+        ) as e:
+            await self._handle_failure(batch, type(e).__name__, error=e)
+            return 0
+
+        if self._on_success is not None:
+            await self._on_success()
+        self._stats["written"] += len(batch)
+        self._stats["batches"] += 1
+        if self._metrics is not None:
+            now = time.monotonic()
+            self._metrics.record_latency("history_flush", (time.perf_counter() - start) * 1000)
+            for pending in batch:
+                self._metrics.record_latency("history_lag", (now - pending.enqueued_at) * 1000)
+        logger.debug(f"Wrote {len(batch)} prompt history records")
+        return len(batch)
+
+    async def _handle_failure(
+        self,
+        batch: list[_Pending],
+        reason: str,
+        error: Exception | None = None,
+        record: bool = True,
+    ) -> None:
+        if record and self._on_failure is not None:
+            await self._on_failure()
+        logger.error(
+            "event=persistence_failed reason=%s records=%s request_ids=%s error=%s",
+            reason,
+            len(batch),
+            ",".join(pending.request_id or "unknown" for pending in batch),
+            error,
+        )
+        if self._policy == OverflowPolicy.SPILL:
+            await self._spill(batch, reason=reason)
+        else:
+            self._stats["failed"] += len(batch)
+
+    async def _spill(self, batch: list[_Pending], reason: str) -> None:
+        lines = [
+            json.dumps({
+                "spilled_at": datetime.now(UTC).isoformat(),
+                "reason": reason,
+                "request_id": pending.request_id,
+                "mode": pending.mode,
+                "history": asdict(pending.entry),
+            })
+            for pending in batch
+        ]
+        try:
+            await asyncio.to_thread(self._append_lines, lines)
+        except OSError as e:
+            self._stats["failed"] += len(batch)
+            logger.error(f"Failed to spill {len(batch)} history records: {type(e).__name__}: {e}")
+            return
+        self._stats["spilled"] += len(batch)
+
+    def _append_lines(self, lines: list[str]) -> None:
+        self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._spill_path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
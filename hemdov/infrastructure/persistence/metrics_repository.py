@@ -47,6 +47,11 @@ class SQLiteMetricsRepository:
         self._connection: aiosqlite.Connection | None = None
         self._lock = asyncio.Lock()
 
+    @property
+    def is_initialized(self) -> bool:
+        """Whether the connection is open (initialize() called, close() not yet)."""
+        return self._connection is not None
+
     async def initialize(self):
         """
         Initialize database connection and schema.
@@ -341,6 +346,11 @@ class SQLiteMetricsRepository:
             provider=perf_data["provider"],
             model=perf_data["model"],
             backend=perf_data["backend"],
+            # Absent from metrics stored before usage was recorded
+            input_tokens=perf_data.get("input_tokens", 0),
+            output_tokens=perf_data.get("output_tokens", 0),
+            cached_tokens=perf_data.get("cached_tokens", 0),
+            tokens_estimated=perf_data.get("tokens_estimated", True),
         )
 
         # Reconstruct impact metrics
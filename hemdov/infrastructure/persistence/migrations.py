@@ -34,6 +34,8 @@ CREATE_INDEXES_SQL = [
     "CREATE INDEX IF NOT EXISTS idx_backend ON prompt_history(backend);",
     "CREATE INDEX IF NOT EXISTS idx_provider ON prompt_history(provider);",
     "CREATE INDEX IF NOT EXISTS idx_confidence ON prompt_history(confidence);",
+    # Cached-response fallback looks up the latest improvement of an idea
+    "CREATE INDEX IF NOT EXISTS idx_original_idea ON prompt_history(original_idea);",
 ]
 
 # ============================================================================
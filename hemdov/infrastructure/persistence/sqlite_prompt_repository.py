@@ -79,6 +79,33 @@ class SQLitePromptRepository(PromptRepository):
 
         logger.info(f"SQLite repository initialized: {self.db_path}")
 
+    _INSERT_SQL = """
+        INSERT INTO prompt_history (
+            created_at, original_idea, context, improved_prompt,
+            role, directive, framework, guardrails, reasoning,
+            confidence, backend, model, provider, latency_ms
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    @staticmethod
+    def _insert_params(history: PromptHistory) -> tuple:
+        return (
+            history.created_at,
+            history.original_idea,
+            history.context,
+            history.improved_prompt,
+            history.role,
+            history.directive,
+            history.framework,
+            json.dumps(history.guardrails),
+            history.reasoning,
+            history.confidence,
+            history.backend,
+            history.model,
+            history.provider,
+            history.latency_ms,
+        )
+
     async def save(self, history: PromptHistory) -> int:
         """
         Save a prompt history record to database.
@@ -92,36 +119,42 @@ class SQLitePromptRepository(PromptRepository):
         async with self._lock:
             conn = await self._get_connection()
 
-            cursor = await conn.execute(
-                """
-                INSERT INTO prompt_history (
-                    created_at, original_idea, context, improved_prompt,
-                    role, directive, framework, guardrails, reasoning,
-                    confidence, backend, model, provider, latency_ms
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    history.created_at,
-                    history.original_idea,
-                    history.context,
-                    history.improved_prompt,
-                    history.role,
-                    history.directive,
-                    history.framework,
-                    json.dumps(history.guardrails),
-                    history.reasoning,
-                    history.confidence,
-                    history.backend,
-                    history.model,
-                    history.provider,
-                    history.latency_ms,
-                ),
-            )
+            cursor = await conn.execute(self._INSERT_SQL, self._insert_params(history))
             await conn.commit()
 
             logger.debug(f"Saved prompt history (id={cursor.lastrowid})")
             return cursor.lastrowid
 
+    async def save_many(self, histories: list[PromptHistory]) -> int:
+        """
+        Save several prompt history records in a single transaction.
+
+        Either every record is written or none is: on error the transaction
+        is rolled back and the exception propagates.
+
+        Args:
+            histories: PromptHistory entities to persist
+
+        Returns:
+            Number of records inserted
+        """
+        if not histories:
+            return 0
+
+        async with self._lock:
+            conn = await self._get_connection()
+            try:
+                await conn.executemany(
+                    self._INSERT_SQL, [self._insert_params(history) for history in histories]
+                )
+                await conn.commit()
+            except aiosqlite.Error:
+                await conn.rollback()
+                raise
+
+            logger.debug(f"Saved {len(histories)} prompt history records in one transaction")
+            return len(histories)
+
     async def find_by_id(self, history_id: int) -> PromptHistory | None:
         """
         Find a prompt history record by ID.
@@ -212,6 +245,34 @@ class SQLitePromptRepository(PromptRepository):
                 rows = await cursor.fetchall()
                 return [self._row_to_entity(row) for row in rows]
 
+    async def find_latest(self, original_idea: str, context: str) -> PromptHistory | None:
+        """
+        Find the most recent improvement of exactly this idea and context.
+
+        Args:
+            original_idea: Idea as submitted
+            context: Context as submitted
+
+        Returns:
+            PromptHistory if found, None otherwise
+        """
+        async with self._lock:
+            conn = await self._get_connection()
+
+            async with conn.execute(
+                """
+                SELECT * FROM prompt_history
+                WHERE original_idea = ? AND context = ?
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (original_idea, context),
+            ) as cursor:
+                row = await cursor.fetchone()
+                if row:
+                    return self._row_to_entity(row)
+                return None
+
     async def delete_old_records(self, days: int) -> int:
         """
         Delete prompt history records older than specified days.
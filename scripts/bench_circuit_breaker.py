@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Microbenchmark the history circuit breaker's closed-state overhead.
+
+Times one guarded call (should_attempt + record_success) against a bare
+coroutine doing no work, for the current breaker and for the previous
+lock + datetime.now() design, so the per-request cost of the guard is
+visible in isolation.
+
+Usage:
+    python scripts/bench_circuit_breaker.py [--iterations N]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.circuit_breaker import CircuitBreaker
+
+
+class LockedBreaker:
+    """The previous design: an asyncio.Lock and a wall-clock read per call."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._failure_count = 0
+        self._disabled_until: datetime | None = None
+
+    async def should_attempt(self) -> bool:
+        async with self._lock:
+            return not (self._disabled_until and datetime.now(UTC) < self._disabled_until)
+
+    async def record_success(self):
+        async with self._lock:
+            self._failure_count = 0
+            self._disabled_until = None
+
+
+async def _noop():
+    return True
+
+
+async def _bench(label: str, breaker, iterations: int, baseline_ns: float | None) -> float:
+    start = time.perf_counter_ns()
+    if breaker is None:
+        for _ in range(iterations):
+            await _noop()
+            await _noop()
+    else:
+        for _ in range(iterations):
+            await breaker.should_attempt()
+            await breaker.record_success()
+    per_call = (time.perf_counter_ns() - start) / iterations
+    overhead = "" if baseline_ns is None else f"  (+{per_call - baseline_ns:6.0f} ns over bare)"
+    sys.stdout.write(f"{label:<28} {per_call:8.0f} ns/call{overhead}\n")
+    return per_call
+
+
+async def main(iterations: int) -> None:
+    sys.stdout.write(f"{iterations} guarded calls, closed breaker\n\n")
+    baseline = await _bench("bare coroutines", None, iterations, None)
+    await _bench("CircuitBreaker", CircuitBreaker(), iterations, baseline)
+    await _bench(
+        "CircuitBreaker (window=50)", CircuitBreaker(window_size=50), iterations, baseline
+    )
+    await _bench("lock + datetime (previous)", LockedBreaker(), iterations, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    asyncio.run(main(parser.parse_args().iterations))
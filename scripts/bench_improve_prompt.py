@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Load-test /api/v1/improve-prompt in process, against the fake LLM provider.
+
+Runs the real FastAPI app (lifespan, admission control, strategies, DSPy,
+history) through an ASGI transport with LLM_PROVIDER=fake, so the whole
+stack can be benchmarked under concurrency with no network. Any LLM_FAKE_*
+or other setting can be overridden through the environment; prompt history
+goes to a temporary database unless SQLITE_DB_PATH is set.
+
+Usage:
+    python scripts/bench_improve_prompt.py [--requests N] [--concurrency C] [--mode legacy|nlac]
+    LLM_FAKE_RECORDINGS_PATH=data/llm_cache.sqlite LLM_FAKE_RATE_LIMIT_RATE=0.05 \\
+        python scripts/bench_improve_prompt.py --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+IDEAS = [
+    "Write release notes for version 2.0 of our CLI",
+    "Design a caching layer for a Django REST API",
+    "Summarize customer interviews into product insights",
+    "Debug a memory leak in a Node.js worker",
+    "Plan a database migration from MySQL to Postgres",
+    "Create onboarding docs for new backend engineers",
+]
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+async def _run(requests: int, concurrency: int, mode: str) -> None:
+    import httpx
+
+    from api.main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+
+    async def one(client: httpx.AsyncClient, index: int) -> None:
+        async with semaphore:
+            body = {"idea": f"{IDEAS[index % len(IDEAS)]} (#{index})", "mode": mode}
+            start = time.perf_counter()
+            response = await client.post("/api/v1/improve-prompt", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(client, i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+            health = (await client.get("/health")).json()
+
+    lines = [
+        f"{requests} requests, concurrency {concurrency}, mode {mode}: {elapsed:.2f}s "
+        f"({requests / elapsed:.1f} req/s)",
+        f"  status: {dict(sorted(statuses.items()))}",
+        f"  latency ms: p50 {statistics.median(latencies):.0f}  "
+        f"p95 {_percentile(latencies, 0.95):.0f}  p99 {_percentile(latencies, 0.99):.0f}  "
+        f"max {max(latencies):.0f}",
+    ]
+    for key in ("admission", "providers", "cancellations"):
+        if key in health:
+            lines.append(f"  {key}: {health[key]}")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the improve-prompt endpoint offline")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests (default: 200)")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Requests in flight (default: 16)"
+    )
+    parser.add_argument("--mode", choices=["legacy", "nlac"], default="legacy")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("LLM_MODEL", "bench")
+    os.environ.setdefault("SQLITE_DB_PATH", str(Path(tempfile.mkdtemp()) / "bench_history.db"))
+    asyncio.run(_run(args.requests, args.concurrency, args.mode))
+
+
+if __name__ == "__main__":
+    main()
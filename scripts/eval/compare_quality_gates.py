@@ -9,7 +9,7 @@ Evaluates:
 - Review rate
 
 Usage:
-    python scripts/compare_quality_gates.py [--subset N]
+    python scripts/compare_quality_gates.py [--subset N] [--llm-cache PATH [--replay]]
 """
 
 import argparse
@@ -199,7 +199,13 @@ def main():
     parser.add_argument("--subset", type=int, default=10, help="Number of test cases to evaluate (default: 10)")
     parser.add_argument("--dataset", type=str, default="/Users/felipe_gonzalez/Developer/raycast_ext/dashboard/testdata/cases.jsonl",
                        help="Path to test dataset")
+    parser.add_argument("--llm-cache", type=str, default=None,
+                       help="SQLite LLM response cache; reruns answer repeated calls from it")
+    parser.add_argument("--replay", action="store_true",
+                       help="Only serve calls recorded in --llm-cache, never call the provider")
     args = parser.parse_args()
+    if args.replay and not args.llm_cache:
+        parser.error("--replay requires --llm-cache")
 
     # Load test cases
     print(f"📂 Loading test cases from {args.dataset}...")
@@ -213,14 +219,22 @@ def main():
 
     from eval.src.dspy_prompt_improver import PromptImprover
     from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import create_deepseek_adapter
+    from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
     from hemdov.infrastructure.config import Settings
     from hemdov.interfaces import container
 
     settings = container.get(Settings)
+    cache = None
+    if args.llm_cache:
+        # No TTL: a recorded run stays replayable
+        cache = LLMResponseCache(
+            args.llm_cache, ttl_seconds=None, mode="replay" if args.replay else "readwrite"
+        )
     lm = create_deepseek_adapter(
         model=settings.LLM_MODEL,
         api_key=settings.DEEPSEEK_API_KEY,
         temperature=0.0,
+        cache=cache,
     )
     dspy.configure(lm=lm)
     print(f"   ✓ Configured with {settings.LLM_MODEL}")
@@ -252,11 +266,14 @@ def main():
     output_path = f"/Users/felipe_gonzalez/Developer/raycast_ext/eval/quality-gates-comparison-{args.subset}cases.json"
     print(f"\n💾 Saving results to {output_path}...")
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    results = {
+        "zero_shot": zero_shot_results,
+        "fewshot": fewshot_results,
+    }
+    if cache is not None:
+        results["llm_cache"] = cache.stats()
     with open(output_path, 'w') as f:
-        json.dump({
-            "zero_shot": zero_shot_results,
-            "fewshot": fewshot_results,
-        }, f, indent=2)
+        json.dump(results, f, indent=2)
     print("   ✓ Results saved")
 
 
@@ -1,6 +1,7 @@
 # tests/conftest.py
 import asyncio
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -16,3 +17,13 @@ def event_loop():
     loop = asyncio.new_event_loop()
     yield loop
     loop.close()
+
+
+@pytest.fixture
+def fresh_history_writer():
+    """Start from no module-level history writer; its cleanup hook is discarded."""
+    from hemdov.interfaces import container
+
+    with patch("api.prompt_improver_api._history_writer", None), \
+         patch.object(container, "_cleanup_hooks", []):
+        yield
@@ -0,0 +1,163 @@
+"""Tests for improve endpoint admission control.
+
+Tests cover:
+- Slots are granted up to the per-mode limit, then queued FIFO
+- Full queue rejects with 429, long expected/actual waits with 503
+- Bound slots are released only when the worker future completes
+- Endpoint maps rejections to HTTP status with Retry-After
+"""
+
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.admission import AdmissionController, AdmissionRejected
+from api.main import app
+
+
+def _controller(limit=1, max_queue=2, max_wait=1.0, service=0.1):
+    return AdmissionController(
+        limits={"legacy": limit, "nlac": limit},
+        max_queue=max_queue,
+        max_wait_seconds=max_wait,
+        initial_service_seconds=service,
+    )
+
+
+def test_admits_up_to_limit_without_waiting():
+    async def run():
+        controller = _controller(limit=2)
+        first = await controller.acquire("legacy")
+        second = await controller.acquire("legacy")
+        return controller.snapshot()["legacy"], first, second
+
+    snapshot, first, second = asyncio.run(run())
+    assert snapshot["in_flight"] == 2
+    assert snapshot["queued"] == 0
+    assert first.wait_seconds == 0.0
+
+
+def test_modes_have_independent_pools():
+    async def run():
+        controller = _controller(limit=1, max_queue=0)
+        await controller.acquire("nlac")
+        # legacy is unaffected by a saturated nlac pool
+        await controller.acquire("legacy")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("nlac")
+
+    asyncio.run(run())
+
+
+def test_waiters_are_served_fifo():
+    async def run():
+        controller = _controller(limit=1, max_queue=3)
+        holder = await controller.acquire("legacy")
+        order = []
+
+        async def wait(name):
+            slot = await controller.acquire("legacy")
+            order.append(name)
+            slot.release()
+
+        tasks = [asyncio.ensure_future(wait(n)) for n in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        assert controller.snapshot()["legacy"]["queued"] == 3
+        holder.release()
+        await asyncio.gather(*tasks)
+        return order, controller.snapshot()["legacy"]
+
+    order, snapshot = asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert snapshot["in_flight"] == 0
+    assert snapshot["admitted"] == 4
+
+
+def test_full_queue_rejects_with_429():
+    async def run():
+        controller = _controller(limit=1, max_queue=0)
+        await controller.acquire("legacy")
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("legacy")
+        return exc_info.value, controller.snapshot()["legacy"]
+
+    exc, snapshot = asyncio.run(run())
+    assert exc.status_code == 429
+    assert exc.retry_after >= 1
+    assert snapshot["rejected_queue_full"] == 1
+
+
+def test_long_estimated_wait_rejects_with_503_without_queueing():
+    async def run():
+        controller = _controller(limit=1, max_queue=5, max_wait=1.0, service=30.0)
+        await controller.acquire("legacy")
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("legacy")
+        return exc_info.value, controller.snapshot()["legacy"]
+
+    exc, snapshot = asyncio.run(run())
+    assert exc.status_code == 503
+    assert exc.reason == "estimated_wait_exceeded"
+    assert exc.retry_after == 30
+    assert snapshot["queued"] == 0
+
+
+def test_wait_timeout_rejects_with_503_and_leaves_queue():
+    async def run():
+        controller = _controller(limit=1, max_queue=2, max_wait=0.05, service=0.01)
+        await controller.acquire("legacy")
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("legacy")
+        return exc_info.value, controller.snapshot()["legacy"]
+
+    exc, snapshot = asyncio.run(run())
+    assert exc.status_code == 503
+    assert exc.reason == "wait_timeout"
+    assert snapshot["queued"] == 0
+    assert snapshot["rejected_wait"] == 1
+
+
+def test_bound_slot_released_when_work_finishes():
+    async def run():
+        controller = _controller(limit=1)
+        slot = await controller.acquire("legacy")
+        work = asyncio.get_running_loop().create_future()
+        slot.bind(work)
+        slot.release_if_unbound()
+        busy = controller.snapshot()["legacy"]["in_flight"]
+        work.set_result(None)
+        await asyncio.sleep(0)
+        return busy, controller.snapshot()["legacy"]["in_flight"]
+
+    busy, after = asyncio.run(run())
+    assert busy == 1
+    assert after == 0
+
+
+def test_endpoint_returns_retry_after_on_rejection():
+    controller = Mock()
+
+    async def reject(mode):
+        raise AdmissionRejected(429, 7, mode, "queue_full")
+
+    controller.acquire = reject
+
+    with patch("api.prompt_improver_api.get_admission_controller", return_value=controller), \
+         patch("api.prompt_improver_api.get_strategy_selector") as mock_selector:
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "nlac"}
+        )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    mock_selector.assert_not_called()
+
+
+def test_health_reports_admission_pools():
+    response = TestClient(app).get("/health")
+    assert response.status_code == 200
+    admission = response.json()["admission"]
+    assert set(admission) == {"legacy", "nlac"}
+    assert admission["nlac"]["limit"] <= admission["legacy"]["limit"]
@@ -371,36 +371,37 @@ class TestPersistenceDisabled:
             mock_selector.get_complexity.return_value = MagicMock(value="medium")
             mock_get_selector.return_value = mock_selector
 
-            # Mock Settings to disable persistence
-            with patch('api.prompt_improver_api.container') as mock_container:
-                from hemdov.infrastructure.config import Settings
-                mock_settings = Settings(SQLITE_ENABLED=False)
-                mock_container.get.return_value = mock_settings
-
-                # Mock repository to return None (disabled)
-                with patch('api.prompt_improver_api.get_repository', return_value=AsyncMock(return_value=None)):
-                    # Make request
-                    response = client.post(
-                        "/api/v1/improve-prompt",
-                        json={
-                            "idea": "Design code review process",
-                            "context": "Engineering team needs structured reviews"
-                        }
-                    )
-
-                    # Assert response is still successful
-                    assert response.status_code == 200
-                    data = response.json()
-                    assert "improved_prompt" in data
-                    assert "role" in data
-                    assert "directive" in data
-                    assert "framework" in data
-                    assert "guardrails" in data
-                    assert "backend" in data
-
-                    # Verify the response is complete despite persistence being disabled
-                    assert data["improved_prompt"] == mock_dspy_result.improved_prompt
-                    assert data["role"] == mock_dspy_result.role
+            # Container holding only Settings with persistence disabled; other
+            # lookups (e.g. the metrics repository) fail as unregistered
+            from hemdov.infrastructure.config import Settings
+            from hemdov.interfaces import Container
+            mock_container = Container()
+            mock_container.register(Settings, Settings(SQLITE_ENABLED=False))
+            with patch('api.prompt_improver_api.container', mock_container), \
+                 patch('api.prompt_improver_api.get_repository',
+                       return_value=AsyncMock(return_value=None)):
+                # Make request
+                response = client.post(
+                    "/api/v1/improve-prompt",
+                    json={
+                        "idea": "Design code review process",
+                        "context": "Engineering team needs structured reviews"
+                    }
+                )
+
+                # Assert response is still successful
+                assert response.status_code == 200
+                data = response.json()
+                assert "improved_prompt" in data
+                assert "role" in data
+                assert "directive" in data
+                assert "framework" in data
+                assert "guardrails" in data
+                assert "backend" in data
+
+                # Verify the response is complete despite persistence being disabled
+                assert data["improved_prompt"] == mock_dspy_result.improved_prompt
+                assert data["role"] == mock_dspy_result.role
 
     def test_improve_prompt_with_circuit_breaker_open(self, client, mock_dspy_result):
         """
@@ -413,6 +414,7 @@ class TestPersistenceDisabled:
         """
         # Import the module to patch the circuit breaker at module level
         import api.prompt_improver_api as api_module
+        from hemdov.infrastructure.adapters.provider_breaker import BreakerState
 
         # Mock the StrategySelector to return a mock strategy
         with patch('api.prompt_improver_api.get_strategy_selector') as mock_get_selector:
@@ -427,9 +429,10 @@ class TestPersistenceDisabled:
             mock_selector.get_complexity.return_value = MagicMock(value="high")
             mock_get_selector.return_value = mock_selector
 
-            # Mock circuit breaker to be open (should_attempt returns False)
+            # Mock circuit breaker to be open
             original_breaker = api_module._circuit_breaker
             mock_breaker = MagicMock()
+            mock_breaker.state = BreakerState.OPEN
             mock_breaker.should_attempt = AsyncMock(return_value=False)
             mock_breaker.record_success = AsyncMock()
             mock_breaker.record_failure = AsyncMock()
@@ -453,8 +456,10 @@ class TestPersistenceDisabled:
                 assert "role" in data
                 assert "directive" in data
 
-                # Verify circuit breaker was checked
-                mock_breaker.should_attempt.assert_called()
+                # Open breaker: the record is skipped without claiming a probe
+                mock_breaker.should_attempt.assert_not_called()
+                mock_breaker.record_success.assert_not_called()
+                mock_breaker.record_failure.assert_not_called()
             finally:
                 # Restore original circuit breaker
                 api_module._circuit_breaker = original_breaker
@@ -641,10 +646,13 @@ class TestNonBlockingSave:
         import asyncio
         from unittest.mock import AsyncMock, patch
 
-        # Mock save to take 1 second
+        # Mock the batched save to take 1 second
         async def slow_save(*args, **kwargs):
             await asyncio.sleep(1)
 
+        slow_repo = AsyncMock()
+        slow_repo.save_many.side_effect = slow_save
+
         # Mock the StrategySelector to return a mock strategy
         with patch('api.prompt_improver_api.get_strategy_selector') as mock_get_selector:
             # Create mock strategy
@@ -658,20 +666,21 @@ class TestNonBlockingSave:
             mock_selector.get_complexity.return_value = MagicMock(value="low")
             mock_get_selector.return_value = mock_selector
 
-            # Mock repository
-            with patch('api.prompt_improver_api.get_repository', return_value=AsyncMock()):
-                # Patch _save_history_async to be slow
-                with patch('api.prompt_improver_api._save_history_async', new=slow_save):
-                    import time
-                    start = time.time()
+            # Mock repository; flushing the history writer is slow
+            with patch('api.prompt_improver_api.get_repository', return_value=slow_repo), \
+                 patch('api.prompt_improver_api._history_writer', None):
+                import time
+                start = time.time()
 
-                    response = client.post(
-                        "/api/v1/improve-prompt",
-                        json={"idea": "test blocking behavior", "context": "testing"}
-                    )
+                response = client.post(
+                    "/api/v1/improve-prompt",
+                    json={"idea": "test blocking behavior", "context": "testing"}
+                )
 
-                    elapsed = time.time() - start
+                elapsed = time.time() - start
 
-                    # Should respond immediately (< 100ms), not wait for save
-                    assert response.status_code == 200
-                    assert elapsed < 0.5, f"Response took {elapsed:.2f}s, should be < 0.5s (non-blocking)"
+                # Should respond immediately (< 100ms), not wait for save
+                assert response.status_code == 200
+                assert elapsed < 0.5, (
+                    f"Response took {elapsed:.2f}s, should be < 0.5s (non-blocking)"
+                )
@@ -0,0 +1,283 @@
+"""Tests for cooperative cancellation of improve-prompt work.
+
+Covers:
+- CancellationToken deadline and idempotent cancel
+- OPRO / Reflexion loops stop at their checkpoints
+- LiteLLM adapter never starts a call for a cancelled request and caps its timeout
+- API runner cancels the token on timeout and on client disconnect
+"""
+
+import asyncio
+import threading
+import time
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from hemdov.domain.dto.nlac_models import PromptObject
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+    cancellation_stats,
+    get_current_token,
+    raise_if_cancelled,
+)
+from hemdov.domain.services.oprop_optimizer import OPROOptimizer
+from hemdov.domain.services.reflexion_service import ReflexionService
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
+    PromptImproverLiteLLMAdapter,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    cancellation_stats.reset()
+    yield
+    cancellation_stats.reset()
+
+
+def _prompt_obj() -> PromptObject:
+    now = datetime.now(UTC).isoformat()
+    return PromptObject(
+        id="test-id",
+        version="1.0.0",
+        intent_type="generate",
+        template="Write a function",
+        strategy_meta={"intent": "generate", "complexity": "simple"},
+        constraints={"max_tokens": 500},
+        created_at=now,
+        updated_at=now,
+    )
+
+
+class TestCancellationToken:
+    def test_cancel_is_idempotent_and_counted_once(self):
+        token = CancellationToken()
+        assert token.cancel(CancelReason.CLIENT_DISCONNECTED) is True
+        assert token.cancel(CancelReason.TIMEOUT) is False
+        assert token.reason == CancelReason.CLIENT_DISCONNECTED
+        assert cancellation_stats.snapshot()["requests"] == {"client_disconnected": 1}
+
+    def test_deadline_expiry_cancels_with_timeout(self):
+        token = CancellationToken(timeout_seconds=0)
+        assert token.cancelled is True
+        assert token.reason == CancelReason.TIMEOUT
+        assert token.remaining() == 0.0
+
+    def test_child_follows_parent_but_cancels_alone(self):
+        parent = CancellationToken(timeout_seconds=5)
+        child = parent.child()
+        assert 0 < child.remaining() <= 5
+
+        child.cancel(CancelReason.SUPERSEDED)
+        assert parent.cancelled is False
+        # Abandoned attempts are not counted as cancelled requests
+        assert cancellation_stats.snapshot()["requests"] == {}
+
+        other = parent.child()
+        parent.cancel(CancelReason.CLIENT_DISCONNECTED)
+        assert other.cancelled is True
+        assert other.reason == CancelReason.CLIENT_DISCONNECTED
+
+    def test_unbounded_token_has_no_remaining(self):
+        token = CancellationToken()
+        assert token.remaining() is None
+        assert token.cancelled is False
+
+    def test_checkpoint_raises_and_records_stage(self):
+        token = CancellationToken()
+        token.cancel(CancelReason.TIMEOUT)
+        with pytest.raises(OperationCancelledError) as exc_info:
+            token.raise_if_cancelled("opro_iteration")
+        assert exc_info.value.stage == "opro_iteration"
+        assert cancellation_stats.snapshot()["aborted_work"] == {"opro_iteration": 1}
+
+    def test_module_checkpoint_is_noop_without_scope(self):
+        assert get_current_token() is None
+        raise_if_cancelled("anything")
+
+    def test_scope_binds_and_restores(self):
+        token = CancellationToken()
+        with cancellation_scope(token):
+            assert get_current_token() is token
+        assert get_current_token() is None
+
+
+class TestPipelineCheckpoints:
+    def test_opro_stops_after_cancel(self):
+        token = CancellationToken()
+        optimizer = OPROOptimizer(llm_client=None, knn_provider=None)
+
+        # Cancel while the first iteration is evaluated (score below early-stop)
+        def evaluate_then_cancel(prompt_obj):
+            token.cancel(CancelReason.CLIENT_DISCONNECTED)
+            return 0.5, "needs work"
+
+        optimizer._evaluate = evaluate_then_cancel
+
+        with cancellation_scope(token), pytest.raises(OperationCancelledError):
+            optimizer.run_loop(_prompt_obj())
+
+        assert cancellation_stats.snapshot()["aborted_work"] == {"opro_iteration": 1}
+
+    def test_reflexion_propagates_cancellation_from_llm(self):
+        llm = Mock()
+        llm.generate.side_effect = OperationCancelledError(CancelReason.TIMEOUT, "llm_call")
+        service = ReflexionService(llm_client=llm)
+
+        with pytest.raises(OperationCancelledError):
+            service.refine(prompt="Fix the bug", error_type="ZeroDivisionError")
+
+    def test_reflexion_does_not_start_when_cancelled(self):
+        llm = Mock()
+        service = ReflexionService(llm_client=llm)
+        token = CancellationToken()
+        token.cancel(CancelReason.TIMEOUT)
+
+        with cancellation_scope(token), pytest.raises(OperationCancelledError):
+            service.refine(prompt="Fix the bug", error_type="ZeroDivisionError")
+        llm.generate.assert_not_called()
+
+
+class TestAdapterCancellation:
+    def _adapter(self):
+        adapter = PromptImproverLiteLLMAdapter(model="openai/test", api_key="x")
+        adapter.litellm = Mock()
+        adapter.litellm.completion.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))]
+        )
+        return adapter
+
+    def test_no_call_when_cancelled(self):
+        adapter = self._adapter()
+        token = CancellationToken()
+        token.cancel(CancelReason.CLIENT_DISCONNECTED)
+        with cancellation_scope(token), pytest.raises(OperationCancelledError):
+            adapter(prompt="hello")
+        adapter.litellm.completion.assert_not_called()
+
+    def test_timeout_capped_to_remaining_budget(self):
+        adapter = self._adapter()
+        with cancellation_scope(CancellationToken(timeout_seconds=5)):
+            assert adapter(prompt="hello", timeout=60) == ["ok"]
+        timeout = adapter.litellm.completion.call_args.kwargs["timeout"]
+        assert 0 < timeout <= 5
+
+    def test_result_discarded_when_cancelled_in_flight(self):
+        adapter = self._adapter()
+        token = CancellationToken()
+
+        def complete_after_disconnect(**kwargs):
+            token.cancel(CancelReason.CLIENT_DISCONNECTED)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="late"))]
+            )
+
+        adapter.litellm.completion.side_effect = complete_after_disconnect
+        with cancellation_scope(token), pytest.raises(OperationCancelledError):
+            adapter(prompt="hello")
+
+    def test_no_token_leaves_params_untouched(self):
+        adapter = self._adapter()
+        adapter(prompt="hello")
+        assert "timeout" not in adapter.litellm.completion.call_args.kwargs
+
+
+class _BlockingStrategy:
+    """Strategy that loops on the current token like an OPRO run would."""
+
+    name = "blocking"
+
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def improve(self, original_idea, context):
+        try:
+            for _ in range(200):
+                raise_if_cancelled("test_iteration")
+                time.sleep(0.01)
+            return SimpleNamespace(improved_prompt="never")
+        finally:
+            self.stopped.set()
+
+
+class TestApiRunner:
+    def _request(self):
+        from api.prompt_improver_api import ImprovePromptRequest
+
+        return ImprovePromptRequest(idea="Test idea for cancellation")
+
+    def test_timeout_cancels_worker(self):
+        from api.prompt_improver_api import _run_strategy_cancellable
+
+        strategy = _BlockingStrategy()
+        http_request = Mock()
+
+        async def never_disconnected():
+            return False
+
+        http_request.is_disconnected = never_disconnected
+        token = CancellationToken()
+
+        async def run():
+            with cancellation_scope(token):
+                await asyncio.wait_for(
+                    _run_strategy_cancellable(strategy, self._request(), http_request, token),
+                    timeout=0.1,
+                )
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run())
+
+        assert token.reason == CancelReason.TIMEOUT
+        assert strategy.stopped.wait(timeout=2)
+        assert cancellation_stats.snapshot()["aborted_work"] == {"test_iteration": 1}
+
+    def test_disconnect_cancels_worker(self):
+        from api.prompt_improver_api import _run_strategy_cancellable
+
+        strategy = _BlockingStrategy()
+        http_request = Mock()
+
+        async def disconnected():
+            return True
+
+        http_request.is_disconnected = disconnected
+        token = CancellationToken()
+
+        async def run():
+            with cancellation_scope(token):
+                await _run_strategy_cancellable(strategy, self._request(), http_request, token)
+
+        with pytest.raises(OperationCancelledError) as exc_info:
+            asyncio.run(run())
+
+        assert exc_info.value.reason == CancelReason.CLIENT_DISCONNECTED
+        assert strategy.stopped.wait(timeout=2)
+
+    def test_endpoint_returns_499_on_disconnect(self):
+        from fastapi.testclient import TestClient
+
+        from api.main import app
+
+        strategy = _BlockingStrategy()
+        selector = Mock()
+        selector.select.return_value = strategy
+        selector.get_complexity.return_value = Mock(value="simple")
+
+        async def disconnected(_http_request):
+            return None
+
+        with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+             patch("api.prompt_improver_api._wait_for_disconnect", disconnected):
+            response = TestClient(app).post(
+                "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "legacy"}
+            )
+
+        assert response.status_code == 499
+        assert strategy.stopped.wait(timeout=2)
+        assert cancellation_stats.snapshot()["requests"] == {"client_disconnected": 1}
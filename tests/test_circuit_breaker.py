@@ -5,6 +5,17 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from api.circuit_breaker import CircuitBreaker
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.reads = 0
+
+    def __call__(self) -> float:
+        self.reads += 1
+        return self.now
 
 
 @pytest.mark.asyncio
@@ -60,9 +71,139 @@ async def test_circuit_breaker_half_open_after_timeout():
 
 
 @pytest.mark.asyncio
-async def test_save_history_success_records_success_outside_try():
-    """Test that success recording is outside try-except in _save_history_async."""
-    from api.prompt_improver_api import _save_history_async
+async def test_closed_fast_path_never_reads_clock():
+    """While closed, attempts and outcomes cost no clock read."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=3, clock=clock)
+
+    for _ in range(100):
+        assert await breaker.should_attempt() is True
+        await breaker.record_success()
+    await breaker.record_failure()
+
+    assert clock.reads == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_admits_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=2, timeout_seconds=30, clock=clock)
+    for _ in range(2):
+        await breaker.record_failure()
+
+    clock.now += 30
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert await breaker.should_attempt() is True
+    assert await breaker.should_attempt() is False  # probe in flight
+
+    await breaker.record_success()
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker._failure_count == 0
+    assert breaker._disabled_until is None
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens_for_another_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=2, timeout_seconds=30, clock=clock)
+    for _ in range(2):
+        await breaker.record_failure()
+
+    clock.now += 30
+    assert await breaker.should_attempt() is True
+    await breaker.record_failure()
+
+    assert breaker.state == BreakerState.OPEN
+    clock.now += 29
+    assert await breaker.should_attempt() is False
+
+
+@pytest.mark.asyncio
+async def test_unreported_probe_expires():
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=1, timeout_seconds=30, clock=clock)
+    await breaker.record_failure()
+
+    clock.now += 30
+    assert await breaker.should_attempt() is True
+    clock.now += 30
+    assert await breaker.should_attempt() is True
+
+
+@pytest.mark.asyncio
+async def test_released_probe_can_be_claimed_again():
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=1, timeout_seconds=30, clock=clock)
+    await breaker.record_failure()
+
+    clock.now += 30
+    assert await breaker.should_attempt() is True
+    await breaker.release()
+
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert await breaker.should_attempt() is True
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_failure_rate_trips():
+    breaker = CircuitBreaker(
+        max_failures=10, window_size=4, failure_rate_threshold=0.5, clock=FakeClock()
+    )
+
+    # Alternating outcomes never reach 10 consecutive failures
+    await breaker.record_success()
+    await breaker.record_failure()
+    await breaker.record_success()
+    assert breaker.state == BreakerState.CLOSED
+
+    await breaker.record_failure()  # 2 of the last 4 calls failed
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.failure_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_window_forgets_old_failures():
+    breaker = CircuitBreaker(
+        max_failures=10, window_size=3, failure_rate_threshold=0.6, clock=FakeClock()
+    )
+    await breaker.record_failure()
+    for _ in range(3):
+        await breaker.record_success()
+
+    assert breaker.failure_rate == 0.0
+    await breaker.record_failure()
+    assert breaker.state == BreakerState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_state_change_callbacks():
+    clock = FakeClock()
+    transitions = []
+    breaker = CircuitBreaker(
+        max_failures=1,
+        timeout_seconds=10,
+        on_state_change=lambda old, new: transitions.append((old.value, new.value)),
+        clock=clock,
+    )
+
+    await breaker.record_failure()
+    await breaker.record_failure()  # already open: no transition
+    clock.now += 10
+    await breaker.should_attempt()
+    await breaker.record_success()
+
+    assert transitions == [
+        ("closed", "open"),
+        ("open", "half_open"),
+        ("half_open", "closed"),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
+async def test_history_flush_success_records_success():
+    """A flushed history batch records success on the breaker."""
+    from api.prompt_improver_api import _enqueue_history, get_history_writer
     from hemdov.infrastructure.config import Settings
 
     settings = Settings(
@@ -76,29 +217,90 @@ async def test_save_history_success_records_success_outside_try():
     mock_breaker = AsyncMock()
 
     # Patch get_repository and _circuit_breaker
-    with patch('api.prompt_improver_api.get_repository', return_value=mock_repo):
-        with patch('api.prompt_improver_api._circuit_breaker', mock_breaker):
-            # Mock result object
-            mock_result = MagicMock()
-            mock_result.improved_prompt = "test"
-            mock_result.role = "test"
-            mock_result.directive = "test"
-            mock_result.framework = "chain-of-thought"
-            mock_result.guardrails = ["test"]
-            mock_result.reasoning = None
-            mock_result.confidence = 0.8
-
-            # Call the function
-            await _save_history_async(
-                settings=settings,
-                original_idea="test idea",
-                context="test context",
-                result=mock_result,
-                backend="zero-shot",
-                latency_ms=100
-            )
-
-            # Verify record_success was called
-            mock_breaker.record_success.assert_called_once()
-            # Verify record_failure was NOT called
-            mock_breaker.record_failure.assert_not_called()
+    with patch('api.prompt_improver_api.get_repository', return_value=mock_repo), \
+         patch('api.prompt_improver_api._circuit_breaker', mock_breaker):
+        # Mock result object
+        mock_result = MagicMock()
+        mock_result.improved_prompt = "test"
+        mock_result.role = "test"
+        mock_result.directive = "test"
+        mock_result.framework = "chain-of-thought"
+        mock_result.guardrails = ["test"]
+        mock_result.reasoning = None
+        mock_result.confidence = 0.8
+
+        await _enqueue_history(
+            settings=settings,
+            original_idea="test idea",
+            context="test context",
+            result=mock_result,
+            backend="zero-shot",
+            latency_ms=100
+        )
+        await get_history_writer(settings).close()
+
+        mock_repo.save_many.assert_awaited_once()
+        # Verify record_success was called
+        mock_breaker.record_success.assert_called_once()
+        # Verify record_failure was NOT called
+        mock_breaker.record_failure.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
+async def test_history_enqueue_and_flush_complete_a_half_open_cycle():
+    """Enqueueing only reads the breaker; the flush claims the probe and closes it."""
+    from api.prompt_improver_api import _enqueue_history, get_history_writer
+    from hemdov.domain.repositories.prompt_repository import PromptRepository
+    from hemdov.infrastructure.config import Settings
+    from hemdov.interfaces import Container
+
+    settings = Settings(SQLITE_ENABLED=True, SQLITE_DB_PATH=":memory:")
+    clock = FakeClock()
+    breaker = CircuitBreaker(max_failures=1, timeout_seconds=30, clock=clock)
+    mock_repo = AsyncMock()
+    mock_repo.save_many.side_effect = [ConnectionError("db down"), 1]
+    repo_container = Container()
+    repo_container.register(PromptRepository, mock_repo)
+
+    result = MagicMock()
+    result.improved_prompt = "test"
+    result.role = "test"
+    result.directive = "test"
+    result.framework = "chain-of-thought"
+    result.guardrails = ["test"]
+    result.reasoning = None
+    result.confidence = 0.8
+
+    async def enqueue() -> bool:
+        return await _enqueue_history(
+            settings=settings,
+            original_idea="test idea",
+            context="test context",
+            result=result,
+            backend="zero-shot",
+            latency_ms=100,
+        )
+
+    with patch('api.prompt_improver_api._circuit_breaker', breaker), \
+         patch('api.prompt_improver_api.container', repo_container):
+        writer = get_history_writer(settings)
+
+        assert await enqueue()
+        await writer.flush()
+        assert breaker.state == BreakerState.OPEN
+
+        assert await enqueue()  # Open: skipped, nothing buffered
+        assert await writer.flush() == 0
+
+        clock.now += 30
+        assert await enqueue()
+        assert breaker.state == BreakerState.HALF_OPEN
+        assert await breaker.should_attempt() is True  # Enqueue left the probe unclaimed
+        await breaker.release()
+
+        assert await writer.flush() == 1
+        await writer.close()
+
+    assert mock_repo.save_many.await_count == 2
+    assert breaker.state == BreakerState.CLOSED
@@ -0,0 +1,163 @@
+"""Tests for token-budgeted context compression."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.prompt_improver_api import ImprovePromptRequest, _compress_context
+from eval.src.strategies.complex_strategy import ComplexStrategy
+from hemdov.domain.metrics.evaluators import estimate_tokens
+from hemdov.domain.services.context_compressor import compress_context
+from hemdov.infrastructure.config import Settings
+from hemdov.interfaces import container
+
+IDEA = "Design a caching layer for our Django REST API"
+
+FILLER = "The office has a nice coffee machine and plenty of plants near the windows."
+
+
+def _long_context() -> str:
+    return "\n".join([
+        "Hello team!",
+        "We run a Django monolith with Postgres. We run a Django monolith with Postgres.",
+        "---",
+        *[f"{FILLER} Day {i} was sunny." for i in range(30)],
+        "Our REST API responses are slow under load and caching is missing.",
+        "```python\ndef get_orders(request):\n    return Order.objects.all()\n```",
+        "Thanks in advance!",
+    ])
+
+
+def test_context_within_budget_is_untouched():
+    context = "Hi. Team of five.\nTeam of five."
+    result = compress_context(IDEA, context, budget_tokens=100)
+
+    assert result.text == context
+    assert not result.compressed
+    assert result.saved_tokens == 0
+
+
+def test_duplicates_and_boilerplate_go_first():
+    context = "Hello!\n" + "We use Django and Postgres for the API. " * 20 + "\nThanks in advance!"
+    result = compress_context(IDEA, context, budget_tokens=50)
+
+    assert result.text == "We use Django and Postgres for the API."
+    assert result.duplicates == 19
+    assert result.boilerplate == 2
+    assert result.low_relevance == 0
+
+
+def test_keeps_segments_closest_to_idea_within_budget():
+    result = compress_context(IDEA, _long_context(), budget_tokens=60)
+
+    assert result.tokens <= 60
+    assert "Django monolith" in result.text
+    assert "REST API responses are slow" in result.text
+    assert "Day 29" not in result.text
+    assert result.low_relevance > 0
+    # Kept segments stay in their original order
+    assert result.text.index("Django monolith") < result.text.index("REST API")
+
+
+def test_code_blocks_are_never_split():
+    result = compress_context("Speed up get_orders request handling", _long_context(), 80)
+
+    assert "```python\ndef get_orders(request):\n    return Order.objects.all()\n```" in result.text
+
+
+def test_only_whole_line_salutations_are_boilerplate():
+    context = "\n".join([
+        "Hi Maria,",
+        "Hello world. The greeter prints Hello world.",
+        "Hey there",
+        "Hello world.",
+        "Best regards",
+    ])
+    result = compress_context(IDEA, context + "\n" + "Cache the orders list. " * 10, 40)
+
+    assert result.boilerplate == 2
+    assert "Hey there" in result.text
+    assert "Hello world. The greeter prints Hello world." in result.text
+
+
+def test_truncation_never_cuts_a_code_block():
+    block = "```python\n" + "cache.set(key, value)\n" * 40 + "```"
+    result = compress_context(IDEA, f"{block}\nCache the Django API responses. " * 2, 10)
+
+    assert "```" not in result.text
+    assert result.text.startswith("Cache the Django API")
+    assert result.tokens <= 10
+
+    only_code = compress_context(IDEA, block, 10)
+    assert "```" not in only_code.text
+
+
+def test_is_deterministic():
+    first = compress_context(IDEA, _long_context(), 60)
+    assert compress_context(IDEA, _long_context(), 60) == first
+
+
+def test_oversized_single_segment_is_truncated():
+    result = compress_context(IDEA, "Django " * 400, budget_tokens=10)
+
+    assert 0 < len(result.text) <= 40
+    assert result.tokens <= 10
+
+
+def test_budget_reserves_room_for_few_shot_examples():
+    settings = Settings(
+        CONTEXT_COMPRESSION_ENABLED=True,
+        CONTEXT_TOKEN_BUDGET=1000,
+        CONTEXT_EXAMPLE_TOKENS=150,
+        CONTEXT_MIN_TOKENS=250,
+    )
+    request = ImprovePromptRequest(idea=IDEA, context=_long_context())
+    strategy = ComplexStrategy.__new__(ComplexStrategy)
+    strategy.few_shot_examples = 3
+
+    assert _compress_context(settings, request, Mock()).tokens == estimate_tokens(request.context)
+    assert _compress_context(settings, request, strategy).tokens <= 550
+
+    settings.CONTEXT_COMPRESSION_ENABLED = False
+    assert _compress_context(settings, request, strategy) is None
+
+
+def test_endpoint_sends_compressed_context_and_reports_savings(monkeypatch):
+    settings = container.get(Settings)
+    monkeypatch.setattr(settings, "CONTEXT_COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 60)
+    monkeypatch.setattr(settings, "CONTEXT_MIN_TOKENS", 0)
+
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = Mock(return_value=SimpleNamespace(
+        improved_prompt="You are a backend engineer.",
+        role="Backend Engineer",
+        directive="Design the cache",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    ))
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="moderate")
+    selector.get_degradation_flags.return_value = {}
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt",
+            json={"idea": IDEA, "context": _long_context(), "mode": "legacy"},
+        )
+
+    assert response.status_code == 200
+    sent = strategy.improve.call_args.kwargs["context"]
+    assert "REST API responses are slow" in sent
+    assert "Hello team" not in sent
+    assert "Day 29" not in sent
+    meta = response.json()["strategy_meta"]["context_compression"]
+    assert meta["tokens"] == estimate_tokens(sent)
+    assert meta["saved_tokens"] == meta["original_tokens"] - meta["tokens"] > 0
@@ -257,7 +257,7 @@ class TestOPROOptimizerIntegration:
         assert result is not None
         assert result.final_instruction is not None
         # KNN failures should be tracked
-        assert len(optimizer._knn_failures) == 3  # One per iteration
+        assert result.knn_failure["failure_count"] == 1  # Examples are fetched once per run
 
     def test_optimizer_trajectory_with_scores(self, sample_prompt_obj):
         """
@@ -0,0 +1,118 @@
+"""Tests for the offline fake LLM provider."""
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import dspy
+import litellm
+import pytest
+
+from api.main import create_provider_adapter
+from eval.src.dspy_prompt_improver import PromptImprover
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.infrastructure.adapters.fake_llm import FakeLLM
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+from hemdov.infrastructure.adapters.provider_router import is_retryable
+
+MESSAGES = [{"role": "user", "content": "Improve: write release notes"}]
+
+
+def _fake(**kwargs) -> FakeLLM:
+    kwargs.setdefault("latency_sigma", 0)
+    kwargs.setdefault("sleep", Mock())
+    return FakeLLM(**kwargs)
+
+
+def test_synthesized_answers_parse_as_dspy_outputs():
+    with dspy.context(lm=_fake()):
+        result = PromptImprover()(original_idea="Write release notes for v2", context="")
+
+    assert result.framework == "chain-of-thought"
+    assert "Write release notes for v2" in result.improved_prompt
+    assert float(result.confidence) == pytest.approx(0.8)
+
+
+def test_replays_responses_recorded_with_a_real_provider(tmp_path):
+    path = tmp_path / "recorded.sqlite"
+    real = PromptImproverLiteLLMAdapter(
+        model="deepseek/chat", api_key="x", cache=LLMResponseCache(path)
+    )
+    real.litellm = Mock()
+    real.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="recorded answer"))],
+    )
+    real(messages=MESSAGES)
+
+    fake = _fake(recordings=LLMResponseCache(path, mode="replay"))
+    assert fake(messages=MESSAGES, temperature=0.7) == ["recorded answer"]
+    assert fake(prompt="never recorded") == ["Simulated response for: never recorded"]
+    assert fake.stats() == {
+        "calls": 2, "replayed": 1, "synthesized": 1, "errors": 0, "rate_limited": 0,
+    }
+
+
+def test_latency_is_first_token_plus_streamed_chunks():
+    sleep = Mock()
+    fake = _fake(latency_ms=200, chunk_tokens=5, chunk_ms=10, sleep=sleep)
+
+    output = fake(prompt="x" * 80)[0]
+
+    chunks = -(-(len(output) // 4) // 5)
+    sleep.assert_called_once_with(pytest.approx(0.2 + chunks * 0.01))
+
+
+def test_latency_distribution_is_seeded():
+    first = FakeLLM(latency_ms=500, latency_sigma=0.8, seed=7, sleep=Mock())
+    second = FakeLLM(latency_ms=500, latency_sigma=0.8, seed=7, sleep=Mock())
+    samples = [first._first_token_seconds() for _ in range(200)]
+
+    assert samples == [second._first_token_seconds() for _ in range(200)]
+    assert min(samples) < 0.5 < max(samples)
+
+
+def test_rate_limits_and_errors_are_retryable():
+    limited = _fake(rate_limit_rate=1.0)
+    with pytest.raises(litellm.exceptions.RateLimitError) as exc_info:
+        limited(messages=MESSAGES)
+    assert is_retryable(exc_info.value)
+
+    failing = _fake(error_rate=1.0)
+    with pytest.raises(RuntimeError) as exc_info:
+        failing(messages=MESSAGES)
+    assert isinstance(exc_info.value.__cause__, ConnectionError)
+    assert is_retryable(exc_info.value)
+
+
+def test_slow_call_times_out_at_the_request_budget():
+    sleep = Mock()
+    fake = _fake(latency_ms=30_000, sleep=sleep)
+
+    with cancellation_scope(CancellationToken(timeout_seconds=2)), \
+         pytest.raises(RuntimeError) as exc_info:
+        fake(messages=MESSAGES)
+
+    assert isinstance(exc_info.value.__cause__, TimeoutError)
+    assert sleep.call_args.args[0] <= 2
+
+
+def test_cancelled_request_is_not_answered():
+    token = CancellationToken()
+    token.cancel(CancelReason.CLIENT_DISCONNECTED)
+    fake = _fake()
+
+    with cancellation_scope(token), pytest.raises(OperationCancelledError):
+        fake(messages=MESSAGES)
+    assert fake.stats()["calls"] == 0
+
+
+def test_provider_factory_builds_the_fake():
+    lm = create_provider_adapter("fake", "bench")
+
+    assert isinstance(lm, FakeLLM)
+    assert lm.model == "fake/bench"
@@ -0,0 +1,205 @@
+"""Tests for the bounded, batched prompt history writer."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import aiosqlite
+import pytest
+
+from hemdov.domain.entities.prompt_history import PromptHistory
+from hemdov.infrastructure.config import Settings
+from hemdov.infrastructure.metrics import InProcessMetrics
+from hemdov.infrastructure.persistence.history_writer import HistoryWriter, OverflowPolicy
+from hemdov.infrastructure.persistence.sqlite_prompt_repository import SQLitePromptRepository
+
+
+def _history(idea: str = "Design an ADR process") -> PromptHistory:
+    return PromptHistory(
+        original_idea=idea,
+        context="",
+        improved_prompt="You are a software architect.",
+        role="Software Architect",
+        directive="Design an ADR process",
+        framework="chain-of-thought",
+        guardrails=["Be concise"],
+        backend="simple",
+        model="test-model",
+        provider="ollama",
+    )
+
+
+class RecordingRepository:
+    def __init__(self, error: Exception | None = None):
+        self.batches: list[list[PromptHistory]] = []
+        self.error = error
+
+    async def save_many(self, histories):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(histories))
+        return len(histories)
+
+
+def _writer(repo, **kwargs) -> HistoryWriter:
+    async def get_repo():
+        return repo
+
+    kwargs.setdefault("flush_interval_seconds", 60)
+    return HistoryWriter(repository_getter=get_repo, **kwargs)
+
+
+def test_full_batch_is_written_in_one_call():
+    repo = RecordingRepository()
+    metrics = InProcessMetrics()
+
+    async def run():
+        writer = _writer(repo, batch_size=3, metrics=metrics)
+        for i in range(3):
+            assert await writer.submit(_history(f"Idea number {i}"))
+        # A full batch wakes the flusher without waiting for the interval
+        for _ in range(100):
+            if repo.batches:
+                break
+            await asyncio.sleep(0.01)
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert [len(batch) for batch in repo.batches] == [3]
+    assert stats["written"] == 3
+    assert stats["batches"] == 1
+    assert stats["queued"] == 0
+    assert metrics.stage_duration.count(stage="history_lag") == 3
+    assert metrics.stage_duration.count(stage="history_flush") == 1
+
+
+def test_close_drains_partial_batches():
+    repo = RecordingRepository()
+
+    async def run():
+        writer = _writer(repo, batch_size=2)
+        for i in range(5):
+            await writer.submit(_history(f"Idea number {i}"))
+        assert writer.stats()["queued"] == 5
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert sum(len(batch) for batch in repo.batches) == 5
+    assert stats["queued"] == 0
+
+
+def test_drop_oldest_keeps_newest_records():
+    repo = RecordingRepository()
+
+    async def run():
+        writer = _writer(repo, max_queue=2, batch_size=10)
+        for i in range(4):
+            assert await writer.submit(_history(f"Idea number {i}"))
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert [h.original_idea for h in repo.batches[0]] == ["Idea number 2", "Idea number 3"]
+    assert stats["dropped"] == 2
+
+
+def test_block_policy_times_out_when_flush_cannot_make_space():
+    async def unavailable():
+        await asyncio.sleep(1)
+        return None
+
+    async def run():
+        writer = HistoryWriter(
+            repository_getter=unavailable,
+            max_queue=1,
+            batch_size=10,
+            flush_interval_seconds=60,
+            overflow_policy="block",
+            block_timeout_seconds=0.05,
+        )
+        assert await writer.submit(_history("First idea here"))
+        # The flusher takes the first record, so the second one fits
+        assert await writer.submit(_history("Second idea here"))
+        assert await writer.submit(_history("Third idea here")) is False
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"] == 1
+
+
+def test_spill_policy_writes_overflow_and_failed_batches(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    repo = RecordingRepository(error=aiosqlite.OperationalError("database is locked"))
+    on_failure = AsyncMock()
+
+    async def run():
+        writer = _writer(
+            repo,
+            max_queue=1,
+            batch_size=10,
+            overflow_policy=OverflowPolicy.SPILL,
+            spill_path=spill,
+            on_failure=on_failure,
+        )
+        await writer.submit(_history("Buffered idea"), request_id="req-1")
+        await writer.submit(_history("Overflowing idea"), request_id="req-2")
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    lines = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert [(line["request_id"], line["reason"]) for line in lines] == [
+        ("req-2", "queue_full"),
+        ("req-1", "OperationalError"),
+    ]
+    assert lines[0]["history"]["original_idea"] == "Overflowing idea"
+    assert stats["spilled"] == 2
+    on_failure.assert_awaited_once()
+
+
+def test_spill_requires_path():
+    with pytest.raises(ValueError):
+        HistoryWriter(repository_getter=AsyncMock(), overflow_policy="spill")
+
+
+def test_unavailable_repository_counts_failures_without_tripping_breaker():
+    on_failure = AsyncMock()
+
+    async def run():
+        writer = _writer(None, on_failure=on_failure)
+        await writer.submit(_history())
+        await writer.close()
+        return writer.stats()
+
+    assert asyncio.run(run())["failed"] == 1
+    on_failure.assert_not_awaited()
+
+
+def test_unavailable_repository_releases_the_probe():
+    on_release = AsyncMock()
+
+    async def run():
+        writer = _writer(None, on_release=on_release)
+        await writer.submit(_history())
+        await writer.close()
+
+    asyncio.run(run())
+    on_release.assert_awaited_once()
+
+
+def test_save_many_writes_one_transaction(tmp_path):
+    settings = Settings(SQLITE_DB_PATH=str(tmp_path / "history.db"))
+
+    async def run():
+        repo = SQLitePromptRepository(settings)
+        try:
+            histories = [_history("First idea here"), _history("Second idea here")]
+            assert await repo.save_many(histories) == 2
+            return await repo.find_recent(limit=10)
+        finally:
+            await repo.close()
+
+    stored = asyncio.run(run())
+    assert sorted(h.original_idea for h in stored) == ["First idea here", "Second idea here"]
@@ -0,0 +1,132 @@
+"""Tests for the shared keep-alive HTTP pool, against a local stub server."""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from hemdov.infrastructure.adapters.http_pool import HttpPool
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
+    create_ollama_adapter,
+    create_openai_adapter,
+)
+
+
+class StubLLMServer:
+    """Ollama- and OpenAI-shaped HTTP/1.1 server recording client connections."""
+
+    def __init__(self, delay: float = 0.0):
+        self.requests: list[tuple[str, tuple]] = []
+        self.delay = delay
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                stub.requests.append((self.path, self.client_address))
+                time.sleep(stub.delay)
+                if self.path.endswith("/api/generate"):
+                    reply = {
+                        "model": body["model"],
+                        "created_at": "2024-01-01T00:00:00Z",
+                        "response": "pooled",
+                        "done": True,
+                        "prompt_eval_count": 3,
+                        "eval_count": 2,
+                    }
+                else:
+                    reply = {
+                        "id": "chatcmpl-1",
+                        "object": "chat.completion",
+                        "created": 1,
+                        "model": body["model"],
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "pooled"},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+                    }
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def connections(self, path_suffix: str) -> set[tuple]:
+        return {address for path, address in self.requests if path.endswith(path_suffix)}
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubLLMServer()
+    yield server
+    server.stop()
+
+
+def test_ollama_calls_reuse_one_connection(stub):
+    pool = HttpPool()
+    adapter = create_ollama_adapter(model="stub", base_url=stub.url, http_pool=pool)
+
+    for _ in range(5):
+        assert adapter(prompt="hi") == ["pooled"]
+
+    assert len(stub.connections("/api/generate")) == 1
+    stats = pool.stats()
+    assert stats["connections_opened"] == 1
+    assert stats["reused"] == stats["requests"] - 1 >= 4
+    assert stats["http_versions"]["HTTP/1.1"] == stats["requests"]
+    pool.close()
+
+
+def test_openai_sdk_path_shares_the_pool(stub):
+    pool = HttpPool()
+    adapter = create_openai_adapter(
+        model="stub", api_key="test-key", api_base=f"{stub.url}/v1", http_pool=pool
+    )
+
+    for _ in range(3):
+        assert adapter(prompt="hi") == ["pooled"]
+
+    assert len(stub.connections("/chat/completions")) == 1
+    assert pool.stats()["requests"] == 3
+    pool.close()
+
+
+def test_max_connections_bounds_concurrent_calls():
+    slow = StubLLMServer(delay=0.1)
+    pool = HttpPool(max_connections=2, max_keepalive_connections=2)
+    adapter = create_ollama_adapter(model="stub", base_url=slow.url, http_pool=pool)
+    try:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(lambda _: adapter(prompt="hi"), range(6)))
+    finally:
+        slow.stop()
+        pool.close()
+
+    assert results == [["pooled"]] * 6
+    assert len(slow.connections("/api/generate")) <= 2
+
+
+def test_http2_requires_h2():
+    with patch("importlib.util.find_spec", return_value=None), \
+         pytest.raises(ValueError, match="h2"):
+        HttpPool(http2=True)
@@ -0,0 +1,156 @@
+"""Tests for n > 1 sampling in PromptImproverLiteLLMAdapter."""
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import litellm
+import pytest
+
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.domain.services.stage_timing import StageTimings, timing_scope
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
+    PromptImproverLiteLLMAdapter,
+    Sample,
+)
+
+
+def _response(*texts, prompt_tokens=10, completion_tokens=5):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text)) for text in texts],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+def _adapter(supported: list[str], completion, **kwargs) -> PromptImproverLiteLLMAdapter:
+    adapter = PromptImproverLiteLLMAdapter(
+        model="openai/test", api_key="x", temperature=0.2, **kwargs
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.get_supported_openai_params.return_value = supported
+    adapter.litellm.completion.side_effect = completion
+    return adapter
+
+
+def test_native_n_is_one_call():
+    adapter = _adapter(["n", "seed"], lambda **kw: _response("a", "b", "c", prompt_tokens=40))
+
+    outputs = adapter(prompt="hi", n=3)
+
+    assert outputs == ["a", "b", "c"]
+    assert adapter.litellm.completion.call_count == 1
+    assert adapter.litellm.completion.call_args.kwargs["n"] == 3
+    # The prompt is billed once
+    assert [s.usage["prompt_tokens"] for s in outputs] == [40, 0, 0]
+
+
+def test_without_native_n_samples_are_separate_varied_calls():
+    def complete(**kwargs):
+        return _response(f"t={kwargs['temperature']:.2f} seed={kwargs.get('seed')}")
+
+    adapter = _adapter(["seed"], complete)
+
+    outputs = adapter(prompt="hi", n=3)
+
+    assert outputs == ["t=0.20 seed=None", "t=0.35 seed=1", "t=0.50 seed=2"]
+    assert len(set(outputs)) == 3
+    assert all("n" not in call.kwargs for call in adapter.litellm.completion.call_args_list)
+    assert all(isinstance(s, Sample) and s.usage["total_tokens"] == 15 for s in outputs)
+
+
+def test_missing_native_choices_are_topped_up():
+    responses = iter([_response("a", "b"), _response("c")])
+    adapter = _adapter(["n"], lambda **kw: next(responses))
+
+    assert adapter(prompt="hi", n=3) == ["a", "b", "c"]
+
+
+def test_extra_samples_run_concurrently_up_to_cap():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def complete(**kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return _response(str(kwargs["temperature"]))
+
+    adapter = _adapter([], complete, max_parallel_samples=2)
+    timings = StageTimings()
+
+    with timing_scope(timings):
+        outputs = adapter(prompt="hi", n=5)
+
+    assert len(outputs) == 5
+    assert peak == 2
+    # Every sample call is timed in the caller's request scope
+    assert timings.as_dict()["llm"]["count"] == 5
+
+
+def test_failed_extra_sample_is_dropped_not_duplicated():
+    responses = iter([_response("a"), ConnectionError("reset"), _response("c")])
+
+    def complete(**kwargs):
+        result = next(responses)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    adapter = _adapter([], complete, max_parallel_samples=1)
+
+    assert adapter(prompt="hi", n=3) == ["a", "c"]
+
+
+def test_rate_limited_extra_samples_keep_the_first():
+    calls = 0
+
+    def complete(**kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return _response("a")
+        raise litellm.exceptions.RateLimitError(
+            message="slow down", llm_provider="openai", model="test"
+        )
+
+    adapter = _adapter([], complete)
+
+    assert adapter(prompt="hi", n=3) == ["a"]
+    assert adapter.litellm.completion.call_count == 3
+
+
+def test_cancellation_reaches_extra_samples():
+    token = CancellationToken()
+
+    def complete(**kwargs):
+        token.cancel(CancelReason.CLIENT_DISCONNECTED)
+        return _response("a")
+
+    adapter = _adapter([], complete)
+
+    with cancellation_scope(token), pytest.raises(OperationCancelledError):
+        adapter(prompt="hi", n=3)
+    assert adapter.litellm.completion.call_count == 1
+
+
+def test_single_sample_is_unchanged():
+    adapter = _adapter(["n"], lambda **kw: _response("ok"))
+
+    assert adapter(prompt="hi") == ["ok"]
+    assert "n" not in adapter.litellm.completion.call_args.kwargs
+    adapter.litellm.get_supported_openai_params.assert_not_called()
@@ -0,0 +1,157 @@
+"""Tests for the on-disk LLM response cache and its use in the adapter."""
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.llm_response_cache import LLMCacheMissError, LLMResponseCache
+from hemdov.infrastructure.adapters.provider_router import ProviderRouter
+
+MESSAGES = [{"role": "user", "content": "Improve: write release notes"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _adapter(cache, content="improved") -> PromptImproverLiteLLMAdapter:
+    adapter = PromptImproverLiteLLMAdapter(model="openai/test", api_key="x", cache=cache)
+    adapter.litellm = Mock()
+    adapter.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=12, completion_tokens=4, total_tokens=16),
+    )
+    return adapter
+
+
+def test_key_ignores_transport_params_but_not_sampling():
+    key = LLMResponseCache.key("m", MESSAGES, {"temperature": 0.0, "api_key": "a", "timeout": 5})
+
+    assert key == LLMResponseCache.key("m", MESSAGES, {"timeout": 60, "temperature": 0.0})
+    assert key != LLMResponseCache.key("m", MESSAGES, {"temperature": 0.7})
+    assert key != LLMResponseCache.key("other", MESSAGES, {"temperature": 0.0})
+
+
+def test_repeated_call_is_served_from_disk(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    first = _adapter(LLMResponseCache(path))
+    assert first(messages=MESSAGES) == ["improved"]
+
+    # A later run with a fresh process-level cache object reads the same file
+    cache = LLMResponseCache(path)
+    second = _adapter(cache, content="should not be used")
+    outputs = second(messages=MESSAGES, timeout=30)
+
+    assert outputs == ["improved"]
+    assert outputs[0].usage == {
+        "prompt_tokens": 12, "completion_tokens": 4, "total_tokens": 16, "cached": True,
+    }
+    second.litellm.completion.assert_not_called()
+    assert cache.stats()["hits"] == 1
+
+    second(messages=MESSAGES, temperature=0.9)
+    assert second.litellm.completion.call_count == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_n_samples_are_cached_together(tmp_path):
+    adapter = _adapter(LLMResponseCache(tmp_path / "llm.sqlite"))
+    adapter.litellm.get_supported_openai_params.return_value = ["n"]
+    adapter.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=t)) for t in ("a", "b")],
+    )
+
+    assert adapter(messages=MESSAGES, n=2) == ["a", "b"]
+    assert adapter(messages=MESSAGES, n=2) == ["a", "b"]
+    assert adapter.litellm.completion.call_count == 1
+    # A different n is a different call
+    adapter(messages=MESSAGES)
+    assert adapter.litellm.completion.call_count == 2
+
+
+def test_expired_entries_are_misses(tmp_path):
+    clock = FakeClock()
+    cache = LLMResponseCache(tmp_path / "llm.sqlite", ttl_seconds=60, clock=clock)
+    key = cache.key("m", MESSAGES, {})
+    cache.put(key, "m", [{"text": "old", "usage": {}}])
+
+    clock.now += 61
+    assert cache.get(key) is None
+    # The next write purges it
+    cache.put(cache.key("m", [], {}), "m", [{"text": "new", "usage": {}}])
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_size_caps_evict_least_recently_used(tmp_path):
+    clock = FakeClock()
+    cache = LLMResponseCache(tmp_path / "llm.sqlite", max_entries=2, clock=clock)
+    keys = [cache.key("m", [{"role": "user", "content": str(i)}], {}) for i in range(3)]
+
+    cache.put(keys[0], "m", [{"text": "0", "usage": {}}])
+    clock.now += 1
+    cache.put(keys[1], "m", [{"text": "1", "usage": {}}])
+    clock.now += 1
+    cache.get(keys[0])  # keys[1] is now the least recently used
+    clock.now += 1
+    cache.put(keys[2], "m", [{"text": "2", "usage": {}}])
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["entries"] == 2
+
+    small = LLMResponseCache(tmp_path / "small.sqlite", max_bytes=60, clock=clock)
+    for key in keys:
+        clock.now += 1
+        small.put(key, "m", [{"text": "x" * 10, "usage": {}}])
+    assert 0 < small.stats()["bytes"] <= 60
+
+
+def test_replay_mode_never_calls_the_provider(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    _adapter(LLMResponseCache(path))(messages=MESSAGES)
+
+    replay = LLMResponseCache(path, mode="replay")
+    adapter = _adapter(replay)
+    assert adapter(messages=MESSAGES) == ["improved"]
+
+    with pytest.raises(LLMCacheMissError):
+        adapter(messages=[{"role": "user", "content": "never recorded"}])
+    adapter.litellm.completion.assert_not_called()
+    assert replay.stats()["writes"] == 0
+
+
+def test_replay_ignores_ttl(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "llm.sqlite"
+    recorder = LLMResponseCache(path, clock=clock)
+    key = recorder.key("m", MESSAGES, {})
+    recorder.put(key, "m", [{"text": "recorded", "usage": {}}])
+
+    clock.now += 30 * 24 * 3600
+    replay = LLMResponseCache(path, ttl_seconds=60, mode="replay", clock=clock)
+    assert replay.get(key) == [{"text": "recorded", "usage": {}}]
+
+
+def test_replay_miss_is_not_failed_over():
+    class Replaying:
+        model = "openai/replay"
+
+        def __call__(self, **kwargs):
+            raise LLMCacheMissError("not recorded")
+
+    backup = Mock(model="openai/backup")
+    with pytest.raises(LLMCacheMissError):
+        ProviderRouter([Replaying(), backup])(prompt="hi")
+    backup.assert_not_called()
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="mode"):
+        LLMResponseCache(tmp_path / "llm.sqlite", mode="write-only")
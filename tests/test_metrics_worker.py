@@ -0,0 +1,212 @@
+"""Tests for the background metrics worker."""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from hemdov.domain.metrics.evaluators import ImpactData, PromptMetricsCalculator
+from hemdov.infrastructure.config import Settings
+from hemdov.infrastructure.metrics import InProcessMetrics
+from hemdov.infrastructure.metrics.metrics_worker import MetricsJob, MetricsWorker
+from hemdov.infrastructure.persistence.metrics_repository import SQLiteMetricsRepository
+from hemdov.interfaces import container
+
+
+def _inputs(**overrides):
+    inputs = {
+        "original_idea": "Design an ADR process",
+        "context": "Architecture team",
+        "improved_prompt": "**[ROLE & PERSONA]**\nYou are a software architect.",
+        "role": "Software Architect",
+        "directive": "Design an ADR process",
+        "framework": "chain-of-thought",
+        "guardrails": ["Be concise"],
+        "backend": "simple",
+        "model": "test-model",
+        "provider": "ollama",
+        "latency_ms": 1200,
+        "confidence": 0.8,
+        "impact_data": ImpactData(),
+    }
+    inputs.update(overrides)
+    return inputs
+
+
+def test_calculation_runs_on_worker_thread():
+    threads = []
+
+    def calculate(**inputs):
+        threads.append(threading.current_thread().name)
+        return Mock()
+
+    telemetry = InProcessMetrics()
+    worker = MetricsWorker(calculate=calculate, repository_getter=lambda: None, metrics=telemetry)
+    assert worker.submit(MetricsJob(calculation={}))
+    worker.join()
+    worker.stop()
+
+    assert threads == ["metrics-worker"]
+    assert worker.stats()["computed"] == 1
+    assert telemetry.stage_duration.count(stage="metrics") == 1
+    assert telemetry.stage_duration.count(stage="metrics_queue") == 1
+
+
+def test_full_queue_drops_without_blocking():
+    release = threading.Event()
+
+    def calculate(**inputs):
+        release.wait(timeout=5)
+        return Mock()
+
+    worker = MetricsWorker(calculate=calculate, repository_getter=lambda: None, max_queue=1)
+    # First job occupies the thread, second fills the queue, third is dropped
+    assert worker.submit(MetricsJob(calculation={}))
+    for _ in range(50):
+        if worker.stats()["queued"] == 0:
+            break
+        threading.Event().wait(0.01)
+    assert worker.submit(MetricsJob(calculation={}))
+    assert worker.submit(MetricsJob(calculation={})) is False
+
+    release.set()
+    worker.join()
+    worker.stop()
+    assert worker.stats()["dropped"] == 1
+    assert worker.stats()["computed"] == 2
+
+
+def test_failed_calculation_is_counted_and_worker_survives():
+    calls = iter([ValueError("bad data"), Mock()])
+
+    def calculate(**inputs):
+        outcome = next(calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    worker = MetricsWorker(calculate=calculate, repository_getter=lambda: None)
+    worker.submit(MetricsJob(calculation={}))
+    worker.submit(MetricsJob(calculation={}))
+    worker.join()
+    worker.stop()
+
+    stats = worker.stats()
+    assert stats["failed"] == 1
+    assert stats["computed"] == 1
+
+
+def test_results_are_persisted_on_submitting_loop():
+    calculator = PromptMetricsCalculator()
+
+    async def run():
+        repo = SQLiteMetricsRepository(":memory:")
+        await repo.initialize()
+        worker = MetricsWorker(
+            calculate=calculator.calculate_from_history, repository_getter=lambda: repo
+        )
+        worker.submit(MetricsJob(calculation=_inputs(), loop=asyncio.get_running_loop()))
+        # The worker needs this loop to run the save, so wait without blocking it
+        await asyncio.to_thread(worker.join)
+        stored = await repo.get_all()
+        await asyncio.to_thread(worker.stop)
+        await repo.close()
+        return worker.stats(), stored
+
+    stats, stored = asyncio.run(run())
+    assert stats["persisted"] == 1
+    assert len(stored) == 1
+    assert stored[0].original_idea == "Design an ADR process"
+
+
+def test_slow_persist_times_out_and_worker_survives():
+    repo = Mock()
+
+    async def slow_save(metrics):
+        await asyncio.sleep(1)
+
+    repo.save = slow_save
+
+    async def run():
+        worker = MetricsWorker(calculate=lambda **inputs: Mock(), repository_getter=lambda: repo)
+        loop = asyncio.get_running_loop()
+        with patch("hemdov.infrastructure.metrics.metrics_worker.PERSIST_TIMEOUT_SECONDS", 0.05):
+            worker.submit(MetricsJob(calculation={}, loop=loop))
+            worker.submit(MetricsJob(calculation={}, loop=loop))
+            await asyncio.to_thread(worker.join)
+        await asyncio.to_thread(worker.stop)
+        return worker.stats()
+
+    stats = asyncio.run(run())
+    assert stats["computed"] == 2
+    assert stats["failed"] == 2
+
+
+def test_endpoint_queues_metrics_instead_of_computing_inline(monkeypatch):
+    monkeypatch.setattr(container.get(Settings), "METRICS_SYNC_MODE", False)
+
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = Mock(return_value=Mock(
+        improved_prompt="improved",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    ))
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+    worker = Mock()
+    worker.submit.return_value = True
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+         patch("api.prompt_improver_api.get_metrics_worker", return_value=worker), \
+         patch("api.prompt_improver_api._metrics_calculator") as calculator, \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "legacy"}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["metrics_warning"] is None
+    calculator.calculate_from_history.assert_not_called()
+    job = worker.submit.call_args.args[0]
+    assert job.calculation["backend"] == "simple"
+    assert job.calculation["guardrails"] == ["be brief"]
+
+
+def test_endpoint_flags_dropped_metrics(monkeypatch):
+    monkeypatch.setattr(container.get(Settings), "METRICS_SYNC_MODE", False)
+
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = Mock(return_value=Mock(
+        improved_prompt="improved",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    ))
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+    worker = Mock()
+    worker.submit.return_value = False  # queue full
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+         patch("api.prompt_improver_api.get_metrics_worker", return_value=worker), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "legacy"}
+        )
+
+    assert response.json()["degradation_flags"]["metrics_failed"] is True
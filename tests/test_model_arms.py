@@ -0,0 +1,149 @@
+"""Tests for per-request model arms (in-process A/B routing)."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import dspy
+import httpx
+import pytest
+
+from api.main import app
+from api.model_arms import ModelArm, ModelArmError, ModelArms, parse_model_arms
+
+PRIMARY = ModelArm("ollama", "qwen:7b")
+
+
+class ArmLM:
+    def __init__(self, provider: str, model: str):
+        self.model = f"{provider}/{model}"
+
+
+def _arms(spec: str = "openai:gpt-4o-mini=0.3, deepseek:deepseek-chat=0.2") -> ModelArms:
+    return ModelArms(PRIMARY, parse_model_arms(spec), lm_factory=ArmLM)
+
+
+def test_parse_model_arms():
+    arms = parse_model_arms("openai:gpt-4o-mini=0.3, ollama:qwen:14b=0.5")
+    assert arms == [ModelArm("openai", "gpt-4o-mini", 0.3), ModelArm("ollama", "qwen:14b", 0.5)]
+    assert parse_model_arms("") == []
+
+    for bad in ("openai:gpt-4o-mini", "openai=0.5", "openai:gpt=1.5", "a:b=0.6,c:d=0.6"):
+        with pytest.raises(ValueError):
+            parse_model_arms(bad)
+
+
+def test_split_is_sticky_and_follows_weights():
+    arms = _arms()
+    assert arms.choose("idea|context") == arms.choose("idea|context")
+
+    counts: dict[str, int] = {}
+    for i in range(4000):
+        name = arms.choose(f"idea {i}|").name
+        counts[name] = counts.get(name, 0) + 1
+    assert counts["openai:gpt-4o-mini"] / 4000 == pytest.approx(0.3, abs=0.03)
+    assert counts["deepseek:deepseek-chat"] / 4000 == pytest.approx(0.2, abs=0.03)
+    assert counts["ollama:qwen:7b"] / 4000 == pytest.approx(0.5, abs=0.03)
+    assert arms.snapshot()["ollama:qwen:7b"] == pytest.approx(0.5)
+
+
+def test_resolve_only_configured_arms():
+    arms = _arms()
+    assert arms.resolve("OpenAI", None).model == "gpt-4o-mini"
+    assert arms.resolve(None, "qwen:7b") == PRIMARY
+    with pytest.raises(ModelArmError, match="available"):
+        arms.resolve("anthropic", "claude")
+
+
+def test_arm_lms_are_built_once_and_primary_uses_global_lm():
+    factory = Mock(side_effect=ArmLM)
+    arms = ModelArms(PRIMARY, parse_model_arms("openai:gpt-4o-mini=0.5"), lm_factory=factory)
+
+    assert arms.lm(PRIMARY) is None
+    arm = arms.arms[0]
+    assert arms.lm(arm) is arms.lm(arm)
+    factory.assert_called_once_with("openai", "gpt-4o-mini")
+
+
+def _selector(strategy):
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+    return selector
+
+
+def _result():
+    return SimpleNamespace(
+        improved_prompt="You are an engineer.",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    )
+
+
+def test_concurrent_requests_run_on_their_own_models():
+    seen: dict[str, str | None] = {}
+    both_running = threading.Barrier(2, timeout=5)
+
+    def improve(original_idea, context):
+        # Both requests are in their worker threads at the same time
+        both_running.wait()
+        lm = dspy.settings.lm
+        seen[original_idea] = getattr(lm, "model", None)
+        return _result()
+
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = improve
+    enqueue = AsyncMock(return_value=True)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                client.post("/api/v1/improve-prompt", json={
+                    "idea": "Write release notes", "provider": "openai", "model": "gpt-4o-mini",
+                }),
+                client.post("/api/v1/improve-prompt", json={
+                    "idea": "Write a changelog", "provider": "deepseek",
+                }),
+            )
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=_selector(strategy)), \
+         patch("api.prompt_improver_api._enqueue_history", new=enqueue), \
+         patch("api.prompt_improver_api._model_arms", _arms()):
+        first, second = asyncio.run(run())
+
+    assert seen == {
+        "Write release notes": "openai/gpt-4o-mini",
+        "Write a changelog": "deepseek/deepseek-chat",
+    }
+    assert first.json()["strategy_meta"]["model_arm"] == "openai:gpt-4o-mini"
+    assert second.json()["strategy_meta"]["model_arm"] == "deepseek:deepseek-chat"
+    # Stored history is tagged with the arm, so comparisons can split by model
+    models = sorted((c.kwargs["provider"], c.kwargs["model"]) for c in enqueue.call_args_list)
+    assert models == [("deepseek", "deepseek-chat"), ("openai", "gpt-4o-mini")]
+
+
+def test_unknown_model_override_is_rejected():
+    strategy = Mock()
+    strategy.name = "simple"
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=_selector(strategy)), \
+         patch("api.prompt_improver_api._model_arms", _arms()):
+        response = asyncio.run(_post({"idea": "Write release notes", "model": "gpt-5"}))
+
+    assert response.status_code == 400
+    assert "not configured" in response.json()["detail"]
+    strategy.improve.assert_not_called()
+
+
+async def _post(body: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/v1/improve-prompt", json=body)
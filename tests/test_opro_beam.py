@@ -0,0 +1,182 @@
+"""Tests for the beam mode and LLM call budget of OPROOptimizer."""
+
+import threading
+import time
+from datetime import UTC, datetime
+from unittest.mock import Mock
+
+import pytest
+
+from eval.src.strategies.nlac_strategy import NLaCStrategy
+from hemdov.domain.dto.nlac_models import PromptObject
+from hemdov.domain.services.oprop_optimizer import OPROOptimizer
+
+
+def _prompt_obj(template: str = "Write a function") -> PromptObject:
+    now = datetime.now(UTC).isoformat()
+    return PromptObject(
+        id="test-id",
+        version="1.0.0",
+        intent_type="generate",
+        template=template,
+        strategy_meta={"intent": "generate", "complexity": "simple"},
+        constraints={"max_tokens": 500},
+        created_at=now,
+        updated_at=now,
+    )
+
+
+class Variations:
+    """_generate_variation stand-in: numbered children of the parent template."""
+
+    def __init__(self, delays: dict[str, float] | None = None):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._delays = delays or {}
+        self.parents: list[str] = []
+
+    def __call__(self, parent: PromptObject, history) -> PromptObject:
+        with self._lock:
+            self._count += 1
+            template = f"{parent.template}/{self._count}"
+            self.parents.append(parent.template)
+        time.sleep(self._delays.get(template, 0))
+        return parent.model_copy(update={"template": template})
+
+
+def _optimizer(scores: dict[str, float], variations: Variations, **kwargs) -> OPROOptimizer:
+    optimizer = OPROOptimizer(**kwargs)
+    optimizer._generate_variation = variations
+    optimizer._evaluate = lambda candidate: (scores.get(candidate.template, 0.1), "needs work")
+    return optimizer
+
+
+def test_candidates_of_a_round_are_generated_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+    variations = Variations()
+    optimizer = _optimizer({}, variations, candidates_per_round=3)
+
+    def generate(parent, history):
+        barrier.wait()  # Breaks (and fails the run) unless all three run at once
+        return variations(parent, history)
+
+    optimizer._generate_variation = generate
+
+    result = optimizer.run_loop(_prompt_obj())
+
+    assert result.iteration_count == OPROOptimizer.MAX_ITERATIONS
+    assert len(result.trajectory) == 1 + 2 * 3
+    assert {entry.iteration_number for entry in result.trajectory} == {1, 2, 3}
+
+
+def test_first_qualifying_candidate_stops_the_run():
+    variations = Variations(delays={"Write a function/1": 1.0})
+    optimizer = _optimizer({"Write a function/2": 1.0}, variations, candidates_per_round=2)
+
+    start = time.monotonic()
+    result = optimizer.run_loop(_prompt_obj())
+
+    assert time.monotonic() - start < 0.5  # Did not wait for the slow variation
+    assert result.early_stopped is True
+    assert result.iteration_count == 2
+    assert result.final_instruction == "Write a function/2"
+    assert result.final_score == 1.0
+
+
+def test_next_round_derives_from_the_top_b_candidates():
+    variations = Variations()
+    scores = {"Write a function/1": 0.4, "Write a function/2": 0.8, "Write a function/3": 0.6}
+    optimizer = _optimizer(scores, variations, beam_width=2, candidates_per_round=3)
+
+    result = optimizer.run_loop(_prompt_obj())
+
+    # Round 2 has only the original to derive from; round 3 uses the best two, best first
+    assert sorted(variations.parents[:3]) == ["Write a function"] * 3
+    assert sorted(variations.parents[3:]) == ["Write a function/2"] * 2 + ["Write a function/3"]
+    assert result.final_instruction == "Write a function/2"
+    assert result.final_score == 0.8
+    assert result.early_stopped is False
+
+
+def test_llm_calls_are_capped_per_run():
+    variations = Variations()
+    optimizer = _optimizer(
+        {}, variations, llm_client=Mock(), candidates_per_round=3, max_llm_calls=4
+    )
+
+    first = optimizer.run_loop(_prompt_obj())
+    second = optimizer.run_loop(_prompt_obj())
+
+    assert len(first.trajectory) == 1 + 3 + 1
+    assert len(second.trajectory) == 1 + 3 + 1  # Budget is per run
+
+
+def test_sequential_loop_stops_when_the_budget_is_spent():
+    optimizer = _optimizer({}, Variations(), llm_client=Mock(), max_llm_calls=1)
+
+    result = optimizer.run_loop(_prompt_obj())
+
+    assert result.iteration_count == 2
+    assert len(result.trajectory) == 2
+
+
+def test_llm_budget_is_not_shared_by_concurrent_runs():
+    second_started = threading.Event()
+    first_done = threading.Event()
+    variations = Variations()
+    optimizer = _optimizer({}, variations, llm_client=Mock(), max_llm_calls=1)
+    evaluate = optimizer._evaluate
+
+    def generate(parent, history):
+        if threading.current_thread().name == "first":
+            second_started.wait(2)  # The second run starts between our generations
+        return variations(parent, history)
+
+    def evaluate_in_lockstep(candidate):
+        if threading.current_thread().name == "second" and not second_started.is_set():
+            second_started.set()
+            first_done.wait(2)
+        return evaluate(candidate)
+
+    optimizer._generate_variation = generate
+    optimizer._evaluate = evaluate_in_lockstep
+    results = {}
+
+    def run(name: str) -> None:
+        results[name] = optimizer.run_loop(_prompt_obj())
+
+    first = threading.Thread(target=run, args=("first",), name="first")
+    second = threading.Thread(target=run, args=("second",), name="second")
+    first.start()
+    second.start()
+    first.join(5)
+    first_done.set()
+    second.join(5)
+
+    assert len(results["first"].trajectory) == 2  # Original + the one budgeted variation
+    assert len(results["second"].trajectory) == 2
+
+
+def test_duplicate_variations_are_scored_once():
+    optimizer = OPROOptimizer(candidates_per_round=3)
+    optimizer._evaluate = lambda candidate: (0.5, "needs work")
+
+    result = optimizer.run_loop(_prompt_obj())  # Heuristic refinement leaves the template as is
+
+    assert [entry.generated_instruction for entry in result.trajectory] == ["Write a function"]
+    assert result.iteration_count == OPROOptimizer.MAX_ITERATIONS
+
+
+def test_invalid_beam_settings_are_rejected():
+    with pytest.raises(ValueError, match="beam_width"):
+        OPROOptimizer(beam_width=0)
+    with pytest.raises(ValueError, match="max_llm_calls"):
+        OPROOptimizer(max_llm_calls=0)
+
+
+def test_nlac_strategy_passes_beam_settings_to_the_optimizer():
+    strategy = NLaCStrategy(opro_beam_width=2, opro_candidates_per_round=4, opro_max_llm_calls=6)
+
+    assert strategy.optimizer.beam_width == 2
+    assert strategy.optimizer.candidates_per_round == 4
+    assert strategy.optimizer.max_llm_calls == 6
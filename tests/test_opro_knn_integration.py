@@ -3,9 +3,11 @@ Tests for OPROOptimizer with KNNProvider integration.
 
 Tests few-shot examples in meta-prompts for better optimization.
 """
-import pytest
+import threading
 from unittest.mock import Mock
 
+import pytest
+
 from hemdov.domain.dto.nlac_models import IntentType, NLaCRequest, PromptObject
 from hemdov.domain.services.knn_provider import FewShotExample, KNNProvider
 from hemdov.domain.services.oprop_optimizer import OPROOptimizer
@@ -136,3 +138,159 @@ def test_opro_knn_runtime_error_raises():
     with pytest.raises(RuntimeError, match="KNN catalog empty"):
         optimizer.run_loop(prompt_obj)
 
+
+
+def _knn_with_one_example() -> Mock:
+    mock_knn = Mock(spec=KNNProvider)
+    mock_knn.find_examples.return_value = [
+        FewShotExample(
+            input_idea="Optimize code",
+            input_context="",
+            improved_prompt="Use efficient algorithms",
+            role="Developer",
+            directive="Make it fast",
+            framework="Python",
+            guardrails=[],
+        ),
+    ]
+    return mock_knn
+
+
+def _short_prompt() -> PromptObject:
+    return PromptObject(
+        id="test-4",
+        version="1.0.0",
+        intent_type=IntentType.GENERATE,
+        template="Write a function",  # Too short to pass: runs every iteration
+        strategy_meta={"intent": "generate", "complexity": "simple"},
+        constraints={"max_tokens": 500},
+        created_at="2026-01-06T00:00:00Z",
+        updated_at="2026-01-06T00:00:00Z",
+    )
+
+
+def test_knn_examples_are_fetched_once_per_run():
+    mock_knn = _knn_with_one_example()
+    optimizer = OPROOptimizer(llm_client=None, knn_provider=mock_knn)
+
+    result = optimizer.run_loop(_short_prompt())
+    optimizer.run_loop(_short_prompt())
+
+    assert len(result.trajectory) == OPROOptimizer.MAX_ITERATIONS
+    assert mock_knn.find_examples.call_count == 2  # Once per run
+    assert all("Use efficient algorithms" in t.meta_prompt_used for t in result.trajectory)
+
+
+def test_meta_prompts_are_rendered_when_read():
+    optimizer = OPROOptimizer(llm_client=None, knn_provider=_knn_with_one_example())
+    rendered = []
+    build = optimizer._build_meta_prompt
+    optimizer._build_meta_prompt = lambda *args: rendered.append(args) or build(*args)
+
+    result = optimizer.run_loop(_short_prompt())
+
+    assert rendered == []
+    first, second = result.trajectory[0].meta_prompt_used, result.trajectory[1].meta_prompt_used
+    assert result.trajectory[0].meta_prompt_used is first  # Rendered once
+    assert len(rendered) == 2
+    assert first.endswith("Improve this prompt: Write a function...")
+    # Rendered against the trajectory as it stood, not as it ended
+    assert "Iteration 1:" in second and "Iteration 2:" not in second
+    assert result.model_dump()["trajectory"][2]["meta_prompt_used"]
+
+
+def test_run_stopped_at_the_first_iteration_skips_knn():
+    mock_knn = _knn_with_one_example()
+    optimizer = OPROOptimizer(llm_client=None, knn_provider=mock_knn)
+    optimizer._evaluate = lambda prompt_obj: (1.0, "All constraints passed")
+
+    result = optimizer.run_loop(_short_prompt())
+
+    assert result.early_stopped is True
+    mock_knn.find_examples.assert_not_called()
+
+
+def test_concurrent_runs_keep_their_own_knn_examples():
+    debug_fetched = threading.Event()
+
+    def find_examples(intent, complexity, k, user_input):
+        if intent == "debug":
+            debug_fetched.set()
+        return [FewShotExample(
+            input_idea=f"{intent} idea",
+            input_context="",
+            improved_prompt=f"{intent} pattern",
+            role="Developer",
+            directive="Do it",
+            framework="Python",
+            guardrails=[],
+        )]
+
+    mock_knn = Mock(spec=KNNProvider)
+    mock_knn.find_examples.side_effect = find_examples
+    optimizer = OPROOptimizer(llm_client=None, knn_provider=mock_knn)
+    generate_variation = optimizer._generate_variation
+
+    def generate_after_debug_fetched(original, trajectory):
+        if threading.current_thread().name == "generate":
+            debug_fetched.wait(2)  # The debug run fetches its examples in between
+        return generate_variation(original, trajectory)
+
+    optimizer._generate_variation = generate_after_debug_fetched
+    results = {}
+
+    def run(intent: str) -> None:
+        prompt = _short_prompt().model_copy(
+            update={"strategy_meta": {"intent": intent, "complexity": "simple"}}
+        )
+        results[intent] = optimizer.run_loop(prompt)
+
+    threads = [threading.Thread(target=run, args=(i,), name=i) for i in ("generate", "debug")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    for intent, other in (("generate", "debug"), ("debug", "generate")):
+        meta_prompts = [t.meta_prompt_used for t in results[intent].trajectory]
+        assert len(meta_prompts) == OPROOptimizer.MAX_ITERATIONS
+        assert all(f"{intent} pattern" in m and f"{other} pattern" not in m for m in meta_prompts)
+
+
+def test_concurrent_runs_keep_their_own_knn_failures():
+    debug_fetched = threading.Event()
+
+    def find_examples(intent, complexity, k, user_input):
+        if intent == "generate":
+            raise ConnectionError("catalog unreachable")
+        debug_fetched.set()
+        return []
+
+    mock_knn = Mock(spec=KNNProvider)
+    mock_knn.find_examples.side_effect = find_examples
+    optimizer = OPROOptimizer(llm_client=None, knn_provider=mock_knn)
+    generate_variation = optimizer._generate_variation
+
+    def generate_after_debug_fetched(original, trajectory):
+        if threading.current_thread().name == "generate":
+            debug_fetched.wait(2)  # The debug run starts after the generate run's failure
+        return generate_variation(original, trajectory)
+
+    optimizer._generate_variation = generate_after_debug_fetched
+    results = {}
+
+    def run(intent: str) -> None:
+        prompt = _short_prompt().model_copy(
+            update={"strategy_meta": {"intent": intent, "complexity": "simple"}}
+        )
+        results[intent] = optimizer.run_loop(prompt)
+
+    threads = [threading.Thread(target=run, args=(i,), name=i) for i in ("generate", "debug")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results["generate"].knn_failure["failure_count"] == 1
+    assert results["generate"].knn_failure["last_error"]["error_type"] == "ConnectionError"
+    assert results["debug"].knn_failure is None
@@ -251,7 +251,7 @@ class TestOPROOptimizerCoverage:
         Test that KNN failures are tracked correctly.
 
         Verifies that:
-        1. KNN errors are tracked in _knn_failures
+        1. KNN errors are tracked for the run
         2. KNN failure metadata is included in response
         3. Transient failures don't stop optimization
         """
@@ -270,16 +270,9 @@ class TestOPROOptimizerCoverage:
 
         result = optimizer_with_knn.run_loop(sample_prompt_obj)
 
-        # Should have tracked KNN failure
-        assert len(optimizer_with_knn._knn_failures) == 3  # One per iteration
-
-        # Should have KNN failure metadata in response
-        # Note: KNN failures are tracked in knn_failure dict if early stopping occurred
-        # or if max iterations reached and failures exist
-        if result.early_stopped or optimizer_with_knn._knn_failures:
-            # The KNN failure metadata is built in run_loop method
-            # We can verify it was tracked
-            assert any(f["error_type"] == "KNNProviderError" for f in optimizer_with_knn._knn_failures)
+        # Should have tracked KNN failure in the response metadata
+        assert result.knn_failure["failure_count"] == 1  # Examples are fetched once per run
+        assert result.knn_failure["last_error"]["error_type"] == "KNNProviderError"
 
     # ========================================================================
     # INPUT VALIDATION
@@ -37,9 +37,9 @@ def test_transient_connection_error_tracked_and_degraded():
     # Should not raise - should track and degrade
     result = optimizer.run_loop(prompt_obj)
 
-    # Verify failure was tracked (at least one, since it runs multiple iterations)
-    assert len(optimizer._knn_failures) >= 1
-    failure = optimizer._knn_failures[0]
+    # Verify failure was tracked in the run's response metadata
+    assert result.knn_failure["failure_count"] >= 1
+    failure = result.knn_failure["errors"][0]
     assert failure["error_type"] == "ConnectionError"
     assert failure["is_transient"] is True
 
@@ -64,10 +64,10 @@ def test_knn_provider_error_degrades_gracefully():
     )
 
     result = optimizer.run_loop(prompt_obj)
-    assert len(optimizer._knn_failures) >= 1
+    assert result.knn_failure["failure_count"] >= 1
 
 
-def test_code_bug_keyerror_propagates_with_tracking():
+def test_code_bug_keyerror_propagates_with_tracking(caplog):
     """Test that KeyError (code bug) propagates after tracking."""
     mock_knn = Mock()
     mock_knn.find_examples.side_effect = KeyError("schema_drift")
@@ -90,12 +90,11 @@ def test_code_bug_keyerror_propagates_with_tracking():
     with pytest.raises(KeyError):
         optimizer.run_loop(prompt_obj)
 
-    # Verify bug was tracked
-    assert len(optimizer._knn_failures) >= 1
-    assert optimizer._knn_failures[0]["is_bug"] is True
+    # Verify bug was logged
+    assert "Unexpected KNN error (code bug)" in caplog.text
 
 
-def test_code_bug_typeerror_propagates_with_tracking():
+def test_code_bug_typeerror_propagates_with_tracking(caplog):
     """Test that TypeError (code bug) propagates after tracking."""
     mock_knn = Mock()
     mock_knn.find_examples.side_effect = TypeError("Wrong type")
@@ -117,11 +116,10 @@ def test_code_bug_typeerror_propagates_with_tracking():
     with pytest.raises(TypeError):
         optimizer.run_loop(prompt_obj)
 
-    assert len(optimizer._knn_failures) >= 1
-    assert optimizer._knn_failures[0]["is_bug"] is True
+    assert "Unexpected KNN error (code bug)" in caplog.text
 
 
-def test_code_bug_runtime_error_propagates_with_tracking():
+def test_code_bug_runtime_error_propagates_with_tracking(caplog):
     """Test that RuntimeError (code bug) propagates after tracking."""
     mock_knn = Mock()
     mock_knn.find_examples.side_effect = RuntimeError("Code bug")
@@ -143,11 +141,10 @@ def test_code_bug_runtime_error_propagates_with_tracking():
     with pytest.raises(RuntimeError):
         optimizer.run_loop(prompt_obj)
 
-    assert len(optimizer._knn_failures) >= 1
-    assert optimizer._knn_failures[0]["is_bug"] is True
+    assert "Unexpected KNN error (code bug)" in caplog.text
 
 
-def test_code_bug_value_error_propagates_with_tracking():
+def test_code_bug_value_error_propagates_with_tracking(caplog):
     """Test that ValueError (code bug) propagates after tracking."""
     mock_knn = Mock()
     mock_knn.find_examples.side_effect = ValueError("Invalid value")
@@ -169,5 +166,4 @@ def test_code_bug_value_error_propagates_with_tracking():
     with pytest.raises(ValueError):
         optimizer.run_loop(prompt_obj)
 
-    assert len(optimizer._knn_failures) >= 1
-    assert optimizer._knn_failures[0]["is_bug"] is True
+    assert "Unexpected KNN error (code bug)" in caplog.text
@@ -7,42 +7,56 @@ import pytest
 from hemdov.infrastructure.config import Settings
 
 
-@pytest.mark.asyncio
-async def test_save_history_normalizes_decomposition_framework_and_persists():
-    """Free-form decomposition framework should be normalized and persisted."""
-    from api.prompt_improver_api import _save_history_async
-
-    settings = Settings(
-        SQLITE_ENABLED=True,
+def _settings(enabled: bool = True) -> Settings:
+    return Settings(
+        SQLITE_ENABLED=enabled,
         SQLITE_DB_PATH=":memory:",
         SQLITE_WAL_MODE=True,
     )
 
+
+def _result(framework: str) -> MagicMock:
+    result = MagicMock()
+    result.improved_prompt = "improved prompt"
+    result.role = "Architect"
+    result.directive = "Design robust policy"
+    result.framework = framework
+    result.guardrails = ["be concrete"]
+    result.reasoning = None
+    result.confidence = 0.9
+    return result
+
+
+async def _persist(settings: Settings, result, **kwargs) -> bool:
+    """Enqueue one record and drain the history writer."""
+    from api.prompt_improver_api import _enqueue_history, get_history_writer
+
+    accepted = await _enqueue_history(
+        settings=settings,
+        original_idea="Design retries",
+        context="Need deterministic fallback",
+        result=result,
+        backend="moderate",
+        latency_ms=120,
+        **kwargs,
+    )
+    await get_history_writer(settings).close()
+    return accepted
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
+async def test_save_history_normalizes_decomposition_framework_and_persists():
+    """Free-form decomposition framework should be normalized and persisted."""
     mock_repo = AsyncMock()
     mock_breaker = AsyncMock()
 
-    mock_result = MagicMock()
-    mock_result.improved_prompt = "improved prompt"
-    mock_result.role = "Architect"
-    mock_result.directive = "Design robust policy"
-    mock_result.framework = "Decomposition: break down into steps"
-    mock_result.guardrails = ["be concrete"]
-    mock_result.reasoning = None
-    mock_result.confidence = 0.9
-
-    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo):
-        with patch("api.prompt_improver_api._circuit_breaker", mock_breaker):
-            await _save_history_async(
-                settings=settings,
-                original_idea="Design retries",
-                context="Need deterministic fallback",
-                result=mock_result,
-                backend="moderate",
-                latency_ms=120,
-            )
-
-    mock_repo.save.assert_awaited_once()
-    saved_history = mock_repo.save.await_args.args[0]
+    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo), \
+         patch("api.prompt_improver_api._circuit_breaker", mock_breaker):
+        assert await _persist(_settings(), _result("Decomposition: break down into steps"))
+
+    mock_repo.save_many.assert_awaited_once()
+    saved_history = mock_repo.save_many.await_args.args[0][0]
     assert saved_history.framework == "decomposition"
     mock_breaker.record_failure.assert_not_called()
 
@@ -68,42 +82,19 @@ def test_normalize_framework_for_history_heuristics(framework_raw: str, expected
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
 async def test_save_history_unknown_framework_uses_safe_fallback_and_logs_warning(caplog):
     """Unknown framework variants should fallback to decomposition and leave a trace."""
-    from api.prompt_improver_api import _save_history_async
-
-    settings = Settings(
-        SQLITE_ENABLED=True,
-        SQLITE_DB_PATH=":memory:",
-        SQLITE_WAL_MODE=True,
-    )
-
     mock_repo = AsyncMock()
     mock_breaker = AsyncMock()
 
-    mock_result = MagicMock()
-    mock_result.improved_prompt = "improved prompt"
-    mock_result.role = "Architect"
-    mock_result.directive = "Design robust policy"
-    mock_result.framework = "Unrecognized Framework Name"
-    mock_result.guardrails = ["be concrete"]
-    mock_result.reasoning = None
-    mock_result.confidence = 0.9
-
-    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo):
-        with patch("api.prompt_improver_api._circuit_breaker", mock_breaker):
-            with caplog.at_level("WARNING", logger="api.prompt_improver_api"):
-                await _save_history_async(
-                    settings=settings,
-                    original_idea="Design retries",
-                    context="Need deterministic fallback",
-                    result=mock_result,
-                    backend="moderate",
-                    latency_ms=120,
-                )
-
-    mock_repo.save.assert_awaited_once()
-    saved_history = mock_repo.save.await_args.args[0]
+    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo), \
+         patch("api.prompt_improver_api._circuit_breaker", mock_breaker), \
+         caplog.at_level("WARNING", logger="api.prompt_improver_api"):
+        await _persist(_settings(), _result("Unrecognized Framework Name"))
+
+    mock_repo.save_many.assert_awaited_once()
+    saved_history = mock_repo.save_many.await_args.args[0][0]
     assert saved_history.framework == "decomposition"
     assert "event=framework_normalization_fallback" in caplog.text
     assert "framework_raw='Unrecognized Framework Name'" in caplog.text
@@ -111,85 +102,36 @@ async def test_save_history_unknown_framework_uses_safe_fallback_and_logs_warnin
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
 async def test_save_history_logs_structured_persistence_failed_on_repo_error(caplog):
     """Persistence failures should emit structured log context for operations."""
-    from api.prompt_improver_api import _save_history_async
-
-    settings = Settings(
-        SQLITE_ENABLED=True,
-        SQLITE_DB_PATH=":memory:",
-        SQLITE_WAL_MODE=True,
-    )
-
     mock_repo = AsyncMock()
-    mock_repo.save.side_effect = ConnectionError("db unavailable")
+    mock_repo.save_many.side_effect = ConnectionError("db unavailable")
     mock_breaker = AsyncMock()
 
-    mock_result = MagicMock()
-    mock_result.improved_prompt = "improved prompt"
-    mock_result.role = "Architect"
-    mock_result.directive = "Design robust policy"
-    mock_result.framework = "chain-of-thought"
-    mock_result.guardrails = ["be concrete"]
-    mock_result.reasoning = None
-    mock_result.confidence = 0.9
-
-    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo):
-        with patch("api.prompt_improver_api._circuit_breaker", mock_breaker):
-            with caplog.at_level("ERROR", logger="api.prompt_improver_api"):
-                await _save_history_async(
-                    settings=settings,
-                    original_idea="Design retries",
-                    context="Need deterministic fallback",
-                    result=mock_result,
-                    backend="moderate",
-                    latency_ms=120,
-                    mode="nlac",
-                    request_id="req-1234",
-                )
+    with patch("api.prompt_improver_api.get_repository", return_value=mock_repo), \
+         patch("api.prompt_improver_api._circuit_breaker", mock_breaker), \
+         caplog.at_level("ERROR", logger="hemdov.infrastructure.persistence.history_writer"):
+        await _persist(_settings(), _result("chain-of-thought"), mode="nlac", request_id="req-1234")
 
     assert "event=persistence_failed" in caplog.text
-    assert "error_type=ConnectionError" in caplog.text
-    assert "request_id=req-1234" in caplog.text
-    assert "backend=moderate" in caplog.text
-    assert "mode=nlac" in caplog.text
+    assert "reason=ConnectionError" in caplog.text
+    assert "request_ids=req-1234" in caplog.text
     mock_breaker.record_failure.assert_awaited_once()
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("fresh_history_writer")
 async def test_save_history_sqlite_disabled_does_not_emit_persistence_failed(caplog):
     """Disabled persistence by config should not be logged as a failure."""
-    from api.prompt_improver_api import _save_history_async
-
-    settings = Settings(
-        SQLITE_ENABLED=False,
-        SQLITE_DB_PATH=":memory:",
-        SQLITE_WAL_MODE=True,
-    )
-
     mock_breaker = AsyncMock()
 
-    mock_result = MagicMock()
-    mock_result.improved_prompt = "improved prompt"
-    mock_result.role = "Architect"
-    mock_result.directive = "Design robust policy"
-    mock_result.framework = "chain-of-thought"
-    mock_result.guardrails = ["be concrete"]
-    mock_result.reasoning = None
-    mock_result.confidence = 0.9
-
-    with patch("api.prompt_improver_api._circuit_breaker", mock_breaker):
-        with caplog.at_level("WARNING", logger="api.prompt_improver_api"):
-            await _save_history_async(
-                settings=settings,
-                original_idea="Design retries",
-                context="Need deterministic fallback",
-                result=mock_result,
-                backend="moderate",
-                latency_ms=120,
-                mode="legacy",
-                request_id="req-4321",
-            )
+    with patch("api.prompt_improver_api._circuit_breaker", mock_breaker), \
+         caplog.at_level("WARNING"):
+        assert await _persist(
+            _settings(enabled=False), _result("chain-of-thought"),
+            mode="legacy", request_id="req-4321",
+        )
 
     assert "event=persistence_failed" not in caplog.text
     mock_breaker.record_failure.assert_not_called()
@@ -15,6 +15,8 @@ from fastapi.testclient import TestClient
 
 # Import the FastAPI app
 from api.main import app
+from hemdov.infrastructure.config import Settings
+from hemdov.interfaces import container
 
 
 @pytest.fixture
@@ -23,6 +25,12 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def sync_metrics(monkeypatch):
+    """Compute metrics inline so calculation failures surface in the response."""
+    monkeypatch.setattr(container.get(Settings), "METRICS_SYNC_MODE", True)
+
+
 class TestMetricsExceptionHandling:
     """Test metrics calculation exception handling."""
 
@@ -315,9 +323,11 @@ class TestDegradationFlags:
 
     def test_request_id_is_forwarded_to_persistence_task(self, client):
         """Request ID from middleware should be propagated to async persistence."""
+        mock_writer = Mock()
+        mock_writer.submit = AsyncMock(return_value=True)
         with patch('api.prompt_improver_api._metrics_calculator') as mock_metrics, \
              patch('api.prompt_improver_api.get_strategy_selector') as mock_selector, \
-             patch('api.prompt_improver_api._save_history_async', new_callable=AsyncMock) as mock_save:
+             patch('api.prompt_improver_api.get_history_writer', return_value=mock_writer):
             # Mock metrics to succeed
             mock_metrics.calculate_from_history = Mock(return_value=Mock(
                 overall_score=0.8,
@@ -345,31 +355,27 @@ class TestDegradationFlags:
             mock_selector_instance.get_degradation_flags.return_value = {}
             mock_selector.return_value = mock_selector_instance
 
-            # Capture and close coroutine to avoid unawaited warnings in test
-            def _capture_task(coro):
-                coro.close()
-                return None
-
-            with patch('api.prompt_improver_api.asyncio.create_task', side_effect=_capture_task):
-                response = client.post(
-                    "/api/v1/improve-prompt",
-                    json={
-                        "idea": "Test prompt idea",
-                        "mode": "legacy"
-                    },
-                    headers={"X-Request-ID": "trace-123"},
-                )
+            response = client.post(
+                "/api/v1/improve-prompt",
+                json={
+                    "idea": "Test prompt idea",
+                    "mode": "legacy"
+                },
+                headers={"X-Request-ID": "trace-123"},
+            )
 
             assert response.status_code == 200
-            assert mock_save.call_count == 1
-            assert mock_save.call_args.kwargs["request_id"] == "trace-123"
-            assert mock_save.call_args.kwargs["mode"] == "legacy"
-
-    def test_create_task_failure_degrades_without_breaking_response(self, client):
-        """Persistence scheduling failure should not fail API response."""
+            assert mock_writer.submit.await_count == 1
+            assert mock_writer.submit.call_args.kwargs["request_id"] == "trace-123"
+            assert mock_writer.submit.call_args.kwargs["mode"] == "legacy"
+
+    def test_history_queue_rejection_degrades_without_breaking_response(self, client):
+        """A record rejected by the history writer should not fail API response."""
+        mock_writer = Mock()
+        mock_writer.submit = AsyncMock(return_value=False)  # queue full, block timed out
         with patch('api.prompt_improver_api._metrics_calculator') as mock_metrics, \
              patch('api.prompt_improver_api.get_strategy_selector') as mock_selector, \
-             patch('api.prompt_improver_api.asyncio.create_task', side_effect=RuntimeError("loop closed")):
+             patch('api.prompt_improver_api.get_history_writer', return_value=mock_writer):
             mock_metrics.calculate_from_history = Mock(return_value=Mock(
                 overall_score=0.8,
                 grade="A",
@@ -0,0 +1,121 @@
+"""Tests for the stable prompt-prefix layout and prompt cache breakpoints."""
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from hemdov.domain.dto.nlac_models import NLaCRequest
+from hemdov.domain.services.complexity_analyzer import ComplexityLevel
+from hemdov.domain.services.knn_provider import FewShotExample
+from hemdov.domain.services.nlac_builder import NLaCBuilder
+from hemdov.domain.services.token_usage import TokenUsage
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
+    PromptImproverLiteLLMAdapter,
+    with_cache_breakpoints,
+)
+from hemdov.infrastructure.metrics.in_process import InProcessMetrics
+
+EXAMPLES = [
+    FewShotExample(
+        input_idea=f"Example idea {name}",
+        input_context="",
+        improved_prompt=f"Improved prompt {name}",
+        role="Developer",
+        directive="d",
+        framework="chain-of-thought",
+        guardrails=[],
+    )
+    for name in ("a", "b", "c")
+]
+
+DEMO_MESSAGES = [
+    {"role": "system", "content": "Your input fields are: ..."},
+    {"role": "user", "content": "demo input"},
+    {"role": "assistant", "content": "demo output"},
+    {"role": "user", "content": "the request"},
+]
+
+
+def _builder(examples, complexity):
+    builder = NLaCBuilder()
+    builder.knn_provider = Mock()
+    builder.knn_provider.find_examples.return_value = examples
+    builder.complexity_analyzer = Mock()
+    builder.complexity_analyzer.analyze.return_value = complexity
+    return builder
+
+
+def _prefix(template: str, marker: str) -> str:
+    return template[: template.index(marker)]
+
+
+def test_simple_template_puts_role_and_examples_before_the_request():
+    first = _builder(EXAMPLES, ComplexityLevel.SIMPLE).build(
+        NLaCRequest(idea="Write a CSV parser", context="")
+    ).template
+    # Same examples ranked differently for another request
+    second = _builder(EXAMPLES[::-1], ComplexityLevel.SIMPLE).build(
+        NLaCRequest(idea="Write a JSON parser", context="streaming")
+    ).template
+
+    assert _prefix(first, "# Task") == _prefix(second, "# Task")
+    assert "Example idea a" in _prefix(first, "# Task")
+    assert "Write a CSV parser" not in _prefix(first, "# Task")
+
+
+def test_rar_template_puts_requirements_and_examples_before_the_request():
+    first = _builder(EXAMPLES, ComplexityLevel.COMPLEX).build(
+        NLaCRequest(idea="Design a sharded job queue", context="")
+    ).template
+    second = _builder(EXAMPLES[::-1], ComplexityLevel.COMPLEX).build(
+        NLaCRequest(idea="Design a rate limiter", context="")
+    ).template
+
+    shared = _prefix(first, "# Understanding the Request")
+    assert shared == _prefix(second, "# Understanding the Request")
+    assert "## Requirements" in shared
+    assert "## Reference Examples" in shared
+
+
+def test_breakpoints_mark_system_and_last_demo_only():
+    marked = with_cache_breakpoints(DEMO_MESSAGES)
+
+    assert [isinstance(m["content"], list) for m in marked] == [True, False, True, False]
+    assert marked[0]["content"][0] == {
+        "type": "text",
+        "text": "Your input fields are: ...",
+        "cache_control": {"type": "ephemeral"},
+    }
+    assert DEMO_MESSAGES[0]["content"] == "Your input fields are: ..."  # Input untouched
+
+
+def test_breakpoints_without_demos_mark_the_system_message():
+    marked = with_cache_breakpoints(DEMO_MESSAGES[:1] + DEMO_MESSAGES[-1:])
+
+    assert isinstance(marked[0]["content"], list)
+    assert marked[1]["content"] == "the request"
+
+
+def _sent_messages(model: str):
+    adapter = PromptImproverLiteLLMAdapter(model=model, api_key="x")
+    adapter.litellm = Mock()
+    adapter.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))]
+    )
+    adapter(messages=DEMO_MESSAGES)
+    return adapter.litellm.completion.call_args.kwargs["messages"]
+
+
+def test_only_explicit_cache_providers_get_breakpoints():
+    assert isinstance(_sent_messages("anthropic/claude-sonnet-4-5-20250929")[0]["content"], list)
+    assert _sent_messages("deepseek/deepseek-chat") == DEMO_MESSAGES
+
+
+def test_cached_token_ratio_per_provider():
+    metrics = InProcessMetrics()
+    usage = TokenUsage()
+    usage.record(2000, 100, cached_tokens=1500)
+    metrics.record_llm_tokens("anthropic", usage)
+    metrics.record_llm_tokens("ollama", TokenUsage())
+
+    assert usage.cached_ratio == 0.75
+    assert metrics.prompt_cache_ratios() == {"anthropic": 0.75}
@@ -0,0 +1,244 @@
+"""Tests for the per-provider LLM circuit breaker and the improve-prompt fallback."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import litellm
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from hemdov.domain.entities.prompt_history import PromptHistory
+from hemdov.domain.services.cancellation import CancelReason, OperationCancelledError
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState, ProviderBreaker
+from hemdov.infrastructure.adapters.provider_router import (
+    ProviderCircuitOpenError,
+    ProviderRouter,
+    ProviderUnavailableError,
+)
+
+
+class FailingProvider:
+    def __init__(self, model: str, error: Exception | None = None):
+        self.model = model
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ["ok"]
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=2, reset_timeout_seconds=60)
+
+    breaker.record_failure("timeout")
+    assert breaker.allow()
+    breaker.record_failure("timeout")
+
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+    assert breaker.snapshot()["last_failure_kind"] == "timeout"
+
+
+def test_success_resets_consecutive_count():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=1, reset_timeout_seconds=0)
+    breaker.record_failure()
+
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # probe in flight
+
+    breaker.record_success(0.1)
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_failed_probe_reopens():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=3, reset_timeout_seconds=60)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker._opened_at -= 60  # reset period elapsed
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.snapshot()["trips"] == 2
+
+
+def test_released_probe_can_be_retried():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=1, reset_timeout_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_slow_successes_count_as_timeouts():
+    breaker = ProviderBreaker("openai/gpt", failure_threshold=2, slow_call_seconds=1.0)
+    breaker.record_success(5.0)
+    breaker.record_success(5.0)
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.snapshot()["last_failure_kind"] == "slow"
+
+
+def test_router_fails_fast_when_every_circuit_is_open():
+    timeout = litellm.exceptions.Timeout("timed out", model="primary", llm_provider="openai")
+    primary = FailingProvider("primary", timeout)
+    router = ProviderRouter([primary], breaker_failure_threshold=2, breaker_reset_seconds=60)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            router(prompt="hi")
+    assert router.stats()[0]["breaker"]["state"] == "open"
+
+    with pytest.raises(ProviderCircuitOpenError) as excinfo:
+        router(prompt="hi")
+    assert primary.calls == 2
+    assert excinfo.value.retry_after > 0
+
+
+def test_router_skips_open_provider_for_next_one():
+    primary = FailingProvider("primary", ConnectionError("refused"))
+    backup = FailingProvider("backup")
+    router = ProviderRouter(
+        [primary, backup], breaker_failure_threshold=1, breaker_reset_seconds=60
+    )
+
+    assert router(prompt="hi") == ["ok"]
+    assert router(prompt="hi") == ["ok"]
+    assert primary.calls == 1
+    assert backup.calls == 2
+
+
+def test_deadline_hit_in_flight_counts_as_timeout():
+    late = OperationCancelledError(CancelReason.TIMEOUT, "llm_result")
+    router = ProviderRouter(
+        [FailingProvider("primary", late)], breaker_failure_threshold=1, breaker_reset_seconds=60
+    )
+
+    with pytest.raises(OperationCancelledError):
+        router(prompt="hi")
+    assert router.breakers()[0].snapshot()["last_failure_kind"] == "timeout"
+
+
+def test_client_disconnect_does_not_count():
+    gone = OperationCancelledError(CancelReason.CLIENT_DISCONNECTED, "llm_result")
+    router = ProviderRouter([FailingProvider("primary", gone)], breaker_failure_threshold=1)
+
+    with pytest.raises(OperationCancelledError):
+        router(prompt="hi")
+    assert router.breakers()[0].state == BreakerState.CLOSED
+
+
+def _selector_raising(error: Exception):
+    strategy = Mock()
+    strategy.name = "complex"
+    strategy.improve = Mock(side_effect=error)
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="complex")
+    selector.get_degradation_flags.return_value = {}
+    return selector
+
+
+def _improve(selector, **patches):
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)), \
+         patch.multiple("api.prompt_improver_api", **patches):
+        return TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Design an ADR process", "mode": "legacy"}
+        )
+
+
+def _strategy_failure(cause: Exception) -> RuntimeError:
+    try:
+        raise RuntimeError("DSPy PromptImprover failed") from cause
+    except RuntimeError as e:
+        return e
+
+
+def test_endpoint_serves_cached_improvement_when_providers_fail():
+    cached = PromptHistory(
+        original_idea="Design an ADR process",
+        context="",
+        improved_prompt="You are an architect.",
+        role="Architect",
+        directive="Design an ADR process",
+        framework="chain-of-thought",
+        guardrails=["Be concise"],
+        backend="complex",
+        model="m",
+        provider="p",
+    )
+    response = _improve(
+        _selector_raising(_strategy_failure(ProviderUnavailableError("all down"))),
+        _find_cached_improvement=AsyncMock(return_value=cached),
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["improved_prompt"] == "You are an architect."
+    assert body["backend"] == "cache"
+    assert body["strategy_meta"]["fallback"] == "cache"
+    assert body["degradation_flags"]["llm_fallback"] is True
+
+
+def test_endpoint_falls_back_to_zero_shot():
+    zero_shot = Mock(return_value=SimpleNamespace(
+        improved_prompt="Zero-shot prompt",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+    ))
+    response = _improve(
+        _selector_raising(_strategy_failure(ProviderUnavailableError("all down"))),
+        _find_cached_improvement=AsyncMock(return_value=None),
+        get_zero_shot_improver=Mock(return_value=zero_shot),
+    )
+
+    assert response.status_code == 200
+    assert response.json()["backend"] == "zero-shot"
+    zero_shot.assert_called_once_with(original_idea="Design an ADR process", context="")
+
+
+@pytest.mark.asyncio
+async def test_zero_shot_fallback_uses_the_compressed_context():
+    from api.prompt_improver_api import ImprovePromptRequest, _llm_fallback
+    from hemdov.infrastructure.config import Settings
+
+    zero_shot = Mock(return_value="result")
+    request = ImprovePromptRequest(idea="Design an ADR process", context="long " * 500)
+
+    with patch("api.prompt_improver_api._find_cached_improvement", AsyncMock(return_value=None)), \
+         patch("api.prompt_improver_api.get_zero_shot_improver", Mock(return_value=zero_shot)):
+        result, backend = await _llm_fallback(
+            Settings(), request, ProviderUnavailableError("all down"), "short"
+        )
+
+    assert (result, backend) == ("result", "zero-shot")
+    zero_shot.assert_called_once_with(original_idea="Design an ADR process", context="short")
+
+
+def test_endpoint_fails_fast_with_retry_after_when_circuits_open():
+    zero_shot = Mock()
+    response = _improve(
+        _selector_raising(_strategy_failure(ProviderCircuitOpenError("open", retry_after=12.3))),
+        _find_cached_improvement=AsyncMock(return_value=None),
+        get_zero_shot_improver=Mock(return_value=zero_shot),
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "13"
+    zero_shot.assert_not_called()
@@ -0,0 +1,247 @@
+"""Tests for latency-aware multi-provider failover."""
+
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import litellm
+import pytest
+
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+    get_current_token,
+)
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import (
+    PromptImproverLiteLLMAdapter,
+)
+from hemdov.infrastructure.adapters.provider_router import (
+    ProviderRouter,
+    ProviderUnavailableError,
+    is_retryable,
+)
+from hemdov.infrastructure.metrics import InProcessMetrics
+
+
+class FakeProvider:
+    """In-process provider: replies after a delay, or raises the queued errors."""
+
+    def __init__(self, model: str, reply: str = "ok", delay: float = 0.0, errors=()):
+        self.model = model
+        self.kwargs = {"temperature": 0.0, "max_tokens": 100, "api_key": f"{model}-key"}
+        self.reply = reply
+        self.delay = delay
+        self.errors = list(errors)
+        self.calls: list[dict] = []
+        self.tokens: list[CancellationToken | None] = []
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        self.calls.append(kwargs)
+        self.tokens.append(get_current_token())
+        if self.delay:
+            time.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return [self.reply]
+
+
+def _rate_limit(model: str) -> Exception:
+    return litellm.exceptions.RateLimitError("slow down", llm_provider="openai", model=model)
+
+
+def test_primary_serves_while_healthy():
+    primary, backup = FakeProvider("primary", "from primary"), FakeProvider("backup")
+    router = ProviderRouter([primary, backup])
+
+    assert router(prompt="hi") == ["from primary"]
+    assert backup.calls == []
+    assert router.model == "primary"
+    # Credentials stay with each provider
+    assert router.kwargs == {"temperature": 0.0, "max_tokens": 100}
+
+
+def test_fails_over_mid_request_on_retryable_errors():
+    primary = FakeProvider("primary", errors=[_rate_limit("primary")])
+    backup = FakeProvider("backup", "from backup")
+    metrics = InProcessMetrics()
+    router = ProviderRouter([primary, backup], metrics=metrics)
+
+    assert router(prompt="hi") == ["from backup"]
+    assert metrics.provider_calls.value(provider="primary", outcome="error") == 1
+    assert metrics.provider_calls.value(provider="backup", outcome="ok") == 1
+
+
+def test_non_retryable_errors_are_not_failed_over():
+    bad_request = litellm.exceptions.BadRequestError("bad", model="primary", llm_provider="openai")
+    primary = FakeProvider("primary", errors=[bad_request])
+    backup = FakeProvider("backup")
+    router = ProviderRouter([primary, backup])
+
+    with pytest.raises(litellm.exceptions.BadRequestError):
+        router(prompt="hi")
+    assert backup.calls == []
+    assert router.stats()[0]["failures"] == 0
+
+
+def test_all_providers_failing_raises_provider_unavailable():
+    router = ProviderRouter([
+        FakeProvider("primary", errors=[ConnectionError("refused")]),
+        FakeProvider("backup", errors=[TimeoutError("slow")]),
+    ])
+
+    with pytest.raises(ProviderUnavailableError, match="primary.*backup"):
+        router(prompt="hi")
+
+
+def test_routes_to_faster_provider_once_both_are_measured():
+    slow, fast = FakeProvider("slow", "slow", delay=0.05), FakeProvider("fast", "fast")
+    router = ProviderRouter([slow, fast])
+
+    assert router(prompt="hi") == ["slow"]  # configuration order until measured
+    assert router(prompt="hi") == ["fast"]  # unmeasured providers get one probe
+    assert router(prompt="hi") == ["fast"]
+    assert [p.model for p in router.ordered_providers()] == ["fast", "slow"]
+
+
+def test_failing_provider_cools_down_then_recovers():
+    primary = FakeProvider("primary", errors=[ConnectionError("down")] * 3)
+    backup = FakeProvider("backup")
+    router = ProviderRouter([primary, backup], cooldown_seconds=60)
+
+    for _ in range(3):
+        router(prompt="hi")
+    assert [p.model for p in router.ordered_providers()] == ["backup", "primary"]
+    assert router.stats()[1]["cooling_down"] is True
+
+    router._cooldown = 0
+    assert router.stats()[1]["cooling_down"] is False
+
+
+def test_attempt_timeout_is_passed_to_providers():
+    primary = FakeProvider("primary")
+    router = ProviderRouter([primary], attempt_timeout_seconds=5)
+
+    router(prompt="hi")
+    router(prompt="hi", timeout=1)
+    assert [call["timeout"] for call in primary.calls] == [5, 1]
+
+
+def test_cancelled_request_does_not_fail_over():
+    token = CancellationToken()
+
+    class DisconnectingProvider(FakeProvider):
+        def __call__(self, prompt=None, messages=None, **kwargs):
+            token.cancel(CancelReason.CLIENT_DISCONNECTED)
+            raise ConnectionError("refused")
+
+    backup = FakeProvider("backup")
+    router = ProviderRouter([DisconnectingProvider("primary"), backup])
+
+    with cancellation_scope(token), pytest.raises(OperationCancelledError):
+        router(prompt="hi")
+    assert backup.calls == []
+
+
+def test_wraps_real_adapters():
+    def adapter(model, side_effect):
+        lm = PromptImproverLiteLLMAdapter(model=model, api_key="x")
+        lm.litellm = Mock()
+        lm.litellm.completion.side_effect = side_effect
+        return lm
+
+    reply = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+    primary = adapter("openai/primary", ConnectionError("refused"))
+    backup = adapter("deepseek/backup", [reply])
+
+    assert ProviderRouter([primary, backup])(prompt="hi") == ["ok"]
+    # The adapter wraps a transport error in RuntimeError: retryable, but a
+    # wrapped ValueError (malformed request) is not
+    wrapped = RuntimeError("LiteLLM request failed")
+    wrapped.__cause__ = ValueError("bad")
+    assert not is_retryable(wrapped)
+    assert not is_retryable(OperationCancelledError(CancelReason.TIMEOUT, "llm_call"))
+
+
+def _hedging_router(providers, **kwargs):
+    kwargs.setdefault("hedge_min_delay_seconds", 0.01)
+    kwargs.setdefault("hedge_budget", 1.0)
+    router = ProviderRouter(providers, hedge_enabled=True, **kwargs)
+    # Ten fast calls each: enough samples for a hedge delay of ~10ms
+    for provider in providers:
+        for _ in range(10):
+            router._record(provider, ok=True, latency=0.01)
+    return router
+
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    slow, fast = FakeProvider("slow", "slow", delay=0.3), FakeProvider("fast", "fast")
+    metrics = InProcessMetrics()
+    router = _hedging_router([slow, fast], metrics=metrics)
+
+    with cancellation_scope(CancellationToken(timeout_seconds=5)) as request_token:
+        assert router(prompt="hi") == ["fast"]
+
+    assert router.hedge_stats() == {
+        "enabled": True, "fired": 1, "won": 1, "lost": 0, "skipped_budget": 0,
+    }
+    assert metrics.llm_hedges.value(outcome="won") == 1
+    # The loser's attempt token is cancelled; the request's is not
+    assert slow.tokens[0].reason == CancelReason.SUPERSEDED
+    assert not request_token.cancelled
+    router.close()
+
+
+def test_single_provider_hedges_to_itself():
+    calls = []
+
+    class FirstCallSlow(FakeProvider):
+        def __call__(self, prompt=None, messages=None, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                time.sleep(0.3)
+                return ["first"]
+            return ["second"]
+
+    router = _hedging_router([FirstCallSlow("only")])
+    assert router(prompt="hi") == ["second"]
+    assert len(calls) == 2
+    router.close()
+
+
+def test_hedge_budget_caps_duplicates():
+    slow, fast = FakeProvider("slow", "slow", delay=0.05), FakeProvider("fast", "fast")
+    router = _hedging_router([slow, fast], hedge_budget=0.0)
+
+    assert router(prompt="hi") == ["slow"]
+    assert fast.calls == []
+    assert router.hedge_stats()["skipped_budget"] == 1
+    router.close()
+
+
+def test_no_hedging_without_latency_history():
+    slow, fast = FakeProvider("slow", "slow", delay=0.05), FakeProvider("fast", "fast")
+    router = ProviderRouter(
+        [slow, fast], hedge_enabled=True, hedge_min_delay_seconds=0.01, hedge_budget=1.0
+    )
+
+    assert router(prompt="hi") == ["slow"]
+    assert router.hedge_stats()["fired"] == 0
+
+
+def test_create_lm_builds_router_from_settings(monkeypatch):
+    from api import main
+
+    monkeypatch.setattr(main.settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(
+        main.settings, "LLM_FALLBACK_PROVIDERS", "deepseek:deepseek-chat, ollama:qwen:7b"
+    )
+    lm = main.create_lm()
+
+    assert isinstance(lm, ProviderRouter)
+    assert [p.model for p in lm.providers][1:] == ["deepseek/deepseek-chat", "ollama/qwen:7b"]
+
+    monkeypatch.setattr(main.settings, "LLM_FALLBACK_PROVIDERS", "deepseek")
+    with pytest.raises(ValueError, match="provider:model"):
+        main.create_lm()
@@ -0,0 +1,229 @@
+"""Tests for the client-side per-provider rate limiter."""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from api.main import parse_rate_limits
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+from hemdov.infrastructure.adapters.provider_router import ProviderRouter, ProviderUnavailableError
+from hemdov.infrastructure.adapters.rate_limiter import RateLimiter, RateLimitWaitError
+from hemdov.infrastructure.adapters.retry_policy import RetryPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _drain(limiter: RateLimiter, requests: int = 0, tokens: int = 0) -> None:
+    for _ in range(requests):
+        limiter.acquire(0)
+    if tokens:
+        limiter.acquire(tokens)
+
+
+def test_requests_refill_continuously():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, clock=clock)
+    _drain(limiter, requests=60)
+
+    with cancellation_scope(CancellationToken(timeout_seconds=0.5)), \
+         pytest.raises(RateLimitWaitError):
+        limiter.acquire(0)
+
+    clock.now += 1.0
+    limiter.acquire(0)
+    assert limiter.stats()["requests_available"] == 0
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_wait_beyond_the_deadline_fails_fast():
+    limiter = RateLimiter(tokens_per_minute=6000)
+    _drain(limiter, tokens=6000)
+
+    start = time.monotonic()
+    with cancellation_scope(CancellationToken(timeout_seconds=2)), \
+         pytest.raises(RateLimitWaitError):
+        limiter.acquire(1000)  # 10s at 100 tokens/s
+    assert time.monotonic() - start < 0.5
+
+
+def test_waits_within_the_deadline():
+    limiter = RateLimiter(tokens_per_minute=60_000)  # 1000 tokens/s
+    _drain(limiter, tokens=60_000)
+
+    start = time.monotonic()
+    with cancellation_scope(CancellationToken(timeout_seconds=5)):
+        limiter.acquire(100)
+    assert 0.08 <= time.monotonic() - start < 1
+    assert limiter.stats()["waited"] == 1
+
+
+def test_settle_refunds_or_charges_the_difference():
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=1000, clock=clock)
+
+    reserved = limiter.acquire(800)
+    limiter.settle(reserved, 100)
+    assert limiter.stats()["tokens_available"] == 900
+
+    reserved = limiter.acquire(100)
+    limiter.settle(reserved, 400)
+    assert limiter.stats()["tokens_available"] == 500
+
+
+def test_oversized_calls_are_capped_at_a_minute_of_tokens():
+    limiter = RateLimiter(tokens_per_minute=1000)
+
+    assert limiter.acquire(5000) == 1000
+
+
+def test_callers_are_admitted_in_arrival_order_across_threads():
+    limiter = RateLimiter(tokens_per_minute=60_000)  # 1000 tokens/s
+    _drain(limiter, tokens=60_000)
+    admitted: list[str] = []
+
+    def call(name: str, tokens: int) -> None:
+        limiter.acquire(tokens)
+        admitted.append(name)
+
+    async def burst():
+        # The large call arrives first; the small ones must not overtake it
+        first = asyncio.create_task(asyncio.to_thread(call, "large", 300))
+        await asyncio.sleep(0.02)
+        rest = [asyncio.create_task(asyncio.to_thread(call, f"small{i}", 5)) for i in range(3)]
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(burst())
+
+    assert admitted[0] == "large"
+    assert sorted(admitted[1:]) == ["small0", "small1", "small2"]
+
+
+def test_cancelled_caller_leaves_the_queue():
+    limiter = RateLimiter(requests_per_minute=1)
+    _drain(limiter, requests=1)
+    token = CancellationToken()
+    threading.Timer(0.05, token.cancel, args=(CancelReason.CLIENT_DISCONNECTED,)).start()
+
+    with cancellation_scope(token), pytest.raises(OperationCancelledError):
+        limiter.acquire(0)
+    assert limiter.stats()["queued"] == 0
+
+
+def test_adapter_reserves_the_estimate_and_settles_to_usage():
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=10_000)
+    adapter = PromptImproverLiteLLMAdapter(
+        model="deepseek/deepseek-chat", api_key="x", max_tokens=2000, rate_limiter=limiter
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150),
+    )
+
+    adapter(prompt="hi")
+
+    stats = limiter.stats()
+    assert stats["requests_available"] == 9
+    assert 9840 <= stats["tokens_available"] <= 9860
+
+
+def test_failed_attempts_release_their_reservation():
+    limiter = RateLimiter(tokens_per_minute=10_000, clock=FakeClock())
+    adapter = PromptImproverLiteLLMAdapter(
+        model="deepseek/deepseek-chat",
+        api_key="x",
+        max_tokens=2000,
+        rate_limiter=limiter,
+        retry_policy=RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.02),
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.completion.side_effect = [
+        ConnectionError("reset"),
+        ConnectionError("reset"),
+        SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150),
+        ),
+    ]
+
+    assert adapter(prompt="hi") == ["ok"]
+    assert limiter.stats()["tokens_available"] == 10_000 - 150
+
+
+def test_timed_out_attempt_keeps_its_reservation():
+    limiter = RateLimiter(tokens_per_minute=10_000, clock=FakeClock())
+    adapter = PromptImproverLiteLLMAdapter(
+        model="deepseek/deepseek-chat", api_key="x", max_tokens=2000, rate_limiter=limiter
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.completion.side_effect = TimeoutError("read timed out")
+
+    with pytest.raises(RuntimeError):
+        adapter(prompt="hi")
+    assert limiter.stats()["tokens_available"] <= 10_000 - 2000
+
+
+def _limited_adapter(limiter: RateLimiter) -> PromptImproverLiteLLMAdapter:
+    adapter = PromptImproverLiteLLMAdapter(
+        model="deepseek/deepseek-chat", api_key="x", rate_limiter=limiter
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.completion.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))]
+    )
+    return adapter
+
+
+def test_router_does_not_count_a_local_rate_limit_rejection():
+    limiter = RateLimiter(requests_per_minute=1)
+    _drain(limiter, requests=1)
+    adapter = _limited_adapter(limiter)
+    router = ProviderRouter([adapter], breaker_failure_threshold=1)
+
+    with cancellation_scope(CancellationToken(timeout_seconds=2)), \
+         pytest.raises(ProviderUnavailableError, match="RateLimitWaitError"):
+        router(prompt="hi")
+
+    adapter.litellm.completion.assert_not_called()
+    assert router.breakers()[0].state == BreakerState.CLOSED
+    assert router.stats()[0]["calls"] == 0
+
+
+def test_router_latency_excludes_the_rate_limit_wait():
+    limiter = RateLimiter(requests_per_minute=600)  # One call per 0.1s
+    _drain(limiter, requests=600)
+    router = ProviderRouter([_limited_adapter(limiter)])
+
+    with cancellation_scope(CancellationToken(timeout_seconds=5)):
+        assert router(prompt="hi") == ["ok"]
+
+    assert limiter.stats()["wait_seconds"] >= 0.08
+    assert router.stats()[0]["latency_ms"] < 50
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("deepseek:deepseek-chat=60/100000, ollama:llama3:8b=/5000") == {
+        ("deepseek", "deepseek-chat"): (60, 100000),
+        ("ollama", "llama3:8b"): (None, 5000),
+    }
+    with pytest.raises(ValueError):
+        parse_rate_limits("deepseek=60/100000")
+    with pytest.raises(ValueError):
+        parse_rate_limits("openai:gpt-4o=fast/1")
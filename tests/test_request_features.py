@@ -0,0 +1,112 @@
+"""Tests for request features computed once per improve-prompt call."""
+
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from eval.src.complexity_analyzer import ComplexityLevel as SelectorComplexityLevel
+from eval.src.strategy_selector import StrategySelector
+from hemdov.domain.dto.nlac_models import NLaCInputs, NLaCRequest
+from hemdov.domain.services.complexity_analyzer import ComplexityLevel
+from hemdov.domain.services.nlac_builder import NLaCBuilder
+from hemdov.domain.services.request_features import (
+    RequestFeatures,
+    features_scope,
+    get_current_features,
+)
+
+
+def test_features_match_analyzer_and_classifier():
+    features = RequestFeatures.from_request("Fix the bug in my login code", "")
+
+    assert features.intent == "debug"
+    assert features.complexity == ComplexityLevel.SIMPLE
+    assert features.text == "fix the bug in my login code "
+
+
+def test_intent_is_classified_on_first_access_only():
+    with patch(
+        "hemdov.domain.services.request_features._intent_classifier.classify",
+        return_value="explain",
+    ) as classify:
+        features = RequestFeatures.from_request("Explain closures", "")
+        classify.assert_not_called()
+
+        assert features.intent == "explain"
+        assert features.intent == "explain"
+        classify.assert_called_once()
+
+
+def test_scope_only_returns_features_for_same_input():
+    features = RequestFeatures.from_request("Explain closures", "")
+
+    assert get_current_features("Explain closures", "") is None
+    with features_scope(features):
+        assert get_current_features("Explain closures", "") is features
+        assert get_current_features("Explain generators", "") is None
+    assert get_current_features("Explain closures", "") is None
+
+
+def test_selector_reuses_features_instead_of_analyzing():
+    selector = StrategySelector(use_nlac=False)
+    features = RequestFeatures.from_request("hola", "")
+
+    with patch.object(selector.analyzer, "analyze") as analyze:
+        assert selector.get_complexity("hola", "", features) == SelectorComplexityLevel.SIMPLE
+        assert selector.select("hola", "", features=features) is selector.simple_strategy
+        analyze.assert_not_called()
+
+        # Features for a different input are ignored
+        selector.get_complexity("other input", "", features)
+        analyze.assert_called_once()
+
+
+def test_builder_reuses_features_unless_structured_inputs():
+    builder = NLaCBuilder(knn_provider=None)
+    features = RequestFeatures.from_request("Refactor the payment module", "")
+
+    with patch.object(builder.intent_classifier, "classify") as classify, \
+         patch.object(builder.complexity_analyzer, "analyze") as analyze:
+        prompt = builder.build(NLaCRequest(idea=features.idea), features=features)
+        classify.assert_not_called()
+        analyze.assert_not_called()
+    assert prompt.strategy_meta["intent"] == features.intent
+    assert prompt.strategy_meta["complexity"] == features.complexity.value
+
+    # code_snippet + error_log is a structural signal the features don't carry
+    structured = NLaCRequest(
+        idea=features.idea,
+        inputs=NLaCInputs(code_snippet="x = 1 / 0", error_log="ZeroDivisionError"),
+    )
+    assert builder.build(structured, features=features).strategy_meta["intent"] == "debug"
+
+
+def test_endpoint_passes_features_to_selector():
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = Mock(return_value=Mock(
+        improved_prompt="improved",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    ))
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Fix the login bug", "mode": "legacy"}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["intent"] == "DEBUG"
+    features = selector.select.call_args.kwargs["features"]
+    assert isinstance(features, RequestFeatures)
+    assert selector.get_complexity.call_args.kwargs["features"] is features
@@ -0,0 +1,180 @@
+"""Tests for retrying transient LLM failures within the request deadline."""
+
+import random
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import httpx
+import litellm
+import pytest
+
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    OperationCancelledError,
+    cancellation_scope,
+)
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.retry_policy import RetryPolicy, is_transient
+from hemdov.infrastructure.metrics.in_process import InProcessMetrics
+
+FAST = RetryPolicy(
+    max_attempts=3, base_delay_seconds=0.01, max_delay_seconds=0.02, min_attempt_seconds=0.1
+)
+
+
+def _rate_limited(retry_after: str | None = None):
+    response = None
+    if retry_after is not None:
+        request = httpx.Request("POST", "https://provider.test/v1/chat/completions")
+        response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return litellm.exceptions.RateLimitError(
+        message="slow down", llm_provider="deepseek", model="deepseek-chat", response=response
+    )
+
+
+def _response(text: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def _adapter(side_effect, policy=FAST, metrics=None) -> PromptImproverLiteLLMAdapter:
+    adapter = PromptImproverLiteLLMAdapter(
+        model="deepseek/deepseek-chat", api_key="x", retry_policy=policy, metrics=metrics
+    )
+    adapter.litellm = Mock()
+    adapter.litellm.get_supported_openai_params.return_value = ["n"]
+    adapter.litellm.completion.side_effect = side_effect
+    adapter._retry_random = random.Random(0)
+    return adapter
+
+
+def _attempts(metrics: InProcessMetrics) -> str:
+    return "\n".join(
+        line for line in metrics.render().splitlines()
+        if line.startswith("prompt_improver_llm_attempts_total{")
+    )
+
+
+def test_rate_limit_is_retried_and_counted():
+    metrics = InProcessMetrics()
+    adapter = _adapter([_rate_limited(), _response("ok")], metrics=metrics)
+
+    assert adapter(prompt="hi") == ["ok"]
+    assert adapter.litellm.completion.call_count == 2
+    attempts = _attempts(metrics)
+    assert 'outcome="retry"' in attempts
+    assert 'outcome="ok"' in attempts
+
+
+def test_attempts_are_capped():
+    metrics = InProcessMetrics()
+    adapter = _adapter(_rate_limited(), metrics=metrics)
+
+    with pytest.raises(litellm.exceptions.RateLimitError):
+        adapter(prompt="hi")
+    assert adapter.litellm.completion.call_count == 3
+    assert 'outcome="exhausted"' in _attempts(metrics)
+
+
+def test_no_retry_when_the_deadline_cannot_fit_one():
+    policy = RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.02, min_attempt_seconds=5.0)
+    adapter = _adapter(_rate_limited(), policy=policy)
+
+    with cancellation_scope(CancellationToken(timeout_seconds=2)), \
+         pytest.raises(litellm.exceptions.RateLimitError):
+        adapter(prompt="hi")
+    assert adapter.litellm.completion.call_count == 1
+
+
+def test_retry_timeout_is_capped_at_the_remaining_deadline():
+    adapter = _adapter([_rate_limited(), _response("ok")])
+
+    with cancellation_scope(CancellationToken(timeout_seconds=3)):
+        adapter(prompt="hi", timeout=60)
+
+    second = adapter.litellm.completion.call_args_list[1].kwargs
+    assert second["timeout"] <= 3
+
+
+def test_builtin_connection_errors_keep_the_runtime_error_contract():
+    adapter = _adapter(ConnectionError("reset"))
+
+    with pytest.raises(RuntimeError) as exc_info:
+        adapter(prompt="hi")
+    assert isinstance(exc_info.value.__cause__, ConnectionError)
+    assert adapter.litellm.completion.call_count == 3
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("read timed out"),
+    ValueError("bad request"),
+    litellm.exceptions.Timeout(message="t", model="m", llm_provider="p"),
+])
+def test_non_transient_errors_are_not_retried(error):
+    adapter = _adapter(error)
+
+    with pytest.raises((RuntimeError, litellm.exceptions.Timeout)):
+        adapter(prompt="hi")
+    assert adapter.litellm.completion.call_count == 1
+    assert not is_transient(error)
+
+
+@pytest.mark.parametrize(("error", "outcome"), [
+    (litellm.exceptions.Timeout(message="t", model="m", llm_provider="p"), "deadline"),
+    (
+        litellm.exceptions.AuthenticationError(message="bad key", llm_provider="p", model="m"),
+        "error",
+    ),
+    (
+        litellm.exceptions.BadRequestError(message="bad input", model="m", llm_provider="p"),
+        "error",
+    ),
+])
+def test_final_provider_errors_are_counted_and_raised_unwrapped(error, outcome):
+    metrics = InProcessMetrics()
+    adapter = _adapter(error, metrics=metrics)
+
+    with pytest.raises(type(error)):
+        adapter(prompt="hi")
+    assert adapter.litellm.completion.call_count == 1
+    assert metrics.llm_attempts.value(provider="deepseek/deepseek-chat", outcome=outcome) == 1
+
+
+def test_disabled_policy_fails_on_first_error():
+    adapter = _adapter([_rate_limited(), _response("ok")], policy=None)
+
+    with pytest.raises(litellm.exceptions.RateLimitError):
+        adapter(prompt="hi")
+
+
+def test_retry_after_header_raises_the_delay():
+    policy = RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.02)
+
+    assert policy.delay(_rate_limited("4"), attempt=1, remaining=None) == 4.0
+    # Honouring Retry-After must still fit the deadline
+    assert policy.delay(_rate_limited("4"), attempt=1, remaining=3.0) is None
+
+
+def test_backoff_is_full_jitter_under_the_cap():
+    policy = RetryPolicy(base_delay_seconds=0.5, max_delay_seconds=2.0)
+    rng = random.Random(1)
+
+    for retry, cap in [(0, 0.5), (1, 1.0), (2, 2.0), (6, 2.0)]:
+        delays = [policy.backoff(retry, rng) for _ in range(200)]
+        assert all(0 <= d <= cap for d in delays)
+        assert max(delays) > cap / 2
+
+
+def test_cancellation_interrupts_the_backoff():
+    policy = RetryPolicy(base_delay_seconds=5.0, max_delay_seconds=5.0, min_attempt_seconds=0)
+    adapter = _adapter(_rate_limited("5"), policy=policy)
+    token = CancellationToken()
+    threading.Timer(0.05, token.cancel, args=(CancelReason.CLIENT_DISCONNECTED,)).start()
+
+    start = time.monotonic()
+    with cancellation_scope(token), pytest.raises(OperationCancelledError):
+        adapter(prompt="hi")
+    assert time.monotonic() - start < 1
+    assert adapter.litellm.completion.call_count == 1
@@ -0,0 +1,224 @@
+"""Tests for sampled shadow traffic through a candidate strategy."""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import dspy
+import httpx
+
+from api.main import app
+from api.shadow import ShadowRequest, ShadowRunner
+from hemdov.domain.services.cancellation import (
+    CancellationToken,
+    CancelReason,
+    cancellation_scope,
+    get_current_token,
+)
+from hemdov.infrastructure.config import Settings
+from hemdov.infrastructure.metrics import InProcessMetrics
+from hemdov.interfaces import container
+
+
+def _result(prompt: str = "You are a senior engineer. Write the release notes."):
+    return SimpleNamespace(
+        improved_prompt=prompt,
+        role="Engineer",
+        directive="Write the release notes",
+        framework="chain-of-thought",
+        guardrails=["Be concise", "Cite tickets"],
+        reasoning=None,
+        confidence=None,
+    )
+
+
+def _selector(improve, name: str = "nlac"):
+    strategy = Mock()
+    strategy.name = name
+    strategy.improve = improve
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+    return selector
+
+
+def _runner(tmp_path, improve, **kwargs) -> ShadowRunner:
+    async def get_selector():
+        return _selector(improve)
+
+    kwargs.setdefault("sample_rate", 1.0)
+    return ShadowRunner(
+        selector_getter=get_selector, results_path=tmp_path / "shadow.jsonl", **kwargs
+    )
+
+
+def _served(request_id: str = "req-1") -> ShadowRequest:
+    return ShadowRequest(
+        request_id=request_id,
+        prompt_id="prompt-1",
+        mode="legacy",
+        idea="Write release notes for v2",
+        context="",
+        strategy="simple",
+        latency_ms=850,
+        improved_prompt="Write release notes.",
+        framework="chain-of-thought",
+        guardrails=["Be concise"],
+    )
+
+
+async def _drain(runner: ShadowRunner) -> None:
+    await asyncio.gather(*list(runner._in_flight), return_exceptions=True)
+
+
+def _records(tmp_path) -> list[dict]:
+    return [json.loads(line) for line in (tmp_path / "shadow.jsonl").read_text().splitlines()]
+
+
+def test_stores_primary_and_candidate_side_by_side(tmp_path):
+    metrics = InProcessMetrics()
+    runner = _runner(tmp_path, lambda original_idea, context: _result(), metrics=metrics)
+
+    async def run():
+        assert runner.submit(_served())
+        await _drain(runner)
+
+    asyncio.run(run())
+    (record,) = _records(tmp_path)
+    assert record["request_id"] == "req-1"
+    assert record["primary"]["latency_ms"] == 850
+    assert record["candidate"]["ok"] is True
+    assert record["candidate"]["strategy"] == "nlac"
+    for side in ("primary", "candidate"):
+        assert 0 <= record[side]["quality_score"] <= 1
+        assert "overall_pass" in record[side]["gates"]
+    assert runner.stats()["completed"] == 1
+    assert metrics.shadow_runs.value(outcome="completed") == 1
+
+
+def test_concurrency_cap_skips_instead_of_queueing(tmp_path):
+    release = threading.Event()
+
+    def improve(original_idea, context):
+        release.wait(5)
+        return _result()
+
+    runner = _runner(tmp_path, improve, max_concurrency=1)
+
+    async def run():
+        assert runner.submit(_served("req-1"))
+        assert not runner.submit(_served("req-2"))
+        release.set()
+        await _drain(runner)
+
+    asyncio.run(run())
+    assert [r["request_id"] for r in _records(tmp_path)] == ["req-1"]
+    assert runner.stats()["skipped"] == 1
+
+
+def test_candidate_deadline_is_recorded_as_failure(tmp_path):
+    tokens = []
+
+    def improve(original_idea, context):
+        tokens.append(get_current_token())
+        time.sleep(0.3)
+        return _result()
+
+    runner = _runner(tmp_path, improve, timeout_seconds=0.05)
+
+    async def run():
+        runner.submit(_served())
+        await _drain(runner)
+
+    asyncio.run(run())
+    (record,) = _records(tmp_path)
+    assert record["candidate"] == {
+        "ok": False,
+        "latency_ms": record["candidate"]["latency_ms"],
+        "error": "TimeoutError",
+        "timings": {},
+    }
+    assert tokens[0].reason == CancelReason.TIMEOUT
+    assert runner.stats()["failed"] == 1
+
+
+def test_request_scope_does_not_leak_into_shadow_run(tmp_path):
+    seen = {}
+
+    def improve(original_idea, context):
+        seen["token"] = get_current_token()
+        seen["lm"] = dspy.settings.lm
+        return _result()
+
+    runner = _runner(tmp_path, improve)
+    request_token = CancellationToken()
+
+    async def run():
+        with cancellation_scope(request_token), dspy.context(lm="arm-lm"):
+            runner.submit(_served())
+        request_token.cancel(CancelReason.CLIENT_DISCONNECTED)
+        await _drain(runner)
+
+    asyncio.run(run())
+    assert seen["token"] is not request_token
+    assert not seen["token"].cancelled
+    assert seen["lm"] != "arm-lm"
+
+
+def test_endpoint_mirrors_sampled_requests(tmp_path, monkeypatch):
+    settings = container.get(Settings)
+    monkeypatch.setattr(settings, "SHADOW_ENABLED", True)
+    monkeypatch.setattr(settings, "SHADOW_CANDIDATE_MODE", "nlac")
+
+    primary = _selector(Mock(return_value=_result("You are the primary.")), name="simple")
+    candidate_improve = Mock(return_value=_result("You are the candidate."))
+    runner = _runner(tmp_path, candidate_improve)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/improve-prompt", json={"idea": "Write release notes", "mode": "legacy"}
+            )
+        await _drain(runner)
+        return response
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=primary), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)), \
+         patch("api.prompt_improver_api._shadow_runner", runner):
+        response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.json()["improved_prompt"] == "You are the primary."
+    (record,) = _records(tmp_path)
+    assert record["prompt_id"] == response.json()["prompt_id"]
+    assert record["primary"]["improved_prompt"] == "You are the primary."
+    assert record["candidate"]["improved_prompt"] == "You are the candidate."
+    candidate_improve.assert_called_once_with(original_idea="Write release notes", context="")
+
+
+def test_endpoint_skips_shadow_when_candidate_matches_primary(tmp_path, monkeypatch):
+    settings = container.get(Settings)
+    monkeypatch.setattr(settings, "SHADOW_ENABLED", True)
+    monkeypatch.setattr(settings, "SHADOW_CANDIDATE_MODE", "legacy")
+    runner = _runner(tmp_path, Mock())
+
+    with patch("api.prompt_improver_api.get_strategy_selector",
+               return_value=_selector(Mock(return_value=_result()), name="simple")), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)), \
+         patch("api.prompt_improver_api._shadow_runner", runner):
+        transport = httpx.ASGITransport(app=app)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(
+                    "/api/v1/improve-prompt", json={"idea": "Write release notes"}
+                )
+
+        assert asyncio.run(run()).status_code == 200
+
+    assert runner.stats()["sampled"] == 0
@@ -0,0 +1,113 @@
+"""Tests for per-stage latency breakdown and the Server-Timing header."""
+
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from hemdov.domain.services.stage_timing import (
+    StageTimings,
+    get_current_timings,
+    timed_stage,
+    timing_scope,
+)
+from hemdov.infrastructure.config import Settings
+from hemdov.interfaces import container
+
+
+def test_timed_stage_is_noop_without_scope():
+    assert get_current_timings() is None
+    with timed_stage("llm"):
+        pass
+
+
+def test_repeated_stages_are_summed_and_counted():
+    timings = StageTimings()
+    timings.record("llm", 100.0)
+    timings.record("llm", 50.04)
+    timings.record("knn", 2.0)
+
+    assert timings.as_dict() == {
+        "llm": {"ms": 150.0, "count": 2},
+        "knn": {"ms": 2.0, "count": 1},
+    }
+    assert timings.server_timing_header() == 'llm;dur=150.0;desc="2x", knn;dur=2.0'
+
+
+def test_failed_stage_is_still_recorded():
+    timings = StageTimings()
+    with timing_scope(timings), pytest.raises(RuntimeError), timed_stage("llm"):
+        raise RuntimeError("provider down")
+    assert timings.as_dict()["llm"]["count"] == 1
+
+
+def test_worker_threads_record_into_request_collector():
+    timings = StageTimings()
+
+    def work():
+        with timed_stage("opro_iter"):
+            pass
+
+    with timing_scope(timings):
+        import contextvars
+
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(work,))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert timings.as_dict()["opro_iter"]["count"] == 4
+
+
+def _selector_mock():
+    strategy = Mock()
+    strategy.name = "simple"
+
+    def improve(original_idea, context):
+        with timed_stage("llm"):
+            pass
+        return Mock(
+            improved_prompt="improved",
+            role="Engineer",
+            directive="Do it",
+            framework="chain-of-thought",
+            guardrails=["be brief"],
+            reasoning=None,
+            confidence=None,
+        )
+
+    strategy.improve = improve
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {}
+    return selector
+
+
+@pytest.mark.parametrize("timings_in_response", [False, True])
+def test_improve_prompt_reports_server_timing(monkeypatch, timings_in_response):
+    settings = container.get(Settings)
+    monkeypatch.setattr(settings, "TIMINGS_IN_RESPONSE", timings_in_response)
+
+    with patch("api.prompt_improver_api.get_strategy_selector", return_value=_selector_mock()), \
+         patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+        response = TestClient(app).post(
+            "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "legacy"}
+        )
+
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    for stage in ("queue", "selector", "features", "select", "improve", "llm",
+                  "metrics", "persistence", "total"):
+        assert f"{stage};dur=" in header
+
+    meta = response.json()["strategy_meta"]
+    assert ("timings" in meta) is timings_in_response
+    if timings_in_response:
+        assert meta["timings"]["llm"]["count"] == 1
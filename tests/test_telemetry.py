@@ -0,0 +1,215 @@
+"""Tests for in-process telemetry and the Prometheus /metrics endpoint."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from hemdov.domain.dto.nlac_models import NLaCRequest
+from hemdov.domain.services.knn_provider import KNNProvider
+from hemdov.domain.services.prompt_cache import PromptCache
+from hemdov.domain.services.stage_timing import bind_metrics_port, get_metrics_port, timed_stage
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+from hemdov.infrastructure.adapters.provider_breaker import BreakerState
+from hemdov.infrastructure.metrics import Histogram, InProcessMetrics, InstrumentRegistry
+
+
+class TestInstruments:
+    def test_counter_renders_labels_and_type(self):
+        registry = InstrumentRegistry()
+        counter = registry.counter("demo_total", "Demo counter.", ("mode",))
+        counter.inc(mode="nlac")
+        counter.inc(2, mode="nlac")
+
+        text = registry.render()
+        assert "# TYPE demo_total counter" in text
+        assert 'demo_total{mode="nlac"} 3' in text
+
+    def test_counter_rejects_wrong_labels_and_decrements(self):
+        counter = InstrumentRegistry().counter("demo_total", "Demo.", ("mode",))
+        with pytest.raises(ValueError):
+            counter.inc(strategy="simple")
+        with pytest.raises(ValueError):
+            counter.inc(-1, mode="legacy")
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, stage="llm")
+
+        lines = histogram.render()
+        assert 'latency_seconds_bucket{stage="llm",le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{stage="llm",le="1"} 3' in lines
+        assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{stage="llm"} 4' in lines
+        assert 'latency_seconds_sum{stage="llm"} 3.65' in lines
+
+    def test_gauge_function_read_at_render(self):
+        registry = InstrumentRegistry()
+        gauge = registry.gauge("breaker_open", "Open.", ("breaker",))
+        state = {"open": 0.0}
+        gauge.set_function(lambda: {("history",): state["open"]})
+        state["open"] = 1.0
+        assert 'breaker_open{breaker="history"} 1' in registry.render()
+
+    def test_label_values_are_escaped(self):
+        registry = InstrumentRegistry()
+        registry.counter("demo_total", "Demo.", ("model",)).inc(model='a"b')
+        assert 'demo_total{model="a\\"b"} 1' in registry.render()
+
+    def test_duplicate_names_rejected(self):
+        registry = InstrumentRegistry()
+        registry.counter("demo_total", "Demo.")
+        with pytest.raises(ValueError):
+            registry.gauge("demo_total", "Demo.")
+
+
+class TestInProcessMetrics:
+    def test_metrics_port_rates(self):
+        metrics = InProcessMetrics()
+        metrics.record_cache_hit(True, "k1")
+        metrics.record_cache_hit(False, "k2")
+        metrics.record_cache_hit(True, "k3")
+        metrics.record_knn_hit(False, "query")
+
+        assert metrics.get_cache_hit_rate("1h") == pytest.approx(2 / 3)
+        assert metrics.get_knn_hit_rate("24h") == 0.0
+        assert metrics.get_cache_hit_rate("7d") == pytest.approx(2 / 3)
+        with pytest.raises(ValueError):
+            metrics.get_cache_hit_rate("yesterday")
+
+    def test_record_latency_feeds_stage_histogram(self):
+        metrics = InProcessMetrics()
+        metrics.record_latency("llm", 250.0)
+        assert metrics.stage_duration.count(stage="llm") == 1
+
+    def test_record_request_counts_degradations(self):
+        metrics = InProcessMetrics()
+        metrics.record_request(
+            mode="nlac",
+            status=200,
+            duration_seconds=1.5,
+            strategy="nlac",
+            provider="ollama",
+            degradation_flags={"knn_disabled": True, "metrics_failed": False},
+        )
+        metrics.record_request(mode="nlac", status=504)
+
+        assert metrics.requests.value(mode="nlac", status="200") == 1
+        assert metrics.requests.value(mode="nlac", status="504") == 1
+        assert metrics.request_duration.count(strategy="nlac", mode="nlac", provider="ollama") == 1
+        assert metrics.degradations.value(flag="knn_disabled") == 1
+        assert metrics.degradations.value(flag="metrics_failed") == 0
+
+    def test_prompt_cache_reports_hits_and_misses(self):
+        metrics = InProcessMetrics()
+        cache = PromptCache(metrics=metrics)
+        request = NLaCRequest(idea="Write a function", context="")
+
+        async def run():
+            await cache.get(request)
+            await cache.put(request, Mock())
+            await cache.get(request)
+
+        asyncio.run(run())
+        assert metrics.cache_requests.value(result="miss") == 1
+        assert metrics.cache_requests.value(result="hit") == 1
+
+    def test_llm_response_cache_reports_hits_and_misses(self, tmp_path):
+        metrics = InProcessMetrics()
+        adapter = PromptImproverLiteLLMAdapter(
+            model="openai/test", api_key="x", cache=LLMResponseCache(tmp_path / "llm.sqlite"),
+            metrics=metrics,
+        )
+        adapter.litellm = Mock()
+        adapter.litellm.completion.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="improved"))],
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=4, total_tokens=16),
+        )
+
+        adapter(prompt="Write a function")
+        adapter(prompt="Write a function")
+
+        assert metrics.cache_requests.value(result="miss") == 1
+        assert metrics.cache_requests.value(result="hit") == 1
+        assert metrics.get_cache_hit_rate("1h") == pytest.approx(0.5)
+
+    def test_knn_queries_are_reported_to_the_bound_port(self):
+        metrics = InProcessMetrics()
+        provider = KNNProvider(
+            catalog_data=[
+                {"inputs": {"original_idea": idea}, "outputs": {"improved_prompt": "improved"}}
+                for idea in ("debug code", "refactor function", "explain recursion")
+            ],
+            k=1,
+        )
+        previous = get_metrics_port()
+        bind_metrics_port(metrics)
+        try:
+            provider.find_examples(intent="debug", complexity="simple", min_similarity=0.0)
+        finally:
+            bind_metrics_port(previous)
+
+        assert metrics.knn_queries.value(method="bigrams") == 1
+        assert metrics.get_knn_hit_rate("1h") == 0.0
+
+
+def _selector_mock():
+    strategy = Mock()
+    strategy.name = "simple"
+    strategy.improve = Mock(return_value=Mock(
+        improved_prompt="improved",
+        role="Engineer",
+        directive="Do it",
+        framework="chain-of-thought",
+        guardrails=["be brief"],
+        reasoning=None,
+        confidence=None,
+    ))
+    selector = Mock()
+    selector.select.return_value = strategy
+    selector.get_complexity.return_value = Mock(value="simple")
+    selector.get_degradation_flags.return_value = {"knn_disabled": True}
+    return selector
+
+
+class TestMetricsEndpoint:
+    def test_metrics_endpoint_exports_request_and_stage_latency(self):
+        client = TestClient(app)
+        selector = _selector_mock()
+        with patch("api.prompt_improver_api.get_strategy_selector", return_value=selector), \
+             patch("api.prompt_improver_api._enqueue_history", new=AsyncMock(return_value=True)):
+            assert client.post(
+                "/api/v1/improve-prompt", json={"idea": "Test idea", "mode": "legacy"}
+            ).status_code == 200
+
+        # Stages timed outside a request are still exported
+        with timed_stage("knn"):
+            pass
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        request_count = "prompt_improver_request_duration_seconds_count"
+        assert f'{request_count}{{strategy="simple",mode="legacy"' in text
+        assert 'prompt_improver_stage_duration_seconds_count{stage="queue"}' in text
+        assert 'prompt_improver_stage_duration_seconds_count{stage="knn"}' in text
+        assert 'prompt_improver_degradation_total{flag="knn_disabled"}' in text
+        assert 'prompt_improver_admission_in_flight{mode="nlac"} 0' in text
+
+    def test_metrics_endpoint_exports_circuit_breaker_state(self):
+        from api.prompt_improver_api import _circuit_breaker
+
+        with patch.object(_circuit_breaker, "_state", BreakerState.OPEN), \
+             patch.object(_circuit_breaker, "_open_until", time.monotonic() + 300), \
+             patch.object(_circuit_breaker, "_failure_count", 5):
+            text = TestClient(app).get("/metrics").text
+
+        assert 'prompt_improver_circuit_breaker_open{breaker="history_persistence"} 1' in text
+        assert 'prompt_improver_circuit_breaker_failures{breaker="history_persistence"} 5' in text
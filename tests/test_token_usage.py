@@ -0,0 +1,165 @@
+"""Tests for provider-reported token accounting."""
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from api.prompt_improver_api import _usage_inputs
+from hemdov.domain.metrics.evaluators import (
+    PerformanceEvaluator,
+    PromptMetricsCalculator,
+    calculate_cost,
+)
+from hemdov.domain.services.token_usage import TokenUsage, record_usage, usage_scope
+from hemdov.infrastructure.adapters.litellm_dspy_adapter_prompt import PromptImproverLiteLLMAdapter
+from hemdov.infrastructure.adapters.llm_response_cache import LLMResponseCache
+from hemdov.infrastructure.metrics.in_process import InProcessMetrics
+
+
+def _response(*texts, usage=None):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text)) for text in texts],
+        usage=usage,
+    )
+
+
+def _usage(prompt_tokens, completion_tokens, cached_tokens=None):
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=details,
+    )
+
+
+def _adapter(completion, supported=("n",), **kwargs) -> PromptImproverLiteLLMAdapter:
+    adapter = PromptImproverLiteLLMAdapter(model="deepseek/deepseek-chat", api_key="x", **kwargs)
+    adapter.litellm = Mock()
+    adapter.litellm.get_supported_openai_params.return_value = list(supported)
+    adapter.litellm.completion.side_effect = completion
+    return adapter
+
+
+def test_record_usage_without_a_scope_is_a_no_op():
+    record_usage(10, 5)
+
+    usage = TokenUsage()
+    with usage_scope(usage):
+        record_usage(10, 5, cached_tokens=4)
+        record_usage(3, 2, estimated=True)
+
+    assert usage.as_dict() == {
+        "calls": 2, "prompt_tokens": 13, "completion_tokens": 7, "cached_tokens": 4,
+        "cached_ratio": 0.308, "estimated": True,
+    }
+
+
+def test_adapter_records_provider_usage_including_cached_tokens():
+    adapter = _adapter(lambda **kw: _response("ok", usage=_usage(1200, 80, cached_tokens=1024)))
+    usage = TokenUsage()
+
+    with usage_scope(usage):
+        outputs = adapter(prompt="hi")
+
+    assert outputs[0].usage["cached_tokens"] == 1024
+    assert usage.as_dict() == {
+        "calls": 1, "prompt_tokens": 1200, "completion_tokens": 80, "cached_tokens": 1024,
+        "cached_ratio": 0.853, "estimated": False,
+    }
+
+
+def test_native_n_records_the_billed_totals_once():
+    adapter = _adapter(lambda **kw: _response("a", "b", "c", usage=_usage(500, 90)))
+    usage = TokenUsage()
+
+    with usage_scope(usage):
+        adapter(prompt="hi", n=3)
+
+    assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (1, 500, 90)
+
+
+def test_extra_sample_calls_reach_the_ledger_from_worker_threads():
+    adapter = _adapter(lambda **kw: _response("x", usage=_usage(100, 10)), supported=())
+    usage = TokenUsage()
+
+    with usage_scope(usage):
+        adapter(prompt="hi", n=3)
+
+    assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (3, 300, 30)
+
+
+def test_missing_usage_falls_back_to_the_estimate():
+    adapter = _adapter(lambda **kw: _response("y" * 40))
+    usage = TokenUsage()
+
+    with usage_scope(usage):
+        adapter(messages=[{"role": "user", "content": "z" * 80}])
+
+    assert (usage.prompt_tokens, usage.completion_tokens, usage.estimated) == (20, 10, True)
+
+
+def test_cache_hits_bill_nothing(tmp_path):
+    cache = LLMResponseCache(tmp_path / "cache.sqlite")
+    adapter = _adapter(lambda **kw: _response("ok", usage=_usage(100, 10)), cache=cache)
+    adapter(prompt="hi")
+    usage = TokenUsage()
+
+    with usage_scope(usage):
+        adapter(prompt="hi")
+
+    assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (1, 0, 0)
+
+
+def test_cached_prompt_tokens_are_priced_at_the_cache_rate():
+    full = calculate_cost("deepseek", "deepseek-chat", 10_000, 0)
+    cached = calculate_cost("deepseek", "deepseek-chat", 10_000, 0, cached_tokens=8_000)
+
+    assert cached == pytest.approx(full * 0.2 + 8 * 0.000014)
+    # Models without a cache rate bill cached tokens as input
+    uncached_rate = calculate_cost("gemini", "gemini-2.5-pro", 1000, 0, cached_tokens=1000)
+    assert uncached_rate == pytest.approx(0.00125)
+
+
+def test_performance_uses_reported_tokens_and_estimates_without_them():
+    evaluate = PerformanceEvaluator.evaluate
+    reported = evaluate(1000, "deepseek", "deepseek-chat", "zero-shot", "idea", "prompt",
+                        input_tokens=2400, output_tokens=600, cached_tokens=2000)
+    estimated = evaluate(1000, "deepseek", "deepseek-chat", "zero-shot", "idea" * 10, "prompt" * 10)
+
+    assert reported.total_tokens == 3000
+    assert reported.cached_tokens == 2000
+    assert reported.tokens_estimated is False
+    expected_cost = calculate_cost("deepseek", "deepseek-chat", 2400, 600, 2000)
+    assert reported.cost_usd == pytest.approx(expected_cost)
+    assert (estimated.total_tokens, estimated.tokens_estimated) == (25, True)
+
+
+def test_request_usage_reaches_prompt_metrics():
+    usage = TokenUsage()
+    usage.record(1500, 300, cached_tokens=1000)
+
+    metrics = PromptMetricsCalculator().calculate_from_history(
+        original_idea="idea", context="", improved_prompt="prompt", role="r", directive="d",
+        framework="chain-of-thought", guardrails=[], backend="simple", model="deepseek-chat",
+        provider="deepseek", latency_ms=900, **_usage_inputs(usage),
+    )
+
+    performance = metrics.to_dict()["performance"]
+    assert performance["input_tokens"] == 1500
+    assert performance["output_tokens"] == 300
+    assert performance["cached_tokens"] == 1000
+    assert performance["tokens_estimated"] is False
+    assert _usage_inputs(TokenUsage()) == {}
+
+
+def test_token_counters_by_provider_and_kind():
+    metrics = InProcessMetrics()
+    usage = TokenUsage()
+    usage.record(1500, 300, cached_tokens=1000)
+
+    metrics.record_llm_tokens("deepseek", usage)
+
+    assert metrics.llm_tokens.value(provider="deepseek", kind="prompt") == 1500
+    assert metrics.llm_tokens.value(provider="deepseek", kind="cached") == 1000
@@ -0,0 +1,125 @@
+"""Tests for startup warm-up and the /ready endpoint."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.warmup import WarmupState, WarmupStatus, run_warmup, warmup_state
+from hemdov.infrastructure.config import Settings
+
+
+def _settings(**overrides):
+    values = {"WARMUP_MODES": "legacy,nlac", "WARMUP_DRY_RUN": True, "WARMUP_TIMEOUT_SECONDS": 5.0}
+    values.update(overrides)
+    return Settings(**values)
+
+
+def _run(settings, lm=None, selector_factory=None):
+    state = WarmupState()
+    get_selector = AsyncMock(side_effect=selector_factory or (lambda *a, **kw: Mock()))
+    with patch("api.prompt_improver_api.get_strategy_selector", get_selector):
+        asyncio.run(run_warmup(settings, lm=lm, state=state))
+    return state, get_selector
+
+
+def test_warmup_builds_each_mode_and_handshakes():
+    lm = Mock(return_value=["pong"])
+    state, get_selector = _run(_settings(), lm=lm)
+
+    assert state.status == WarmupStatus.READY
+    assert [step.name for step in state.steps] == ["selector:legacy", "selector:nlac", "provider"]
+    assert [call.kwargs["use_nlac"] for call in get_selector.call_args_list] == [False, True]
+    lm.assert_called_once_with(prompt="ping", max_tokens=1)
+    assert state.snapshot()["duration_ms"] is not None
+
+
+def test_selector_failure_leaves_instance_not_ready():
+    def factory(settings, use_nlac=False):
+        if use_nlac:
+            raise FileNotFoundError("catalog missing")
+        return Mock()
+
+    state, _ = _run(_settings(WARMUP_DRY_RUN=False), selector_factory=factory)
+
+    assert state.status == WarmupStatus.FAILED
+    failed = [step for step in state.steps if not step.ok]
+    assert [step.name for step in failed] == ["selector:nlac"]
+    assert "FileNotFoundError" in state.snapshot()["steps"][1]["error"]
+
+
+@pytest.mark.parametrize("require_provider,expected", [
+    (False, WarmupStatus.READY),
+    (True, WarmupStatus.FAILED),
+])
+def test_provider_handshake_failure(require_provider, expected):
+    lm = Mock(side_effect=RuntimeError("LiteLLM request failed: connection refused"))
+    state, _ = _run(
+        _settings(WARMUP_MODES="legacy", WARMUP_REQUIRE_PROVIDER=require_provider), lm=lm
+    )
+
+    assert state.status == expected
+    assert state.steps[-1].name == "provider"
+    assert state.steps[-1].ok is False
+
+
+def test_unknown_mode_fails_warmup():
+    state, get_selector = _run(_settings(WARMUP_MODES="legacy,turbo"))
+    assert state.status == WarmupStatus.FAILED
+    get_selector.assert_not_called()
+
+
+def test_ready_endpoint_tracks_warmup_state(monkeypatch):
+    client = TestClient(app)
+
+    monkeypatch.setattr(warmup_state, "status", WarmupStatus.WARMING)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+    # Liveness is unaffected
+    assert client.get("/health").status_code == 200
+
+    monkeypatch.setattr(warmup_state, "status", WarmupStatus.READY)
+    assert client.get("/ready").status_code == 200
+
+
+def _run_lifespan(check):
+    from api.main import lifespan
+
+    async def run():
+        async with lifespan(app):
+            return await check()
+
+    # dspy.settings is bound to the thread that first configured it
+    with patch("api.main.dspy"):
+        return asyncio.run(run())
+
+
+def test_lifespan_without_warmup_is_ready_until_shutdown():
+    async def check():
+        return warmup_state.ready
+
+    assert _run_lifespan(check) is True
+    assert warmup_state.status == WarmupStatus.COLD
+
+
+def test_lifespan_warms_in_background(monkeypatch):
+    from hemdov.interfaces import container
+
+    settings = container.get(Settings)
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(settings, "WARMUP_DRY_RUN", False)
+
+    async def check():
+        # Startup does not wait for warm-up
+        assert not warmup_state.ready
+        for _ in range(100):
+            if warmup_state.status in (WarmupStatus.READY, WarmupStatus.FAILED):
+                break
+            await asyncio.sleep(0.01)
+        return warmup_state.status
+
+    with patch("api.prompt_improver_api.get_strategy_selector", AsyncMock(return_value=Mock())):
+        assert _run_lifespan(check) == WarmupStatus.READY